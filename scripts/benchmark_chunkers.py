@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+ContextForge Chunker Benchmark
+Measures chunking throughput of the preprocessor chunkers on multi-MB
+generated files and checks that time grows linearly with file size, so
+quadratic regressions (e.g. per-match line counting) fail loudly.
+
+The scaling exponent is log(t_max / t_min) / log(size_max / size_min):
+about 1.0 for linear chunkers and about 2.0 for quadratic ones.
+
+Examples:
+  python scripts/benchmark_chunkers.py
+  python scripts/benchmark_chunkers.py --sizes-mb 1 4 16 --repeat 5
+  python scripts/benchmark_chunkers.py --max-scaling 1.3 --max-seconds-per-mb 0.5
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / 'services' / 'preprocessor'))
+
+from lang_chunkers import JavaScriptChunker, MarkdownChunker  # noqa: E402
+
+MB = 1024 * 1024
+
+
+# Generated sources
+def javascript_source(size_bytes: int) -> str:
+    """A bundle-like JS file with functions, classes, arrows, templates and tricky literals."""
+    parts = ["import { helper } from './helper';\nimport React from 'react';\n"]
+    total = len(parts[0])
+    i = 0
+    while total < size_bytes:
+        part = (
+            f"// module {i}: braces in comments are ignored {{ }}\n"
+            f"export function handler{i}(event, context) {{\n"
+            f"  const label = \"value {{ {i} }}\";\n"
+            f"  const message = `Handled ${{event.id}} in ${{ {{ n: {i} }}.n }} ms`;\n"
+            f"  /* block comment with }} brace */\n"
+            f"  if (event.type === 'close{{') {{\n"
+            f"    return {{ status: {i}, message }};\n"
+            f"  }}\n"
+            f"  return null;\n"
+            f"}}\n"
+            f"const transform{i} = (items) => {{\n"
+            f"  return items.map((item) => ({{ ...item, index: {i} }}));\n"
+            f"}};\n"
+            f"class Service{i} extends Base {{\n"
+            f"  constructor() {{ super(); this.name = 'service{i}'; }}\n"
+            f"  run() {{ return handler{i}({{ id: {i}, type: 'open' }}); }}\n"
+            f"}}\n"
+        )
+        parts.append(part)
+        total += len(part)
+        i += 1
+    return "".join(parts)
+
+
+def markdown_source(size_bytes: int) -> str:
+    """A docs-site-like Markdown file with nested headings, lists, tables and fenced code with # lines."""
+    parts = ["---\ntitle: Reference\n---\n\n"]
+    total = len(parts[0])
+    i = 0
+    while total < size_bytes:
+        part = (
+            f"# Module {i}\n\n"
+            f"Module {i} provides **helpers** for parsing, _validation_ and [rendering](./render-{i}.md).\n"
+            f"It is used by the CLI and the server.\n\n"
+            f"## Installation {i}\n\n"
+            f"- Install the package\n- Configure `module_{i}.yaml`\n  - nested option\n\n"
+            f"```bash\n# this is a comment, not a heading\npip install module-{i}\n```\n\n"
+            f"## Usage {i}\n\n"
+            f"| Option | Default | Description |\n|--------|---------|-------------|\n"
+            f"| size   | {i}     | Batch size  |\n\n"
+            f"~~~python\n# Example {i}\nfrom module_{i} import run\nrun(size={i})\n~~~\n\n"
+            f"### Notes {i}\n\n> Deprecated options are removed in version {i}.\n\n"
+        )
+        parts.append(part)
+        total += len(part)
+        i += 1
+    return "".join(parts)
+
+
+LANGUAGES: Dict[str, Dict[str, Any]] = {
+    "javascript": {"path": "bundle.js", "source": javascript_source, "chunker": JavaScriptChunker},
+    "markdown": {"path": "docs.md", "source": markdown_source, "chunker": MarkdownChunker},
+}
+
+
+def _time_chunking(chunk: Callable[[], List[Dict[str, Any]]], repeat: int) -> Dict[str, Any]:
+    """Best-of-N wall time (least affected by noise) and the chunk count."""
+    timings = []
+    chunks: List[Dict[str, Any]] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = chunk()
+        timings.append(time.perf_counter() - start)
+    return {"seconds": min(timings), "num_chunks": len(chunks)}
+
+
+def run_language(language: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmark one chunker across the configured file sizes."""
+    spec = LANGUAGES[language]
+    chunker = spec["chunker"](max_chunk_size=args.max_chunk_size, overlap=args.overlap)
+    runs = []
+
+    for size_mb in args.sizes_mb:
+        content = spec["source"](int(size_mb * MB))
+        actual_mb = len(content.encode('utf-8')) / MB
+        measured = _time_chunking(lambda: chunker.chunk(content, spec["path"]), args.repeat)
+        runs.append({
+            "size_mb": round(actual_mb, 2),
+            "seconds": round(measured["seconds"], 4),
+            "mb_per_second": round(actual_mb / measured["seconds"], 2) if measured["seconds"] else None,
+            "seconds_per_mb": round(measured["seconds"] / actual_mb, 4),
+            "num_chunks": measured["num_chunks"]
+        })
+        print(f"  {language:<11} {actual_mb:>7.2f} MB  {measured['seconds']:>8.3f} s  "
+              f"{runs[-1]['mb_per_second']:>8.2f} MB/s  {measured['num_chunks']:>8} chunks")
+
+    scaling = None
+    if len(runs) > 1 and runs[-1]["size_mb"] > runs[0]["size_mb"] and runs[0]["seconds"] > 0:
+        scaling = math.log(runs[-1]["seconds"] / runs[0]["seconds"]) / \
+            math.log(runs[-1]["size_mb"] / runs[0]["size_mb"])
+
+    return {
+        "language": language,
+        "chunker": chunker.__class__.__name__,
+        "runs": runs,
+        "scaling_exponent": round(scaling, 3) if scaling is not None else None
+    }
+
+
+def _check_regressions(result: Dict[str, Any], args: argparse.Namespace) -> List[str]:
+    failures = []
+    scaling = result["scaling_exponent"]
+    if args.max_scaling is not None and scaling is not None and scaling > args.max_scaling:
+        failures.append(f"{result['language']}: scaling exponent {scaling} > {args.max_scaling}")
+    if args.max_seconds_per_mb is not None:
+        for run in result["runs"]:
+            if run["seconds_per_mb"] > args.max_seconds_per_mb:
+                failures.append(f"{result['language']}: {run['seconds_per_mb']} s/MB at "
+                                f"{run['size_mb']} MB > {args.max_seconds_per_mb}")
+    return failures
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ContextForge preprocessor chunkers')
+    parser.add_argument('--languages', nargs='+', choices=sorted(LANGUAGES), default=sorted(LANGUAGES),
+                       help='Chunkers to benchmark')
+    parser.add_argument('--sizes-mb', nargs='+', type=float, default=[1, 4, 8],
+                       help='Generated file sizes in MB')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size (best time is kept)')
+    parser.add_argument('--max-chunk-size', type=int, default=1000, help='Chunker max_chunk_size')
+    parser.add_argument('--overlap', type=int, default=100, help='Chunker overlap')
+    parser.add_argument('--max-scaling', type=float, default=1.5,
+                       help='Fail if the scaling exponent exceeds this (linear is ~1.0)')
+    parser.add_argument('--max-seconds-per-mb', type=float, default=None,
+                       help='Fail if any size is slower than this many seconds per MB')
+    parser.add_argument('--output', default='bench_chunkers.json', help='Where to write JSON results')
+
+    args = parser.parse_args()
+
+    report = {"environment": _environment(), "config": vars(args), "results": []}
+    failures = []
+    for language in args.languages:
+        result = run_language(language, args)
+        report["results"].append(result)
+        print(f"  {language:<11} scaling exponent {result['scaling_exponent']}")
+        failures.extend(_check_regressions(result, args))
+
+    report["failures"] = failures
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if failures:
+        for failure in failures:
+            print(f"REGRESSION: {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+ContextForge Connector Pattern Benchmark
+Measures include/exclude pattern matching per path: the previous per-pattern
+fnmatch loop (each pattern matched twice, once lowercased) against the
+compiled GlobPatterns and GitignorePatterns matchers, on a generated
+monorepo-like tree or the files of a real directory.
+
+Matching results of the fnmatch loop and GlobPatterns are compared, so a
+semantic regression fails the run.
+
+Examples:
+  python scripts/benchmark_connector_patterns.py
+  python scripts/benchmark_connector_patterns.py --paths 500000 --repeat 3
+  python scripts/benchmark_connector_patterns.py --root ~/src/big-monorepo
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import fnmatch
+import argparse
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from services.connector.app import DEFAULT_INCLUDE_PATTERNS, DEFAULT_EXCLUDE_PATTERNS  # noqa: E402
+from services.connector.patterns import GlobPatterns, GitignorePatterns  # noqa: E402
+
+# Gitignore equivalents of the default exclude patterns, for the gitignore matcher
+GITIGNORE_EXCLUDES = [
+    "*.pyc", "*.pyo", "*.pyd", "__pycache__/", "*.so", "*.dylib", "*.dll",
+    ".git/", ".svn/", ".hg/", ".bzr/",
+    "node_modules/", "venv/", "env/", ".env/", "virtualenv/",
+    "*.log", "*.tmp", "*.temp", "*.cache", ".DS_Store", "Thumbs.db", "*.min.js", "*.min.css",
+    "dist/", "build/", "target/", "out/", "*.env*", "*.key", "*.pem", "*secret*", "*password*",
+    "*.zip", "*.tar", "*.gz", "*.rar", "*.7z", "*.jpg", "*.jpeg", "*.png", "*.gif", "*.bmp", "*.svg",
+    "*.ico", "*.mp3", "*.mp4", "*.avi", "*.mov", "*.wmv", "*.flv",
+    "*.pdf", "*.doc", "*.docx", "*.xls", "*.xlsx", "*.ppt", "*.pptx"
+]
+
+
+def generated_paths(count: int, seed: int = 0) -> List[str]:
+    """Monorepo-like relative paths: packages with sources, tests, assets, build output and node_modules."""
+    rng = random.Random(seed)
+    extensions = [".py", ".ts", ".tsx", ".js", ".md", ".json", ".png", ".min.js", ".pyc", ".yaml", ".go", ".lock"]
+    tops = ["packages", "services", "libs", "node_modules", "dist", "build", "docs", "tools", ".git"]
+    paths = []
+    for i in range(count):
+        depth = rng.randint(1, 6)
+        parts = [rng.choice(tops)] + [f"dir{rng.randint(0, 50)}" for _ in range(depth)]
+        paths.append("/".join(parts) + f"/file{i}{rng.choice(extensions)}")
+    return paths
+
+
+def real_paths(root: str) -> List[str]:
+    """Relative paths of all files below a directory."""
+    paths = []
+    for directory, _, names in os.walk(root):
+        relative = os.path.relpath(directory, root)
+        paths.extend(name if relative == "." else f"{relative}/{name}" for name in names)
+    return paths
+
+
+def fnmatch_loop(patterns: List[str]) -> Callable[[str], bool]:
+    """The connector's matching before compiled patterns."""
+    def matches(path: str) -> bool:
+        for pattern in patterns:
+            if fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(path.lower(), pattern.lower()):
+                return True
+        return False
+    return matches
+
+
+def _time(select: Callable[[str], bool], paths: List[str], repeat: int) -> Dict[str, Any]:
+    """Best-of-N time to filter all paths."""
+    timings = []
+    selected = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        selected = sum(1 for path in paths if select(path))
+        timings.append(time.perf_counter() - start)
+    seconds = min(timings)
+    return {"seconds": round(seconds, 4), "us_per_path": round(seconds / len(paths) * 1e6, 3), "selected": selected}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark connector include/exclude pattern matching')
+    parser.add_argument('--paths', type=int, default=200000, help='Number of generated paths')
+    parser.add_argument('--root', default=None, help='Use the files of this directory instead of generated paths')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per matcher (best time is kept)')
+    parser.add_argument('--output', default='bench_connector_patterns.json', help='Where to write JSON results')
+
+    args = parser.parse_args()
+
+    paths = real_paths(args.root) if args.root else generated_paths(args.paths)
+    print(f"{len(paths)} paths")
+
+    include_loop, exclude_loop = fnmatch_loop(DEFAULT_INCLUDE_PATTERNS), fnmatch_loop(DEFAULT_EXCLUDE_PATTERNS)
+    start = time.perf_counter()
+    include_glob, exclude_glob = GlobPatterns(DEFAULT_INCLUDE_PATTERNS), GlobPatterns(DEFAULT_EXCLUDE_PATTERNS)
+    include_gitignore = GitignorePatterns(DEFAULT_INCLUDE_PATTERNS)
+    exclude_gitignore = GitignorePatterns(GITIGNORE_EXCLUDES)
+    compile_seconds = time.perf_counter() - start
+
+    matchers = {
+        "fnmatch_loop": lambda path: include_loop(path) and not exclude_loop(path),
+        "glob": lambda path: include_glob.matches(path) and not exclude_glob.matches(path),
+        "gitignore": lambda path: include_gitignore.matches(path) and not exclude_gitignore.matches(path),
+    }
+    results = {}
+    for name, select in matchers.items():
+        results[name] = _time(select, paths, args.repeat)
+        print(f"  {name:<13} {results[name]['seconds']:>8.3f} s  {results[name]['us_per_path']:>8.3f} us/path  "
+              f"{results[name]['selected']:>8} selected")
+
+    speedup = results["fnmatch_loop"]["seconds"] / max(results["glob"]["seconds"], 1e-9)
+    print(f"  compiled glob is {speedup:.1f}x faster (patterns compiled in {compile_seconds * 1000:.2f} ms)")
+
+    mismatches = [path for path in paths if matchers["glob"](path) != matchers["fnmatch_loop"](path)]
+    report = {
+        "paths": len(paths),
+        "root": args.root,
+        "compile_seconds": round(compile_seconds, 6),
+        "results": results,
+        "glob_speedup": round(speedup, 2),
+        "mismatches": mismatches[:20]
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if mismatches:
+        print(f"REGRESSION: {len(mismatches)} paths matched differently, e.g. {mismatches[:3]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
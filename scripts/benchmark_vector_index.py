@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+ContextForge Vector Index Benchmark
+Measures insert throughput, search latency, QPS under concurrency, memory
+footprint and recall@k of the vector index backends on CPU, and writes
+machine-readable results that can be tracked across releases.
+
+Backends:
+  flat      FAISSIndex (exact inner product, the service default)
+  inmemory  SimpleInMemoryIndex (fallback when FAISS is unavailable)
+  hnsw      FAISS IndexHNSWFlat (approximate nearest neighbour candidate)
+  sq8       FAISS IndexScalarQuantizer, 8-bit (quantized candidate)
+
+Examples:
+  python scripts/benchmark_vector_index.py --sizes 10000 100000
+  python scripts/benchmark_vector_index.py --corpus repo --repo-path . --sizes 10000
+  python scripts/benchmark_vector_index.py --sizes 1000000 5000000 --backends flat hnsw sq8
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / 'services' / 'vector_index'))
+sys.path.append(str(ROOT / 'services' / 'preprocessor'))
+
+from index import FAISS_AVAILABLE, FAISSIndex, SimpleInMemoryIndex  # noqa: E402
+
+if FAISS_AVAILABLE:
+    import faiss
+
+ALL_BACKENDS = ['flat', 'inmemory', 'hnsw', 'sq8']
+FAISS_BACKENDS = {'flat', 'hnsw', 'sq8'}
+
+
+# Corpora
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def synthetic_corpus(size: int, dimension: int, num_queries: int, seed: int):
+    """Clustered Gaussian vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    num_clusters = max(8, size // 1000)
+    centers = rng.standard_normal((num_clusters, dimension)).astype(np.float32)
+
+    vectors = np.empty((size, dimension), dtype=np.float32)
+    block = 100_000
+    for start in range(0, size, block):
+        end = min(start + block, size)
+        assignment = rng.integers(0, num_clusters, end - start)
+        vectors[start:end] = centers[assignment] + 0.5 * rng.standard_normal((end - start, dimension))
+    vectors = _normalize(vectors)
+
+    picks = rng.integers(0, size, num_queries)
+    queries = _normalize(vectors[picks] + 0.1 * rng.standard_normal((num_queries, dimension)))
+    return vectors, queries
+
+
+def repo_corpus(repo_path: str, size: int, num_queries: int, seed: int):
+    """
+    Chunk and embed a real repository with the preprocessor chunkers and the
+    configured embedding model. The corpus is tiled with small perturbations
+    when the repository yields fewer chunks than the requested size.
+    """
+    from lang_chunkers import ChunkerFactory
+    from index import EmbeddingGenerator
+
+    extensions = set(ChunkerFactory.supported_extensions())
+    texts = []
+    for path in sorted(Path(repo_path).rglob('*')):
+        if any(part in ('.git', 'node_modules', 'venv', '__pycache__') for part in path.parts):
+            continue
+        if not path.is_file() or path.suffix.lower() not in extensions:
+            continue
+        try:
+            content = path.read_text(encoding='utf-8')
+        except (UnicodeDecodeError, OSError):
+            continue
+        chunker = ChunkerFactory.get_chunker(str(path))
+        texts.extend(c['text'] for c in chunker.chunk(content, str(path)) if c['text'].strip())
+
+    if not texts:
+        raise SystemExit(f"No chunkable files found under {repo_path}")
+
+    print(f"Embedding {len(texts)} chunks from {repo_path}...")
+    generator = EmbeddingGenerator()
+    base = _normalize(generator.encode(texts))
+
+    rng = np.random.default_rng(seed)
+    repeats = -(-size // len(base))
+    tiled = np.concatenate([base] + [
+        base + 0.02 * rng.standard_normal(base.shape).astype(np.float32)
+        for _ in range(repeats - 1)
+    ])[:size]
+    vectors = _normalize(tiled)
+
+    picks = rng.integers(0, len(base), num_queries)
+    queries = _normalize(base[picks] + 0.05 * rng.standard_normal((num_queries, base.shape[1])))
+    return vectors, queries
+
+
+def ground_truth(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k ids by brute force, computed block-wise to bound memory."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.full((len(queries), k), -1, dtype=np.int64)
+
+    block = 200_000
+    for start in range(0, len(vectors), block):
+        scores = queries @ vectors[start:start + block].T
+        kk = min(k, scores.shape[1])
+        top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+        merged_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+        merged_ids = np.concatenate([best_ids, top + start], axis=1)
+        order = np.argsort(-merged_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(merged_scores, order, axis=1)
+        best_ids = np.take_along_axis(merged_ids, order, axis=1)
+
+    return best_ids
+
+
+# Backends
+class BenchmarkBackend:
+    """Uniform build/search interface over the benchmarked index types."""
+
+    def __init__(self, name: str, dimension: int, hnsw_m: int, ef_search: int):
+        self.name = name
+        self.dimension = dimension
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.index = None
+
+    def build(self, vectors: np.ndarray):
+        if self.name == 'flat':
+            self.index = FAISSIndex(self.dimension)
+            self._add_with_metadata(vectors)
+        elif self.name == 'inmemory':
+            self.index = SimpleInMemoryIndex(self.dimension)
+            self._add_with_metadata(vectors)
+        elif self.name == 'hnsw':
+            self.index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            self.index.hnsw.efSearch = self.ef_search
+            self.index.add(vectors)
+        elif self.name == 'sq8':
+            self.index = faiss.IndexScalarQuantizer(
+                self.dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
+            self.index.train(vectors[:min(len(vectors), 100_000)])
+            self.index.add(vectors)
+
+    def _add_with_metadata(self, vectors: np.ndarray):
+        # Go through the service classes so metadata bookkeeping is included
+        block = 50_000
+        for start in range(0, len(vectors), block):
+            chunk = vectors[start:start + block].copy()
+            self.index.add(chunk, [{"text": ""} for _ in range(len(chunk))])
+
+    def search(self, query: np.ndarray, k: int) -> List[int]:
+        if self.name in ('flat', 'inmemory'):
+            return [int(r["id"]) for r in self.index.search(query.copy(), k)]
+        _, ids = self.index.search(query.reshape(1, -1), k)
+        return [int(i) for i in ids[0] if i != -1]
+
+    def index_bytes(self) -> int:
+        """Structural size of the vectors plus serialized metadata."""
+        if self.name == 'inmemory':
+            size = sum(e.nbytes for e in self.index.embeddings)
+        elif self.name == 'flat':
+            size = faiss.serialize_index(self.index.index).nbytes
+        else:
+            return int(faiss.serialize_index(self.index).nbytes)
+
+        return int(size + len(json.dumps(self.index.metadata)))
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux only)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def run_backend(name: str, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+                args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmark one backend on one corpus size."""
+    result: Dict[str, Any] = {"backend": name, "size": len(vectors), "dimension": vectors.shape[1]}
+
+    if name in FAISS_BACKENDS and not FAISS_AVAILABLE:
+        result["skipped"] = "faiss not installed"
+        return result
+    if name == 'inmemory' and len(vectors) > args.max_inmemory:
+        result["skipped"] = f"size above --max-inmemory ({args.max_inmemory})"
+        return result
+
+    gc.collect()
+    rss_before = _rss_bytes()
+
+    backend = BenchmarkBackend(name, vectors.shape[1], args.hnsw_m, args.ef_search)
+    start = time.perf_counter()
+    backend.build(vectors)
+    insert_seconds = time.perf_counter() - start
+
+    gc.collect()
+    rss_after = _rss_bytes()
+
+    # Single-query latency and recall
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        ids = backend.search(query, args.top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(ids) & set(int(i) for i in expected))
+
+    # Throughput under concurrency
+    qps = {}
+    search = partial(backend.search, k=args.top_k)
+    for workers in args.concurrency:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(search, queries))
+        qps[str(workers)] = round(len(queries) / (time.perf_counter() - start), 1)
+
+    result.update({
+        "insert_seconds": round(insert_seconds, 3),
+        "insert_vectors_per_second": round(len(vectors) / insert_seconds, 1) if insert_seconds else None,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50), 3),
+            "p99": round(_percentile(latencies, 99), 3),
+            "mean": round(float(np.mean(latencies)), 3)
+        },
+        "qps": qps,
+        f"recall_at_{args.top_k}": round(hits / (len(queries) * args.top_k), 4),
+        "memory": {
+            "index_bytes": backend.index_bytes(),
+            "rss_delta_bytes": (rss_after - rss_before) if rss_before and rss_after else None
+        }
+    })
+
+    del backend, search
+    gc.collect()
+    return result
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "faiss": getattr(faiss, '__version__', 'unknown') if FAISS_AVAILABLE else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ContextForge vector index backends')
+    parser.add_argument('--corpus', choices=['synthetic', 'repo'], default='synthetic',
+                       help='Synthetic clustered vectors or embedded chunks of a real repository')
+    parser.add_argument('--repo-path', default=str(ROOT / 'examples' / 'small-repo'),
+                       help='Repository to chunk and embed for --corpus repo')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000],
+                       help='Corpus sizes in vectors (e.g. 10000 100000 1000000 5000000)')
+    parser.add_argument('--backends', nargs='+', choices=ALL_BACKENDS, default=ALL_BACKENDS,
+                       help='Backends to benchmark')
+    parser.add_argument('--dimension', type=int, default=384,
+                       help='Vector dimension for the synthetic corpus')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries per run')
+    parser.add_argument('--top-k', type=int, default=10, help='k for search and recall@k')
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 8],
+                       help='Thread counts for the QPS measurement')
+    parser.add_argument('--hnsw-m', type=int, default=32, help='HNSW graph degree')
+    parser.add_argument('--ef-search', type=int, default=64, help='HNSW efSearch')
+    parser.add_argument('--max-inmemory', type=int, default=200_000,
+                       help='Largest size run against the pure-Python in-memory backend')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--output', default='bench_output.json', help='Where to write JSON results')
+
+    args = parser.parse_args()
+
+    report = {"environment": _environment(), "config": vars(args), "results": []}
+
+    for size in args.sizes:
+        print(f"Preparing {args.corpus} corpus of {size} vectors...")
+        if args.corpus == 'repo':
+            vectors, queries = repo_corpus(args.repo_path, size, args.queries, args.seed)
+        else:
+            vectors, queries = synthetic_corpus(size, args.dimension, args.queries, args.seed)
+        truth = ground_truth(vectors, queries, args.top_k)
+
+        for name in args.backends:
+            result = run_backend(name, vectors, queries, truth, args)
+            result["corpus"] = args.corpus
+            report["results"].append(result)
+
+            if "skipped" in result:
+                print(f"  {name:<9} skipped: {result['skipped']}")
+            else:
+                print(f"  {name:<9} insert {result['insert_vectors_per_second']:>12,.0f} vec/s  "
+                      f"p50 {result['latency_ms']['p50']:>8.3f} ms  "
+                      f"p99 {result['latency_ms']['p99']:>8.3f} ms  "
+                      f"recall@{args.top_k} {result[f'recall_at_{args.top_k}']:.3f}  "
+                      f"qps {result['qps']}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
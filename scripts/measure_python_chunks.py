@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+ContextForge Python Chunking Measurement
+Chunks every Python file under a directory at each PythonChunker granularity
+and reports chunk count, embedded characters and how many of them are
+duplicated across chunks (nested definitions chunked more than once), which
+drive embedding time and index size.
+
+With --embed, the chunks are also embedded with the configured
+sentence-transformers model and the embedding time is reported.
+
+Examples:
+  python scripts/measure_python_chunks.py
+  python scripts/measure_python_chunks.py services --max-chunk-size 1500
+  python scripts/measure_python_chunks.py --embed --output python_chunks.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / 'services' / 'preprocessor'))
+
+from lang_chunkers import PythonChunker  # noqa: E402
+
+
+def load_files(path: Path) -> Dict[str, str]:
+    """Read all Python files under a directory."""
+    files = {}
+    for file_path in sorted(path.rglob('*.py')):
+        try:
+            files[str(file_path.relative_to(path))] = file_path.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"  skipping {file_path}: {e}")
+    return files
+
+
+def _duplicated_chars(chunks: List[Dict[str, Any]], content: str) -> int:
+    """Characters of chunk text beyond the source lines they cover."""
+    lines = content.split('\n')
+    covered = set()
+    for chunk in chunks:
+        covered.update(range(chunk["meta"]["start_line"], chunk["meta"]["end_line"] + 1))
+    covered_chars = sum(len(lines[line - 1].strip()) for line in covered if line <= len(lines))
+    chunk_chars = sum(len(line.strip()) for chunk in chunks for line in chunk["text"].split('\n'))
+    return max(0, chunk_chars - covered_chars)
+
+
+def measure(files: Dict[str, str], granularity: str, args: argparse.Namespace, model=None) -> Dict[str, Any]:
+    """Chunk all files at one granularity and collect totals."""
+    chunker = PythonChunker(max_chunk_size=args.max_chunk_size, overlap=args.overlap,
+                            granularity=granularity)
+    texts = []
+    duplicated = 0
+    chunk_types: Dict[str, int] = {}
+
+    start = time.perf_counter()
+    for path, content in files.items():
+        chunks = chunker.chunk(content, path)
+        texts.extend(chunk["text"] for chunk in chunks)
+        duplicated += _duplicated_chars(chunks, content)
+        for chunk in chunks:
+            chunk_type = chunk["meta"]["chunk_type"]
+            chunk_types[chunk_type] = chunk_types.get(chunk_type, 0) + 1
+    chunk_seconds = time.perf_counter() - start
+
+    result = {
+        "granularity": granularity,
+        "num_chunks": len(texts),
+        "chunk_chars": sum(len(text) for text in texts),
+        "duplicated_chars": duplicated,
+        "chunk_types": chunk_types,
+        "chunk_seconds": round(chunk_seconds, 4)
+    }
+
+    if model is not None:
+        start = time.perf_counter()
+        model.encode(texts, batch_size=args.batch_size)
+        result["embed_seconds"] = round(time.perf_counter() - start, 3)
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure PythonChunker output per granularity')
+    parser.add_argument('path', nargs='?', default=str(ROOT / 'examples' / 'small-repo'),
+                       help='Directory to scan for Python files')
+    parser.add_argument('--granularities', nargs='+', choices=PythonChunker.GRANULARITIES,
+                       default=list(PythonChunker.GRANULARITIES), help='Granularities to measure')
+    parser.add_argument('--max-chunk-size', type=int, default=1000, help='Chunker max_chunk_size')
+    parser.add_argument('--overlap', type=int, default=100, help='Chunker overlap')
+    parser.add_argument('--embed', action='store_true', help='Also time embedding the chunks')
+    parser.add_argument('--model', default=os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'),
+                       help='sentence-transformers model for --embed')
+    parser.add_argument('--batch-size', type=int, default=64, help='Embedding batch size')
+    parser.add_argument('--output', default=None, help='Optional JSON output file')
+
+    args = parser.parse_args()
+
+    files = load_files(Path(args.path))
+    source_chars = sum(len(content) for content in files.values())
+    print(f"{len(files)} Python files, {source_chars} characters in {args.path}")
+
+    model = None
+    if args.embed:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(args.model)
+
+    results = []
+    for granularity in args.granularities:
+        result = measure(files, granularity, args, model)
+        results.append(result)
+        embed = f"  {result['embed_seconds']:>7.2f} s embedding" if "embed_seconds" in result else ""
+        print(f"  {granularity:<7} {result['num_chunks']:>6} chunks  {result['chunk_chars']:>9} chars  "
+              f"{result['duplicated_chars']:>8} duplicated{embed}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"path": args.path, "files": len(files), "source_chars": source_chars,
+                       "config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,20 @@ Provides unified API for ingestion, querying, and management.
 """
 
 import os
+import json
 import logging
 import hashlib
 import secrets
 import time
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 from datetime import datetime
 from functools import wraps
 from collections import defaultdict
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field, validator
@@ -66,6 +70,11 @@ CONNECTOR_URL = os.getenv("CONNECTOR_URL", "http://connector:8002")
 WEB_FETCHER_URL = os.getenv("WEB_FETCHER_URL", "http://web-fetcher:8004")
 TERMINAL_EXECUTOR_URL = os.getenv("TERMINAL_EXECUTOR_URL", "http://terminal-executor:8006")
 
+# Chunks per vector index insert while streaming ingestion
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+# Files per preprocessor request while the connector streams a repository
+INGEST_FILE_BATCH_SIZE = int(os.getenv("INGEST_FILE_BATCH_SIZE", "100"))
+
 # CORS Configuration - Security hardened
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:8080").split(",")
 ALLOWED_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
@@ -211,6 +220,13 @@ class IngestRequest(BaseModel):
     recursive: bool = True
     file_patterns: Optional[List[str]] = Field(None, max_items=50)
     exclude_patterns: Optional[List[str]] = Field(None, max_items=50)
+    # "glob" (fnmatch) or "gitignore"
+    pattern_syntax: str = "glob"
+    # walk, gitignore or git; None uses the connector's FILE_ENUMERATION
+    enumeration: Optional[str] = None
+    # Only re-index files changed since the last ingestion (or since a git commit)
+    incremental: bool = False
+    since_commit: Optional[str] = Field(None, max_length=256)
 
     @validator('path')
     def validate_path(cls, v):
@@ -219,6 +235,18 @@ class IngestRequest(BaseModel):
             raise ValueError("Path traversal not allowed")
         return v
 
+    @validator('pattern_syntax')
+    def validate_pattern_syntax(cls, v):
+        if v not in ("glob", "gitignore"):
+            raise ValueError("pattern_syntax must be 'glob' or 'gitignore'")
+        return v
+
+    @validator('enumeration')
+    def validate_enumeration(cls, v):
+        if v is not None and v not in ("walk", "gitignore", "git"):
+            raise ValueError("enumeration must be 'walk', 'gitignore' or 'git'")
+        return v
+
 
 class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=10000)
@@ -337,52 +365,49 @@ async def ingest_repository(
     try:
         logger.info("Starting repository ingestion", path=request.path)
         
-        # Step 1: Connect to repository
+        # Step 1: Connect to repository, receiving files as they are read
+        incremental = request.incremental or request.since_commit is not None
         connector_response = requests.post(
             f"{CONNECTOR_URL}/connect",
             json={
                 "path": request.path,
                 "recursive": request.recursive,
                 "file_patterns": request.file_patterns,
-                "exclude_patterns": request.exclude_patterns
+                "exclude_patterns": request.exclude_patterns,
+                "pattern_syntax": request.pattern_syntax,
+                **({"enumeration": request.enumeration} if request.enumeration else {}),
+                "delta": request.incremental,
+                "since_commit": request.since_commit,
+                # The connector saves its snapshot only once the files are indexed
+                "defer_manifest": True,
+                "stream": True
             },
+            stream=True,
             timeout=30
         )
-        connector_response.raise_for_status()
-        files_data = connector_response.json()
-        
-        logger.info("Repository connected", num_files=len(files_data.get("files", [])))
-        
-        # Step 2: Preprocess files
-        preprocessor_response = requests.post(
-            f"{PREPROCESSOR_URL}/process",
-            json={"files": files_data["files"]},
-            timeout=60
-        )
-        preprocessor_response.raise_for_status()
-        chunks_data = preprocessor_response.json()
-        
-        logger.info("Files preprocessed", num_chunks=len(chunks_data.get("chunks", [])))
-        
-        # Step 3: Index chunks
-        index_response = requests.post(
-            f"{VECTOR_INDEX_URL}/index/insert",
-            json={"chunks": chunks_data["chunks"]},
-            timeout=120
-        )
-        index_response.raise_for_status()
-        index_data = index_response.json()
+        try:
+            connector_response.raise_for_status()
+            # Steps 2 and 3: Preprocess files in batches as they arrive and index the chunks as they stream in
+            index_stats, summary = await run_in_threadpool(
+                _stream_chunks_to_index, connector_response, incremental
+            )
+        finally:
+            connector_response.close()
+        changes = summary.get("changes", {})
         
-        logger.info("Chunks indexed", indexed_count=index_data.get("indexed_count", 0))
+        logger.info("Chunks indexed", incremental=incremental, **index_stats)
         
         return {
             "status": "success",
             "message": "Repository ingested successfully",
             "stats": {
-                "files_processed": len(files_data.get("files", [])),
-                "chunks_created": len(chunks_data.get("chunks", [])),
-                "chunks_indexed": index_data.get("indexed_count", 0)
+                "files_added": len(changes.get("added", [])),
+                "files_modified": len(changes.get("modified", [])),
+                "files_deleted": len(changes.get("deleted", [])),
+                "files_unchanged": changes.get("unchanged", 0),
+                **index_stats
             },
+            "head_commit": summary.get("head_commit"),
             "timestamp": datetime.now().isoformat()
         }
         
@@ -394,6 +419,183 @@ async def ingest_repository(
         raise HTTPException(status_code=500, detail=f"Ingestion failed: {e}")
 
 
+def _connector_files(connector_response, summary: Dict[str, Any],
+                     read_errors: List[str]) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """
+    Yield ``(file, change)`` pairs from the connector's NDJSON stream,
+    storing the repository's path (sent first) and the final summary in
+    ``summary``. A stream ending without a summary was cut short by a
+    connector failure.
+    """
+    for line in connector_response.iter_lines():
+        if not line:
+            continue
+        record = json.loads(line)
+        if record["type"] == "repository":
+            summary["repository_path"] = record["repository_path"]
+        elif record["type"] == "file":
+            yield record["file"], record.get("change", "added")
+        elif record["type"] == "error":
+            if record["file_path"] is None:
+                raise RuntimeError(record["error"])
+            read_errors.append(f"Error reading {record['file_path']}: {record['error']}")
+        elif record["type"] == "summary":
+            summary.update(record)
+    if summary.get("type") != "summary":
+        raise RuntimeError("Connector stream ended without a summary")
+
+
+def _stream_chunks_to_index(connector_response, incremental: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Pipe files streamed by the connector through the preprocessor into the vector index.
+
+    Files go to the preprocessor in batches of INGEST_FILE_BATCH_SIZE as
+    they arrive, and its NDJSON chunks go to the index in batches of
+    INGEST_BATCH_SIZE. Each batch is embedded by the index while the next
+    one is read from the preprocessor, with at most one insert in flight,
+    so no service holds the whole repository. Chunks are tagged with the
+    repository's path, and with ``incremental`` the chunks of an added or
+    modified file in that repository are deleted just before its batch
+    is processed (added files may be left over from a failed ingestion)
+    and those of deleted files at the end, when they also leave the
+    preprocessor's import graph. The index is saved once at the
+    end, and only then the connector's staged snapshot committed, leaving
+    out files the preprocessor failed on so the next delta ingestion
+    retries them.
+
+    Returns the indexing stats and the connector's summary.
+    """
+    def insert_batch(batch: List[Dict[str, Any]]) -> int:
+        response = requests.post(
+            f"{VECTOR_INDEX_URL}/index/insert",
+            json={"chunks": batch, "save": False},
+            timeout=120
+        )
+        response.raise_for_status()
+        return response.json().get("indexed_count", 0)
+
+    def delete_files(file_paths: List[str]) -> int:
+        # Only this repository's chunks: others may hold files at the same relative paths
+        response = requests.post(
+            f"{VECTOR_INDEX_URL}/index/delete",
+            json={"file_paths": file_paths, "save": False, "repository": summary.get("repository_path")},
+            timeout=120
+        )
+        response.raise_for_status()
+        return response.json().get("deleted_count", 0)
+
+    def remove_from_graph(file_paths: List[str]):
+        response = requests.post(
+            f"{PREPROCESSOR_URL}/graph/remove",
+            json={"file_paths": file_paths, "repository": summary.get("repository_path")},
+            timeout=60
+        )
+        # 404: the preprocessor keeps no import graph
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    summary: Dict[str, Any] = {}
+    processing_errors: List[str] = []
+    files = _connector_files(connector_response, summary, processing_errors)
+    executor = ThreadPoolExecutor(max_workers=1)
+    pending = None
+    batch: List[Dict[str, Any]] = []
+    files_processed = 0
+    chunks_created = 0
+    chunks_indexed = 0
+    chunks_deleted = 0
+    # Files not indexed, left out of the connector's snapshot
+    failed_files: List[str] = []
+    try:
+        while True:
+            file_batch = list(islice(files, INGEST_FILE_BATCH_SIZE))
+            if not file_batch:
+                break
+            files_processed += len(file_batch)
+            replaced = [file["path"] for file, change in file_batch if change in ("added", "modified")]
+            if incremental and replaced:
+                chunks_deleted += delete_files(replaced)
+
+            preprocessor_response = requests.post(
+                f"{PREPROCESSOR_URL}/process",
+                json={"files": [file for file, _ in file_batch], "stream": True,
+                      "repository": summary.get("repository_path")},
+                stream=True,
+                timeout=60
+            )
+            batch_errors: List[str] = []
+            batch_failed: List[str] = []
+            completed = False
+            try:
+                preprocessor_response.raise_for_status()
+                for line in preprocessor_response.iter_lines():
+                    if not line:
+                        continue
+                    record = json.loads(line)
+                    if record["type"] == "chunk":
+                        chunk = record["chunk"]
+                        if "repository_path" in summary:
+                            chunk.setdefault("meta", {})["repository"] = summary["repository_path"]
+                        batch.append(chunk)
+                        chunks_created += 1
+                        if len(batch) >= INGEST_BATCH_SIZE:
+                            if pending is not None:
+                                chunks_indexed += pending.result()
+                            pending = executor.submit(insert_batch, batch)
+                            batch = []
+                    elif record["type"] == "error":
+                        batch_errors.append(f"Error processing {record['file_path']}: {record['error']}")
+                        batch_failed.append(record["file_path"])
+                    elif record["type"] == "summary":
+                        batch_errors = record["stats"].get("processing_errors", batch_errors)
+                        completed = True
+            finally:
+                preprocessor_response.close()
+            processing_errors.extend(batch_errors)
+            if not completed or len(batch_errors) > len(batch_failed):
+                # Cut short or failed as a whole: which files made it is unknown
+                batch_failed = [file["path"] for file, _ in file_batch]
+            failed_files.extend(batch_failed)
+
+        if pending is not None:
+            chunks_indexed += pending.result()
+        if batch:
+            chunks_indexed += insert_batch(batch)
+    finally:
+        executor.shutdown(wait=True)
+
+    deleted = summary.get("changes", {}).get("deleted", [])
+    if incremental and deleted:
+        chunks_deleted += delete_files(deleted)
+        remove_from_graph(deleted)
+
+    if chunks_indexed or chunks_deleted:
+        requests.post(f"{VECTOR_INDEX_URL}/index/save", timeout=120).raise_for_status()
+
+    if summary.get("manifest_token"):
+        try:
+            requests.post(
+                f"{CONNECTOR_URL}/manifest/commit",
+                json={
+                    "path": summary["repository_path"],
+                    "token": summary["manifest_token"],
+                    "exclude": sorted(set(failed_files))
+                },
+                timeout=30
+            ).raise_for_status()
+        except requests.RequestException as e:
+            # The index is saved; the next delta ingestion just delivers these files again
+            logger.warning("Failed to commit the connector manifest", error=str(e))
+
+    return {
+        "files_processed": files_processed,
+        "chunks_created": chunks_created,
+        "chunks_indexed": chunks_indexed,
+        "chunks_deleted": chunks_deleted,
+        "processing_errors": processing_errors
+    }, summary
+
+
 @app.get("/ingest/status")
 async def get_ingestion_status():
     """Get status of ingested repositories."""
@@ -505,12 +707,12 @@ async def query_context(
 
 
 @app.post("/search/vector")
-async def search_vector_index(query: str, top_k: int = 10):
+async def search_vector_index(query: str, top_k: int = 10, threshold: Optional[float] = None):
     """Search the vector index directly."""
     try:
         response = requests.post(
             f"{VECTOR_INDEX_URL}/search",
-            json={"query": query, "top_k": top_k},
+            json={"query": query, "top_k": top_k, "threshold": threshold},
             timeout=10
         )
         response.raise_for_status()
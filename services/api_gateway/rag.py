@@ -4,8 +4,9 @@ Combines vector search, web search, and LLM generation.
 """
 
 import os
+import re
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 
 import requests
@@ -16,8 +17,17 @@ logger = logging.getLogger(__name__)
 
 # Configuration
 VECTOR_INDEX_URL = os.getenv("VECTOR_INDEX_URL", "http://vector-index:8001")
+PREPROCESSOR_URL = os.getenv("PREPROCESSOR_URL", "http://preprocessor:8003")
 ENABLE_WEB_SEARCH = os.getenv("ENABLE_WEB_SEARCH", "True").lower() == "true"
 VECTOR_TOP_K = int(os.getenv("VECTOR_TOP_K", "10"))
+# Minimum similarity for retrieved chunks; unset keeps a fixed VECTOR_TOP_K
+VECTOR_SCORE_THRESHOLD = float(os.getenv("VECTOR_SCORE_THRESHOLD")) if os.getenv("VECTOR_SCORE_THRESHOLD") else None
+# Expand each retrieved chunk with sibling chunks / its enclosing chunk
+VECTOR_CONTEXT_NEIGHBORS = int(os.getenv("VECTOR_CONTEXT_NEIGHBORS", "0"))
+VECTOR_INCLUDE_PARENT = os.getenv("VECTOR_INCLUDE_PARENT", "False").lower() == "true"
+# Attach up to N chunks of the definitions each retrieved chunk's file imports,
+# looked up in the preprocessor's import graph (0 = off)
+VECTOR_DEPENDENCY_CHUNKS = int(os.getenv("VECTOR_DEPENDENCY_CHUNKS", "0"))
 WEB_SEARCH_RESULTS = int(os.getenv("WEB_SEARCH_RESULTS", "5"))
 
 # Prompt templates
@@ -45,6 +55,21 @@ INSTRUCTION:
 4) Output JSON object meta: {{"sources": [...], "backend": "{backend}", "latency_ms": {latency_ms}}}"""
 
 
+def _chunk_symbols(meta: Dict[str, Any]) -> set:
+    """Names a top-level chunk defines; nested definitions are reached through their parent."""
+    if meta.get("parent"):
+        return set()
+    symbols = {meta.get(key) for key in ("function_name", "class_name", "name")}
+    symbols.update(meta.get("function_names") or [])
+    symbols.discard(None)
+    return symbols
+
+
+def _mentions(text: str, symbols: set) -> bool:
+    """Whether text refers to any of the symbols."""
+    return any(re.search(rf"\b{re.escape(symbol)}\b", text) for symbol in symbols)
+
+
 class RAGPipeline:
     """Main RAG pipeline orchestrator."""
     
@@ -52,24 +77,112 @@ class RAGPipeline:
         self.llm_client = LLMClient()
         self.search_adapter = SearchAdapter() if ENABLE_WEB_SEARCH else None
         self.vector_index_url = VECTOR_INDEX_URL
+        self.preprocessor_url = PREPROCESSOR_URL
     
-    def retrieve_contexts(self, query: str, top_k: int = VECTOR_TOP_K) -> List[Dict[str, Any]]:
-        """Retrieve relevant contexts from vector index."""
+    def retrieve_contexts(self, query: str, top_k: int = VECTOR_TOP_K,
+                          threshold: Optional[float] = VECTOR_SCORE_THRESHOLD,
+                          neighbors: int = VECTOR_CONTEXT_NEIGHBORS,
+                          include_parent: bool = VECTOR_INCLUDE_PARENT,
+                          dependencies: int = VECTOR_DEPENDENCY_CHUNKS) -> List[Dict[str, Any]]:
+        """
+        Retrieve relevant contexts (at most top_k, optionally above a similarity threshold).
+
+        With ``dependencies``, each context gets up to that many chunks of
+        the definitions its file imports under ``"dependencies"``.
+        """
         try:
+            payload = {"query": query, "top_k": top_k}
+            if threshold is not None:
+                payload["threshold"] = threshold
+            if neighbors > 0:
+                payload["neighbors"] = neighbors
+            if include_parent:
+                payload["include_parent"] = True
+            
             response = requests.post(
                 f"{self.vector_index_url}/search",
-                json={"query": query, "top_k": top_k},
+                json=payload,
                 timeout=10
             )
             response.raise_for_status()
             
             data = response.json()
-            return data.get("results", [])
+            results = data.get("results", [])
+            if dependencies > 0 and results:
+                self._attach_dependencies(results, dependencies)
+            return results
             
         except Exception as e:
             logger.error(f"Vector search failed: {e}")
             return []
     
+    def _attach_dependencies(self, contexts: List[Dict[str, Any]], limit: int):
+        """
+        Attach chunks of the files each context's file imports.
+
+        The imported files come from the preprocessor's import graph. Of their
+        chunks, top-level definitions of the imported names are attached, or,
+        for whole-module imports, those the context's text refers to.
+        """
+        # Files of different repositories resolve in their own repository's graph
+        by_repository: Dict[Optional[str], List[str]] = {}
+        for context in contexts:
+            meta = context.get("meta", {})
+            file_paths = by_repository.setdefault(meta.get("repository"), [])
+            if meta.get("file_path") and meta["file_path"] not in file_paths:
+                file_paths.append(meta["file_path"])
+        graphs: Dict[Optional[str], Dict[str, Any]] = {}
+        for repository, file_paths in by_repository.items():
+            if not file_paths:
+                continue
+            try:
+                response = requests.post(
+                    f"{self.preprocessor_url}/graph/dependencies",
+                    json={"file_paths": file_paths, "repository": repository},
+                    timeout=5
+                )
+                response.raise_for_status()
+                graphs[repository] = response.json().get("dependencies", {})
+            except Exception as e:
+                logger.warning(f"Import graph lookup failed: {e}")
+                return
+        
+        retrieved = {context.get("meta", {}).get("chunk_id") for context in contexts} - {None}
+        file_chunks: Dict[Tuple[Optional[str], str], List[Dict[str, Any]]] = {}
+        for context in contexts:
+            attached: Dict[str, Dict[str, Any]] = {}
+            meta = context.get("meta", {})
+            repository = meta.get("repository")
+            for record in graphs.get(repository, {}).get(meta.get("file_path"), []):
+                names = set(record.get("names") or [])
+                for dependency_path in record.get("files", []):
+                    key = (repository, dependency_path)
+                    if key not in file_chunks:
+                        file_chunks[key] = self._get_file_chunks(dependency_path, repository)
+                    for chunk in file_chunks[key]:
+                        chunk_id = chunk.get("meta", {}).get("chunk_id") or chunk.get("text", "")
+                        if chunk_id in retrieved or chunk_id in attached:
+                            continue
+                        symbols = _chunk_symbols(chunk.get("meta", {}))
+                        if (symbols & names) if names else _mentions(context.get("text", ""), symbols):
+                            attached[chunk_id] = chunk
+            if attached:
+                context["dependencies"] = list(attached.values())[:limit]
+    
+    def _get_file_chunks(self, file_path: str, repository: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get a file's indexed chunks (of one repository) from the vector index."""
+        try:
+            response = requests.get(
+                f"{self.vector_index_url}/index/files/chunks",
+                params={"file_path": file_path, **({"repository": repository} if repository else {})},
+                timeout=10
+            )
+            response.raise_for_status()
+            return response.json().get("chunks", [])
+        except Exception as e:
+            logger.warning(f"Failed to get chunks of {file_path}: {e}")
+            return []
+    
     def search_web(self, query: str, num_results: int = WEB_SEARCH_RESULTS) -> List[Dict[str, Any]]:
         """Search the web for additional context."""
         if not self.search_adapter:
@@ -108,12 +221,27 @@ class RAGPipeline:
             meta = context.get("meta", {})
             source = meta.get("file_path") or meta.get("url", "unknown")
             score = context.get("score", 0)
-            text = context.get("text", "")
+            text = self._expand_context(context)
+            for dependency in context.get("dependencies", []):
+                dependency_source = dependency.get("meta", {}).get("file_path", "unknown")
+                text += f"\n\n[DEPENDENCY | {dependency_source}]\n{dependency.get('text', '')}"
             
             formatted.append(f"[SOURCE {i+1} | {source} | score: {score:.3f}]\n{text}")
         
         return "\n\n".join(formatted)
     
+    def _expand_context(self, context: Dict[str, Any]) -> str:
+        """Get a context's text, widened to its enclosing chunk or sibling chunks if retrieved."""
+        parent = context.get("parent")
+        if parent and parent.get("text"):
+            return parent["text"]
+        
+        neighbors = context.get("neighbors") or {}
+        texts = [chunk.get("text", "") for chunk in neighbors.get("before", [])]
+        texts.append(context.get("text", ""))
+        texts.extend(chunk.get("text", "") for chunk in neighbors.get("after", []))
+        return "\n\n".join(text for text in texts if text)
+    
     def format_web_results(self, web_results: List[Dict[str, Any]]) -> str:
         """Format web search results for inclusion in prompt."""
         if not web_results:
@@ -3,16 +3,23 @@ Connector Service - FastAPI application for filesystem repository ingestion.
 """
 
 import os
+import json
 import logging
-import fnmatch
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Tuple, Union
 from datetime import datetime
 from pathlib import Path
 
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import structlog
 
+from .walker import RepositoryWalker, GitIndexWalker, FileEntry, git_ls_files, git_changes, git_head, WALK_WORKERS
+from .manifest import ManifestStore, ManifestEntry, content_hash, MANIFEST_DIR
+from .reader import read_ahead, read_file, READ_WORKERS
+from .patterns import compile_patterns, PATTERN_SYNTAXES
+
 # Configure structured logging
 structlog.configure(
     processors=[
@@ -43,8 +50,8 @@ app = FastAPI(
 
 # Default patterns
 DEFAULT_INCLUDE_PATTERNS = [
-    "*.py", "*.js", "*.jsx", "*.ts", "*.tsx", "*.md", "*.markdown",
-    "*.txt", "*.json", "*.yaml", "*.yml", "*.toml", "*.cfg", "*.ini"
+    "*.py", "*.js", "*.jsx", "*.mjs", "*.cjs", "*.ts", "*.tsx", "*.go", "*.rs", "*.java",
+    "*.md", "*.markdown", "*.txt", "*.json", "*.yaml", "*.yml", "*.toml", "*.cfg", "*.ini"
 ]
 
 DEFAULT_EXCLUDE_PATTERNS = [
@@ -65,6 +72,10 @@ DEFAULT_EXCLUDE_PATTERNS = [
 # Configuration
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", "1048576"))  # 1MB default
 MAX_FILES = int(os.getenv("MAX_FILES", "10000"))
+# How files are enumerated: walk (every file on disk), gitignore (walk honouring .gitignore files)
+# or git (files in the git index plus untracked files that are not ignored)
+ENUMERATION_MODES = ("walk", "gitignore", "git")
+FILE_ENUMERATION = os.getenv("FILE_ENUMERATION", "walk")
 
 
 # Pydantic models
@@ -73,10 +84,32 @@ class ConnectRequest(BaseModel):
     recursive: bool = True
     file_patterns: Optional[List[str]] = None
     exclude_patterns: Optional[List[str]] = None
+    # glob (fnmatch against the relative path) or gitignore
+    pattern_syntax: str = "glob"
+    # walk, gitignore or git (see ENUMERATION_MODES)
+    enumeration: str = FILE_ENUMERATION
+    # Return only files added or modified since the repository's last snapshot (its manifest),
+    # or since a git commit; deleted paths are listed in "changes"
+    delta: bool = False
+    since_commit: Optional[str] = None
+    # Record this scan as the repository's snapshot
+    update_manifest: bool = True
+    # Stage the snapshot instead, until POST /manifest/commit once the files are indexed
+    defer_manifest: bool = False
+    # Send files as NDJSON while they are read (see /connect)
+    stream: bool = False
     max_file_size: int = MAX_FILE_SIZE
     max_files: int = MAX_FILES
 
 
+class ManifestCommitRequest(BaseModel):
+    path: str
+    # The summary's manifest_token
+    token: str
+    # Delivered files that were not indexed; the next delta scan returns them again
+    exclude: List[str] = []
+
+
 class FileInfo(BaseModel):
     path: str
     content: str
@@ -85,6 +118,10 @@ class FileInfo(BaseModel):
     encoding: str = "utf-8"
 
 
+# Snapshots of delivered files, for delta scans
+manifests = ManifestStore(MANIFEST_DIR)
+
+
 # Health check
 @app.get("/health")
 async def health_check():
@@ -99,103 +136,45 @@ async def health_check():
 # Main connection endpoint
 @app.post("/connect")
 async def connect_repository(request: ConnectRequest):
-    """Connect to a filesystem repository and extract file contents."""
+    """
+    Connect to a filesystem repository and extract file contents.
+
+    With ``stream`` set, files are sent as NDJSON as they are read instead
+    of in a single response: a ``{"type": "repository"}`` line with the
+    resolved ``repository_path``, one ``{"type": "file"}`` line per file (with
+    its ``change`` against the last snapshot), an ``{"type": "error"}`` line
+    per unreadable file and a final ``{"type": "summary"}`` line with the
+    changes and stats. Files are read only as fast as the client consumes
+    them, so the connector holds one file at a time.
+
+    With ``defer_manifest``, the scan's snapshot is only staged and its
+    ``manifest_token`` returned; POST /manifest/commit saves it once the
+    files are indexed, so a failed ingestion delivers them again.
+    """
     try:
-        logger.info("Connecting to repository", path=request.path)
-        
-        # Validate path
-        repo_path = Path(request.path)
-        if not repo_path.exists():
-            raise HTTPException(status_code=404, detail=f"Path not found: {request.path}")
+        logger.info("Connecting to repository", path=request.path, stream=request.stream)
+        repo_path, changed = _validate_connect(request)
         
-        if not repo_path.is_dir():
-            raise HTTPException(status_code=400, detail=f"Path is not a directory: {request.path}")
+        if request.stream:
+            return StreamingResponse(_stream_files(request, repo_path, changed), media_type="application/x-ndjson")
         
-        # Set up patterns
-        include_patterns = request.file_patterns or DEFAULT_INCLUDE_PATTERNS
-        exclude_patterns = request.exclude_patterns or DEFAULT_EXCLUDE_PATTERNS
-        
-        # Scan files
+        # Files are read off the event loop
         files = []
-        stats = {
-            "total_files_found": 0,
-            "files_processed": 0,
-            "files_skipped": 0,
-            "total_size": 0,
-            "errors": []
-        }
-        
-        for file_path in _scan_directory(repo_path, request.recursive):
-            stats["total_files_found"] += 1
-            
-            # Check if we've hit the file limit
-            if len(files) >= request.max_files:
-                logger.warning("File limit reached", max_files=request.max_files)
-                break
-            
-            try:
-                # Check patterns
-                relative_path = str(file_path.relative_to(repo_path))
-                
-                if not _matches_patterns(relative_path, include_patterns):
-                    stats["files_skipped"] += 1
-                    continue
-                
-                if _matches_patterns(relative_path, exclude_patterns):
-                    stats["files_skipped"] += 1
-                    continue
-                
-                # Check file size
-                file_size = file_path.stat().st_size
-                if file_size > request.max_file_size:
-                    logger.warning("File too large", 
-                                 file_path=str(file_path), 
-                                 size=file_size,
-                                 max_size=request.max_file_size)
-                    stats["files_skipped"] += 1
-                    continue
-                
-                # Read file content
-                content, encoding = _read_file_content(file_path)
-                if content is None:
-                    stats["files_skipped"] += 1
-                    continue
-                
-                # Create file info
-                file_info = FileInfo(
-                    path=str(file_path.relative_to(repo_path)),
-                    content=content,
-                    size=file_size,
-                    modified_time=datetime.fromtimestamp(file_path.stat().st_mtime).isoformat(),
-                    encoding=encoding
-                )
-                
-                files.append(file_info.dict())
-                stats["files_processed"] += 1
-                stats["total_size"] += file_size
-                
-                logger.debug("File processed", 
-                           file_path=relative_path,
-                           size=file_size,
-                           encoding=encoding)
-                
-            except Exception as e:
-                error_msg = f"Error processing {file_path}: {str(e)}"
-                logger.error("File processing error", 
-                           file_path=str(file_path), 
-                           error=str(e))
-                stats["errors"].append(error_msg)
-                stats["files_skipped"] += 1
-        
-        logger.info("Repository connection completed",
-                   files_processed=stats["files_processed"],
-                   files_skipped=stats["files_skipped"],
-                   total_size=stats["total_size"])
+        summary: Dict[str, Any] = {}
+        for record in await run_in_threadpool(list, _connect_records(request, repo_path, changed)):
+            if record["type"] == "file":
+                files.append(record["file"])
+            elif record["type"] == "summary":
+                summary = record
         
         return {
             "repository_path": str(repo_path),
             "files": files,
-            "stats": stats,
+            "delta": summary["delta"],
+            "changes": summary["changes"],
+            "head_commit": summary["head_commit"],
+            "manifest_token": summary["manifest_token"],
+            "stats": summary["stats"],
             "timestamp": datetime.now().isoformat()
         }
         
@@ -206,6 +185,225 @@ async def connect_repository(request: ConnectRequest):
         raise HTTPException(status_code=500, detail=f"Connection failed: {e}")
 
 
+def _validate_connect(request: ConnectRequest) -> Tuple[Path, Optional[Dict[str, List[str]]]]:
+    """
+    Check a connect request before anything is sent, returning the
+    repository path and, with ``since_commit``, the files changed since it.
+    """
+    # Validate path
+    repo_path = Path(request.path)
+    if not repo_path.exists():
+        raise HTTPException(status_code=404, detail=f"Path not found: {request.path}")
+    
+    if not repo_path.is_dir():
+        raise HTTPException(status_code=400, detail=f"Path is not a directory: {request.path}")
+    
+    if request.pattern_syntax not in PATTERN_SYNTAXES:
+        raise HTTPException(status_code=400, detail=f"Unknown pattern syntax: {request.pattern_syntax}")
+    
+    if request.enumeration not in ENUMERATION_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown enumeration mode: {request.enumeration}")
+    
+    # Changes since a commit replace the enumeration
+    changed = None
+    if request.since_commit is not None:
+        changed = git_changes(str(repo_path), request.since_commit)
+        if changed is None:
+            raise HTTPException(status_code=400,
+                                detail=f"Cannot diff {request.path} against commit {request.since_commit}")
+    return repo_path, changed
+
+
+def _stream_files(request: ConnectRequest, repo_path: Path, changed: Optional[Dict[str, List[str]]]):
+    """
+    Yield NDJSON lines for each file as it is read.
+
+    A plain generator: the response iterates it on a worker thread and only
+    asks for the next line once the previous one was sent, which is what
+    keeps a slow client from piling up file contents in memory.
+    """
+    try:
+        for record in _connect_records(request, repo_path, changed):
+            yield _ndjson(record)
+    except Exception as e:
+        # The status code is already sent; a stream without a summary line failed
+        logger.error("Streaming repository connection failed", error=str(e))
+        yield _ndjson({"type": "error", "file_path": None, "error": f"Connection failed: {e}"})
+
+
+def _ndjson(record: Dict[str, Any]) -> bytes:
+    """Encode one NDJSON line."""
+    return (json.dumps(record) + "\n").encode("utf-8")
+
+
+def _connect_records(request: ConnectRequest, repo_path: Path,
+                     changed: Optional[Dict[str, List[str]]]) -> Iterator[Dict[str, Any]]:
+    """
+    Read the repository's files, yielding a ``repository`` record, a
+    ``file`` record per delivered file, an ``error`` record per unreadable
+    one and a final ``summary`` record; the manifest is saved (or staged,
+    with ``defer_manifest``) before the summary.
+    """
+    delta = request.delta or request.since_commit is not None
+    # Files are identified by (repository, relative path) downstream
+    yield {"type": "repository", "repository_path": str(repo_path)}
+    
+    # Set up patterns
+    include_patterns = request.file_patterns or DEFAULT_INCLUDE_PATTERNS
+    exclude_patterns = request.exclude_patterns or DEFAULT_EXCLUDE_PATTERNS
+    
+    # Scan files, comparing them with the last snapshot
+    delivered = 0
+    previous = manifests.load(str(repo_path))
+    current: Dict[str, ManifestEntry] = {}
+    changes = {"added": [], "modified": [], "deleted": [], "unchanged": 0}
+    # Previously delivered files skipped this time
+    dropped = []
+    truncated = False
+    stats = {
+        "total_files_found": 0,
+        "files_processed": 0,
+        "files_skipped": 0,
+        "directories_pruned": 0,
+        "enumeration": request.enumeration,
+        "total_size": 0,
+        "errors": []
+    }
+    
+    def unchanged(entry: FileEntry, previous_entry: Optional[ManifestEntry]) -> bool:
+        """Same size and mtime as in the snapshot: not read again."""
+        return (delta and previous_entry is not None and previous_entry.size == entry.size
+                and previous_entry.mtime == entry.mtime)
+    
+    def read(entry: FileEntry) -> Tuple[Optional[str], str, Optional[str]]:
+        """Content, encoding and hash of a file, on a reader thread; files skipped below are not read."""
+        if unchanged(entry, previous.get(entry.relative_path)) or entry.size > request.max_file_size:
+            return None, "skipped", None
+        content, encoding = read_file(entry.path)
+        return content, encoding, content_hash(content) if content is not None else None
+    
+    # Files git reports as modified are modified even if the snapshot lacks them
+    git_modified = {path.replace('/', os.sep) for path in changed["modified"]} if changed else set()
+    
+    # Files not matching the patterns are dropped by the walker
+    walker = _scan_directory(repo_path, request.recursive, include_patterns, exclude_patterns,
+                             request.pattern_syntax, request.enumeration,
+                             paths=changed["added"] + changed["modified"] if changed else None)
+    for entry, (content, encoding, digest) in read_ahead(walker, read, READ_WORKERS):
+        # Check if we've hit the file limit
+        if delivered >= request.max_files:
+            logger.warning("File limit reached", max_files=request.max_files)
+            truncated = True
+            break
+        
+        file_path = Path(entry.path)
+        relative_path = entry.relative_path
+        previous_entry = previous.get(relative_path)
+        if unchanged(entry, previous_entry):
+            current[relative_path] = previous_entry
+            changes["unchanged"] += 1
+            continue
+        try:
+            # Check file size
+            file_size = entry.size
+            if file_size > request.max_file_size:
+                logger.warning("File too large", 
+                             file_path=str(file_path), 
+                             size=file_size,
+                             max_size=request.max_file_size)
+                stats["files_skipped"] += 1
+                if previous_entry is not None:
+                    dropped.append(relative_path)
+                continue
+            
+            # Read ahead by the reader threads
+            if content is None:
+                stats["files_skipped"] += 1
+                if previous_entry is not None:
+                    dropped.append(relative_path)
+                continue
+            
+            current[relative_path] = ManifestEntry(file_size, entry.mtime, digest)
+            if previous_entry is not None and previous_entry.hash == digest:
+                # Touched but not modified
+                change = "unchanged"
+                changes["unchanged"] += 1
+                if delta:
+                    continue
+            else:
+                change = "added" if previous_entry is None and relative_path not in git_modified else "modified"
+                changes[change].append(relative_path)
+            
+            # Create file info
+            file_info = FileInfo(
+                path=relative_path,
+                content=content,
+                size=file_size,
+                modified_time=datetime.fromtimestamp(entry.mtime).isoformat(),
+                encoding=encoding
+            )
+            
+        except Exception as e:
+            error_msg = f"Error processing {file_path}: {str(e)}"
+            logger.error("File processing error", 
+                       file_path=str(file_path), 
+                       error=str(e))
+            stats["errors"].append(error_msg)
+            stats["files_skipped"] += 1
+            yield {"type": "error", "file_path": relative_path, "error": str(e)}
+            continue
+        
+        delivered += 1
+        stats["files_processed"] += 1
+        stats["total_size"] += file_size
+        
+        logger.debug("File processed", 
+                   file_path=relative_path,
+                   size=file_size,
+                   encoding=encoding)
+        yield {"type": "file", "file": file_info.dict(), "change": change}
+    
+    _add_walk_stats(stats, walker)
+    
+    # Files missing from a complete scan were deleted (or are now excluded)
+    if changed is not None:
+        deleted = [path.replace('/', os.sep) for path in changed["deleted"] if walker.selects(path)]
+        manifest = {**previous, **current}
+    elif truncated:
+        deleted = []
+        manifest = {**previous, **current}
+    else:
+        deleted = [path for path in previous if path not in current]
+        manifest = current
+    changes["deleted"] = sorted(set(deleted + dropped))
+    for path in changes["deleted"]:
+        manifest.pop(path, None)
+    manifest_token = None
+    if request.update_manifest and request.defer_manifest:
+        manifest_token = manifests.stage(str(repo_path), manifest)
+    elif request.update_manifest:
+        manifests.save(str(repo_path), manifest)
+    
+    logger.info("Repository connection completed",
+               files_processed=stats["files_processed"],
+               files_skipped=stats["files_skipped"],
+               total_size=stats["total_size"],
+               added=len(changes["added"]),
+               modified=len(changes["modified"]),
+               deleted=len(changes["deleted"]))
+    
+    yield {
+        "type": "summary",
+        "repository_path": str(repo_path),
+        "delta": delta,
+        "changes": changes,
+        "head_commit": git_head(str(repo_path)) if changed is not None or (repo_path / ".git").exists() else None,
+        "manifest_token": manifest_token,
+        "stats": stats,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
 # File listing endpoint
 @app.post("/list-files")
 async def list_files(request: ConnectRequest):
@@ -221,6 +419,12 @@ async def list_files(request: ConnectRequest):
         if not repo_path.is_dir():
             raise HTTPException(status_code=400, detail=f"Path is not a directory: {request.path}")
         
+        if request.pattern_syntax not in PATTERN_SYNTAXES:
+            raise HTTPException(status_code=400, detail=f"Unknown pattern syntax: {request.pattern_syntax}")
+        
+        if request.enumeration not in ENUMERATION_MODES:
+            raise HTTPException(status_code=400, detail=f"Unknown enumeration mode: {request.enumeration}")
+        
         # Set up patterns
         include_patterns = request.file_patterns or DEFAULT_INCLUDE_PATTERNS
         exclude_patterns = request.exclude_patterns or DEFAULT_EXCLUDE_PATTERNS
@@ -231,47 +435,31 @@ async def list_files(request: ConnectRequest):
             "total_files_found": 0,
             "files_matched": 0,
             "files_skipped": 0,
+            "directories_pruned": 0,
+            "enumeration": request.enumeration,
             "total_size": 0
         }
         
-        for file_path in _scan_directory(repo_path, request.recursive):
-            stats["total_files_found"] += 1
-            
-            try:
-                relative_path = str(file_path.relative_to(repo_path))
-                file_size = file_path.stat().st_size
-                
-                # Check patterns
-                if not _matches_patterns(relative_path, include_patterns):
-                    stats["files_skipped"] += 1
-                    continue
-                
-                if _matches_patterns(relative_path, exclude_patterns):
-                    stats["files_skipped"] += 1
-                    continue
-                
-                # Check file size
-                if file_size > request.max_file_size:
-                    stats["files_skipped"] += 1
-                    continue
-                
-                file_info = {
-                    "path": relative_path,
-                    "size": file_size,
-                    "modified_time": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat(),
-                    "extension": file_path.suffix
-                }
-                
-                file_list.append(file_info)
-                stats["files_matched"] += 1
-                stats["total_size"] += file_size
-                
-            except Exception as e:
-                logger.error("Error processing file info", 
-                           file_path=str(file_path), 
-                           error=str(e))
+        walker = _scan_directory(repo_path, request.recursive, include_patterns, exclude_patterns,
+                                 request.pattern_syntax, request.enumeration)
+        for entry in walker:
+            # Check file size
+            if entry.size > request.max_file_size:
                 stats["files_skipped"] += 1
+                continue
+            
+            file_info = {
+                "path": entry.relative_path,
+                "size": entry.size,
+                "modified_time": datetime.fromtimestamp(entry.mtime).isoformat(),
+                "extension": os.path.splitext(entry.relative_path)[1]
+            }
+            
+            file_list.append(file_info)
+            stats["files_matched"] += 1
+            stats["total_size"] += entry.size
         
+        _add_walk_stats(stats, walker)
         return {
             "repository_path": str(repo_path),
             "files": file_list,
@@ -286,6 +474,23 @@ async def list_files(request: ConnectRequest):
         raise HTTPException(status_code=500, detail=f"File listing failed: {e}")
 
 
+@app.delete("/manifest")
+async def delete_manifest(path: str):
+    """Forget a repository's snapshot, so its next delta scan returns every file."""
+    deleted = manifests.delete(path)
+    logger.info("Manifest deleted", path=path, existed=deleted)
+    return {"repository_path": path, "deleted": deleted}
+
+
+@app.post("/manifest/commit")
+async def commit_manifest(request: ManifestCommitRequest):
+    """Save the snapshot staged by a /connect with defer_manifest, once its files are indexed."""
+    if not manifests.commit(request.path, request.token, request.exclude):
+        raise HTTPException(status_code=409, detail=f"No manifest staged for {request.path} with this token")
+    logger.info("Manifest committed", path=request.path, excluded=len(request.exclude))
+    return {"repository_path": request.path, "committed": True}
+
+
 # Configuration endpoints
 @app.get("/config")
 async def get_config():
@@ -293,6 +498,12 @@ async def get_config():
     return {
         "max_file_size": MAX_FILE_SIZE,
         "max_files": MAX_FILES,
+        "walk_workers": WALK_WORKERS,
+        "read_workers": READ_WORKERS,
+        "file_enumeration": FILE_ENUMERATION,
+        "enumeration_modes": list(ENUMERATION_MODES),
+        "manifest_dir": MANIFEST_DIR,
+        "pattern_syntaxes": list(PATTERN_SYNTAXES),
         "default_include_patterns": DEFAULT_INCLUDE_PATTERNS,
         "default_exclude_patterns": DEFAULT_EXCLUDE_PATTERNS
     }
@@ -308,51 +519,49 @@ async def get_patterns():
 
 
 # Utility functions
-def _scan_directory(path: Path, recursive: bool = True):
-    """Scan directory for files."""
-    if recursive:
-        return path.rglob("*")
-    else:
-        return path.glob("*")
+def _scan_directory(path: Path, recursive: bool, include_patterns: List[str],
+                    exclude_patterns: List[str], pattern_syntax: str = "glob",
+                    enumeration: str = "walk",
+                    paths: Optional[List[str]] = None) -> Union[RepositoryWalker, GitIndexWalker]:
+    """
+    Scan directory for files matching the include patterns and none of the exclude patterns.
 
+    The patterns are compiled once per scan. Directories whose every path
+    is excluded (e.g. ``node_modules/*``, or ``node_modules/`` in gitignore
+    syntax) are skipped without being listed. With the gitignore and git
+    enumeration modes, files ignored by the repository are left out too;
+    git mode falls back to gitignore mode outside a git work tree. Given
+    ``paths`` (``/``-separated, e.g. from git), only those are listed.
+    """
+    include = compile_patterns(include_patterns, pattern_syntax)
+    exclude = compile_patterns(exclude_patterns, pattern_syntax)
 
-def _matches_patterns(file_path: str, patterns: List[str]) -> bool:
-    """Check if file path matches any of the patterns."""
-    for pattern in patterns:
-        if fnmatch.fnmatch(file_path, pattern) or fnmatch.fnmatch(file_path.lower(), pattern.lower()):
-            return True
-    return False
+    def include_file(relative_path: str) -> bool:
+        return include.matches(relative_path) and not exclude.matches(relative_path)
 
+    if paths is None and enumeration == "git":
+        paths = git_ls_files(str(path))
+        if paths is None:
+            logger.warning("Not a git work tree, walking with .gitignore rules", path=str(path))
+    if paths is not None:
+        return GitIndexWalker(str(path), sorted(paths), recursive=recursive,
+                              exclude_dir=exclude.matches_directory, include_file=include_file)
+    return RepositoryWalker(
+        str(path),
+        recursive=recursive,
+        exclude_dir=exclude.matches_directory,
+        include_file=include_file,
+        gitignore=enumeration != "walk"
+    )
 
-def _read_file_content(file_path: Path) -> tuple[Optional[str], str]:
-    """Read file content with encoding detection."""
-    encodings = ['utf-8', 'utf-16', 'latin-1', 'cp1252']
-    
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                content = f.read()
-                return content, encoding
-        except (UnicodeDecodeError, UnicodeError):
-            continue
-        except Exception as e:
-            logger.error("Error reading file", 
-                       file_path=str(file_path), 
-                       encoding=encoding,
-                       error=str(e))
-            return None, encoding
-    
-    # If all encodings fail, try binary mode and decode as best effort
-    try:
-        with open(file_path, 'rb') as f:
-            raw_content = f.read()
-            content = raw_content.decode('utf-8', errors='replace')
-            return content, 'utf-8-with-errors'
-    except Exception as e:
-        logger.error("Failed to read file in binary mode", 
-                   file_path=str(file_path), 
-                   error=str(e))
-        return None, 'failed'
+
+def _add_walk_stats(stats: Dict[str, Any], walker: Union[RepositoryWalker, GitIndexWalker]):
+    """Add the walker's counts of listed and filtered files, and the enumeration mode used, to the stats."""
+    if isinstance(walker, RepositoryWalker) and stats["enumeration"] == "git":
+        stats["enumeration"] = "gitignore"
+    stats["total_files_found"] += walker.files_found
+    stats["files_skipped"] += walker.files_filtered
+    stats["directories_pruned"] += walker.directories_pruned
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+"""
+Per-repository file manifests for the connector.
+Records the size, mtime and content hash of every delivered file so later scans can return only what changed.
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Directory holding one manifest (JSON) per repository path
+MANIFEST_DIR = os.getenv("MANIFEST_DIR", "/app/data/manifests")
+
+
+class ManifestEntry(NamedTuple):
+    """What a file looked like when it was last delivered."""
+    size: int
+    mtime: float
+    hash: str
+
+
+def content_hash(content: str) -> str:
+    """Hash of a file's decoded content."""
+    return hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+
+class ManifestStore:
+    """
+    Stores the manifest of each repository, keyed by its resolved path.
+
+    A manifest maps relative file paths to a ManifestEntry. Saves replace
+    the file atomically, so a crash leaves the previous snapshot in place.
+    """
+
+    def __init__(self, directory: str = MANIFEST_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, repository: str) -> str:
+        key = hashlib.sha256(os.path.realpath(repository).encode('utf-8', 'surrogatepass')).hexdigest()[:32]
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, repository: str) -> Dict[str, ManifestEntry]:
+        """The repository's last manifest, empty if there is none."""
+        try:
+            with open(self._path(repository), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {path: ManifestEntry(*entry) for path, entry in data["files"].items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable manifest of {repository}: {e}")
+            return {}
+
+    def _staged_path(self, repository: str) -> str:
+        return self._path(repository)[:-len(".json")] + ".staged.json"
+
+    def _write(self, path: str, data: Dict) -> None:
+        """Write JSON to a file atomically; the caller holds the lock."""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def save(self, repository: str, files: Dict[str, ManifestEntry]) -> bool:
+        """Replace the repository's manifest; returns False if it could not be written."""
+        data = {
+            "repository": os.path.realpath(repository),
+            "updated_at": time.time(),
+            "files": {file_path: list(entry) for file_path, entry in files.items()}
+        }
+        try:
+            with self._lock:
+                self._write(self._path(repository), data)
+            return True
+        except OSError as e:
+            logger.warning(f"Cannot save manifest of {repository}: {e}")
+            return False
+
+    def stage(self, repository: str, files: Dict[str, ManifestEntry]) -> Optional[str]:
+        """
+        Keep a manifest aside until ``commit()``, e.g. until its files are
+        indexed, so a failed ingestion leaves the previous snapshot in
+        place. Returns the token to commit it with, None if it could not
+        be written. Staging again replaces the staged manifest.
+        """
+        token = uuid.uuid4().hex
+        data = {
+            "repository": os.path.realpath(repository),
+            "token": token,
+            "files": {file_path: list(entry) for file_path, entry in files.items()}
+        }
+        try:
+            with self._lock:
+                self._write(self._staged_path(repository), data)
+            return token
+        except OSError as e:
+            logger.warning(f"Cannot stage manifest of {repository}: {e}")
+            return None
+
+    def commit(self, repository: str, token: str, exclude: Iterable[str] = ()) -> bool:
+        """
+        Save the manifest staged with ``token``. Files in ``exclude`` (not
+        indexed after all) keep their entry of the current manifest, or are
+        left out if they had none, so the next delta scan returns them
+        again. Returns False if no manifest is staged with that token.
+        """
+        staged_path = self._staged_path(repository)
+        with self._lock:
+            try:
+                with open(staged_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"No staged manifest of {repository}: {e}")
+                return False
+            if data.get("token") != token:
+                return False
+            exclude = set(exclude)
+            if exclude:
+                previous = self.load(repository)
+                files = data["files"]
+                for file_path in exclude:
+                    if file_path in previous:
+                        files[file_path] = list(previous[file_path])
+                    else:
+                        files.pop(file_path, None)
+            data.pop("token")
+            data["updated_at"] = time.time()
+            try:
+                self._write(self._path(repository), data)
+                os.remove(staged_path)
+            except OSError as e:
+                logger.warning(f"Cannot save manifest of {repository}: {e}")
+                return False
+        return True
+
+    def delete(self, repository: str) -> bool:
+        """Forget the repository's manifest, so the next delta scan returns every file."""
+        try:
+            os.remove(self._staged_path(repository))
+        except FileNotFoundError:
+            pass
+        try:
+            os.remove(self._path(repository))
+            return True
+        except FileNotFoundError:
+            return False
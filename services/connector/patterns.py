@@ -0,0 +1,246 @@
+"""
+Path pattern matching for the connector.
+Include/exclude patterns are compiled once per request instead of running fnmatch per pattern and path.
+"""
+
+import os
+import re
+import fnmatch
+from typing import Iterable, List, Optional, Tuple
+
+PATTERN_SYNTAXES = ("glob", "gitignore")
+
+_WILDCARDS = re.compile(r'[*?\[]')
+
+
+def _normalize(path: str) -> str:
+    """Use ``/`` separators whatever the platform."""
+    return path.replace(os.sep, '/') if os.sep != '/' else path
+
+
+class GlobPatterns:
+    """
+    fnmatch-style patterns, matched case-insensitively against the whole
+    relative path with ``*`` also matching ``/`` (so ``*.py`` matches at any
+    depth and ``dist/*`` only at the top level).
+
+    Patterns of the form ``*.ext`` become a suffix check and ``dir/*`` a
+    prefix check; the rest are combined into a single regex.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = list(patterns)
+        suffixes, prefixes, residual = [], [], []
+        for pattern in self.patterns:
+            pattern = _normalize(pattern).lower()
+            if pattern.startswith('*') and not _WILDCARDS.search(pattern[1:]):
+                suffixes.append(pattern[1:])
+            elif pattern.endswith('/*') and not _WILDCARDS.search(pattern[:-1]):
+                prefixes.append(pattern[:-1])
+            else:
+                residual.append(pattern)
+        self._suffixes = tuple(suffixes)
+        self._prefixes = tuple(prefixes)
+        self._regex = self._combine(residual)
+        # A pattern ending in "*" that matches "dir/" matches every path below dir
+        self._directory_regex = self._combine(
+            [pattern for pattern in residual if pattern.endswith('*')]
+        )
+
+    @staticmethod
+    def _combine(patterns: List[str]) -> Optional[re.Pattern]:
+        if not patterns:
+            return None
+        return re.compile('|'.join(f'(?:{fnmatch.translate(pattern)})' for pattern in patterns), re.IGNORECASE)
+
+    def matches(self, path: str) -> bool:
+        """Whether any pattern matches a relative file path."""
+        path = _normalize(path).lower()
+        return (path.endswith(self._suffixes) or path.startswith(self._prefixes) or
+                (self._regex is not None and self._regex.match(path) is not None))
+
+    def matches_directory(self, path: str) -> bool:
+        """Whether the patterns match every path below a relative directory path."""
+        path = _normalize(path).lower() + '/'
+        return (path.startswith(self._prefixes) or
+                (self._directory_regex is not None and self._directory_regex.match(path) is not None))
+
+
+def _translate_gitignore(body: str) -> str:
+    """Regex for the path part of a gitignore pattern: ``*`` and ``?`` stay within a path segment, ``**`` spans them."""
+    parts = []
+    i, n = 0, len(body)
+    while i < n:
+        if body.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif body.startswith('/**', i) and i + 3 == n:
+            parts.append('/.*')
+            i += 3
+        elif body.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif body[i] == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif body[i] == '?':
+            parts.append('[^/]')
+            i += 1
+        elif body[i] == '[':
+            end = body.find(']', i + 2)
+            if end == -1:
+                parts.append(re.escape('['))
+                i += 1
+                continue
+            group = body[i + 1:end]
+            if group[:1] in ('!', '^'):
+                group = '^' + group[1:]
+            parts.append('[' + group.replace('\\', '\\\\') + ']')
+            i = end + 1
+        elif body[i] == '\\' and i + 1 < n:
+            parts.append(re.escape(body[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(body[i]))
+            i += 1
+    return ''.join(parts)
+
+
+def parse_gitignore_line(line: str) -> Optional[Tuple[str, bool, bool, bool]]:
+    """
+    Parse one gitignore line into ``(body, negated, directory_only, anchored)``,
+    or None for blank lines and comments.
+    """
+    line = line.rstrip('\n').rstrip('\r')
+    # Trailing spaces are ignored unless escaped
+    stripped = line.rstrip(' ')
+    if stripped.endswith('\\') and len(stripped) < len(line):
+        stripped += ' '
+    line = stripped
+    if not line or line.startswith('#'):
+        return None
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+    elif line.startswith('\\'):
+        line = line[1:]
+    directory_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+    # A separator at the start or in the middle anchors the pattern to its base directory
+    anchored = '/' in line
+    return line.lstrip('/'), negated, directory_only, anchored
+
+
+class GitignorePatterns:
+    """
+    Patterns with gitignore semantics, relative to ``base`` (a directory
+    relative to the repository root, "" for the root):
+
+    - a pattern without a ``/`` (other than a trailing one) matches a name
+      at any depth, otherwise it is anchored to ``base``;
+    - ``*`` and ``?`` do not match ``/`` and ``**`` matches any number of
+      directories;
+    - a trailing ``/`` only matches directories;
+    - ``!`` re-includes paths excluded by an earlier pattern (the last
+      matching pattern wins), except below an excluded directory;
+    - matching a directory matches everything below it.
+
+    Without negations, unanchored names (``node_modules/``, ``.DS_Store``)
+    and extensions (``*.log``) are checked per path segment and the other
+    patterns are combined into one regex per kind of path (files,
+    directories).
+    """
+
+    def __init__(self, patterns: Iterable[str], base: str = ""):
+        self.patterns = list(patterns)
+        self.base = _normalize(base).strip('/')
+        prefix = re.escape(self.base + '/') if self.base else ''
+        self._rules: List[Tuple[re.Pattern, bool, bool]] = []
+        # Segment checks, for any segment or only directory segments
+        self._names, self._directory_names = set(), set()
+        suffixes, directory_suffixes = [], []
+        file_alternatives, directory_alternatives = [], []
+        for pattern in self.patterns:
+            parsed = parse_gitignore_line(pattern)
+            if parsed is None:
+                continue
+            body, negated, directory_only, anchored = parsed
+            regex = prefix + ('' if anchored else '(?:.*/)?') + _translate_gitignore(body)
+            self._rules.append((re.compile(regex + r'\Z', re.DOTALL), negated, directory_only))
+            if not anchored and '\\' not in body and not _WILDCARDS.search(body):
+                (self._directory_names if directory_only else self._names).add(body)
+            elif not anchored and body.startswith('*') and '\\' not in body and not _WILDCARDS.search(body[1:]):
+                (directory_suffixes if directory_only else suffixes).append(body[1:])
+            else:
+                # Files match below a matching directory, or themselves unless directory-only
+                file_alternatives.append(regex + (r'/.*' if directory_only else r'(?:/.*)?'))
+                directory_alternatives.append(regex + r'(?:/.*)?')
+        self._suffixes, self._directory_suffixes = tuple(suffixes), tuple(directory_suffixes)
+        self.has_negations = any(negated for _, negated, _ in self._rules)
+        self._file_regex = self._directory_regex = None
+        if file_alternatives and not self.has_negations:
+            self._file_regex = re.compile('(?:' + '|'.join(file_alternatives) + r')\Z', re.DOTALL)
+            self._directory_regex = re.compile('(?:' + '|'.join(directory_alternatives) + r')\Z', re.DOTALL)
+
+    def _segments_match(self, path: str, is_dir: bool) -> bool:
+        """Whether a segment of the path below ``base`` matches an unanchored name or extension."""
+        if self.base:
+            if not path.startswith(self.base + '/'):
+                return False
+            path = path[len(self.base) + 1:]
+        segments = path.split('/')
+        directories = segments if is_dir else segments[:-1]
+        if not is_dir and (segments[-1] in self._names or segments[-1].endswith(self._suffixes)):
+            return True
+        for segment in directories:
+            if (segment in self._names or segment in self._directory_names or
+                    segment.endswith(self._suffixes) or segment.endswith(self._directory_suffixes)):
+                return True
+        return False
+
+    def __bool__(self) -> bool:
+        return bool(self._rules)
+
+    def _last_match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """Verdict of the last pattern matching the path itself: True excluded, False re-included, None no match."""
+        for regex, negated, directory_only in reversed(self._rules):
+            if (is_dir or not directory_only) and regex.match(path):
+                return not negated
+        return None
+
+    def match(self, path: str, is_dir: bool = False) -> Optional[bool]:
+        """
+        Verdict for a relative path: True if matched (ignored), False if
+        re-included by a negation, None if no pattern applies.
+        """
+        path = _normalize(path)
+        if not self.has_negations:
+            if self._segments_match(path, is_dir):
+                return True
+            regex = self._directory_regex if is_dir else self._file_regex
+            return True if regex is not None and regex.match(path) else None
+        # Nothing below an excluded directory can be re-included
+        parts = path.split('/')
+        for depth in range(1, len(parts)):
+            if self._last_match('/'.join(parts[:depth]), True):
+                return True
+        return self._last_match(path, is_dir)
+
+    def matches(self, path: str, is_dir: bool = False) -> bool:
+        """Whether a relative path is matched (ignored)."""
+        return bool(self.match(path, is_dir))
+
+    def matches_directory(self, path: str) -> bool:
+        """Whether a relative directory is matched, which matches every path below it."""
+        return self.matches(path, is_dir=True)
+
+
+def compile_patterns(patterns: Iterable[str], syntax: str = "glob"):
+    """Compile include/exclude patterns in the given syntax (see PATTERN_SYNTAXES)."""
+    if syntax == "gitignore":
+        return GitignorePatterns(patterns)
+    if syntax == "glob":
+        return GlobPatterns(patterns)
+    raise ValueError(f"Unknown pattern syntax: {syntax}")
@@ -0,0 +1,114 @@
+"""
+File reading for the connector.
+Reads each file once as bytes, detects its encoding in memory and reads ahead on a bounded thread pool.
+"""
+
+import os
+import codecs
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Files read concurrently ahead of the one being sent (1 = read on the calling thread);
+# more help on cold or network-mounted checkouts
+READ_WORKERS = int(os.getenv("READ_WORKERS", "1"))
+
+# Longest BOMs first: the UTF-32-LE BOM starts with the UTF-16-LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _utf16_without_bom(data: bytes) -> Optional[str]:
+    """
+    Codec for BOM-less UTF-16 text, recognised by NUL high bytes (mostly
+    ASCII content) at the odd (little-endian) or even (big-endian)
+    positions of the first KB.
+    """
+    sample = data[:1024]
+    if len(sample) < 2 or len(sample) % 2 or b"\0" not in sample:
+        return None
+    half = len(sample) // 2
+    if sample[1::2].count(0) > 0.9 * half and sample[0::2].count(0) < 0.1 * half:
+        return "utf-16-le"
+    if sample[0::2].count(0) > 0.9 * half and sample[1::2].count(0) < 0.1 * half:
+        return "utf-16-be"
+    return None
+
+
+def decode_content(data: bytes) -> Tuple[str, str]:
+    """
+    Decode file content, returning the text and the encoding used.
+
+    A BOM decides the encoding. Otherwise BOM-less UTF-16 is recognised
+    first (its ASCII text is valid UTF-8 too), then UTF-8 (almost every
+    source file), cp1252 and finally latin-1, which decodes any bytes, are
+    tried.
+    """
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            try:
+                return data.decode(encoding), encoding
+            except UnicodeDecodeError:
+                break
+
+    for encoding in (_utf16_without_bom(data), "utf-8", "cp1252"):
+        if encoding is None:
+            continue
+        try:
+            return data.decode(encoding), encoding
+        except UnicodeDecodeError:
+            continue
+    return data.decode("latin-1"), "latin-1"
+
+
+def read_file(path: str) -> Tuple[Optional[str], str]:
+    """Read and decode a file with a single read; ``(None, "failed")`` if it cannot be read."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        logger.error(f"Error reading {path}: {e}")
+        return None, "failed"
+    return decode_content(data)
+
+
+def read_ahead(items: Iterable[T], read: Callable[[T], R], workers: int = READ_WORKERS) -> Iterator[Tuple[T, R]]:
+    """
+    Yield ``(item, read(item))`` in the order of ``items``, with up to
+    ``workers`` reads running on a thread pool ahead of the consumer.
+
+    At most ``workers`` results are held at a time, and ``items`` is only
+    advanced as results are consumed, so a slow consumer still slows down
+    reading. ``read`` should handle its own errors; an exception is raised
+    to the consumer when its item's turn comes.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, read(item)
+        return
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reader")
+    pending: Deque = deque()
+    try:
+        for item in items:
+            pending.append((item, pool.submit(read, item)))
+            if len(pending) >= workers:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        # The consumer may stop early (e.g. at the file limit)
+        pool.shutdown(wait=False, cancel_futures=True)
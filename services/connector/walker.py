@@ -0,0 +1,297 @@
+"""
+Repository walker for the connector.
+Lists files with os.scandir, pruning excluded directories before descending into them,
+or from the git index.
+"""
+
+import os
+import stat
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .patterns import GitignorePatterns
+
+logger = logging.getLogger(__name__)
+
+# Threads listing directories in parallel (1 = walk on the calling thread);
+# more help on large, cold or network-mounted checkouts
+WALK_WORKERS = int(os.getenv("WALK_WORKERS", "1"))
+# Seconds to wait for `git ls-files` before falling back to walking the tree
+GIT_LS_FILES_TIMEOUT = float(os.getenv("GIT_LS_FILES_TIMEOUT", "60"))
+
+# Rules of the ignore files in effect for a directory, lowest precedence first
+IgnoreRules = Tuple[GitignorePatterns, ...]
+
+
+class FileEntry(NamedTuple):
+    """A file found by the walker, with the stat taken while listing its directory."""
+    path: str
+    relative_path: str
+    size: int
+    mtime: float
+
+
+class _Listing(NamedTuple):
+    files: List[FileEntry]
+    directories: List[Tuple[str, str, IgnoreRules]]
+    filtered: int
+    pruned: int
+
+
+def _ignored(rules: IgnoreRules, relative_path: str, is_dir: bool) -> bool:
+    """Whether ignore rules match a path; the deepest ignore file with a matching pattern decides."""
+    for patterns in reversed(rules):
+        verdict = patterns.match(relative_path, is_dir)
+        if verdict is not None:
+            return verdict
+    return False
+
+
+def _read_ignore_file(path: str, base: str = "") -> Optional[GitignorePatterns]:
+    """Patterns of a .gitignore or info/exclude file relative to ``base``, None if missing or empty."""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            patterns = GitignorePatterns(f.read().splitlines(), base=base)
+    except OSError:
+        return None
+    return patterns if patterns else None
+
+
+class RepositoryWalker:
+    """
+    Walks a directory tree with ``os.scandir``.
+
+    Directories for which ``exclude_dir(relative_path)`` is true are not
+    entered, and files for which ``include_file(relative_path)`` is false
+    are dropped before they are stat'ed; both get paths relative to the
+    root. Symlinked directories are not followed. Files are yielded
+    depth-first in name order. With several ``workers``, directory listings
+    are prefetched on a thread pool while earlier ones are consumed, so the
+    order stays the same.
+
+    With ``gitignore``, ``.git`` directories are skipped and the rules of
+    ``.git/info/exclude`` and every ``.gitignore`` on the way down apply
+    as they do for git: ignored directories are not entered and ignored
+    files are filtered out.
+
+    ``files_found``, ``files_filtered`` and ``directories_pruned`` count
+    what has been walked so far.
+    """
+
+    def __init__(self, root: str, recursive: bool = True,
+                 exclude_dir: Optional[Callable[[str], bool]] = None,
+                 include_file: Optional[Callable[[str], bool]] = None,
+                 workers: int = WALK_WORKERS, gitignore: bool = False):
+        self.root = os.fspath(root)
+        self.recursive = recursive
+        self.exclude_dir = exclude_dir
+        self.include_file = include_file
+        self.workers = max(1, workers)
+        self.gitignore = gitignore
+        self.files_found = 0
+        self.files_filtered = 0
+        self.directories_pruned = 0
+
+    def _root_rules(self) -> IgnoreRules:
+        if not self.gitignore:
+            return ()
+        exclude = _read_ignore_file(os.path.join(self.root, '.git', 'info', 'exclude'))
+        return (exclude,) if exclude is not None else ()
+
+    def _list(self, path: str, relative: str, rules: IgnoreRules = ()) -> _Listing:
+        """List one directory: matching files with their stat, and subdirectories to walk."""
+        files, directories = [], []
+        filtered = pruned = 0
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"Cannot list {path}: {e}")
+            return _Listing(files, directories, filtered, pruned)
+
+        if self.gitignore and any(entry.name == '.gitignore' for entry in entries):
+            patterns = _read_ignore_file(os.path.join(path, '.gitignore'), relative)
+            if patterns is not None:
+                rules = rules + (patterns,)
+
+        for entry in entries:
+            relative_path = os.path.join(relative, entry.name) if relative else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not self.recursive:
+                        continue
+                    if ((self.gitignore and (entry.name == '.git' or _ignored(rules, relative_path, True))) or
+                            (self.exclude_dir is not None and self.exclude_dir(relative_path))):
+                        pruned += 1
+                    else:
+                        directories.append((entry.path, relative_path, rules))
+                    continue
+                if ((rules and _ignored(rules, relative_path, False)) or
+                        (self.include_file is not None and not self.include_file(relative_path))):
+                    filtered += 1
+                    continue
+                # Follows symlinks to files; broken links and special files are left out
+                info = entry.stat()
+                if stat.S_ISREG(info.st_mode):
+                    files.append(FileEntry(entry.path, relative_path, info.st_size, info.st_mtime))
+            except OSError as e:
+                logger.debug(f"Skipping {entry.path}: {e}")
+        return _Listing(files, directories, filtered, pruned)
+
+    def _count(self, listing: _Listing) -> List[FileEntry]:
+        self.files_found += len(listing.files) + listing.filtered
+        self.files_filtered += listing.filtered
+        self.directories_pruned += listing.pruned
+        return listing.files
+
+    def __iter__(self) -> Iterator[FileEntry]:
+        if self.workers == 1:
+            stack = [(self.root, "", self._root_rules())]
+            while stack:
+                listing = self._list(*stack.pop())
+                yield from self._count(listing)
+                stack.extend(reversed(listing.directories))
+            return
+
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="walker")
+        try:
+            stack = [pool.submit(self._list, self.root, "", self._root_rules())]
+            while stack:
+                listing = stack.pop().result()
+                stack.extend(pool.submit(self._list, *directory) for directory in reversed(listing.directories))
+                yield from self._count(listing)
+        finally:
+            # The consumer may stop early (e.g. at the file limit)
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _git(root: str, *args: str) -> Optional[str]:
+    """Output of a git command run in ``root``, or None if it failed or git is unavailable."""
+    try:
+        # Mounted repositories are usually owned by another user than the service
+        result = subprocess.run(
+            ["git", "-c", "safe.directory=*", *args],
+            cwd=root, capture_output=True, timeout=GIT_LS_FILES_TIMEOUT, check=True
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.info(f"git {args[0]} unavailable for {root}: {e}")
+        return None
+    return os.fsdecode(result.stdout)
+
+
+def git_ls_files(root: str) -> Optional[List[str]]:
+    """
+    Paths (relative to ``root``, ``/``-separated) of the files in the git
+    index plus untracked files that are not ignored, or None if ``root``
+    is not inside a git work tree or git is unavailable.
+    """
+    output = _git(root, "ls-files", "-z", "--cached", "--others", "--exclude-standard")
+    if output is None:
+        return None
+    # Untracked files come after the index, and unmerged files are listed once per stage
+    return sorted(set(path for path in output.split('\0') if path))
+
+
+def git_head(root: str) -> Optional[str]:
+    """Commit checked out in the work tree containing ``root``, if any."""
+    output = _git(root, "rev-parse", "--verify", "--quiet", "HEAD")
+    if output is None:
+        return None
+    return output.strip() or None
+
+
+def git_changes(root: str, commit: str) -> Optional[Dict[str, List[str]]]:
+    """
+    Files below ``root`` that differ between ``commit`` and the work tree,
+    as ``{"added", "modified", "deleted"}`` lists of ``/``-separated paths
+    relative to ``root``; untracked files that are not ignored count as
+    added. None if ``commit`` is unknown or ``root`` is not in a git work
+    tree.
+    """
+    if commit.startswith('-'):
+        return None
+    diff = _git(root, "diff", "--name-status", "-z", "--no-renames", "--relative", commit, "--")
+    untracked = _git(root, "ls-files", "-z", "--others", "--exclude-standard")
+    if diff is None or untracked is None:
+        return None
+
+    changes: Dict[str, List[str]] = {"added": [], "modified": [], "deleted": []}
+    fields = diff.split('\0')
+    for status, path in zip(fields[0::2], fields[1::2]):
+        if status.startswith('A'):
+            changes["added"].append(path)
+        elif status.startswith('D'):
+            changes["deleted"].append(path)
+        elif status:
+            # M, T (type change) or U (unmerged)
+            changes["modified"].append(path)
+    changes["added"].extend(path for path in untracked.split('\0') if path)
+    return {kind: sorted(set(paths)) for kind, paths in changes.items()}
+
+
+class GitIndexWalker:
+    """
+    Lists the files git knows about (see ``git_ls_files``) instead of
+    walking the tree, so ignored build and output directories cost nothing.
+
+    Takes the same filters as RepositoryWalker: files below a directory for
+    which ``exclude_dir`` is true are dropped, as are files for which
+    ``include_file`` is false. Files are yielded in path order, with the
+    same counters as RepositoryWalker.
+    """
+
+    def __init__(self, root: str, paths: List[str], recursive: bool = True,
+                 exclude_dir: Optional[Callable[[str], bool]] = None,
+                 include_file: Optional[Callable[[str], bool]] = None):
+        self.root = os.fspath(root)
+        self.paths = paths
+        self.recursive = recursive
+        self.exclude_dir = exclude_dir
+        self.include_file = include_file
+        self.files_found = 0
+        self.files_filtered = 0
+        self.directories_pruned = 0
+        self._excluded: Dict[str, bool] = {}
+
+    def _directory_excluded(self, directory: str) -> bool:
+        """Whether a directory or one of its parents is excluded, counting each pruned directory once."""
+        excluded = self._excluded.get(directory)
+        if excluded is None:
+            parent, _, _ = directory.rpartition('/')
+            if parent and self._directory_excluded(parent):
+                excluded = True
+            else:
+                excluded = self.exclude_dir is not None and self.exclude_dir(directory.replace('/', os.sep))
+                self.directories_pruned += excluded
+            self._excluded[directory] = excluded
+        return excluded
+
+    def selects(self, path: str) -> bool:
+        """Whether a ``/``-separated relative path passes the filters, without counting it."""
+        directory, _, _ = path.rpartition('/')
+        if directory and (not self.recursive or self._directory_excluded(directory)):
+            return False
+        return self.include_file is None or self.include_file(path.replace('/', os.sep))
+
+    def __iter__(self) -> Iterator[FileEntry]:
+        for path in self.paths:
+            directory, _, _ = path.rpartition('/')
+            if directory and (not self.recursive or self._directory_excluded(directory)):
+                continue
+            relative_path = path.replace('/', os.sep)
+            self.files_found += 1
+            if self.include_file is not None and not self.include_file(relative_path):
+                self.files_filtered += 1
+                continue
+            full_path = os.path.join(self.root, relative_path)
+            try:
+                info = os.stat(full_path)
+            except OSError as e:
+                # Deleted from the work tree but still in the index
+                logger.debug(f"Skipping {full_path}: {e}")
+                continue
+            # Submodules are listed as directories
+            if stat.S_ISREG(info.st_mode):
+                yield FileEntry(full_path, relative_path, info.st_size, info.st_mtime)
@@ -3,16 +3,27 @@ Preprocessor Service - FastAPI application for language-aware text chunking.
 """
 
 import os
+import json
+import time
 import logging
-import hashlib
-from typing import Dict, List, Any
+from contextlib import asynccontextmanager
+from typing import Callable, Coroutine, Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
-from fastapi import FastAPI, HTTPException
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
 import structlog
 
-from .lang_chunkers import ChunkerFactory
+from .lang_chunkers import ChunkerFactory, get_chunk_sizer, derive_metadata
+from .engine import (
+    ChunkingEngine, prepare_chunks, PREPROCESSOR_WORKERS, GENERATED_FILE_ACTION, CHUNK_METADATA
+)
+from .chunk_cache import ChunkCache, CHUNK_CACHE_PATH
+from .import_graph import ImportGraph, IMPORT_GRAPH_PATH
+from .metrics import ProcessingMetrics
 
 # Configure structured logging
 structlog.configure(
@@ -35,17 +46,44 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
+# Configuration
+MAX_CHUNK_SIZE = int(os.getenv("MAX_CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+# Files listed in the slowest_files stat of /process responses
+PROCESS_SLOWEST_FILES = int(os.getenv("PROCESS_SLOWEST_FILES", "10"))
+
+# Parallel chunking engine (worker processes start on first use) with a
+# persistent cache so unchanged files are not re-chunked on re-ingest
+engine = ChunkingEngine(
+    workers=PREPROCESSOR_WORKERS,
+    cache=ChunkCache(CHUNK_CACHE_PATH) if CHUNK_CACHE_PATH else None
+)
+
+# Timings of all files processed since startup (or the last reset), served by /metrics
+metrics = ProcessingMetrics(PROCESS_SLOWEST_FILES)
+
+# Import graph of processed files, filled from the chunkers' import parsing
+import_graph: Optional[ImportGraph] = ImportGraph(IMPORT_GRAPH_PATH) if IMPORT_GRAPH_PATH else None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan handler."""
+    yield
+    engine.shutdown()
+    if import_graph is not None:
+        import_graph.close()
+    logger.info("Chunking engine stopped")
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="ContextForge Preprocessor Service",
     description="Language-aware text chunking and preprocessing service",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Configuration
-MAX_CHUNK_SIZE = int(os.getenv("MAX_CHUNK_SIZE", "1000"))
-CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
-
 
 # Pydantic models
 class FileData(BaseModel):
@@ -59,6 +97,11 @@ class ProcessRequest(BaseModel):
     files: List[FileData]
     max_chunk_size: int = MAX_CHUNK_SIZE
     overlap: int = CHUNK_OVERLAP
+    stream: bool = False
+    use_cache: bool = True
+    profile: bool = False
+    # Repository the files belong to; the import graph keeps repositories apart
+    repository: Optional[str] = None
 
 
 class ChunkRequest(BaseModel):
@@ -68,6 +111,25 @@ class ChunkRequest(BaseModel):
     overlap: int = CHUNK_OVERLAP
 
 
+class ChunkData(BaseModel):
+    text: str
+    meta: Dict[str, Any]
+
+
+class DeriveMetadataRequest(BaseModel):
+    chunks: List[ChunkData]
+
+
+class DependenciesRequest(BaseModel):
+    file_paths: List[str]
+    repository: Optional[str] = None
+
+
+class RemoveFilesRequest(BaseModel):
+    file_paths: List[str]
+    repository: Optional[str] = None
+
+
 # Health check
 @app.get("/health")
 async def health_check():
@@ -80,79 +142,212 @@ async def health_check():
     }
 
 
+class DecodeTimedRoute(APIRoute):
+    """
+    Route noting when the request body was received, before FastAPI decodes
+    and validates it, so the handler can time that as the "decode" stage.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            # Read (and cached on the request) first, so receiving it is not counted
+            await request.body()
+            request.state.decode_start = time.perf_counter()
+            return await handler(request)
+
+        return timed_handler
+
+
+process_router = APIRouter(route_class=DecodeTimedRoute)
+
+
 # Main processing endpoint
-@app.post("/process")
-async def process_files(request: ProcessRequest):
-    """Process multiple files and return chunks."""
+@process_router.post("/process")
+async def process_files(request: ProcessRequest, http_request: Request):
+    """
+    Process multiple files and return chunks.
+
+    With ``stream`` set, chunks are sent as
+    NDJSON as soon as each file is chunked instead of in a single response:
+    one ``{"type": "chunk"}`` line per chunk, an ``{"type": "error"}`` line
+    per failed file and a final ``{"type": "summary"}`` line with the stats.
+    With ``profile`` set, the stats include this request's timings in the
+    format of ``/metrics``.
+    """
+    profile = ProcessingMetrics(PROCESS_SLOWEST_FILES) if request.profile else None
+    _record_stage("decode", time.perf_counter() - http_request.state.decode_start, profile)
+    
     try:
-        logger.info("Processing files", num_files=len(request.files))
+        logger.info("Processing files", num_files=len(request.files), stream=request.stream)
         
-        all_chunks = []
-        stats = {
-            "files_processed": 0,
-            "total_chunks": 0,
-            "files_by_language": {},
-            "chunks_by_language": {},
-            "processing_errors": []
-        }
+        if request.stream:
+            return StreamingResponse(_stream_chunks(request, profile), media_type="application/x-ndjson")
         
-        for file_data in request.files:
-            try:
-                # Get appropriate chunker
-                chunker = ChunkerFactory.get_chunker(
-                    file_data.path,
-                    max_chunk_size=request.max_chunk_size,
-                    overlap=request.overlap
-                )
-                
-                # Process file
-                chunks = chunker.chunk(file_data.content, file_data.path)
-                
-                # Add chunk IDs and source info
-                for i, chunk in enumerate(chunks):
-                    chunk_id = _generate_chunk_id(file_data.path, i, chunk["text"])
-                    chunk["chunk_id"] = chunk_id
-                    chunk["source"] = "file"
-                    chunk["file_size"] = file_data.size
-                    chunk["file_modified"] = file_data.modified_time
-                
-                all_chunks.extend(chunks)
-                
-                # Update stats
-                language = chunker.get_language()
-                stats["files_by_language"][language] = stats["files_by_language"].get(language, 0) + 1
-                stats["chunks_by_language"][language] = stats["chunks_by_language"].get(language, 0) + len(chunks)
-                stats["files_processed"] += 1
-                
-                logger.info("File processed", 
-                           file_path=file_data.path, 
-                           language=language, 
-                           num_chunks=len(chunks))
-                
-            except Exception as e:
-                error_msg = f"Error processing {file_data.path}: {str(e)}"
-                logger.error("File processing error", 
-                           file_path=file_data.path, 
-                           error=str(e))
-                stats["processing_errors"].append(error_msg)
+        all_chunks = []
+        stats = _new_stats()
+        imports = []
         
-        stats["total_chunks"] = len(all_chunks)
+        # Files are chunked on worker processes; results arrive in request order
+        async for result in engine.process(request.files, request.max_chunk_size, request.overlap,
+                                           use_cache=request.use_cache):
+            if _record_result(stats, result, profile):
+                all_chunks.extend(result["chunks"])
+                imports.append((result["path"], result["language"], result.get("imports", [])))
+        await run_in_threadpool(_update_graph, imports, request.repository)
         
         logger.info("Processing completed", 
                    files_processed=stats["files_processed"],
                    total_chunks=stats["total_chunks"])
         
-        return {
-            "chunks": all_chunks,
-            "stats": stats,
-            "timestamp": datetime.now().isoformat()
-        }
+        # Serialize the chunks here, before the stats, so the time it takes is
+        # measured and included in the profile
+        start = time.perf_counter()
+        chunks_json = _json(all_chunks)
+        _record_stage("serialize", time.perf_counter() - start, profile)
+        if profile is not None:
+            stats["profile"] = profile.snapshot()
+        return Response(
+            f'{{"chunks":{chunks_json},"stats":{_json(stats)},"timestamp":{_json(datetime.now().isoformat())}}}',
+            media_type="application/json"
+        )
         
     except Exception as e:
         logger.error("Processing failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Processing failed: {e}")
 
 
+app.include_router(process_router)
+
+
+def _json(value: Any) -> str:
+    """Encode a value as compact JSON (as JSONResponse does)."""
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def _record_stage(stage: str, seconds: float, profile: Optional[ProcessingMetrics] = None):
+    """Add request-level time spent on a stage to the metrics and the request's profile."""
+    metrics.record_stage(stage, seconds)
+    if profile is not None:
+        profile.record_stage(stage, seconds)
+
+
+async def _stream_chunks(request: ProcessRequest, profile: Optional[ProcessingMetrics] = None):
+    """Yield NDJSON lines for each file's chunks as the engine finishes it."""
+    stats = _new_stats()
+    imports = []
+    try:
+        async for result in engine.process(request.files, request.max_chunk_size, request.overlap,
+                                           use_cache=request.use_cache):
+            if result["error"]:
+                _record_result(stats, result, profile)
+                yield _ndjson({"type": "error", "file_path": result["path"], "error": result["error"]})
+                continue
+            start = time.perf_counter()
+            lines = [_ndjson({"type": "chunk", "chunk": chunk}) for chunk in result["chunks"]]
+            result.setdefault("stages", {})["serialize"] = time.perf_counter() - start
+            _record_result(stats, result, profile)
+            imports.append((result["path"], result["language"], result.get("imports", [])))
+            for line in lines:
+                yield line
+    except Exception as e:
+        # The status code is already sent; report the failure in-band
+        logger.error("Streaming processing failed", error=str(e))
+        stats["processing_errors"].append(f"Processing failed: {e}")
+    await run_in_threadpool(_update_graph, imports, request.repository)
+    if profile is not None:
+        stats["profile"] = profile.snapshot()
+    
+    logger.info("Processing completed", 
+               files_processed=stats["files_processed"],
+               total_chunks=stats["total_chunks"])
+    yield _ndjson({"type": "summary", "stats": stats, "timestamp": datetime.now().isoformat()})
+
+
+def _update_graph(imports: List[Tuple[str, Optional[str], List[Dict[str, Any]]]],
+                  repository: Optional[str] = None):
+    """Record processed files' imports in the import graph and write them (SQLite I/O, off the event loop)."""
+    if import_graph is None:
+        return
+    for file_path, language, file_imports in imports:
+        import_graph.update(file_path, language, file_imports, repository or "")
+    import_graph.flush()
+
+
+def _ndjson(record: Dict[str, Any]) -> bytes:
+    """Encode one NDJSON line."""
+    return (json.dumps(record) + "\n").encode("utf-8")
+
+
+def _new_stats() -> Dict[str, Any]:
+    """Create empty processing statistics."""
+    return {
+        "files_processed": 0,
+        "total_chunks": 0,
+        "cache_hits": 0,
+        "chunking_seconds": 0.0,
+        "metadata_bytes": 0,
+        "metadata_bytes_per_chunk": 0.0,
+        "files_by_language": {},
+        "chunks_by_language": {},
+        "slowest_files": [],
+        "generated_files": [],
+        "processing_errors": []
+    }
+
+
+def _record_result(stats: Dict[str, Any], result: Dict[str, Any],
+                   profile: Optional[ProcessingMetrics] = None) -> bool:
+    """Update stats and metrics with one file's result; returns False if the file failed."""
+    metrics.record(result)
+    if profile is not None:
+        profile.record(result)
+    if result["error"]:
+        error_msg = f"Error processing {result['path']}: {result['error']}"
+        logger.error("File processing error", 
+                   file_path=result["path"], 
+                   error=result["error"])
+        stats["processing_errors"].append(error_msg)
+        return False
+    
+    language = result["language"]
+    num_chunks = len(result["chunks"])
+    seconds = result.get("seconds", 0.0)
+    stats["files_by_language"][language] = stats["files_by_language"].get(language, 0) + 1
+    stats["chunks_by_language"][language] = stats["chunks_by_language"].get(language, 0) + num_chunks
+    stats["files_processed"] += 1
+    stats["total_chunks"] += num_chunks
+    stats["chunking_seconds"] += seconds
+    stats["metadata_bytes"] += result.get("metadata_bytes", 0)
+    if stats["total_chunks"]:
+        stats["metadata_bytes_per_chunk"] = round(stats["metadata_bytes"] / stats["total_chunks"], 1)
+    if result.get("cached"):
+        stats["cache_hits"] += 1
+    if result.get("generated"):
+        stats["generated_files"].append({
+            "path": result["path"],
+            "reason": result["generated"],
+            "skipped": bool(result.get("skipped"))
+        })
+    
+    slowest = stats["slowest_files"]
+    if len(slowest) < PROCESS_SLOWEST_FILES or (slowest and seconds > slowest[-1]["seconds"]):
+        slowest.append({"path": result["path"], "language": language,
+                        "seconds": round(seconds, 4), "num_chunks": num_chunks})
+        slowest.sort(key=lambda entry: entry["seconds"], reverse=True)
+        del slowest[PROCESS_SLOWEST_FILES:]
+    
+    logger.info("File processed", 
+               file_path=result["path"], 
+               language=language, 
+               num_chunks=num_chunks,
+               seconds=round(seconds, 4),
+               generated=result.get("generated"),
+               cached=bool(result.get("cached")))
+    return True
+
+
 # Single file processing endpoint
 @app.post("/chunk")
 async def chunk_single_file(request: ChunkRequest):
@@ -167,13 +362,12 @@ async def chunk_single_file(request: ChunkRequest):
             overlap=request.overlap
         )
         
-        # Process content
-        chunks = chunker.chunk(request.content, request.file_path)
+        # Process content, splitting chunks that exceed the size budget
+        chunks = chunker.fit_to_budget(chunker.chunk(request.content, request.file_path))
         
         # Add chunk IDs
-        for i, chunk in enumerate(chunks):
-            chunk_id = _generate_chunk_id(request.file_path, i, chunk["text"])
-            chunk["chunk_id"] = chunk_id
+        prepare_chunks(chunks, request.file_path)
+        for chunk in chunks:
             chunk["source"] = "content"
         
         logger.info("Chunking completed", 
@@ -193,6 +387,26 @@ async def chunk_single_file(request: ChunkRequest):
         raise HTTPException(status_code=500, detail=f"Chunking failed: {e}")
 
 
+# Derived metadata endpoint
+@app.post("/derive-metadata")
+async def derive_chunk_metadata(request: DeriveMetadataRequest):
+    """
+    Fill in the metadata that compact chunks leave out (docstrings, argument
+    and method lists, imported modules, Markdown word counts and code
+    languages), recomputed from each chunk's text.
+    """
+    try:
+        return {
+            "chunks": [
+                {"text": chunk.text, "meta": derive_metadata(chunk.text, chunk.meta)}
+                for chunk in request.chunks
+            ]
+        }
+    except Exception as e:
+        logger.error("Deriving metadata failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Deriving metadata failed: {e}")
+
+
 # Language detection endpoint
 @app.post("/detect-language")
 async def detect_language(file_path: str):
@@ -217,8 +431,15 @@ async def get_supported_extensions():
         "supported_extensions": ChunkerFactory.supported_extensions(),
         "chunker_types": {
             "python": [".py"],
-            "javascript": [".js", ".jsx", ".ts", ".tsx"],
-            "markdown": [".md", ".markdown"]
+            "javascript": [".js", ".jsx", ".mjs", ".cjs"],
+            "typescript": [".ts", ".tsx"],
+            "go": [".go"],
+            "rust": [".rs"],
+            "java": [".java"],
+            "markdown": [".md", ".markdown"],
+            "json": [".json"],
+            "yaml": [".yaml", ".yml"],
+            "toml": [".toml"]
         }
     }
 
@@ -230,16 +451,114 @@ async def get_config():
     return {
         "max_chunk_size": MAX_CHUNK_SIZE,
         "chunk_overlap": CHUNK_OVERLAP,
+        "chunk_size_unit": get_chunk_sizer().describe(),
+        "generated_file_action": GENERATED_FILE_ACTION,
+        "chunk_metadata": CHUNK_METADATA,
+        "workers": engine.workers,
         "supported_extensions": ChunkerFactory.supported_extensions()
     }
 
 
-# Utility functions
-def _generate_chunk_id(file_path: str, chunk_index: int, content: str) -> str:
-    """Generate a unique ID for a chunk."""
-    # Create a hash based on file path, chunk index, and content
-    content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()[:8]
-    return f"{file_path}#{chunk_index}#{content_hash}"
+# Chunk cache endpoints
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Get chunk cache statistics."""
+    if engine.cache is None:
+        return {"enabled": False}
+    return engine.cache.stats()
+
+
+@app.delete("/cache/clear")
+async def clear_cache():
+    """Clear the chunk cache so every file is re-chunked."""
+    if engine.cache is None:
+        raise HTTPException(status_code=404, detail="Chunk cache is disabled")
+    try:
+        engine.cache.clear()
+        logger.info("Chunk cache cleared")
+        return {"status": "success", "message": "Chunk cache cleared"}
+    except Exception as e:
+        logger.error("Failed to clear chunk cache", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to clear chunk cache: {e}")
+
+
+# Metrics endpoints
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Get processing timings since startup or the last reset: seconds per stage
+    overall and per language, per-file time histograms and the slowest files.
+    """
+    return metrics.snapshot()
+
+
+@app.delete("/metrics")
+async def reset_metrics():
+    """Reset the processing timings."""
+    metrics.reset()
+    logger.info("Processing metrics reset")
+    return {"status": "success", "message": "Processing metrics reset"}
+
+
+# Import graph endpoints
+@app.post("/graph/dependencies")
+async def get_dependencies(request: DependenciesRequest):
+    """
+    Get the imports of processed files and the repository files they resolve to.
+
+    Returns ``{"dependencies": {file_path: [{"module", "names", "files"}]}}``
+    for the files of ``repository``; files that were never processed are
+    left out.
+    """
+    if import_graph is None:
+        raise HTTPException(status_code=404, detail="Import graph is disabled")
+
+    def lookup() -> Dict[str, List[Dict[str, Any]]]:
+        dependencies = {}
+        for file_path in request.file_paths:
+            imports = import_graph.dependencies(file_path, request.repository or "")
+            if imports is not None:
+                dependencies[file_path] = imports
+        return dependencies
+
+    return {"dependencies": await run_in_threadpool(lookup)}
+
+
+@app.get("/graph/dependents")
+async def get_dependents(file_path: str, repository: Optional[str] = None):
+    """Get the processed files of the same repository that import a file."""
+    if import_graph is None:
+        raise HTTPException(status_code=404, detail="Import graph is disabled")
+    dependents = await run_in_threadpool(import_graph.dependents, file_path, repository or "")
+    return {"file_path": file_path, "dependents": dependents}
+
+
+@app.get("/graph/stats")
+async def get_graph_stats():
+    """Get import graph statistics."""
+    if import_graph is None:
+        return {"enabled": False}
+    return await run_in_threadpool(import_graph.stats)
+
+
+@app.post("/graph/remove")
+async def remove_graph_files(request: RemoveFilesRequest):
+    """Remove deleted files from the import graph."""
+    if import_graph is None:
+        raise HTTPException(status_code=404, detail="Import graph is disabled")
+    removed = await run_in_threadpool(import_graph.remove, request.file_paths, request.repository or "")
+    logger.info("Files removed from import graph", removed=removed)
+    return {"removed_count": removed}
+
+
+@app.delete("/graph/clear")
+async def clear_graph():
+    """Remove all files from the import graph."""
+    if import_graph is None:
+        raise HTTPException(status_code=404, detail="Import graph is disabled")
+    await run_in_threadpool(import_graph.clear)
+    logger.info("Import graph cleared")
+    return {"status": "success", "message": "Import graph cleared"}
 
 
 # Statistics endpoint
@@ -254,7 +573,8 @@ async def get_stats():
         "default_config": {
             "max_chunk_size": MAX_CHUNK_SIZE,
             "chunk_overlap": CHUNK_OVERLAP
-        }
+        },
+        "engine": engine.stats()
     }
 
 
@@ -0,0 +1,201 @@
+"""
+Persistent chunk cache for the preprocessor.
+Stores each file's chunks in SQLite so unchanged files are not re-parsed on re-ingest.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration (an empty path disables the cache)
+CHUNK_CACHE_PATH = os.getenv("CHUNK_CACHE_PATH", "/app/data/chunk_cache.sqlite3")
+CHUNK_CACHE_MAX_MB = float(os.getenv("CHUNK_CACHE_MAX_MB", "512"))
+# Evict down to this fraction of the limit so eviction does not run on every write
+CHUNK_CACHE_EVICT_TO = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    entry_key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    language TEXT,
+    chunks TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_last_used ON chunks (last_used);
+"""
+
+
+def content_hash(content: str) -> str:
+    """Hash file content for cache validation."""
+    return hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+
+class ChunkCache:
+    """
+    Size-bounded SQLite cache of chunked files.
+
+    Entries are stored per (file path, chunker version, max_chunk_size,
+    overlap) and are only returned when the content hash also matches, so a
+    changed file replaces its old entry instead of leaving it behind. Writes
+    and last-used updates are buffered and committed by ``flush()`` in one
+    transaction; least recently used entries are evicted once the stored
+    chunks exceed ``max_bytes``.
+    """
+
+    def __init__(self, path: str = CHUNK_CACHE_PATH, max_bytes: int = int(CHUNK_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disabled = False
+        self._total_bytes = 0
+        self._pending: Dict[str, Tuple[str, Optional[str], str, int]] = {}
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def entry_key(file_path: str, version: str, max_chunk_size: int, overlap: int) -> str:
+        """Key of a file's entry for one chunker configuration."""
+        return f"{version}:{max_chunk_size}:{overlap}:{file_path}"
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the database on first use; failures disable the cache."""
+        if self._conn is None and not self._disabled:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(_SCHEMA)
+                self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM chunks").fetchone()[0]
+                self._conn = conn
+                logger.info(f"Opened chunk cache at {self.path} ({self._total_bytes} bytes)")
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Chunk cache disabled, cannot open {self.path}: {e}")
+                self._disabled = True
+        return self._conn
+
+    def get(self, key: str, file_hash: str) -> Optional[Tuple[Optional[str], List[Dict[str, Any]]]]:
+        """Get the cached ``(language, chunks)`` for a file, or None on a miss."""
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                row = pending[:3]
+            else:
+                conn = self._connect()
+                if conn is None:
+                    return None
+                try:
+                    row = conn.execute(
+                        "SELECT content_hash, language, chunks FROM chunks WHERE entry_key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Chunk cache lookup failed: {e}")
+                    row = None
+
+            if row is None or row[0] != file_hash:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._touched[key] = time.time()
+            return row[1], json.loads(row[2])
+
+    def put(self, key: str, file_hash: str, language: Optional[str], chunks: List[Dict[str, Any]]):
+        """Buffer a file's chunks; they are written on the next ``flush()``."""
+        data = json.dumps(chunks)
+        with self._lock:
+            self._pending[key] = (file_hash, language, data, len(data))
+
+    def flush(self):
+        """Write buffered entries and last-used times, then evict if over the size limit."""
+        with self._lock:
+            if not self._pending and not self._touched:
+                return
+            conn = self._connect()
+            if conn is None:
+                self._pending.clear()
+                self._touched.clear()
+                return
+
+            now = time.time()
+            try:
+                with conn:
+                    for key, (file_hash, language, data, size) in self._pending.items():
+                        old = conn.execute("SELECT size FROM chunks WHERE entry_key = ?", (key,)).fetchone()
+                        conn.execute(
+                            "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?)",
+                            (key, file_hash, language, data, size, now)
+                        )
+                        self._total_bytes += size - (old[0] if old else 0)
+                    conn.executemany(
+                        "UPDATE chunks SET last_used = ? WHERE entry_key = ?",
+                        [(used, key) for key, used in self._touched.items() if key not in self._pending]
+                    )
+                    if self._total_bytes > self.max_bytes:
+                        self._evict(conn)
+            except sqlite3.Error as e:
+                logger.warning(f"Chunk cache write failed: {e}")
+                self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM chunks").fetchone()[0]
+            finally:
+                self._pending.clear()
+                self._touched.clear()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Delete least recently used entries until under the eviction target."""
+        target = self.max_bytes * CHUNK_CACHE_EVICT_TO
+        evicted = []
+        for key, size in conn.execute("SELECT entry_key, size FROM chunks ORDER BY last_used"):
+            if self._total_bytes <= target:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        conn.executemany("DELETE FROM chunks WHERE entry_key = ?", evicted)
+        logger.info(f"Evicted {len(evicted)} chunk cache entries ({self._total_bytes} bytes kept)")
+
+    def clear(self):
+        """Remove all cached entries."""
+        with self._lock:
+            self._pending.clear()
+            self._touched.clear()
+            conn = self._connect()
+            if conn is not None:
+                with conn:
+                    conn.execute("DELETE FROM chunks")
+                self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self._lock:
+            # The database is not opened just to report stats
+            conn = self._conn
+            entries = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0] if conn is not None else 0
+            return {
+                "enabled": not self._disabled,
+                "open": conn is not None,
+                "path": self.path,
+                "entries": entries,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def close(self):
+        """Flush and close the database."""
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
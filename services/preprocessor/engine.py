@@ -0,0 +1,350 @@
+"""
+Parallel chunking engine for the preprocessor.
+Distributes files across a process pool and yields per-file results in input order.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Iterable, AsyncIterator, Optional
+
+from .lang_chunkers import (
+    ChunkerFactory, FixedWindowChunker, detect_generated, compact_metadata,
+    reset_parse_seconds, parse_seconds,
+    CHUNKER_VERSION, CHUNK_TOKENIZER, PYTHON_CHUNK_GRANULARITY, TREE_SITTER_AVAILABLE
+)
+from .chunk_cache import ChunkCache, content_hash
+
+logger = logging.getLogger(__name__)
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+    logger.info("xxhash not available, hashing chunks with blake2b")
+
+# Configuration
+PREPROCESSOR_WORKERS = int(os.getenv("PREPROCESSOR_WORKERS", "0")) or (os.cpu_count() or 1)
+# Files queued per worker before the engine waits for results
+PREPROCESSOR_IN_FLIGHT_PER_WORKER = int(os.getenv("PREPROCESSOR_IN_FLIGHT_PER_WORKER", "4"))
+# What to do with minified, generated and encoded files: window (cheap fixed-size
+# chunks), skip (no chunks) or chunk (use the language chunker like any other file)
+GENERATED_FILE_ACTION = os.getenv("GENERATED_FILE_ACTION", "window").lower()
+# Chunk metadata schema: full, or compact (fields derivable from the chunk text, such
+# as docstrings and argument lists, are left out and recomputed on demand)
+CHUNK_METADATA = os.getenv("CHUNK_METADATA", "full").lower()
+
+# Stages of processing files: request body decoding (per request, in the app), then,
+# timed per file, generated-file detection, parsing source into syntax trees,
+# chunking, import extraction, chunk ID hashing, chunk cache lookups and writes,
+# and response serialization (in the app)
+PROCESSING_STAGES = ("decode", "detect", "parse", "chunk", "imports", "ids", "cache", "serialize")
+
+# Cached chunks are only reused by the chunker that produced them
+CHUNK_CACHE_VERSION = (
+    f"{CHUNKER_VERSION}-{PYTHON_CHUNK_GRANULARITY}{'-ts' if TREE_SITTER_AVAILABLE else ''}"
+    f"{'-' + CHUNK_TOKENIZER if CHUNK_TOKENIZER else ''}-{GENERATED_FILE_ACTION}"
+    f"-{'xxh3' if XXHASH_AVAILABLE else 'blake2b'}-{CHUNK_METADATA}"
+)
+
+
+def chunk_content_hash(text: str) -> str:
+    """
+    Hash chunk text for ids, deduplication and caching.
+
+    Whitespace runs are collapsed first, so re-indenting or re-wrapping a
+    chunk keeps its hash.
+    """
+    data = " ".join(text.split()).encode('utf-8', 'surrogatepass')
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_64_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def chunk_anchor(meta: Dict[str, Any]) -> str:
+    """
+    Structural anchor of a chunk: its type and symbol path (e.g.
+    ``function:Repository.save``), or just its type for anonymous chunks.
+    """
+    qualified_name = meta.get("qualified_name")
+    symbol = (qualified_name or meta.get("function_name") or meta.get("class_name")
+              or meta.get("name") or meta.get("heading"))
+    if symbol is None and meta.get("function_names"):
+        symbol = meta["function_names"][0]
+    parent = meta.get("parent")
+    if parent and not qualified_name:
+        symbol = f"{parent}.{symbol}" if symbol else parent
+
+    anchor = meta.get("chunk_type", "text")
+    if symbol:
+        anchor = f"{anchor}:{symbol}"
+    if "part" in meta:
+        anchor = f"{anchor}/{meta['part']}"
+    return anchor
+
+
+def generate_chunk_id(file_path: str, anchor: str, content_hash: str) -> str:
+    """Generate a unique ID for a chunk from its file, anchor and content hash."""
+    return f"{file_path}#{anchor}#{content_hash}"
+
+
+def assign_chunk_ids(chunks: List[Dict[str, Any]], file_path: str):
+    """
+    Set ``chunk_id`` and ``content_hash`` on a file's chunks.
+
+    IDs do not depend on the chunk's position, so editing one function
+    leaves the IDs of the other chunks in the file unchanged. Identical
+    chunks under the same anchor are numbered in file order.
+    """
+    seen: Dict[str, int] = {}
+    for chunk in chunks:
+        digest = chunk_content_hash(chunk["text"])
+        chunk_id = generate_chunk_id(file_path, chunk_anchor(chunk["meta"]), digest)
+        seen[chunk_id] = count = seen.get(chunk_id, 0) + 1
+        chunk["chunk_id"] = chunk_id if count == 1 else f"{chunk_id}~{count}"
+        chunk["content_hash"] = digest
+
+
+def prepare_chunks(chunks: List[Dict[str, Any]], file_path: str) -> List[Dict[str, Any]]:
+    """Apply the CHUNK_METADATA schema to chunker output and assign chunk IDs."""
+    if CHUNK_METADATA == "compact":
+        for chunk in chunks:
+            chunk["meta"] = compact_metadata(chunk["meta"])
+    assign_chunk_ids(chunks, file_path)
+    return chunks
+
+
+def metadata_bytes(chunks: List[Dict[str, Any]]) -> int:
+    """Serialized size of the chunks' metadata."""
+    return sum(len(json.dumps(chunk["meta"])) for chunk in chunks)
+
+
+def chunk_file(path: str, content: str, size: int, modified_time: str,
+               max_chunk_size: int, overlap: int) -> Dict[str, Any]:
+    """
+    Chunk a single file.
+
+    Runs inside pool workers, so it takes and returns plain picklable values
+    and reports chunker failures in the result instead of raising. Files that
+    look minified, generated or encoded are windowed or skipped according to
+    GENERATED_FILE_ACTION, with the reason in ``generated``; ``imports``
+    lists the modules the file imports and ``seconds`` is the time spent on
+    the file, broken down by stage (see PROCESSING_STAGES) in ``stages``.
+    """
+    start = time.perf_counter()
+    stages: Dict[str, float] = {}
+    try:
+        chunker = ChunkerFactory.get_chunker(path, max_chunk_size=max_chunk_size, overlap=overlap)
+        generated = detect_generated(content, path) if GENERATED_FILE_ACTION != "chunk" else None
+        mark = time.perf_counter()
+        stages["detect"] = mark - start
+
+        reset_parse_seconds()
+        if generated is None:
+            chunks = chunker.fit_to_budget(chunker.chunk(content, path))
+        elif GENERATED_FILE_ACTION == "skip":
+            chunks = []
+        else:
+            window_chunker = FixedWindowChunker(max_chunk_size, overlap, language=chunker.get_language(),
+                                                reason=generated)
+            chunks = window_chunker.chunk(content, path)
+        stages["parse"] = parse_seconds()
+        stages["chunk"] = time.perf_counter() - mark - stages["parse"]
+        mark = time.perf_counter()
+
+        imports = chunker.dependencies(chunks) if generated is None else []
+        stages["imports"] = time.perf_counter() - mark
+        mark = time.perf_counter()
+
+        # Add chunk IDs and source info
+        prepare_chunks(chunks, path)
+        for chunk in chunks:
+            chunk["source"] = "file"
+            chunk["file_size"] = size
+            chunk["file_modified"] = modified_time
+        meta_bytes = metadata_bytes(chunks)
+        stages["ids"] = time.perf_counter() - mark
+
+        return {"path": path, "language": chunker.get_language(), "chunks": chunks, "error": None,
+                "generated": generated, "skipped": bool(generated) and not chunks, "imports": imports,
+                "metadata_bytes": meta_bytes, "seconds": time.perf_counter() - start, "stages": stages}
+    except Exception as e:
+        return {"path": path, "language": None, "chunks": [], "error": str(e),
+                "seconds": time.perf_counter() - start, "stages": stages}
+
+
+class ChunkingEngine:
+    """
+    Chunks files on a pool of worker processes.
+
+    At most ``max_in_flight`` files are submitted at a time, so memory stays
+    bounded for large repositories, and results are yielded in the order the
+    files were given regardless of which worker finishes first. With a single
+    worker, files are chunked on a thread so the event loop is never blocked.
+
+    With a ``cache``, files whose content is unchanged since they were last
+    chunked with the same settings are returned from it without parsing.
+    """
+
+    def __init__(self, workers: int = PREPROCESSOR_WORKERS, max_in_flight: Optional[int] = None,
+                 cache: Optional[ChunkCache] = None):
+        self.workers = max(1, workers)
+        self.max_in_flight = max(1, max_in_flight or self.workers * PREPROCESSOR_IN_FLIGHT_PER_WORKER)
+        self.cache = cache
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        """Get the process pool, starting it on first use."""
+        if self.workers == 1:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                logger.info(f"Started chunking pool with {self.workers} workers")
+            return self._executor
+
+    def _reset_executor(self, executor: ProcessPoolExecutor):
+        """Drop a broken pool so the next request starts a fresh one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def process(self, files: Iterable[Any], max_chunk_size: int,
+                      overlap: int, use_cache: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Chunk files in parallel, yielding one result per file in input order.
+
+        ``files`` are objects with ``path``, ``content``, ``size`` and
+        ``modified_time`` attributes. Results served from the cache have
+        ``cached`` set.
+        """
+        loop = asyncio.get_running_loop()
+        cache = self.cache if use_cache else None
+        pending = deque()
+
+        def lookup(file_data):
+            """Hash a file and look it up in the cache; runs on a thread, off the event loop."""
+            start = time.perf_counter()
+            cache_entry = (
+                ChunkCache.entry_key(file_data.path, CHUNK_CACHE_VERSION, max_chunk_size, overlap),
+                content_hash(file_data.content)
+            )
+            cached = cache.get(*cache_entry)
+            lookup_seconds = time.perf_counter() - start
+            if cached is None:
+                return cache_entry, None, lookup_seconds
+            result = _cached_result(file_data, *cached)
+            result["stages"]["cache"] = lookup_seconds
+            return cache_entry, result, lookup_seconds
+
+        def store(cache_entry, result) -> float:
+            """Buffer a result in the cache (serializing its chunks) on a thread."""
+            start = time.perf_counter()
+            cache.put(*cache_entry, result["language"], result["chunks"])
+            return time.perf_counter() - start
+
+        def run(executor, file_data):
+            return loop.run_in_executor(
+                executor, chunk_file, file_data.path, file_data.content,
+                file_data.size, file_data.modified_time, max_chunk_size, overlap
+            )
+
+        async def resolve(file_data) -> Dict[str, Any]:
+            """Serve a file from the cache or chunk it on the pool."""
+            cache_entry = None
+            lookup_seconds = 0.0
+            if cache is not None:
+                cache_entry, cached, lookup_seconds = await loop.run_in_executor(None, lookup, file_data)
+                if cached is not None:
+                    return cached
+
+            # Looked up per file: a pool that broke earlier in the request has been replaced
+            executor = self._get_executor()
+            try:
+                future = run(executor, file_data)
+            except BrokenProcessPool as e:
+                # A worker died after the last result was collected; retry on a fresh pool
+                logger.error(f"Chunking pool failed before processing {file_data.path}: {e}")
+                self._reset_executor(executor)
+                executor = self._get_executor()
+                future = run(executor, file_data)
+            try:
+                result = await future
+            except BrokenProcessPool as e:
+                logger.error(f"Chunking pool failed while processing {file_data.path}: {e}")
+                if executor is not None:
+                    self._reset_executor(executor)
+                return {"path": file_data.path, "language": None, "chunks": [],
+                        "error": f"Worker process failed: {e}"}
+            if cache_entry is not None:
+                # Skipped files keep no chunks to cache and are cheap to detect again
+                if result["error"] is None and not result.get("skipped"):
+                    lookup_seconds += await loop.run_in_executor(None, store, cache_entry, result)
+                result.setdefault("stages", {})["cache"] = lookup_seconds
+            return result
+
+        async def next_result() -> Dict[str, Any]:
+            path, task = pending.popleft()
+            try:
+                return await task
+            except Exception as e:
+                return {"path": path, "language": None, "chunks": [], "error": str(e)}
+
+        flushed = cache is None
+        try:
+            for file_data in files:
+                pending.append((file_data.path, asyncio.ensure_future(resolve(file_data))))
+                if len(pending) >= self.max_in_flight:
+                    yield await next_result()
+            while pending:
+                yield await next_result()
+            if cache is not None:
+                flushed = True
+                await loop.run_in_executor(None, cache.flush)
+        finally:
+            # The consumer stopped early (e.g. the client disconnected)
+            for _, task in pending:
+                task.cancel()
+            if not flushed:
+                cache.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get engine configuration."""
+        return {
+            "workers": self.workers,
+            "max_in_flight": self.max_in_flight,
+            "pool_started": self._executor is not None,
+            "cache": self.cache.stats() if self.cache is not None else None
+        }
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
+
+
+def _cached_result(file_data: Any, language: Optional[str], chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build a file result from cached chunks, refreshing the file info."""
+    for chunk in chunks:
+        chunk["file_size"] = file_data.size
+        chunk["file_modified"] = file_data.modified_time
+    generated = chunks[0]["meta"].get("generated") if chunks else None
+    start = time.perf_counter()
+    imports = ChunkerFactory.get_chunker(file_data.path).dependencies(chunks) if generated is None else []
+    return {"path": file_data.path, "language": language, "chunks": chunks, "error": None,
+            "generated": generated, "skipped": False, "imports": imports, "metadata_bytes": metadata_bytes(chunks),
+            "seconds": 0.0, "stages": {"imports": time.perf_counter() - start}, "cached": True}
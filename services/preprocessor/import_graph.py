@@ -0,0 +1,301 @@
+"""
+Repository import graph for the preprocessor.
+Records the modules each chunked file imports and resolves them to files in the repository.
+"""
+
+import os
+import json
+import time
+import logging
+import sqlite3
+import posixpath
+import threading
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration (an empty path disables the graph)
+IMPORT_GRAPH_PATH = os.getenv("IMPORT_GRAPH_PATH", "/app/data/import_graph.sqlite3")
+
+# File names that stand for their directory (packages and index modules)
+_PACKAGE_STEMS = frozenset({"__init__", "index", "mod", "lib"})
+# Extensions a JS/TS import may spell out; TypeScript imports "./b.js" for b.ts
+_JS_EXTENSIONS = frozenset({".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".mts", ".cts"})
+
+# Files are keyed by repository ('' when the caller names none); "files" was the unscoped table
+_SCHEMA = """
+DROP TABLE IF EXISTS files;
+CREATE TABLE IF NOT EXISTS repository_files (
+    repository TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    language TEXT,
+    imports TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (repository, file_path)
+);
+"""
+
+# (repository, file path)
+FileKey = Tuple[str, str]
+
+
+def _module_stems(file_path: str) -> List[str]:
+    """Module paths a file can be imported by: its path without extension, and its package directory."""
+    stem, extension = posixpath.splitext(file_path)
+    stems = [stem]
+    directory, name = posixpath.split(stem)
+    # Go imports packages (directories); other languages name a directory by its index file
+    if directory and (name in _PACKAGE_STEMS or extension == ".go"):
+        stems.append(directory)
+    return stems
+
+
+def _module_path(file_path: str, language: Optional[str], module: str) -> Tuple[Optional[str], bool]:
+    """
+    Convert an imported module to a slash-separated path.
+
+    Returns ``(path, relative)``: relative paths are resolved from the
+    importing file and must match exactly; absolute ones match any file whose
+    path ends with them. External packages give ``(None, False)``.
+    """
+    directory = posixpath.dirname(file_path)
+    if language == "python":
+        level = len(module) - len(module.lstrip('.'))
+        path = module[level:].replace('.', '/')
+        if not level:
+            return path, False
+        for _ in range(level - 1):
+            directory = posixpath.dirname(directory)
+        return posixpath.join(directory, path) if path else directory, True
+    if language in ("javascript", "typescript"):
+        if module.startswith('.'):
+            path = posixpath.normpath(posixpath.join(directory, module))
+            stem, extension = posixpath.splitext(path)
+            return (stem if extension in _JS_EXTENSIONS else path), True
+        return None, False
+    if language == "rust":
+        parts = module.split('::')
+        if parts[0] == "crate":
+            return '/'.join(parts[1:]) or None, False
+        if parts[0] in ("self", "super"):
+            while parts and parts[0] == "super" and len(parts) > 1 and parts[1] == "super":
+                directory = posixpath.dirname(directory)
+                parts = parts[1:]
+            return posixpath.join(directory, *parts[1:]) if len(parts) > 1 else directory, True
+        return None, False
+    if language == "java":
+        return module.replace('.', '/') or None, False
+    if language == "go":
+        return module, False
+    return None, False
+
+
+class ImportGraph:
+    """
+    Persistent module -> imported modules/symbols graph of ingested files.
+
+    Each file's imports are stored as written, ``{"module", "names"}``, and
+    resolved against the files in the graph when queried, so files ingested
+    later still resolve. Files are namespaced by repository: imports only
+    resolve to files of the importer's repository, and repositories may hold
+    the same relative paths. Updates are buffered and written by ``flush()``
+    in one transaction. Methods do blocking SQLite I/O (the first call loads
+    the whole graph), so async callers run them on a worker thread.
+    """
+
+    def __init__(self, path: str = IMPORT_GRAPH_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disabled = False
+        self._files: Dict[FileKey, Tuple[Optional[str], List[Dict[str, Any]]]] = {}
+        self._pending: Dict[FileKey, Tuple[Optional[str], List[Dict[str, Any]]]] = {}
+        # Per repository: module path suffix -> full module paths, and module path -> files;
+        # rebuilt after updates
+        self._suffixes: Optional[Dict[str, Dict[str, Set[str]]]] = None
+        self._files_by_stem: Dict[str, Dict[str, List[str]]] = {}
+        self._dependents: Optional[Dict[FileKey, List[str]]] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the database and load the graph on first use; failures keep the graph in memory only."""
+        if self._conn is None and not self._disabled:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                for repository, file_path, language, imports in conn.execute(
+                        "SELECT repository, file_path, language, imports FROM repository_files"):
+                    self._files.setdefault((repository, file_path), (language, json.loads(imports)))
+                self._conn = conn
+                self._suffixes = self._dependents = None
+                logger.info(f"Opened import graph at {self.path} ({len(self._files)} files)")
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Import graph not persisted, cannot open {self.path}: {e}")
+                self._disabled = True
+        return self._conn
+
+    def update(self, file_path: str, language: Optional[str], imports: List[Dict[str, Any]],
+               repository: str = ""):
+        """Record a file's imports; they are written on the next ``flush()``."""
+        with self._lock:
+            self._connect()
+            key = (repository, file_path)
+            if self._files.get(key) == (language, imports):
+                return
+            self._files[key] = self._pending[key] = (language, imports)
+            self._suffixes = self._dependents = None
+
+    def flush(self):
+        """Write buffered updates."""
+        with self._lock:
+            conn = self._connect()
+            if conn is None or not self._pending:
+                self._pending.clear()
+                return
+            now = time.time()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO repository_files VALUES (?, ?, ?, ?, ?)",
+                        [(repository, file_path, language, json.dumps(imports), now)
+                         for (repository, file_path), (language, imports) in self._pending.items()]
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Import graph write failed: {e}")
+            finally:
+                self._pending.clear()
+
+    def _build_index(self):
+        """Index each repository's files by every trailing part of their module paths."""
+        suffixes: Dict[str, Dict[str, Set[str]]] = {}
+        files_by_stem: Dict[str, Dict[str, List[str]]] = {}
+        for repository, file_path in self._files:
+            repository_suffixes = suffixes.setdefault(repository, {})
+            repository_stems = files_by_stem.setdefault(repository, {})
+            for stem in _module_stems(file_path):
+                repository_stems.setdefault(stem, []).append(file_path)
+                parts = stem.split('/')
+                for i in range(len(parts)):
+                    repository_suffixes.setdefault('/'.join(parts[i:]), set()).add(stem)
+        self._suffixes, self._files_by_stem = suffixes, files_by_stem
+
+    def _lookup(self, repository: str, file_path: str, path: str, relative: bool) -> List[str]:
+        """Files for a module path; of several matches, the one sharing most of the importer's path."""
+        files_by_stem = self._files_by_stem.get(repository, {})
+        if relative:
+            return files_by_stem.get(path, [])
+        stems = self._suffixes.get(repository, {}).get(path)
+        if not stems:
+            return []
+        best = max(stems, key=lambda stem: (len(posixpath.commonpath([stem, file_path])) if stem[:1] == file_path[:1]
+                                            else 0, -len(stem)))
+        return files_by_stem[best]
+
+    def _resolve(self, key: FileKey, language: Optional[str], record: Dict[str, Any]) -> List[str]:
+        """Files an import refers to: submodules named by the import first, then the module itself."""
+        repository, file_path = key
+        path, relative = _module_path(file_path, language, record["module"])
+        if path is None:
+            return []
+        candidates = [posixpath.join(path, name) for name in record.get("names", [])] + [path]
+        if language == "go":
+            # Go import paths start with the module path, which is not part of the file paths
+            parts = path.split('/')
+            candidates = ['/'.join(parts[i:]) for i in range(len(parts) - 1)]
+        files: List[str] = []
+        for candidate in candidates:
+            if files and language == "go":
+                break
+            for resolved in self._lookup(repository, file_path, candidate, relative):
+                if resolved != file_path and resolved not in files:
+                    files.append(resolved)
+        return files
+
+    def dependencies(self, file_path: str, repository: str = "") -> Optional[List[Dict[str, Any]]]:
+        """
+        Get a file's imports with the repository files they resolve to, as
+        ``{"module", "names", "files"}`` records, or None for unknown files.
+        """
+        with self._lock:
+            self._connect()
+            key = (repository, file_path)
+            entry = self._files.get(key)
+            if entry is None:
+                return None
+            if self._suffixes is None:
+                self._build_index()
+            language, imports = entry
+            return [{**record, "files": self._resolve(key, language, record)} for record in imports]
+
+    def dependents(self, file_path: str, repository: str = "") -> List[str]:
+        """Get the files of the same repository that import a file."""
+        with self._lock:
+            self._connect()
+            if self._dependents is None:
+                if self._suffixes is None:
+                    self._build_index()
+                dependents: Dict[FileKey, List[str]] = {}
+                for importer, (language, imports) in self._files.items():
+                    for record in imports:
+                        for resolved in self._resolve(importer, language, record):
+                            importers = dependents.setdefault((importer[0], resolved), [])
+                            if importer[1] not in importers:
+                                importers.append(importer[1])
+                self._dependents = dependents
+            return list(self._dependents.get((repository, file_path), []))
+
+    def remove(self, file_paths: List[str], repository: str = "") -> int:
+        """Remove a repository's files from the graph, e.g. after they were deleted; returns how many were known."""
+        with self._lock:
+            conn = self._connect()
+            keys = {(repository, file_path) for file_path in file_paths}
+            removed = 0
+            for key in keys:
+                removed += self._files.pop(key, None) is not None
+                self._pending.pop(key, None)
+            if not removed:
+                return 0
+            self._suffixes = self._dependents = None
+            if conn is not None:
+                try:
+                    with conn:
+                        conn.executemany("DELETE FROM repository_files WHERE repository = ? AND file_path = ?",
+                                         list(keys))
+                except sqlite3.Error as e:
+                    logger.warning(f"Import graph write failed: {e}")
+            return removed
+
+    def clear(self):
+        """Remove all files from the graph."""
+        with self._lock:
+            conn = self._connect()
+            self._files.clear()
+            self._pending.clear()
+            self._suffixes = self._dependents = None
+            if conn is not None:
+                with conn:
+                    conn.execute("DELETE FROM repository_files")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get graph statistics."""
+        with self._lock:
+            self._connect()
+            return {
+                "persisted": self._conn is not None,
+                "path": self.path,
+                "repositories": len({repository for repository, _ in self._files}),
+                "files": len(self._files),
+                "imports": sum(len(imports) for _, imports in self._files.values()),
+                "pending": len(self._pending)
+            }
+
+    def close(self):
+        """Flush and close the database."""
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,23 +1,172 @@
 """
 Language-aware chunking for different file types.
-Supports Python (AST-based), JavaScript/TypeScript, and Markdown.
+Supports Python (AST-based), JavaScript/TypeScript, Go, Rust and Java
+(tree-sitter), Markdown, and JSON/YAML/TOML data files.
 """
 
+import os
 import ast
 import re
+import json
+import math
+import time
 import logging
-from typing import List, Dict, Any, Optional
+import importlib
+import threading
+from bisect import bisect_right
+from collections import Counter
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from abc import ABC, abstractmethod
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever chunk boundaries or metadata change so cached chunks are recomputed
+CHUNKER_VERSION = "7"
+
+# Hugging Face tokenizer of the embedding model (e.g. sentence-transformers/all-MiniLM-L6-v2).
+# When set, max_chunk_size and overlap are measured in its tokens instead of characters.
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", "")
+
+try:
+    from tree_sitter import Language, Parser, Query
+    try:
+        from tree_sitter import QueryCursor
+    except ImportError:  # tree-sitter < 0.25 runs queries on the Query itself
+        QueryCursor = None
+    TREE_SITTER_AVAILABLE = True
+except ImportError:
+    TREE_SITTER_AVAILABLE = False
+    logger.warning("tree-sitter not available, using regex/line-based chunking")
+
+
+class ChunkSizer:
+    """Measures chunk text in characters."""
+    
+    unit = "chars"
+    # Tokens the embedding model adds around every input
+    reserved = 0
+    # Longest input the model accepts, if known
+    max_length: Optional[int] = None
+    
+    def size(self, text: str) -> int:
+        return len(text)
+    
+    def size_of(self, content: str, start: int, end: int) -> int:
+        """Size of content[start:end]; characters are counted without copying."""
+        return end - start
+    
+    def line_sizes(self, lines: List[str]) -> List[int]:
+        """Sizes of lines, including their newline, that add up to the size of the joined text."""
+        return [len(line) + 1 for line in lines]
+    
+    def split(self, text: str, budget: int) -> List[str]:
+        """Split text that has no line breaks into pieces of at most ``budget``."""
+        return [text[i:i + budget] for i in range(0, len(text), budget)] or [text]
+    
+    def describe(self) -> str:
+        return self.unit
+
+
+class TokenSizer(ChunkSizer):
+    """
+    Measures chunk text in tokens of the embedding model's (fast) tokenizer.
+    
+    Line sizes are batch-encoded once per file and summed. That is exact for
+    tokenizers that split on whitespace, such as the WordPiece tokenizers of
+    the sentence-transformers MiniLM/MPNet models.
+    """
+    
+    unit = "tokens"
+    
+    def __init__(self, tokenizer: Any, name: Optional[str] = None):
+        self.tokenizer = tokenizer
+        self.name = name or getattr(tokenizer, "name_or_path", "") or "tokenizer"
+        self.reserved = tokenizer.num_special_tokens_to_add(pair=False)
+        model_max_length = getattr(tokenizer, "model_max_length", None)
+        # Tokenizers without a configured limit report a huge sentinel value
+        self.max_length = model_max_length if model_max_length and model_max_length < 1_000_000 else None
+    
+    def _encode(self, text, **kwargs):
+        return self.tokenizer(text, add_special_tokens=False, verbose=False, **kwargs)
+    
+    def size(self, text: str) -> int:
+        return len(self._encode(text)["input_ids"])
+    
+    def size_of(self, content: str, start: int, end: int) -> int:
+        return self.size(content[start:end])
+    
+    def line_sizes(self, lines: List[str]) -> List[int]:
+        if not lines:
+            return []
+        return [len(ids) for ids in self._encode(lines)["input_ids"]]
+    
+    def split(self, text: str, budget: int) -> List[str]:
+        offsets = self._encode(text, return_offsets_mapping=True)["offset_mapping"]
+        cuts = [0] + [offsets[i][0] for i in range(budget, len(offsets), budget)] + [len(text)]
+        return [text[start:end] for start, end in zip(cuts, cuts[1:])]
+    
+    def describe(self) -> str:
+        return f"{self.unit}:{self.name}"
+
+
+@lru_cache(maxsize=None)
+def get_chunk_sizer(tokenizer_name: str = CHUNK_TOKENIZER) -> ChunkSizer:
+    """
+    Get the sizer for a tokenizer, loading it once per process.
+    
+    An empty name, or a tokenizer that cannot be loaded, measures characters.
+    """
+    if not tokenizer_name:
+        return ChunkSizer()
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_name, use_fast=True)
+        logger.info(f"Sizing chunks in tokens of {tokenizer_name}")
+        return TokenSizer(tokenizer, tokenizer_name)
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer {tokenizer_name}, sizing chunks in characters: {e}")
+        return ChunkSizer()
+
+
+# Time spent parsing source into syntax trees, which profiling separates from the rest of
+# chunking. Chunker instances are shared by concurrent calls, so it is kept per thread.
+_parse_time = threading.local()
+
+
+def reset_parse_seconds():
+    """Start timing parsing on this thread, e.g. before chunking a file."""
+    _parse_time.seconds = 0.0
+
+
+def parse_seconds() -> float:
+    """Time this thread spent parsing since ``reset_parse_seconds()``."""
+    return getattr(_parse_time, "seconds", 0.0)
+
+
+def _add_parse_seconds(seconds: float):
+    _parse_time.seconds = parse_seconds() + seconds
+
 
 class BaseChunker(ABC):
-    """Base class for language-specific chunkers."""
+    """
+    Base class for language-specific chunkers.
     
-    def __init__(self, max_chunk_size: int = 1000, overlap: int = 100):
+    ``max_chunk_size`` and ``overlap`` are in the units of ``sizer``:
+    characters by default, or tokens of the embedding model when
+    CHUNK_TOKENIZER is set, so that chunks fit the model's input window.
+    Chunkers report the time they spend parsing through ``parse_seconds()``.
+    """
+    
+    def __init__(self, max_chunk_size: int = 1000, overlap: int = 100,
+                 sizer: Optional[ChunkSizer] = None):
+        self.sizer = sizer or get_chunk_sizer()
+        if self.sizer.max_length:
+            max_chunk_size = min(max_chunk_size, self.sizer.max_length)
         self.max_chunk_size = max_chunk_size
         self.overlap = overlap
+        # Room for chunk text once the model's special tokens are counted
+        self.budget = max(1, max_chunk_size - self.sizer.reserved)
     
     @abstractmethod
     def chunk(self, content: str, file_path: str) -> List[Dict[str, Any]]:
@@ -44,267 +193,917 @@ class BaseChunker(ABC):
     def get_language(self) -> str:
         """Get the language identifier."""
         pass
-
-
-class PythonChunker(BaseChunker):
-    """AST-based chunker for Python files."""
     
-    def get_language(self) -> str:
-        return "python"
+    def _windows(self, sizes: List[int], overlap: int = 0) -> List[Tuple[int, int]]:
+        """
+        Split consecutive lines into (start, end) index windows within the budget.
+        
+        Each window repeats the trailing lines of the previous one that fit in
+        ``overlap``; a single line larger than the budget is a window on its own.
+        """
+        windows = []
+        start = total = 0
+        for i, size in enumerate(sizes):
+            if total + size > self.budget and i > start:
+                windows.append((start, i))
+                carried, back = 0, i
+                while back - 1 > start and carried + sizes[back - 1] <= overlap:
+                    back -= 1
+                    carried += sizes[back]
+                start, total = (back, carried) if carried + size <= self.budget else (i, 0)
+            total += size
+        windows.append((start, len(sizes)))
+        return windows
     
-    def chunk(self, content: str, file_path: str) -> List[Dict[str, Any]]:
-        """Chunk Python code using AST analysis."""
+    def _fallback_chunk(self, content: str, file_path: str) -> List[Dict[str, Any]]:
+        """Fallback to windows of whole lines, overlapping by up to ``overlap``."""
         chunks = []
         lines = content.split('\n')
+        sizes = self.sizer.line_sizes(lines)
         
-        try:
-            tree = ast.parse(content)
+        for start, end in self._windows(sizes, self.overlap):
+            if end - start == 1 and sizes[start] > self.budget:
+                texts = self.sizer.split(lines[start], self.budget)
+            else:
+                texts = ['\n'.join(lines[start:end])]
+            for text in texts:
+                chunks.append(self.create_chunk(
+                    text=text,
+                    file_path=file_path,
+                    start_line=start + 1,
+                    end_line=end,
+                    chunk_type="text_block"
+                ))
+        
+        return chunks
+    
+    def fit_to_budget(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Split chunks larger than max_chunk_size into parts at line breaks.
+        
+        Applied to every chunker's output, so the embedding model never
+        truncates a chunk and discards its tail.
+        """
+        fitted = []
+        for chunk in chunks:
+            text = chunk["text"]
+            if self.sizer.size(text) <= self.budget:
+                fitted.append(chunk)
+                continue
             
-            # Extract top-level definitions
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                    chunk = self._extract_function(node, lines, file_path)
-                    if chunk:
-                        chunks.append(chunk)
-                
-                elif isinstance(node, ast.ClassDef):
-                    chunk = self._extract_class(node, lines, file_path)
-                    if chunk:
-                        chunks.append(chunk)
-                
-                elif isinstance(node, ast.Import):
-                    chunk = self._extract_import(node, lines, file_path)
-                    if chunk:
-                        chunks.append(chunk)
-                
-                elif isinstance(node, ast.ImportFrom):
-                    chunk = self._extract_import_from(node, lines, file_path)
-                    if chunk:
-                        chunks.append(chunk)
+            lines = text.split('\n')
+            sizes = self.sizer.line_sizes(lines)
+            pieces = []
+            for start, end in self._windows(sizes):
+                if end - start == 1 and sizes[start] > self.budget:
+                    pieces.extend((start, start, piece) for piece in self.sizer.split(lines[start], self.budget))
+                else:
+                    pieces.append((start, end - 1, '\n'.join(lines[start:end])))
             
-            # Add module-level docstring if present
-            if (tree.body and isinstance(tree.body[0], ast.Expr) and 
-                isinstance(tree.body[0].value, ast.Constant) and 
-                isinstance(tree.body[0].value.value, str)):
-                
-                docstring_node = tree.body[0]
-                chunk = self.create_chunk(
-                    text=docstring_node.value.value,
+            meta = chunk["meta"]
+            for i, (first, last, piece) in enumerate(pieces, 1):
+                fitted.append({**chunk, "text": piece.strip(), "meta": {
+                    **meta,
+                    "start_line": meta["start_line"] + first,
+                    "end_line": min(meta["start_line"] + last, meta["end_line"]),
+                    "part": i,
+                    "parts": len(pieces)
+                }})
+        return fitted
+
+    # Chunk types whose text holds the file's imports
+    import_chunk_types = frozenset({"import"})
+
+    def dependencies(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Get the modules a file imports, as ``{"module", "names"}`` records.
+
+        Read from the import chunks the chunker already split out, so the file
+        is not parsed again. ``names`` are the imported symbols, empty when the
+        whole module is imported.
+        """
+        imports = []
+        for chunk in chunks:
+            if chunk["meta"].get("chunk_type") in self.import_chunk_types:
+                imports.extend(self._parse_imports(chunk["text"]))
+        return imports
+
+    def _parse_imports(self, text: str) -> List[Dict[str, Any]]:
+        """Parse the import statements of an import chunk."""
+        return []
+
+
+class LineIndex:
+    """
+    Maps character offsets to 1-based line numbers.
+
+    Newline offsets are collected once per file, so each lookup is a binary
+    search instead of counting newlines in ``content[:pos]``.
+    """
+    
+    def __init__(self, content: str):
+        self.newlines = [match.start() for match in re.finditer('\n', content)]
+    
+    def line_of(self, pos: int) -> int:
+        """Get the line number of the character at ``pos``."""
+        return bisect_right(self.newlines, pos - 1) + 1
+
+
+# Pre-scan heuristics for minified, bundled, generated and encoded files
+GENERATED_FILE_NAMES = frozenset({
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock",
+    "pipfile.lock", "cargo.lock", "composer.lock", "gemfile.lock", "go.sum", "packages.lock.json"
+})
+_GENERATED_SUFFIXES = (".min.js", ".min.mjs", ".min.css", ".bundle.js", ".chunk.js", ".pb.go", "_pb2.py")
+_GENERATED_MARKER = re.compile(
+    r'@generated\b|\bdo not edit\b|\bcode generated by\b|\bauto-?generated\b|\bautomatically generated\b',
+    re.IGNORECASE
+)
+_SOURCE_MAP_COMMENT = re.compile(r'[#@] sourceMappingURL=')
+# Files shorter than this are cheap to chunk whatever they contain
+GENERATED_MIN_SIZE = 2048
+# Hand-written code and prose average 20-50 characters per line; minified bundles thousands
+MINIFIED_AVG_LINE_LENGTH = 300
+MINIFIED_MAX_LINE_LENGTH = 5000
+# Bits per character; source code and prose measure 4.3-5.1, base64 and hex blobs 6
+ENCODED_MIN_ENTROPY = 5.6
+_PRE_SCAN_SAMPLE = 8192
+
+
+def _entropy(sample: str) -> float:
+    """Shannon entropy of a sample in bits per character."""
+    total = len(sample)
+    return -sum(count / total * math.log2(count / total) for count in Counter(sample).values())
+
+
+def detect_generated(content: str, file_path: str) -> Optional[str]:
+    """
+    Tell whether a file looks minified, generated or encoded, and why.
+
+    Only the file name, the head and tail of the content and a sample are
+    looked at, so this is cheap enough to run before every chunker. Returns
+    the reason (``lockfile``, ``minified_name``, ``generated_marker``,
+    ``source_map``, ``minified`` or ``encoded``) or None for ordinary files.
+    """
+    name = os.path.basename(file_path).lower()
+    if name in GENERATED_FILE_NAMES:
+        return "lockfile"
+    if name.endswith(_GENERATED_SUFFIXES):
+        return "minified_name"
+    if _GENERATED_MARKER.search(content, 0, 1024):
+        return "generated_marker"
+    if len(content) < GENERATED_MIN_SIZE:
+        return None
+
+    if _SOURCE_MAP_COMMENT.search(content, len(content) - 512):
+        return "source_map"
+    if len(content) / (content.count('\n') + 1) > MINIFIED_AVG_LINE_LENGTH:
+        return "minified"
+    sample = content[:_PRE_SCAN_SAMPLE]
+    if max(map(len, sample.split('\n'))) >= MINIFIED_MAX_LINE_LENGTH:
+        return "minified"
+    if _entropy(sample) >= ENCODED_MIN_ENTROPY:
+        return "encoded"
+    return None
+
+
+class FixedWindowChunker(BaseChunker):
+    """
+    Chunker for minified, generated and encoded files.
+
+    Cuts the content into consecutive windows of the chunk budget without
+    parsing it or looking for line breaks, so its cost is linear in the file
+    size however pathological the content is.
+    """
+
+    def __init__(self, max_chunk_size: int = 1000, overlap: int = 100,
+                 sizer: Optional[ChunkSizer] = None, language: str = "text",
+                 reason: Optional[str] = None):
+        super().__init__(max_chunk_size, overlap, sizer)
+        self.language = language
+        self.reason = reason
+
+    def get_language(self) -> str:
+        return self.language
+
+    def chunk(self, content: str, file_path: str) -> List[Dict[str, Any]]:
+        chunks = []
+        line_index = LineIndex(content)
+        metadata = {"generated": self.reason} if self.reason else None
+        start = 0
+        for window in self.sizer.split(content, self.budget):
+            end = start + len(window)
+            if window.strip():
+                chunks.append(self.create_chunk(
+                    text=window,
                     file_path=file_path,
-                    start_line=docstring_node.lineno,
-                    end_line=docstring_node.end_lineno or docstring_node.lineno,
-                    chunk_type="module_docstring"
-                )
-                chunks.append(chunk)
+                    start_line=line_index.line_of(start),
+                    end_line=line_index.line_of(max(start, end - 1)),
+                    chunk_type="text_window",
+                    metadata=metadata
+                ))
+            start = end
+        return chunks
+
+
+# Tree-sitter grammar packages: grammar name -> (module, language function)
+_TREE_SITTER_GRAMMARS = {
+    "javascript": ("tree_sitter_javascript", "language"),
+    "typescript": ("tree_sitter_typescript", "language_typescript"),
+    "tsx": ("tree_sitter_typescript", "language_tsx"),
+    "go": ("tree_sitter_go", "language"),
+    "rust": ("tree_sitter_rust", "language"),
+    "java": ("tree_sitter_java", "language"),
+}
+
+# Compiled grammars and queries are shared; parsers are not thread-safe, so each thread gets its own
+_ts_languages: Dict[str, Any] = {}
+_ts_queries: Dict[Tuple[str, str], Any] = {}
+_ts_local = threading.local()
+_ts_lock = threading.Lock()
+
+
+def _load_tree_sitter_language(grammar: str):
+    """Load a tree-sitter grammar once per process; None if it is not installed."""
+    if grammar not in _ts_languages:
+        with _ts_lock:
+            if grammar not in _ts_languages:
+                language = None
+                if TREE_SITTER_AVAILABLE:
+                    module_name, function_name = _TREE_SITTER_GRAMMARS[grammar]
+                    try:
+                        module = importlib.import_module(module_name)
+                        language = Language(getattr(module, function_name)())
+                    except Exception as e:
+                        logger.warning(f"tree-sitter grammar for {grammar} not available: {e}")
+                _ts_languages[grammar] = language
+    return _ts_languages[grammar]
+
+
+def _get_tree_sitter_parser(grammar: str):
+    """Get this thread's cached parser for a grammar."""
+    parsers = getattr(_ts_local, "parsers", None)
+    if parsers is None:
+        parsers = _ts_local.parsers = {}
+    if grammar not in parsers:
+        language = _load_tree_sitter_language(grammar)
+        parsers[grammar] = Parser(language) if language is not None else None
+    return parsers[grammar]
+
+
+def _get_tree_sitter_query(grammar: str, source: str):
+    """Compile a query once per grammar; None if the grammar or query is unusable."""
+    key = (grammar, source)
+    if key not in _ts_queries:
+        query = None
+        language = _load_tree_sitter_language(grammar)
+        if language is not None:
+            try:
+                query = Query(language, source)
+            except Exception as e:
+                logger.warning(f"tree-sitter query for {grammar} failed to compile: {e}")
+        _ts_queries[key] = query
+    return _ts_queries[key]
+
+
+class TreeSitterChunker(BaseChunker):
+    """
+    Base class for chunkers driven by tree-sitter queries.
+
+    Each query pattern captures a declaration as ``@<chunk_type>`` and its
+    identifier as ``@name``; captures starting with ``_`` only feed query
+    predicates. Matching runs inside tree-sitter, so Python only sees the
+    declarations. Adjacent imports are merged into one chunk.
+
+    Every line goes into at most one chunk. Declarations nested in a
+    container (see ``container_types``, e.g. a class's methods) become
+    chunks of their own, and the container is emitted as a header chunk:
+    its text without its members, spanning all of its lines so that the
+    members nest under it. Declarations nested in anything else (e.g. a
+    function inside a function) stay part of the enclosing chunk.
+    """
+    
+    grammar = ""
+    query = ""
+    # Parent nodes whose span includes the declaration (e.g. ``export``)
+    wrapper_types = frozenset()
+    # Chunk types whose nested declarations are chunked separately
+    container_types = frozenset()
+    # Sibling nodes directly above a declaration that belong to it (doc comments, attributes)
+    leading_types = frozenset({"comment"})
+    
+    def grammar_for(self, file_path: str) -> str:
+        """Get the grammar to parse a file with."""
+        return self.grammar
+    
+    def chunk(self, content: str, file_path: str) -> List[Dict[str, Any]]:
+        """Chunk code with the tree-sitter grammar, if installed."""
+        grammar = self.grammar_for(file_path)
+        parser = _get_tree_sitter_parser(grammar)
+        query = _get_tree_sitter_query(grammar, self.query)
+        if parser is None or query is None:
+            return self._chunk_without_tree_sitter(content, file_path)
         
-        except SyntaxError as e:
-            logger.warning(f"Syntax error in {file_path}: {e}")
-            # Fall back to simple text chunking
-            return self._fallback_chunk(content, file_path)
+        data = content.encode('utf-8')
+        start = time.perf_counter()
+        tree = parser.parse(data)
+        _add_parse_seconds(time.perf_counter() - start)
+        matches = QueryCursor(query).matches(tree.root_node) if QueryCursor else query.matches(tree.root_node)
+        
+        declarations = {}
+        for _, captures in matches:
+            name_nodes = captures.get("name")
+            for chunk_type, nodes in captures.items():
+                if chunk_type == "name" or chunk_type.startswith("_"):
+                    continue
+                node = nodes[0] if isinstance(nodes, list) else nodes
+                if node.parent is not None and node.parent.type in self.wrapper_types:
+                    node = node.parent
+                name = None
+                if name_nodes:
+                    name_node = name_nodes[0] if isinstance(name_nodes, list) else name_nodes
+                    name = data[name_node.start_byte:name_node.end_byte].decode('utf-8', errors='replace')
+                declarations.setdefault((node.start_byte, node.end_byte), (node, chunk_type, name))
+        
+        # Declarations sorted by start (widest first) nest like brackets: the
+        # innermost open one still covering the current one encloses it
+        parents: Dict[Tuple[int, int], Optional[Tuple[int, int]]] = {}
+        members: Dict[Tuple[int, int], List[Any]] = {}
+        stack: List[Tuple[int, int]] = []
+        for key in sorted(declarations, key=lambda key: (key[0], -key[1])):
+            while stack and stack[-1][1] <= key[0]:
+                stack.pop()
+            if stack and declarations[stack[-1]][1] not in self.container_types:
+                continue
+            parents[key] = stack[-1] if stack else None
+            if stack:
+                members.setdefault(stack[-1], []).append(declarations[key][0])
+            stack.append(key)
+        
+        chunks = []
+        pending_imports = []
+        qualified_names: Dict[Tuple[int, int], str] = {}
+        for key, parent in parents.items():
+            node, chunk_type, name = declarations[key]
+            if chunk_type == "import":
+                if pending_imports and data[pending_imports[-1].end_byte:node.start_byte].strip():
+                    chunks.append(self._import_chunk(pending_imports, data, file_path))
+                    pending_imports = []
+                pending_imports.append(node)
+                continue
+            
+            name = name or "anonymous"
+            metadata = {"name": name, "block_type": chunk_type}
+            if parent is not None:
+                metadata["parent"] = qualified_names[parent]
+                metadata["qualified_name"] = f"{qualified_names[parent]}.{name}"
+            qualified_names[key] = metadata.get("qualified_name", name)
+            nested = [member for member in members.get(key, []) if declarations[
+                (member.start_byte, member.end_byte)][1] != "import"]
+            if nested:
+                metadata["members"] = [declarations[(member.start_byte, member.end_byte)][2] or "anonymous"
+                                       for member in nested]
+            
+            start_byte, start_line = self._leading_start(node, data)
+            chunks.append(self.create_chunk(
+                text=self._text_without(data, start_byte, node.end_byte, members.get(key, [])),
+                file_path=file_path,
+                start_line=start_line + 1,
+                end_line=node.end_point[0] + 1,
+                chunk_type=chunk_type,
+                metadata=metadata
+            ))
+        if pending_imports:
+            chunks.append(self._import_chunk(pending_imports, data, file_path))
         
-        # If no AST chunks found, fall back to simple chunking
         if not chunks:
             return self._fallback_chunk(content, file_path)
         
+        chunks.sort(key=lambda c: (c["meta"]["start_line"], -c["meta"]["end_line"]))
         return chunks
     
-    def _extract_function(self, node: ast.FunctionDef, lines: List[str], 
-                         file_path: str) -> Optional[Dict[str, Any]]:
-        """Extract function definition and docstring."""
-        start_line = node.lineno
-        end_line = node.end_lineno or start_line
-        
-        # Get function text
-        function_lines = lines[start_line-1:end_line]
-        function_text = '\n'.join(function_lines)
-        
-        # Extract docstring if present
-        docstring = ast.get_docstring(node)
-        
-        metadata = {
-            "function_name": node.name,
-            "is_async": isinstance(node, ast.AsyncFunctionDef),
-            "args": [arg.arg for arg in node.args.args],
-            "docstring": docstring
-        }
-        
+    def _leading_start(self, node: Any, data: bytes) -> Tuple[int, int]:
+        """Start byte and row of a declaration including the comments and attributes right above it."""
+        first = node
+        sibling = node.prev_sibling
+        while (sibling is not None and sibling.type in self.leading_types
+               and first.start_point[0] - sibling.end_point[0] <= 1
+               and not data[data.rfind(b'\n', 0, sibling.start_byte) + 1:sibling.start_byte].strip()):
+            first = sibling
+            sibling = sibling.prev_sibling
+        return first.start_byte, first.start_point[0]
+    
+    def _text_without(self, data: bytes, start: int, end: int, members: List[Any]) -> str:
+        """Text of data[start:end] with the members, the lines only they occupy and blank lines above them cut out."""
+        pieces = []
+        position = start
+        for member in members:
+            cut_start, _ = self._leading_start(member, data)
+            cut_end = member.end_byte
+            line_start = data.rfind(b'\n', 0, cut_start) + 1
+            while line_start >= position and not data[line_start:cut_start].strip():
+                cut_start = line_start
+                if cut_start == position:
+                    break
+                line_start = data.rfind(b'\n', 0, cut_start - 1) + 1
+            line_end = data.find(b'\n', cut_end)
+            line_end = len(data) if line_end == -1 else line_end + 1
+            if not data[cut_end:line_end].strip():
+                cut_end = line_end
+            pieces.append(data[position:max(position, cut_start)])
+            position = max(position, cut_end)
+        pieces.append(data[position:max(position, end)])
+        return b''.join(pieces).decode('utf-8', errors='replace')
+    
+    def _import_chunk(self, nodes: List[Any], data: bytes, file_path: str) -> Dict[str, Any]:
+        """Create one chunk for a run of adjacent import statements."""
         return self.create_chunk(
-            text=function_text,
+            text=data[nodes[0].start_byte:nodes[-1].end_byte].decode('utf-8', errors='replace'),
             file_path=file_path,
-            start_line=start_line,
-            end_line=end_line,
-            chunk_type="function",
-            metadata=metadata
+            start_line=nodes[0].start_point[0] + 1,
+            end_line=nodes[-1].end_point[0] + 1,
+            chunk_type="import",
+            metadata={"import_count": len(nodes)}
         )
     
-    def _extract_class(self, node: ast.ClassDef, lines: List[str], 
-                      file_path: str) -> Optional[Dict[str, Any]]:
-        """Extract class definition and docstring."""
-        start_line = node.lineno
-        end_line = node.end_lineno or start_line
-        
-        # Get class text
-        class_lines = lines[start_line-1:end_line]
-        class_text = '\n'.join(class_lines)
+    def _chunk_without_tree_sitter(self, content: str, file_path: str) -> List[Dict[str, Any]]:
+        """Chunk when the grammar is not installed."""
+        return self._fallback_chunk(content, file_path)
+
+
+# Granularity of Python chunks: "module", "class" or "method" (see PythonChunker)
+PYTHON_CHUNK_GRANULARITY = os.getenv("PYTHON_CHUNK_GRANULARITY", "method")
+
+_PYTHON_DEFS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+_PYTHON_IMPORTS = (ast.Import, ast.ImportFrom)
+
+
+class SourceLines:
+    """Lines of a file with prefix sums of their sizes, so the size of any line range is O(1)."""
+    
+    def __init__(self, content: str, sizer: ChunkSizer):
+        self.lines = content.split('\n')
+        self._offsets = [0]
+        for size in sizer.line_sizes(self.lines):
+            self._offsets.append(self._offsets[-1] + size)
+    
+    def size(self, start_line: int, end_line: int) -> int:
+        """Size of lines start_line..end_line (1-based, inclusive)."""
+        return self._offsets[end_line] - self._offsets[start_line - 1]
+    
+    def text(self, start_line: int, end_line: int) -> str:
+        return '\n'.join(self.lines[start_line - 1:end_line])
+
+
+class PythonChunker(BaseChunker):
+    """
+    AST-based chunker for Python files.
+    
+    Walks the module once, top-down, and puts every line in at most one chunk.
+    ``granularity`` is the coarsest unit emitted:
+    
+    - ``module``: the whole file, if it fits in ``max_chunk_size``
+    - ``class``: top-level functions and classes, whole
+    - ``method``: classes as a header chunk (signature, docstring and class
+      attributes, spanning the whole class so methods nest under it) followed
+      by one chunk per method
+    
+    Units that do not fit are split: modules into definitions, classes into
+    methods and functions into parts at statement boundaries. Runs of
+    imports, other module-level statements and functions smaller than
+    ``min_chunk_size`` are merged up to ``max_chunk_size``.
+    """
+    
+    GRANULARITIES = ("module", "class", "method")
+    
+    def __init__(self, max_chunk_size: int = 1000, overlap: int = 100,
+                 granularity: str = PYTHON_CHUNK_GRANULARITY, min_chunk_size: Optional[int] = None,
+                 sizer: Optional[ChunkSizer] = None):
+        super().__init__(max_chunk_size, overlap, sizer)
+        if granularity not in self.GRANULARITIES:
+            raise ValueError(f"Unknown Python chunk granularity {granularity!r}, "
+                             f"expected one of {', '.join(self.GRANULARITIES)}")
+        self.granularity = granularity
+        self.min_chunk_size = self.max_chunk_size // 20 if min_chunk_size is None else min_chunk_size
+    
+    def get_language(self) -> str:
+        return "python"
+    
+    def chunk(self, content: str, file_path: str) -> List[Dict[str, Any]]:
+        """Chunk Python code using AST analysis."""
+        start = time.perf_counter()
+        try:
+            tree = ast.parse(content)
+        except (SyntaxError, ValueError) as e:
+            logger.warning(f"Syntax error in {file_path}: {e}")
+            tree = None
+        _add_parse_seconds(time.perf_counter() - start)
+        if tree is None:
+            # Fall back to simple text chunking
+            return self._fallback_chunk(content, file_path)
         
-        # Extract docstring if present
-        docstring = ast.get_docstring(node)
+        source = SourceLines(content, self.sizer)
+        body = tree.body
+        names = [node.name for node in body if isinstance(node, _PYTHON_DEFS)]
         
-        # Get method names
-        methods = []
-        for item in node.body:
-            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                methods.append(item.name)
+        if (self.granularity == "module" and body and
+                source.size(1, len(source.lines)) <= self.budget):
+            return [self.create_chunk(
+                text=content,
+                file_path=file_path,
+                start_line=1,
+                end_line=body[-1].end_lineno,
+                chunk_type="module",
+                metadata={"names": names, "docstring": ast.get_docstring(tree)}
+            )]
         
-        metadata = {
-            "class_name": node.name,
-            "base_classes": [base.id if isinstance(base, ast.Name) else str(base) 
-                           for base in node.bases],
-            "methods": methods,
-            "docstring": docstring
-        }
+        chunks = []
         
-        return self.create_chunk(
-            text=class_text,
-            file_path=file_path,
-            start_line=start_line,
-            end_line=end_line,
-            chunk_type="class",
-            metadata=metadata
-        )
-    
-    def _extract_import(self, node: ast.Import, lines: List[str], 
-                       file_path: str) -> Optional[Dict[str, Any]]:
-        """Extract import statement."""
-        line_num = node.lineno
-        import_text = lines[line_num-1]
+        # Module-level docstring
+        if (body and isinstance(body[0], ast.Expr) and 
+            isinstance(body[0].value, ast.Constant) and 
+            isinstance(body[0].value.value, str)):
+            
+            docstring_node = body[0]
+            chunks.append(self.create_chunk(
+                text=docstring_node.value.value,
+                file_path=file_path,
+                start_line=docstring_node.lineno,
+                end_line=docstring_node.end_lineno or docstring_node.lineno,
+                chunk_type="module_docstring"
+            ))
+            body = body[1:]
         
-        modules = [alias.name for alias in node.names]
+        self._chunk_statements(body, source, file_path, chunks)
         
-        metadata = {
-            "import_type": "import",
-            "modules": modules
-        }
+        # If no AST chunks found, fall back to simple chunking
+        if not chunks:
+            return self._fallback_chunk(content, file_path)
         
-        return self.create_chunk(
-            text=import_text,
-            file_path=file_path,
-            start_line=line_num,
-            end_line=line_num,
-            chunk_type="import",
-            metadata=metadata
-        )
+        return chunks
     
-    def _extract_import_from(self, node: ast.ImportFrom, lines: List[str], 
-                           file_path: str) -> Optional[Dict[str, Any]]:
-        """Extract from-import statement."""
-        line_num = node.lineno
-        import_text = lines[line_num-1]
+    def _chunk_statements(self, statements: List[ast.stmt], source: SourceLines, file_path: str,
+                          chunks: List[Dict[str, Any]], parent: Optional[str] = None):
+        """Chunk sibling statements, merging runs of small ones of the same kind."""
+        run_kind, run = None, []
         
-        module = node.module or ""
-        names = [alias.name for alias in node.names]
+        for node in statements:
+            if isinstance(node, ast.ClassDef):
+                kind = None
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                start, end = self._span(node, source)
+                kind = "function" if source.size(start, end) < self.min_chunk_size else None
+            elif isinstance(node, _PYTHON_IMPORTS):
+                kind = "import"
+            else:
+                kind = "code"
+            
+            if run and kind != run_kind:
+                self._chunk_run(run_kind, run, source, file_path, chunks, parent)
+                run = []
+            if kind is not None:
+                run_kind = kind
+                run.append(node)
+            elif isinstance(node, ast.ClassDef):
+                self._chunk_class(node, source, file_path, chunks, parent)
+            else:
+                self._chunk_function(node, source, file_path, chunks, parent)
         
+        if run:
+            self._chunk_run(run_kind, run, source, file_path, chunks, parent)
+    
+    def _chunk_run(self, kind: str, nodes: List[ast.stmt], source: SourceLines, file_path: str,
+                   chunks: List[Dict[str, Any]], parent: Optional[str]):
+        """Emit a run of small sibling statements packed into as few chunks as fit."""
+        spans = [self._span(node, source) for node in nodes]
+        for start, end, indexes in self._pack(spans, source):
+            group = [nodes[i] for i in indexes]
+            if kind == "function" and len(group) == 1:
+                self._chunk_function(group[0], source, file_path, chunks, parent)
+                continue
+            
+            if kind == "import":
+                chunk_type = "import"
+                metadata = {
+                    "modules": [module for node in group for module in self._imported_modules(node)],
+                    "import_count": len(group)
+                }
+            elif kind == "function":
+                chunk_type = "functions"
+                metadata = {"function_names": [node.name for node in group]}
+            else:
+                chunk_type = "class_body" if parent else "module_code"
+                metadata = {}
+            if parent:
+                metadata["parent"] = parent
+            
+            chunks.append(self.create_chunk(
+                text=source.text(start, end),
+                file_path=file_path,
+                start_line=start,
+                end_line=end,
+                chunk_type=chunk_type,
+                metadata=metadata
+            ))
+    
+    def _chunk_class(self, node: ast.ClassDef, source: SourceLines, file_path: str,
+                     chunks: List[Dict[str, Any]], parent: Optional[str]):
+        """Emit a class whole, or as a header chunk followed by its members."""
+        start, end = self._span(node, source)
+        qualified_name = f"{parent}.{node.name}" if parent else node.name
         metadata = {
-            "import_type": "from_import",
-            "module": module,
-            "names": names
+            "class_name": node.name,
+            "base_classes": [ast.unparse(base) for base in node.bases],
+            "methods": [item.name for item in node.body 
+                       if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))],
+            "docstring": ast.get_docstring(node)
         }
+        if parent:
+            metadata["parent"] = parent
         
-        return self.create_chunk(
-            text=import_text,
-            file_path=file_path,
-            start_line=line_num,
-            end_line=line_num,
-            chunk_type="import",
-            metadata=metadata
-        )
+        first_def = next((i for i, item in enumerate(node.body) if isinstance(item, _PYTHON_DEFS)), None)
+        fits = source.size(start, end) <= self.budget
+        if first_def is None or (fits and self.granularity != "method"):
+            if fits:
+                chunks.append(self.create_chunk(source.text(start, end), file_path, start, end,
+                                                "class", metadata))
+            else:
+                for part_start, part_end in self._line_windows(start, end, source):
+                    chunks.append(self.create_chunk(source.text(part_start, part_end), file_path,
+                                                    part_start, part_end, "class", metadata))
+            return
+        
+        # Header up to the first nested definition; the header chunk spans the
+        # whole class so that its members nest under it
+        header_end = self._span(node.body[first_def], source)[0] - 1
+        chunks.append(self.create_chunk(source.text(start, header_end), file_path, start, end,
+                                        "class", metadata))
+        self._chunk_statements(node.body[first_def:], source, file_path, chunks, qualified_name)
     
-    def _fallback_chunk(self, content: str, file_path: str) -> List[Dict[str, Any]]:
-        """Fallback to simple text chunking."""
-        chunks = []
-        lines = content.split('\n')
+    def _chunk_function(self, node: ast.FunctionDef, source: SourceLines, file_path: str,
+                        chunks: List[Dict[str, Any]], parent: Optional[str]):
+        """Emit a function whole, or in parts split at statement boundaries."""
+        start, end = self._span(node, source)
+        metadata = {
+            "function_name": node.name,
+            "is_async": isinstance(node, ast.AsyncFunctionDef),
+            "args": [arg.arg for arg in node.args.args],
+            "docstring": ast.get_docstring(node)
+        }
+        if parent:
+            metadata["parent"] = parent
+            metadata["qualified_name"] = f"{parent}.{node.name}"
         
-        current_chunk = []
-        current_size = 0
-        start_line = 1
+        if source.size(start, end) <= self.budget:
+            chunks.append(self.create_chunk(source.text(start, end), file_path, start, end,
+                                            "function", metadata))
+            return
         
-        for i, line in enumerate(lines, 1):
-            line_size = len(line)
-            
-            if current_size + line_size > self.max_chunk_size and current_chunk:
-                # Create chunk
-                chunk_text = '\n'.join(current_chunk)
-                chunk = self.create_chunk(
-                    text=chunk_text,
-                    file_path=file_path,
-                    start_line=start_line,
-                    end_line=i-1,
-                    chunk_type="text_block"
-                )
-                chunks.append(chunk)
-                
-                # Start new chunk with overlap
-                overlap_lines = current_chunk[-self.overlap//20:] if current_chunk else []
-                current_chunk = overlap_lines + [line]
-                current_size = sum(len(l) for l in current_chunk)
-                start_line = i - len(overlap_lines)
-            else:
-                current_chunk.append(line)
-                current_size += line_size
+        # The signature (and docstring) go with the first statement
+        spans = [(node.body[0].lineno, node.body[0].end_lineno)]
+        spans += [self._span(stmt, source) for stmt in node.body[1:]]
+        spans[0] = (start, spans[0][1])
+        parts = [(part_start, part_end) for part_start, part_end, _ in self._pack(spans, source)]
         
-        # Add final chunk
-        if current_chunk:
-            chunk_text = '\n'.join(current_chunk)
-            chunk = self.create_chunk(
-                text=chunk_text,
+        for i, (part_start, part_end) in enumerate(parts, 1):
+            chunks.append(self.create_chunk(
+                text=source.text(part_start, part_end),
                 file_path=file_path,
-                start_line=start_line,
-                end_line=len(lines),
-                chunk_type="text_block"
-            )
-            chunks.append(chunk)
+                start_line=part_start,
+                end_line=part_end,
+                chunk_type="function",
+                metadata={**metadata, "part": i, "parts": len(parts)}
+            ))
+    
+    def _span(self, node: ast.stmt, source: SourceLines) -> Tuple[int, int]:
+        """Line range of a statement including its decorators and leading comments."""
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        while start > 1 and source.lines[start - 2].lstrip().startswith('#'):
+            start -= 1
+        return start, node.end_lineno or node.lineno
+    
+    def _pack(self, spans: List[Tuple[int, int]], source: SourceLines) -> List[Tuple[int, int, List[int]]]:
+        """
+        Group consecutive spans into ranges of at most max_chunk_size.
         
-        return chunks
+        Returns (start_line, end_line, span indexes) per group; a span that is
+        too large on its own is split into line windows.
+        """
+        groups = []
+        current = None
+        for i, (start, end) in enumerate(spans):
+            if current and source.size(current[0], end) <= self.budget:
+                current[1] = end
+                current[2].append(i)
+                continue
+            if current:
+                groups.append(tuple(current))
+                current = None
+            if source.size(start, end) <= self.budget:
+                current = [start, end, [i]]
+            else:
+                groups.extend((w_start, w_end, [i]) for w_start, w_end in self._line_windows(start, end, source))
+        if current:
+            groups.append(tuple(current))
+        return groups
+    
+    def _line_windows(self, start: int, end: int, source: SourceLines) -> List[Tuple[int, int]]:
+        """Split a line range into consecutive windows of at most max_chunk_size."""
+        sizes = [source.size(line, line) for line in range(start, end + 1)]
+        return [(start + first, start + last - 1) for first, last in self._windows(sizes)]
+    
+    @staticmethod
+    def _imported_modules(node: ast.stmt) -> List[str]:
+        if isinstance(node, ast.ImportFrom):
+            return ["." * node.level + (node.module or "")]
+        return [alias.name for alias in node.names]
 
+    # Module granularity keeps the imports in the single module chunk
+    import_chunk_types = frozenset({"import", "module"})
 
-class JavaScriptChunker(BaseChunker):
-    """Regex-based chunker for JavaScript/TypeScript files."""
-    
-    def __init__(self, max_chunk_size: int = 1000, overlap: int = 100):
-        super().__init__(max_chunk_size, overlap)
+    def _parse_imports(self, text: str) -> List[Dict[str, Any]]:
+        body = _parse_python_chunk(text) or []
+        imports = []
+        for node in body:
+            if isinstance(node, ast.ImportFrom):
+                imports.append({
+                    "module": self._imported_modules(node)[0],
+                    "names": [alias.name for alias in node.names if alias.name != "*"]
+                })
+            elif isinstance(node, ast.Import):
+                imports.extend({"module": alias.name, "names": []} for alias in node.names)
+        return imports
+
+
+# Tokens the brace scanner stops at; everything in between is skipped by the regex engine
+_JS_CODE_TOKEN = re.compile(r'[{}"\'`]|//|/\*')
+_JS_TEMPLATE_TOKEN = re.compile(r'[`\\]|\$\{')
+_JS_STRING_BODY = {
+    '"': re.compile(r'[^"\\\n]*(?:\\.[^"\\\n]*)*', re.DOTALL),
+    "'": re.compile(r"[^'\\\n]*(?:\\.[^'\\\n]*)*", re.DOTALL),
+}
+
+
+def _scan_js_code(content: str, pos: int, depth: int = 0) -> int:
+    """
+    Find the end of a brace-delimited JavaScript region.
+
+    Scans from ``pos`` with ``depth`` braces already open and returns the
+    offset just past the brace that closes them, or -1 if they never close.
+    Braces inside strings, comments and template literals are ignored, and
+    ``${...}`` expressions in templates are scanned recursively.
+    """
+    length = len(content)
+    while pos < length:
+        match = _JS_CODE_TOKEN.search(content, pos)
+        if not match:
+            return -1
+        token = match.group(0)
+        pos = match.end()
         
-        # Regex patterns for JS/TS constructs
-        self.function_pattern = re.compile(
-            r'(?:export\s+)?(?:async\s+)?function\s+(\w+)\s*\([^)]*\)\s*{',
-            re.MULTILINE
-        )
-        self.arrow_function_pattern = re.compile(
-            r'(?:const|let|var)\s+(\w+)\s*=\s*(?:async\s+)?\([^)]*\)\s*=>\s*{',
-            re.MULTILINE
-        )
-        self.class_pattern = re.compile(
-            r'(?:export\s+)?class\s+(\w+)(?:\s+extends\s+\w+)?\s*{',
-            re.MULTILINE
-        )
-        self.import_pattern = re.compile(
-            r'import\s+.*?from\s+[\'"][^\'"]+[\'"];?',
-            re.MULTILINE
-        )
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+            if depth == 0:
+                return pos
+        elif token == '//':
+            newline = content.find('\n', pos)
+            pos = length if newline == -1 else newline + 1
+        elif token == '/*':
+            comment_end = content.find('*/', pos)
+            pos = length if comment_end == -1 else comment_end + 2
+        elif token == '`':
+            pos = _scan_js_template(content, pos)
+            if pos == -1:
+                return -1
+        else:
+            # String literal: skip the body and the closing quote (or newline)
+            pos = _JS_STRING_BODY[token].match(content, pos).end() + 1
+    return -1
+
+
+def _scan_js_template(content: str, pos: int) -> int:
+    """Return the offset just past the backtick closing a template literal started before ``pos``."""
+    while True:
+        match = _JS_TEMPLATE_TOKEN.search(content, pos)
+        if not match:
+            return -1
+        token = match.group(0)
+        if token == '`':
+            return match.end()
+        if token == '\\':
+            pos = match.end() + 1
+        else:
+            pos = _scan_js_code(content, match.end(), depth=1)
+            if pos == -1:
+                return -1
+
+
+_JS_QUERY = """
+(import_statement) @import
+(function_declaration name: (identifier) @name) @function
+(generator_function_declaration name: (identifier) @name) @function
+(class_declaration name: (_) @name) @class
+(lexical_declaration (variable_declarator name: (identifier) @name value: (arrow_function))) @arrow_function
+(variable_declaration (variable_declarator name: (identifier) @name value: (arrow_function))) @arrow_function
+(lexical_declaration (variable_declarator name: (identifier) @name value: (function_expression))) @function
+(variable_declaration (variable_declarator name: (identifier) @name value: (function_expression))) @function
+(lexical_declaration (variable_declarator value: [
+  (call_expression function: (identifier) @_require arguments: (arguments (string)))
+  (member_expression object: (call_expression function: (identifier) @_require arguments: (arguments (string))))
+]) (#eq? @_require "require")) @import
+(variable_declaration (variable_declarator value: [
+  (call_expression function: (identifier) @_require arguments: (arguments (string)))
+  (member_expression object: (call_expression function: (identifier) @_require arguments: (arguments (string))))
+]) (#eq? @_require "require")) @import
+(expression_statement (call_expression function: (identifier) @_require arguments: (arguments (string)))
+  (#eq? @_require "require")) @import
+"""
+
+# Import statements and require() calls; the clause holds the imported names,
+# as does the object pattern a require() call is destructured into
+_JS_IMPORT = re.compile(
+    r'''\bimport\s+(?:type\s+)?(?:(?P<clause>[\w$*{}\s,]+?)\s+from\s+)?['"](?P<module>[^'"\n]+)['"]'''
+    r'''|(?:\{(?P<destructured>[^{}]*)\}\s*=\s*)?\brequire\(\s*['"](?P<required>[^'"\n]+)['"]\s*\)'''
+)
+_JS_NAMED_IMPORTS = re.compile(r'\{([^}]*)\}')
+
+_TS_QUERY = _JS_QUERY + """
+(abstract_class_declaration name: (_) @name) @class
+(interface_declaration name: (_) @name) @interface
+(type_alias_declaration name: (_) @name) @type
+(enum_declaration name: (_) @name) @enum
+"""
+
+
+class JavaScriptChunker(TreeSitterChunker):
+    """
+    Chunker for JavaScript files.
+
+    Uses the tree-sitter grammar when installed and falls back to regex
+    patterns with a brace scanner otherwise.
+    """
+    
+    grammar = "javascript"
+    query = _JS_QUERY
+    wrapper_types = frozenset({"export_statement"})
+    
+    # Regex patterns for JS/TS constructs, compiled once per process
+    function_pattern = re.compile(
+        r'(?:export\s+)?(?:async\s+)?function\s+(\w+)\s*\([^)]*\)\s*{',
+        re.MULTILINE
+    )
+    arrow_function_pattern = re.compile(
+        r'(?:const|let|var)\s+(\w+)\s*=\s*(?:async\s+)?\([^)]*\)\s*=>\s*{',
+        re.MULTILINE
+    )
+    class_pattern = re.compile(
+        r'(?:export\s+)?class\s+(\w+)(?:\s+extends\s+\w+)?\s*{',
+        re.MULTILINE
+    )
+    import_pattern = re.compile(
+        r'import\s+.*?from\s+[\'"][^\'"]+[\'"];?'
+        r'|^(?:const|let|var)\s+[\w${}\s,:]+=\s*require\(\s*[\'"][^\'"]+[\'"]\s*\)[\w.$]*;?',
+        re.MULTILINE
+    )
     
     def get_language(self) -> str:
         return "javascript"
     
-    def chunk(self, content: str, file_path: str) -> List[Dict[str, Any]]:
+    def _parse_imports(self, text: str) -> List[Dict[str, Any]]:
+        imports = []
+        for match in _JS_IMPORT.finditer(text):
+            clause = match.group('clause') or ""
+            names = []
+            named = _JS_NAMED_IMPORTS.search(clause)
+            if named:
+                for part in named.group(1).split(','):
+                    name = part.split(' as ')[0].strip()
+                    name = name[5:].strip() if name.startswith('type ') else name
+                    if name:
+                        names.append(name)
+                clause = clause[:named.start()] + clause[named.end():]
+            # Default imports; namespace imports (* as ns) import the whole module
+            names.extend(part.strip() for part in clause.split(',')
+                         if part.strip() and not part.strip().startswith('*'))
+            # const { a, b: alias } = require(...)
+            for part in (match.group('destructured') or "").split(','):
+                name = part.split(':')[0].strip()
+                if name and not name.startswith('...'):
+                    names.append(name)
+            imports.append({"module": match.group('module') or match.group('required'), "names": names})
+        return imports
+    
+    def _chunk_without_tree_sitter(self, content: str, file_path: str) -> List[Dict[str, Any]]:
         """Chunk JavaScript/TypeScript code using regex patterns."""
         chunks = []
-        lines = content.split('\n')
+        line_index = LineIndex(content)
         
         # Extract imports
         for match in self.import_pattern.finditer(content):
-            start_pos = match.start()
-            end_pos = match.end()
-            start_line = content[:start_pos].count('\n') + 1
-            end_line = content[:end_pos].count('\n') + 1
+            start_line = line_index.line_of(match.start())
+            end_line = line_index.line_of(match.end())
             
             chunk = self.create_chunk(
                 text=match.group(0),
@@ -322,7 +1121,7 @@ class JavaScriptChunker(BaseChunker):
             (self.class_pattern, "class")
         ]:
             for match in pattern.finditer(content):
-                function_chunk = self._extract_block(match, content, file_path, chunk_type)
+                function_chunk = self._extract_block(match, content, file_path, chunk_type, line_index)
                 if function_chunk:
                     chunks.append(function_chunk)
         
@@ -333,29 +1132,18 @@ class JavaScriptChunker(BaseChunker):
         return chunks
     
     def _extract_block(self, match: re.Match, content: str, file_path: str, 
-                      chunk_type: str) -> Optional[Dict[str, Any]]:
+                      chunk_type: str, line_index: Optional[LineIndex] = None) -> Optional[Dict[str, Any]]:
         """Extract a code block starting from a regex match."""
+        line_index = line_index or LineIndex(content)
         start_pos = match.start()
-        start_line = content[:start_pos].count('\n') + 1
-        
-        # Find the matching closing brace
-        brace_count = 0
-        pos = match.end() - 1  # Start from the opening brace
-        
-        while pos < len(content):
-            if content[pos] == '{':
-                brace_count += 1
-            elif content[pos] == '}':
-                brace_count -= 1
-                if brace_count == 0:
-                    break
-            pos += 1
+        start_line = line_index.line_of(start_pos)
         
-        if brace_count != 0:
+        # Find the matching closing brace, starting from the opening brace
+        end_pos = _scan_js_code(content, match.end() - 1)
+        if end_pos == -1:
             return None  # Unmatched braces
         
-        end_pos = pos + 1
-        end_line = content[:end_pos].count('\n') + 1
+        end_line = line_index.line_of(end_pos)
         
         block_text = content[start_pos:end_pos]
         
@@ -373,93 +1161,241 @@ class JavaScriptChunker(BaseChunker):
             metadata=metadata
         )
     
-    def _fallback_chunk(self, content: str, file_path: str) -> List[Dict[str, Any]]:
-        """Fallback to simple text chunking."""
-        # Similar to Python fallback but simpler
-        chunks = []
-        lines = content.split('\n')
-        
-        for i in range(0, len(lines), self.max_chunk_size // 50):
-            chunk_lines = lines[i:i + self.max_chunk_size // 50]
-            if chunk_lines:
-                chunk_text = '\n'.join(chunk_lines)
-                chunk = self.create_chunk(
-                    text=chunk_text,
-                    file_path=file_path,
-                    start_line=i + 1,
-                    end_line=min(i + len(chunk_lines), len(lines)),
-                    chunk_type="text_block"
-                )
-                chunks.append(chunk)
-        
-        return chunks
+
+class TypeScriptChunker(JavaScriptChunker):
+    """Tree-sitter chunker for TypeScript and TSX files."""
+    
+    grammar = "typescript"
+    query = _TS_QUERY
+    
+    def get_language(self) -> str:
+        return "typescript"
+    
+    def grammar_for(self, file_path: str) -> str:
+        return "tsx" if file_path.lower().endswith('.tsx') else "typescript"
+
+
+class GoChunker(TreeSitterChunker):
+    """Tree-sitter chunker for Go files."""
+    
+    grammar = "go"
+    query = """
+(import_declaration) @import
+(function_declaration name: (identifier) @name) @function
+(method_declaration name: (field_identifier) @name) @method
+(type_declaration (type_spec name: (type_identifier) @name)) @type
+"""
+    
+    def get_language(self) -> str:
+        return "go"
+    
+    def _parse_imports(self, text: str) -> List[Dict[str, Any]]:
+        # Go imports whole packages by path
+        return [{"module": module, "names": []} for module in re.findall(r'"([^"\n]+)"', text)]
+
+
+class RustChunker(TreeSitterChunker):
+    """Tree-sitter chunker for Rust files."""
+    
+    grammar = "rust"
+    query = """
+(use_declaration) @import
+(function_item name: (identifier) @name) @function
+(struct_item name: (type_identifier) @name) @struct
+(enum_item name: (type_identifier) @name) @enum
+(trait_item name: (type_identifier) @name) @trait
+(impl_item type: (_) @name) @impl
+(mod_item name: (identifier) @name) @module
+(macro_definition name: (identifier) @name) @macro
+"""
+    container_types = frozenset({"impl", "trait", "module"})
+    leading_types = frozenset({"line_comment", "block_comment", "attribute_item"})
+    
+    def get_language(self) -> str:
+        return "rust"
+    
+    def _parse_imports(self, text: str) -> List[Dict[str, Any]]:
+        imports = []
+        for path in re.findall(r'\buse\s+([^;]+);', text):
+            path = re.sub(r'\s+', '', re.sub(r'\s+as\s+\w+', '', path))
+            if '::{' in path:
+                module, items = path.split('::{', 1)
+                names = [item.split('::')[-1].strip('{}') for item in items.split(',')]
+            elif '::' in path:
+                module, name = path.rsplit('::', 1)
+                names = [name]
+            else:
+                module, names = path, []
+            imports.append({"module": module, "names": [name for name in names if name not in ('', '*', 'self')]})
+        return imports
+
+
+class JavaChunker(TreeSitterChunker):
+    """Tree-sitter chunker for Java files."""
+    
+    grammar = "java"
+    query = """
+(import_declaration) @import
+(class_declaration name: (identifier) @name) @class
+(interface_declaration name: (identifier) @name) @interface
+(enum_declaration name: (identifier) @name) @enum
+(record_declaration name: (identifier) @name) @class
+(method_declaration name: (identifier) @name) @method
+(constructor_declaration name: (identifier) @name) @constructor
+"""
+    container_types = frozenset({"class", "interface", "enum"})
+    leading_types = frozenset({"line_comment", "block_comment"})
+    
+    def get_language(self) -> str:
+        return "java"
+    
+    def _parse_imports(self, text: str) -> List[Dict[str, Any]]:
+        imports = []
+        for path in re.findall(r'\bimport\s+(?:static\s+)?([\w.]+(?:\.\*)?)\s*;', text):
+            module, name = path.rsplit('.', 1) if '.' in path else ("", path)
+            imports.append({"module": module, "names": [] if name == '*' else [name]})
+        return imports
+
+
+# One pass over a Markdown file finds ATX headings and code fences; everything
+# else is skipped by the regex engine
+_MD_LINE = re.compile(
+    r'^[ \t]{0,3}(?:(?P<hashes>#{1,6})[ \t]+(?P<heading>\S[^\n]*)|(?P<fence>`{3,}|~{3,})(?P<info>[^\n]*))',
+    re.MULTILINE
+)
+_MD_BLANK_LINE = re.compile(r'^[ \t]*$', re.MULTILINE)
+_NON_SPACE = re.compile(r'\S')
 
 
 class MarkdownChunker(BaseChunker):
-    """Chunker for Markdown files based on headings and paragraphs."""
+    """
+    Chunker for Markdown files based on headings and paragraphs.
+    
+    A single scan tracks fenced code blocks, so ``#`` lines inside code are
+    not taken as headings. Sections larger than max_chunk_size are split
+    into parts at blank lines outside code blocks.
+    """
     
     def get_language(self) -> str:
         return "markdown"
     
     def chunk(self, content: str, file_path: str) -> List[Dict[str, Any]]:
         """Chunk Markdown content by headings and paragraphs."""
-        chunks = []
-        lines = content.split('\n')
-        
-        current_section = []
-        current_heading = None
-        current_level = 0
-        start_line = 1
+        # Sections are [heading, level, start, end, fences]; fences are
+        # (start, end, info language) of each code block
+        sections = []
+        current = [None, 0, 0, None, []]
+        fence = None
         
-        for i, line in enumerate(lines, 1):
-            # Check if line is a heading
-            heading_match = re.match(r'^(#{1,6})\s+(.+)$', line.strip())
+        for match in _MD_LINE.finditer(content):
+            marker = match.group('fence')
+            if fence is not None:
+                # Inside a code block only a matching closing fence counts
+                if (marker and marker[0] == fence[0] and len(marker) >= len(fence)
+                        and not match.group('info').strip()):
+                    current[4][-1][1] = match.end()
+                    fence = None
+                continue
             
-            if heading_match:
-                # Save previous section
-                if current_section:
-                    chunk = self._create_markdown_chunk(
-                        current_section, file_path, start_line, i-1,
-                        current_heading, current_level
-                    )
-                    chunks.append(chunk)
-                
-                # Start new section
-                level = len(heading_match.group(1))
-                heading_text = heading_match.group(2)
-                
-                current_section = [line]
-                current_heading = heading_text
-                current_level = level
-                start_line = i
+            if marker:
+                info = match.group('info').strip()
+                if marker[0] == '`' and '`' in info:
+                    continue  # inline code, not a fence
+                fence = marker
+                # Unclosed fences run to the end of the file
+                current[4].append([match.start(), len(content), info.split()[0] if info else None])
             else:
-                current_section.append(line)
+                current[3] = match.start()
+                sections.append(current)
+                current = [self._heading_text(match.group('heading')), len(match.group('hashes')),
+                           match.start(), None, []]
         
-        # Add final section
-        if current_section:
-            chunk = self._create_markdown_chunk(
-                current_section, file_path, start_line, len(lines),
-                current_heading, current_level
-            )
-            chunks.append(chunk)
+        current[3] = len(content)
+        sections.append(current)
+        
+        # Chunks are emitted in file order, so line numbers are counted forward
+        position, line = 0, 1
+        
+        def line_of(pos: int) -> int:
+            nonlocal position, line
+            line += content.count('\n', position, pos)
+            position = pos
+            return line
+        
+        chunks = []
+        for heading, level, start, end, fences in sections:
+            if not _NON_SPACE.search(content, start, end):
+                continue
+            parts = self._split_section(content, start, end, fences)
+            for i, (part_start, part_end) in enumerate(parts, 1):
+                metadata = {"part": i, "parts": len(parts)} if len(parts) > 1 else None
+                chunks.append(self._create_markdown_chunk(
+                    content[part_start:part_end], file_path,
+                    line_of(part_start), line_of(max(part_start, part_end - 1)),
+                    heading, level,
+                    [language for offset, _, language in fences if part_start <= offset < part_end],
+                    metadata
+                ))
         
         return chunks
     
-    def _create_markdown_chunk(self, lines: List[str], file_path: str,
+    @staticmethod
+    def _heading_text(text: str) -> str:
+        """Heading text without trailing whitespace or an optional closing # sequence."""
+        text = text.rstrip()
+        stripped = text.rstrip('#')
+        if stripped != text and (not stripped or stripped[-1] in ' \t'):
+            text = stripped.rstrip()
+        return text
+    
+    def _split_section(self, content: str, start: int, end: int,
+                       fences: List[List[Any]]) -> List[Tuple[int, int]]:
+        """Split a section over the budget at blank lines, packing paragraphs into parts."""
+        if self.sizer.size_of(content, start, end) <= self.budget:
+            return [(start, end)]
+        
+        breaks = [match.start() for match in _MD_BLANK_LINE.finditer(content, start, end)
+                  if not any(fence_start < match.start() < fence_end for fence_start, fence_end, _ in fences)]
+        bounds = [start] + breaks + [end]
+        parts = []
+        part_start, part_size = start, 0
+        for block_start, block_end in zip(bounds, bounds[1:]):
+            size = self.sizer.size_of(content, block_start, block_end)
+            if part_size and part_size + size > self.budget:
+                parts.append((part_start, block_start))
+                part_start, part_size = block_start, 0
+            part_size += size
+        parts.append((part_start, end))
+        
+        # Paragraphs (or code blocks) that are too large on their own are split at lines
+        fitted = []
+        for part_start, part_end in parts:
+            if self.sizer.size_of(content, part_start, part_end) <= self.budget:
+                fitted.append((part_start, part_end))
+                continue
+            lines = content[part_start:part_end].split('\n')
+            offsets = [part_start]
+            for line in lines:
+                offsets.append(offsets[-1] + len(line) + 1)
+            fitted.extend((offsets[first], min(offsets[last], part_end))
+                          for first, last in self._windows(self.sizer.line_sizes(lines)))
+        return [(s, e) for s, e in fitted if _NON_SPACE.search(content, s, e)]
+    
+    def _create_markdown_chunk(self, text: str, file_path: str,
                               start_line: int, end_line: int,
-                              heading: Optional[str], level: int) -> Dict[str, Any]:
+                              heading: Optional[str], level: int,
+                              code_languages: List[Optional[str]],
+                              metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Create a markdown chunk with metadata."""
-        text = '\n'.join(lines).strip()
+        text = text.strip()
         
-        # Extract code blocks
-        code_blocks = re.findall(r'```(\w+)?\n(.*?)\n```', text, re.DOTALL)
-        
-        metadata = {
+        chunk_metadata = {
             "heading": heading,
             "heading_level": level,
-            "has_code": len(code_blocks) > 0,
-            "code_languages": [lang for lang, _ in code_blocks if lang],
-            "word_count": len(text.split())
+            "has_code": len(code_languages) > 0,
+            "code_languages": [language for language in code_languages if language],
+            "word_count": len(text.split()),
+            **(metadata or {})
         }
         
         chunk_type = "heading" if heading else "paragraph"
@@ -470,40 +1406,433 @@ class MarkdownChunker(BaseChunker):
             start_line=start_line,
             end_line=end_line,
             chunk_type=chunk_type,
-            metadata=metadata
+            metadata=chunk_metadata
         )
 
 
+class DataFileChunker(BaseChunker):
+    """
+    Base class for structured data files (JSON, YAML, TOML).
+
+    Files are split into sections at top-level keys (tables for TOML),
+    oversized sections are split at their nested keys where the format
+    allows, and small adjacent sections are merged up to max_chunk_size.
+    """
+    
+    def chunk(self, content: str, file_path: str) -> List[Dict[str, Any]]:
+        """Chunk a data file by its key structure."""
+        try:
+            sections = self._sections(content)
+        except (ValueError, IndexError) as e:
+            logger.warning(f"Could not parse {file_path} as {self.get_language()}: {e}")
+            sections = []
+        
+        if not sections:
+            return self._fallback_chunk(content, file_path)
+        
+        line_index = LineIndex(content)
+        chunks = []
+        for keys, start, end in self._group(content, sections):
+            text = content[start:end]
+            if not text.strip():
+                continue
+            chunks.append(self.create_chunk(
+                text=text,
+                file_path=file_path,
+                start_line=line_index.line_of(start),
+                end_line=line_index.line_of(max(start, end - 1)),
+                chunk_type="data_section",
+                metadata={"name": keys[0], "keys": keys}
+            ))
+        return chunks or self._fallback_chunk(content, file_path)
+    
+    @abstractmethod
+    def _sections(self, content: str) -> List[Tuple[str, int, int]]:
+        """Split content into (key, start offset, end offset) sections in file order."""
+        pass
+    
+    def _group(self, content: str, sections: List[Tuple[str, int, int]]) -> List[Tuple[List[str], int, int]]:
+        """Merge adjacent sections while they fit in max_chunk_size."""
+        groups = []
+        group_size = 0
+        for key, start, end in sections:
+            # Measured from the end of the group so the separators in between count too
+            extra = self.sizer.size_of(content, groups[-1][2], end) if groups else 0
+            if groups and group_size + extra <= self.budget:
+                groups[-1][0].append(key)
+                groups[-1][2] = end
+                group_size += extra
+            else:
+                groups.append([[key], start, end])
+                group_size = self.sizer.size_of(content, start, end)
+        return [(keys, start, end) for keys, start, end in groups]
+    
+    def _line_sections(self, content: str, header: "re.Pattern") -> List[Tuple[Optional[str], int, int]]:
+        """Sections from each header line to the next; leading lines join the first."""
+        matches = list(header.finditer(content))
+        sections = []
+        for i, match in enumerate(matches):
+            start = 0 if i == 0 else match.start()
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+            sections.append((self._section_name(match), start, end))
+        return sections
+    
+    def _section_name(self, match: re.Match) -> Optional[str]:
+        """Get the key named by a header line."""
+        return match.group('name').strip().strip('"\'')
+
+
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class JSONChunker(DataFileChunker):
+    """Chunker for JSON files, split at object members / array elements."""
+    
+    def get_language(self) -> str:
+        return "json"
+    
+    def _sections(self, content: str) -> List[Tuple[str, int, int]]:
+        pos = _JSON_WHITESPACE.match(content).end()
+        if pos >= len(content) or content[pos] not in '{[':
+            return []
+        return self._members(content, pos, "")
+    
+    def _members(self, content: str, pos: int, prefix: str) -> List[Tuple[str, int, int]]:
+        """Get the members of the object or array starting at ``pos``, expanding oversized ones."""
+        decoder = json.JSONDecoder()
+        is_object = content[pos] == '{'
+        closing = '}' if is_object else ']'
+        sections = []
+        index = 0
+        pos += 1
+        while True:
+            pos = _JSON_WHITESPACE.match(content, pos).end()
+            if content[pos] == closing:
+                return sections
+            
+            start = pos
+            if is_object:
+                key, pos = json.decoder.scanstring(content, pos + 1)
+                pos = _JSON_WHITESPACE.match(content, pos).end()
+                if content[pos] != ':':
+                    raise ValueError(f"Expected ':' at offset {pos}")
+                pos = _JSON_WHITESPACE.match(content, pos + 1).end()
+                name = f"{prefix}.{key}" if prefix else key
+            else:
+                name = f"{prefix}[{index}]"
+            
+            value_start = pos
+            _, pos = decoder.raw_decode(content, pos)
+            if content[value_start] in '{[' and self.sizer.size_of(content, start, pos) > self.budget:
+                sections.extend(self._members(content, value_start, name) or [(name, start, pos)])
+            else:
+                sections.append((name, start, pos))
+            
+            pos = _JSON_WHITESPACE.match(content, pos).end()
+            if content[pos] == ',':
+                pos += 1
+            index += 1
+
+
+class YAMLChunker(DataFileChunker):
+    """Chunker for YAML files, split at top-level keys, list items and documents."""
+    
+    def get_language(self) -> str:
+        return "yaml"
+    
+    def _sections(self, content: str) -> List[Tuple[str, int, int]]:
+        return self._at_indent(content, 0, len(content), "", 0)
+    
+    def _at_indent(self, content: str, start: int, end: int, prefix: str, depth: int) -> List[Tuple[str, int, int]]:
+        """Split a block at its least-indented keys, expanding oversized ones."""
+        block = content[start:end]
+        indents = [len(m.group(1)) for m in re.finditer(r'^( *)[^\s#]', block, re.MULTILINE)]
+        if not indents:
+            return []
+        indent = min(indents)
+        header = re.compile(
+            rf'^(?:---.*|\.\.\..*| {{{indent}}}(?:(?P<name>"[^"\n]*"|\'[^\'\n]*\'|[^\s#\-:][^:#\n]*?)\s*:(?:\s|$)|-(?:\s|$)))',
+            re.MULTILINE
+        )
+        
+        sections = []
+        item = 0
+        for name, section_start, section_end in self._line_sections(block, header):
+            if name is None:
+                name = f"{prefix}[{item}]"
+                item += 1
+            elif prefix:
+                name = f"{prefix}.{name}"
+            section_start += start
+            section_end += start
+            
+            body = content.find('\n', section_start, section_end) + 1
+            if (0 < body < section_end and depth < 8 and
+                    self.sizer.size_of(content, section_start, section_end) > self.budget):
+                nested = self._at_indent(content, body, section_end, name, depth + 1)
+                if nested:
+                    sections.append((name, section_start, body))
+                    sections.extend(nested)
+                    continue
+            sections.append((name, section_start, section_end))
+        return sections
+    
+    def _section_name(self, match: re.Match) -> Optional[str]:
+        if match.group(0).startswith(('---', '...')):
+            return "---"
+        name = match.group('name')
+        return name.strip().strip('"\'') if name is not None else None
+
+
+_TOML_HEADER = re.compile(r'^[ \t]*\[\[?[ \t]*(?P<name>[A-Za-z0-9_\-."\' ]+?)[ \t]*\]\]?[ \t]*(?:#.*)?$', re.MULTILINE)
+
+
+class TOMLChunker(DataFileChunker):
+    """Chunker for TOML files, split at [table] and [[array]] headers."""
+    
+    def get_language(self) -> str:
+        return "toml"
+    
+    def _sections(self, content: str) -> List[Tuple[str, int, int]]:
+        sections = self._line_sections(content, _TOML_HEADER)
+        if sections:
+            first_header = _TOML_HEADER.search(content).start()
+            if content[:first_header].strip():
+                # Key/values before the first table belong to the root table
+                sections[0] = (sections[0][0], first_header, sections[0][2])
+                sections.insert(0, ("(root)", 0, first_header))
+        elif content.strip():
+            sections = [("(root)", 0, len(content))]
+        return sections
+
+
 class ChunkerFactory:
-    """Factory for creating language-specific chunkers."""
+    """
+    Factory for creating language-specific chunkers.
+    
+    Chunkers are looked up by file extension and reused per (class,
+    max_chunk_size, overlap), so compiled patterns and parsers are built once
+    per process; chunkers keep no per-file state. Additional languages
+    register with ``ChunkerFactory.register(...)`` from a plugin module listed
+    in CHUNKER_PLUGINS or exposed through the ``contextforge.chunkers`` entry
+    point group.
+    """
     
-    _chunkers = {
+    _chunkers: Dict[str, type] = {
         '.py': PythonChunker,
         '.js': JavaScriptChunker,
         '.jsx': JavaScriptChunker,
-        '.ts': JavaScriptChunker,
-        '.tsx': JavaScriptChunker,
+        '.mjs': JavaScriptChunker,
+        '.cjs': JavaScriptChunker,
+        '.ts': TypeScriptChunker,
+        '.tsx': TypeScriptChunker,
+        '.go': GoChunker,
+        '.rs': RustChunker,
+        '.java': JavaChunker,
         '.md': MarkdownChunker,
         '.markdown': MarkdownChunker,
+        '.json': JSONChunker,
+        '.yaml': YAMLChunker,
+        '.yml': YAMLChunker,
+        '.toml': TOMLChunker,
     }
+    # Default to JavaScript chunker for unknown types
+    _default: type = JavaScriptChunker
+    
+    _instances: Dict[Tuple[Any, ...], BaseChunker] = {}
+    _max_instances = 64
+    _lock = threading.Lock()
+    _plugins_loaded = False
+    
+    @classmethod
+    def register(cls, chunker_class: Optional[type] = None, *extensions: str):
+        """
+        Register a chunker class for file extensions.
+        
+        Works as a call, ``ChunkerFactory.register(KotlinChunker, ".kt", ".kts")``,
+        or as a class decorator, ``@ChunkerFactory.register(".kt", ".kts")``.
+        Without extensions, the class's ``extensions`` attribute is used.
+        Registering an extension again replaces its chunker.
+        """
+        if chunker_class is None or isinstance(chunker_class, str):
+            if chunker_class is not None:
+                extensions = (chunker_class,) + extensions
+            
+            def decorator(decorated: type) -> type:
+                cls.register(decorated, *extensions)
+                return decorated
+            return decorator
+        
+        if not (isinstance(chunker_class, type) and issubclass(chunker_class, BaseChunker)):
+            raise TypeError(f"{chunker_class!r} is not a BaseChunker subclass")
+        extensions = extensions or tuple(getattr(chunker_class, "extensions", ()))
+        if not extensions:
+            raise ValueError(f"No extensions given for {chunker_class.__name__}")
+        
+        with cls._lock:
+            for extension in extensions:
+                extension = extension.lower()
+                cls._chunkers[extension if extension.startswith('.') else f'.{extension}'] = chunker_class
+            cls._instances.clear()
+        logger.info(f"Registered {chunker_class.__name__} for {', '.join(extensions)}")
+        return chunker_class
+    
+    @classmethod
+    def load_plugins(cls):
+        """Import chunker plugins once per process; failures are logged and skipped."""
+        if cls._plugins_loaded:
+            return
+        cls._plugins_loaded = True
+        
+        for module_name in filter(None, (name.strip() for name in os.getenv("CHUNKER_PLUGINS", "").split(','))):
+            try:
+                importlib.import_module(module_name)
+            except Exception as e:
+                logger.error(f"Failed to load chunker plugin {module_name}: {e}")
+        
+        try:
+            from importlib.metadata import entry_points
+            plugins = entry_points(group="contextforge.chunkers")
+        except Exception as e:
+            logger.warning(f"Could not list chunker plugin entry points: {e}")
+            return
+        for entry_point in plugins:
+            try:
+                loaded = entry_point.load()
+                # Entry points may name a chunker class with an ``extensions``
+                # attribute, or a module that registers its own chunkers
+                if isinstance(loaded, type) and getattr(loaded, "extensions", None):
+                    cls.register(loaded, *loaded.extensions)
+            except Exception as e:
+                logger.error(f"Failed to load chunker plugin {entry_point.name}: {e}")
+    
+    @classmethod
+    def chunker_class_for(cls, file_path: str) -> type:
+        """Get the chunker class for a file from its extension."""
+        if not cls._plugins_loaded:
+            cls.load_plugins()
+        return cls._chunkers.get(os.path.splitext(file_path)[1].lower(), cls._default)
     
     @classmethod
     def get_chunker(cls, file_path: str, **kwargs) -> BaseChunker:
         """Get appropriate chunker for file extension."""
-        # Get file extension
-        ext = None
-        for extension in cls._chunkers.keys():
-            if file_path.lower().endswith(extension):
-                ext = extension
-                break
-        
-        if ext and ext in cls._chunkers:
-            return cls._chunkers[ext](**kwargs)
+        chunker_class = cls.chunker_class_for(file_path)
+        if kwargs.keys() <= {"max_chunk_size", "overlap"}:
+            key = (chunker_class, kwargs.get("max_chunk_size"), kwargs.get("overlap"))
         else:
-            # Default to JavaScript chunker for unknown types
-            return JavaScriptChunker(**kwargs)
+            key = (chunker_class, *sorted(kwargs.items()))
+        try:
+            chunker = cls._instances.get(key)
+        except TypeError:
+            # Unhashable options (e.g. a custom sizer object) are not cached
+            return chunker_class(**kwargs)
+        if chunker is None:
+            with cls._lock:
+                chunker = cls._instances.get(key)
+                if chunker is None:
+                    if len(cls._instances) >= cls._max_instances:
+                        cls._instances.clear()
+                    chunker = cls._instances[key] = chunker_class(**kwargs)
+        return chunker
     
     @classmethod
     def supported_extensions(cls) -> List[str]:
         """Get list of supported file extensions."""
+        cls.load_plugins()
         return list(cls._chunkers.keys())
+
+
+# Metadata fields recomputed from chunk text by derive_metadata(); compact chunks omit them
+DERIVED_METADATA_FIELDS = frozenset({
+    "docstring", "args", "is_async", "base_classes", "names", "modules", "import_count",
+    "word_count", "has_code", "code_languages"
+})
+
+
+def compact_metadata(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Drop metadata that can be derived from the chunk text, and empty values.
+
+    Parts of a split chunk may not contain (all of) the definition or fences
+    their metadata describes, so they keep it; only later parts drop the
+    docstring, which is in the text of the first part.
+    """
+    if "part" in meta:
+        dropped = {"docstring"} if meta["part"] > 1 else set()
+    else:
+        dropped = DERIVED_METADATA_FIELDS
+    return {key: value for key, value in meta.items() if key not in dropped and value is not None}
+
+
+def _parse_python_chunk(text: str) -> Optional[List[ast.stmt]]:
+    """
+    Parse the statements of a Python chunk.
+
+    Chunk text is stripped, so its first line lost its indentation while the
+    other lines kept theirs; indentations of the first line are tried until
+    the chunk parses inside a dummy block.
+    """
+    indents = sorted({len(line) - len(line.lstrip()) for line in text.split('\n')[1:] if line.strip()})
+    for indent in sorted({0} | set(indents) | {i - 1 for i in indents if i > 1}):
+        try:
+            if indent == 0:
+                return ast.parse(text).body
+            return ast.parse("if True:\n" + " " * indent + text).body[0].body
+        except SyntaxError:
+            continue
+    return None
+
+
+def derive_metadata(text: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Recompute the derivable metadata of a chunk from its text.
+
+    Returns ``meta`` with the fields compact chunks leave out filled in, so
+    docstrings, argument lists and the like are only materialized for the
+    chunks a client actually looks at.
+    """
+    derived = dict(meta)
+    language = meta.get("language")
+    if "part" in meta:
+        # Compact parts of split chunks keep their metadata
+        return derived
+
+    if language == "python":
+        body = _parse_python_chunk(text)
+        if body is None:
+            return derived
+        node = next((item for item in body if isinstance(item, _PYTHON_DEFS)), None)
+        chunk_type = meta.get("chunk_type")
+        if chunk_type == "import":
+            imports = [item for item in body if isinstance(item, _PYTHON_IMPORTS)]
+            derived["modules"] = [module for item in imports for module in PythonChunker._imported_modules(item)]
+            derived["import_count"] = len(imports)
+        elif chunk_type == "module":
+            derived["names"] = [item.name for item in body if isinstance(item, _PYTHON_DEFS)]
+            derived["docstring"] = ast.get_docstring(ast.Module(body=body, type_ignores=[]))
+        elif isinstance(node, ast.ClassDef):
+            derived["base_classes"] = [ast.unparse(base) for base in node.bases]
+            derived["docstring"] = ast.get_docstring(node)
+        elif node is not None and chunk_type == "function":
+            derived["is_async"] = isinstance(node, ast.AsyncFunctionDef)
+            derived["args"] = [arg.arg for arg in node.args.args]
+            derived["docstring"] = ast.get_docstring(node)
+
+    elif language == "markdown":
+        code_languages = []
+        open_fence = None
+        for match in _MD_LINE.finditer(text):
+            fence = match.group('fence')
+            if fence is None:
+                continue
+            if open_fence is None:
+                open_fence = fence
+                info = match.group('info').strip()
+                code_languages.append(info.split()[0] if info else None)
+            elif fence[0] == open_fence[0] and len(fence) >= len(open_fence):
+                open_fence = None
+        derived["has_code"] = bool(code_languages)
+        derived["code_languages"] = [code_language for code_language in code_languages if code_language]
+        derived["word_count"] = len(text.split())
+
+    return derived
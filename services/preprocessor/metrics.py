@@ -0,0 +1,138 @@
+"""
+Processing metrics for the preprocessor.
+Aggregates per-file timings by language and stage to show which files and chunkers dominate ingestion time.
+"""
+
+import time
+import heapq
+import threading
+from itertools import count
+from typing import Dict, List, Any
+
+from .engine import PROCESSING_STAGES
+
+# Upper bounds (seconds) of the per-file processing time histogram buckets
+FILE_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+# Stages timed in the service process rather than inside the chunking worker
+_SERVICE_STAGES = frozenset({"cache", "serialize"})
+
+
+def file_seconds(result: Dict[str, Any]) -> float:
+    """Total time spent on a file: chunking in the worker plus cache and serialization in the service."""
+    stages = result.get("stages") or {}
+    if result.get("cached"):
+        return sum(stages.values())
+    return result.get("seconds", 0.0) + sum(stages.get(stage, 0.0) for stage in _SERVICE_STAGES)
+
+
+def _histogram(values: List[int]) -> List[Dict[str, Any]]:
+    """Histogram buckets as ``{"le": upper bound, "files": count}``, the last one unbounded."""
+    bounds: List[Any] = list(FILE_SECONDS_BUCKETS) + ["+Inf"]
+    return [{"le": bound, "files": files} for bound, files in zip(bounds, values)]
+
+
+class ProcessingMetrics:
+    """
+    Aggregated processing timings.
+
+    Records every processed file's result: time per stage (see
+    PROCESSING_STAGES), overall and per language, a histogram of per-file
+    times and the slowest ``slowest_files`` files.
+    """
+
+    def __init__(self, slowest_files: int = 10):
+        self.slowest_files = slowest_files
+        self._lock = threading.Lock()
+        self._order = count()
+        self.reset()
+
+    def reset(self):
+        """Discard all recorded timings."""
+        with self._lock:
+            self._since = time.time()
+            self._files = 0
+            self._errors = 0
+            self._cache_hits = 0
+            self._chunks = 0
+            self._seconds = 0.0
+            self._stages = dict.fromkeys(PROCESSING_STAGES, 0.0)
+            self._histogram = [0] * (len(FILE_SECONDS_BUCKETS) + 1)
+            self._languages: Dict[str, Dict[str, Any]] = {}
+            # Min-heap of (seconds, order, entry) holding the slowest files
+            self._slowest: List[Any] = []
+
+    def record(self, result: Dict[str, Any]):
+        """Record one file's result from the chunking engine."""
+        seconds = file_seconds(result)
+        stages = result.get("stages") or {}
+        with self._lock:
+            if result.get("error"):
+                self._errors += 1
+                return
+            language = result.get("language") or "unknown"
+            num_chunks = len(result.get("chunks", []))
+            bucket = next((i for i, bound in enumerate(FILE_SECONDS_BUCKETS) if seconds <= bound),
+                          len(FILE_SECONDS_BUCKETS))
+
+            self._files += 1
+            self._chunks += num_chunks
+            self._seconds += seconds
+            self._cache_hits += bool(result.get("cached"))
+            self._histogram[bucket] += 1
+
+            totals = self._languages.setdefault(language, {
+                "files": 0, "chunks": 0, "seconds": 0.0,
+                "stages": dict.fromkeys(PROCESSING_STAGES, 0.0),
+                "histogram": [0] * (len(FILE_SECONDS_BUCKETS) + 1)
+            })
+            totals["files"] += 1
+            totals["chunks"] += num_chunks
+            totals["seconds"] += seconds
+            totals["histogram"][bucket] += 1
+            for stage, stage_seconds in stages.items():
+                self._stages[stage] = self._stages.get(stage, 0.0) + stage_seconds
+                totals["stages"][stage] = totals["stages"].get(stage, 0.0) + stage_seconds
+
+            if self.slowest_files > 0:
+                entry = (seconds, next(self._order), {
+                    "path": result["path"], "language": language, "seconds": round(seconds, 4),
+                    "num_chunks": num_chunks, "cached": bool(result.get("cached")),
+                    "stages": {stage: round(value, 4) for stage, value in stages.items()}
+                })
+                if len(self._slowest) < self.slowest_files:
+                    heapq.heappush(self._slowest, entry)
+                elif seconds > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, entry)
+
+    def record_stage(self, stage: str, seconds: float):
+        """Add time spent on a stage outside any single file's result (e.g. serializing a response)."""
+        with self._lock:
+            self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+            self._seconds += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the recorded metrics."""
+        with self._lock:
+            return {
+                "since": self._since,
+                "files": self._files,
+                "errors": self._errors,
+                "cache_hits": self._cache_hits,
+                "chunks": self._chunks,
+                "seconds": round(self._seconds, 4),
+                "stages": {stage: round(value, 4) for stage, value in self._stages.items()},
+                "languages": {
+                    language: {
+                        "files": totals["files"],
+                        "chunks": totals["chunks"],
+                        "seconds": round(totals["seconds"], 4),
+                        "seconds_per_file": round(totals["seconds"] / totals["files"], 6),
+                        "stages": {stage: round(value, 4) for stage, value in totals["stages"].items()},
+                        "histogram": _histogram(totals["histogram"])
+                    }
+                    for language, totals in sorted(self._languages.items(),
+                                                   key=lambda item: item[1]["seconds"], reverse=True)
+                },
+                "histogram": _histogram(self._histogram),
+                "slowest_files": [entry for _, _, entry in sorted(self._slowest, reverse=True)]
+            }
@@ -295,7 +295,7 @@ class AgentWorker:
                     return {"error": "No query provided"}
 
                 index = VectorIndex()
-                results = index.search(query, top_k=top_k, threshold=threshold)
+                results = index.search(query, top_k=top_k, threshold=threshold)["results"]
 
                 return {
                     "query": query,
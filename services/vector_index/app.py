@@ -4,9 +4,10 @@ Vector Index Service - FastAPI application for vector indexing and search.
 
 import os
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import structlog
 
@@ -47,17 +48,39 @@ vector_index = VectorIndex()
 # Pydantic models
 class InsertRequest(BaseModel):
     chunks: List[Dict[str, Any]]
+    # Streaming clients insert many batches and call /index/save once
+    save: bool = True
+
+
+class DeleteRequest(BaseModel):
+    file_paths: List[str]
+    save: bool = True
+    # Only delete the chunks of this repository (their meta["repository"]); None matches every repository
+    repository: Optional[str] = None
 
 
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 10
+    threshold: Optional[float] = None
+    neighbors: int = 0
+    include_parent: bool = False
 
 
 class EmbeddingRequest(BaseModel):
     texts: List[str]
 
 
+class SnapshotRequest(BaseModel):
+    version: Optional[int] = None
+
+
+class ReembedRequest(BaseModel):
+    model_name: Optional[str] = None
+    batch_size: Optional[int] = None
+    workers: Optional[int] = None
+
+
 # Health check
 @app.get("/health")
 async def health_check():
@@ -84,8 +107,9 @@ async def health_check():
 async def insert_chunks(request: InsertRequest):
     """Insert text chunks into the vector index."""
     try:
-        logger.info("Inserting chunks", num_chunks=len(request.chunks))
-        result = vector_index.insert(request.chunks)
+        logger.info("Inserting chunks", num_chunks=len(request.chunks), save=request.save)
+        # Embedding runs off the event loop so searches are served meanwhile
+        result = await run_in_threadpool(vector_index.insert, request.chunks, request.save)
         logger.info("Chunks inserted successfully", indexed_count=result["indexed_count"])
         return result
     except Exception as e:
@@ -93,12 +117,32 @@ async def insert_chunks(request: InsertRequest):
         raise HTTPException(status_code=500, detail=f"Failed to insert chunks: {e}")
 
 
+@app.post("/index/delete")
+async def delete_file_chunks(request: DeleteRequest):
+    """Delete all chunks of the given files from the vector index."""
+    try:
+        logger.info("Deleting file chunks", num_files=len(request.file_paths), save=request.save)
+        result = await run_in_threadpool(vector_index.delete_files, request.file_paths, request.save,
+                                         request.repository)
+        logger.info("File chunks deleted", deleted_count=result["deleted_count"])
+        return result
+    except Exception as e:
+        logger.error("Failed to delete file chunks", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to delete file chunks: {e}")
+
+
 @app.post("/search")
 async def search_index(request: SearchRequest):
     """Search the vector index for similar content."""
     try:
-        logger.info("Searching index", query=request.query, top_k=request.top_k)
-        result = vector_index.search(request.query, request.top_k)
+        logger.info("Searching index", query=request.query, top_k=request.top_k, threshold=request.threshold)
+        result = vector_index.search(
+            request.query,
+            request.top_k,
+            threshold=request.threshold,
+            neighbors=request.neighbors,
+            include_parent=request.include_parent
+        )
         logger.info("Search completed", num_results=result["total_results"])
         return result
     except Exception as e:
@@ -130,6 +174,16 @@ async def get_index_stats():
         raise HTTPException(status_code=500, detail=f"Failed to get stats: {e}")
 
 
+@app.get("/index/files/chunks")
+async def get_file_chunks(file_path: str, repository: Optional[str] = None):
+    """Get all indexed chunks of a file in line order."""
+    try:
+        return vector_index.get_file_chunks(file_path, repository)
+    except Exception as e:
+        logger.error("Failed to get file chunks", file_path=file_path, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to get file chunks: {e}")
+
+
 # Embedding endpoints
 @app.post("/embeddings/generate")
 async def generate_embeddings(request: EmbeddingRequest):
@@ -162,29 +216,81 @@ async def get_embedding_model_info():
 # Index backup and restore
 @app.post("/index/save")
 async def save_index():
-    """Manually save the index to disk."""
+    """Manually save the index to disk as a new snapshot."""
     try:
-        vector_index.save()
-        return {"message": "Index saved successfully"}
+        manifest = await run_in_threadpool(vector_index.save)
+        return {"message": "Index saved successfully", "version": manifest["version"]}
     except Exception as e:
         logger.error("Failed to save index", error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to save index: {e}")
 
 
 @app.post("/index/load")
-async def load_index():
-    """Manually load the index from disk."""
+async def load_index(request: Optional[SnapshotRequest] = None):
+    """Load a snapshot in the background and atomically swap it in."""
+    version = request.version if request else None
     try:
-        success = vector_index.load()
+        success = await run_in_threadpool(vector_index.load, version)
         if success:
-            return {"message": "Index loaded successfully"}
+            return {"message": "Index loaded successfully", "version": vector_index.version}
         else:
             return {"message": "No existing index found"}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error("Failed to load index", error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to load index: {e}")
 
 
+@app.get("/index/snapshots")
+async def list_snapshots():
+    """List the available index snapshots."""
+    try:
+        return vector_index.list_snapshots()
+    except Exception as e:
+        logger.error("Failed to list snapshots", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to list snapshots: {e}")
+
+
+@app.post("/index/rollback")
+async def rollback_index(request: Optional[SnapshotRequest] = None):
+    """Roll back to a previous snapshot (the one before the current by default)."""
+    version = request.version if request else None
+    try:
+        logger.info("Rolling back index", version=version)
+        manifest = await run_in_threadpool(vector_index.rollback, version)
+        return {"message": "Index rolled back successfully", "version": manifest["version"]}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Failed to roll back index", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to roll back index: {e}")
+
+
+# Embedding model migration
+@app.post("/index/reembed")
+async def start_reembed(request: Optional[ReembedRequest] = None):
+    """Start a background job re-embedding the index with a new model."""
+    request = request or ReembedRequest()
+    try:
+        logger.info("Starting re-embedding job", model_name=request.model_name)
+        return vector_index.start_reembed(request.model_name, request.batch_size, request.workers)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error("Failed to start re-embedding job", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to start re-embedding: {e}")
+
+
+@app.get("/index/reembed/status")
+async def get_reembed_status():
+    """Get progress and throughput of the latest re-embedding job."""
+    status = vector_index.reembed_status()
+    if status is None:
+        raise HTTPException(status_code=404, detail="No re-embedding job has been started")
+    return status
+
+
 if __name__ == "__main__":
     import uvicorn
     
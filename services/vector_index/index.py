@@ -6,8 +6,13 @@ Handles embedding generation and similarity search.
 import os
 import json
 import pickle
+import shutil
+import hashlib
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Any, Set, Tuple
 from datetime import datetime
 import numpy as np
 
@@ -25,8 +30,12 @@ logger = logging.getLogger(__name__)
 # Configuration
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
 DATA_DIR = os.getenv("DATA_DIR", "/app/data")
-INDEX_FILE = os.path.join(DATA_DIR, "faiss_index.bin")
-METADATA_FILE = os.path.join(DATA_DIR, "metadata.json")
+INDEX_FILE_NAME = "faiss_index.bin"
+METADATA_FILE_NAME = "metadata.json"
+MANIFEST_FILE_NAME = "manifest.json"
+SNAPSHOT_RETENTION = int(os.getenv("SNAPSHOT_RETENTION", "5"))
+REEMBED_BATCH_SIZE = int(os.getenv("REEMBED_BATCH_SIZE", "1024"))
+REEMBED_WORKERS = int(os.getenv("REEMBED_WORKERS", "0")) or (os.cpu_count() or 1)
 
 
 class EmbeddingGenerator:
@@ -62,6 +71,21 @@ class EmbeddingGenerator:
     def encode_single(self, text: str) -> np.ndarray:
         """Generate embedding for a single text."""
         return self.encode([text])[0]
+
+    def start_pool(self, workers: int):
+        """Start a multi-process encoding pool with one CPU worker per process."""
+        if not self.model:
+            raise RuntimeError("Embedding model not loaded")
+        return self.model.start_multi_process_pool(target_devices=["cpu"] * workers)
+
+    def encode_with_pool(self, texts: List[str], pool, batch_size: int = 32) -> np.ndarray:
+        """Generate embeddings for a list of texts on a multi-process pool."""
+        return self.model.encode_multi_process(texts, pool, batch_size=batch_size)
+
+    @staticmethod
+    def stop_pool(pool):
+        """Stop a multi-process encoding pool."""
+        SentenceTransformer.stop_multi_process_pool(pool)
     
     @property
     def dimension(self) -> int:
@@ -71,6 +95,15 @@ class EmbeddingGenerator:
         return self.model.get_sentence_embedding_dimension()
 
 
+def _renumbered(metadata: List[Dict[str, Any]], keep: List[int]) -> List[Dict[str, Any]]:
+    """
+    Copies of the kept chunks' metadata with ids matching their new
+    positions; the originals stay untouched for searches still running on
+    the old backend.
+    """
+    return [dict(metadata[old_id], id=new_id) for new_id, old_id in enumerate(keep)]
+
+
 class FAISSIndex:
     """FAISS-based vector index implementation."""
     
@@ -99,23 +132,39 @@ class FAISSIndex:
         
         return ids
     
-    def search(self, query_embedding: np.ndarray, top_k: int = 10) -> List[Dict[str, Any]]:
-        """Search for similar embeddings."""
+    def search(self, query_embedding: np.ndarray, top_k: int = 10,
+               threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Search for similar embeddings.
+
+        With a threshold, uses FAISS range search to collect every vector
+        scoring at least ``threshold`` and returns the best ``top_k`` of them.
+        """
         # Normalize query embedding
-        query_embedding = query_embedding.reshape(1, -1)
+        query_embedding = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
         faiss.normalize_L2(query_embedding)
         
         # Search
-        scores, indices = self.index.search(query_embedding, top_k)
+        if threshold is None:
+            scores, indices = self.index.search(query_embedding, top_k)
+            scores, indices = scores[0], indices[0]
+        else:
+            # range_search keeps scores strictly above the radius
+            radius = float(np.nextafter(np.float32(threshold), np.float32(-np.inf)))
+            lims, range_scores, range_indices = self.index.range_search(query_embedding, radius)
+            range_scores = range_scores[lims[0]:lims[1]]
+            range_indices = range_indices[lims[0]:lims[1]]
+            order = np.argsort(-range_scores, kind="stable")[:top_k]
+            scores, indices = range_scores[order], range_indices[order]
         
         # Prepare results
         results = []
-        for i, (score, idx) in enumerate(zip(scores[0], indices[0])):
+        for i, (score, idx) in enumerate(zip(scores, indices)):
             if idx == -1:  # No more results
                 break
             
             result = {
-                "id": idx,
+                "id": int(idx),
                 "score": float(score),
                 "metadata": self.metadata[idx] if idx < len(self.metadata) else {},
                 "rank": i + 1
@@ -161,6 +210,17 @@ class FAISSIndex:
         self.metadata = []
         self.id_counter = 0
     
+    def without(self, ids: Set[int]) -> "FAISSIndex":
+        """Copy of the index without the given chunk ids; the remaining chunks are renumbered."""
+        keep = [i for i in range(len(self.metadata)) if i not in ids]
+        backend = FAISSIndex(self.dimension)
+        if keep:
+            # Stored vectors are already normalized
+            backend.index.add(self.index.reconstruct_n(0, self.index.ntotal)[keep])
+        backend.metadata = _renumbered(self.metadata, keep)
+        backend.id_counter = len(keep)
+        return backend
+    
     def stats(self) -> Dict[str, Any]:
         """Get index statistics."""
         return {
@@ -179,6 +239,7 @@ class SimpleInMemoryIndex:
         self.embeddings = []
         self.metadata = []
         self.id_counter = 0
+        self._matrix: Optional[np.ndarray] = None
     
     def add(self, embeddings: np.ndarray, metadata: List[Dict[str, Any]]) -> List[int]:
         """Add embeddings and metadata to the index."""
@@ -199,31 +260,48 @@ class SimpleInMemoryIndex:
         
         return ids
     
-    def search(self, query_embedding: np.ndarray, top_k: int = 10) -> List[Dict[str, Any]]:
-        """Search for similar embeddings using cosine similarity."""
+    def _embedding_matrix(self) -> np.ndarray:
+        """Stack the stored embeddings into one matrix, cached until the next change."""
+        if self._matrix is None or len(self._matrix) != len(self.embeddings):
+            self._matrix = np.asarray(self.embeddings, dtype=np.float32).reshape(len(self.embeddings), -1)
+        return self._matrix
+    
+    def search(self, query_embedding: np.ndarray, top_k: int = 10,
+               threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Search for similar embeddings using cosine similarity.
+
+        With a threshold, only vectors scoring at least ``threshold`` are
+        returned, capped at ``top_k``.
+        """
         if not self.embeddings:
             return []
         
         # Normalize query
+        query_embedding = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
         norm = np.linalg.norm(query_embedding)
         if norm > 0:
             query_embedding = query_embedding / norm
         
-        # Calculate similarities
-        similarities = []
-        for i, embedding in enumerate(self.embeddings):
-            similarity = np.dot(query_embedding, embedding)
-            similarities.append((similarity, i))
+        # Calculate similarities in one matrix-vector product
+        similarities = self._embedding_matrix() @ query_embedding
         
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x[0], reverse=True)
+        candidates = np.arange(len(similarities))
+        if threshold is not None:
+            candidates = np.flatnonzero(similarities >= threshold)
+        
+        # Select the top_k candidates, then sort them by similarity (descending)
+        if len(candidates) > top_k:
+            partition = np.argpartition(-similarities[candidates], top_k - 1)[:top_k]
+            candidates = candidates[partition]
+        order = np.argsort(-similarities[candidates], kind="stable")
         
         # Prepare results
         results = []
-        for rank, (score, idx) in enumerate(similarities[:top_k]):
+        for rank, idx in enumerate(candidates[order]):
             result = {
-                "id": idx,
-                "score": float(score),
+                "id": int(idx),
+                "score": float(similarities[idx]),
                 "metadata": self.metadata[idx],
                 "rank": rank + 1
             }
@@ -258,6 +336,7 @@ class SimpleInMemoryIndex:
                 # Load embeddings
                 embeddings_array = np.load(embeddings_path)
                 self.embeddings = embeddings_array.tolist() if embeddings_array.size > 0 else []
+                self._matrix = None
                 
                 # Load metadata
                 with open(metadata_path, 'r') as f:
@@ -274,9 +353,19 @@ class SimpleInMemoryIndex:
     def clear(self):
         """Clear the index and metadata."""
         self.embeddings = []
+        self._matrix = None
         self.metadata = []
         self.id_counter = 0
     
+    def without(self, ids: Set[int]) -> "SimpleInMemoryIndex":
+        """Copy of the index without the given chunk ids; the remaining chunks are renumbered."""
+        keep = [i for i in range(len(self.metadata)) if i not in ids]
+        backend = SimpleInMemoryIndex(self.dimension)
+        backend.embeddings = [self.embeddings[i] for i in keep]
+        backend.metadata = _renumbered(self.metadata, keep)
+        backend.id_counter = len(keep)
+        return backend
+    
     def stats(self) -> Dict[str, Any]:
         """Get index statistics."""
         return {
@@ -287,29 +376,465 @@ class SimpleInMemoryIndex:
         }
 
 
+class ChunkGroups:
+    """
+    Per-file grouping of the chunks stored in a backend.
+
+    Keeps each file's chunk ids in line order together with the enclosing
+    (parent) chunk and the previous/next sibling of every chunk, so search
+    hits can be expanded to surrounding context with dictionary lookups
+    instead of extra vector searches. Siblings are chunks sharing the same
+    parent, e.g. adjacent methods of a class or adjacent top-level functions.
+    """
+
+    def __init__(self, metadata: List[Dict[str, Any]]):
+        self.metadata = metadata
+        # Keyed by (repository, file path): repositories share relative paths like README.md
+        self._files: Dict[Tuple[Optional[str], str], List[int]] = {}
+        self._repositories: Dict[str, List[Optional[str]]] = {}
+        self._file_of: Dict[int, Tuple[Optional[str], str]] = {}
+        self._parent: Dict[int, int] = {}
+        self._prev: Dict[int, int] = {}
+        self._next: Dict[int, int] = {}
+        self.add(metadata)
+
+    def add(self, metadata: List[Dict[str, Any]]):
+        """Group newly added chunks, regrouping only the files they belong to."""
+        touched = set()
+        for meta in metadata:
+            chunk_meta = meta.get("meta", {})
+            file_path = chunk_meta.get("file_path")
+            if file_path is None:
+                continue
+            key = (chunk_meta.get("repository"), file_path)
+            if key not in self._files:
+                self._files[key] = []
+                self._repositories.setdefault(file_path, []).append(key[0])
+            self._files[key].append(meta["id"])
+            self._file_of[meta["id"]] = key
+            touched.add(key)
+
+        for key in touched:
+            self._group_file(key)
+
+    def _group_file(self, key: Tuple[Optional[str], str]):
+        """Order a file's chunks by line and link parents and siblings."""
+        def lines(chunk_id: int) -> Tuple[int, int]:
+            meta = self.metadata[chunk_id].get("meta", {})
+            return meta.get("start_line") or 0, meta.get("end_line") or 0
+
+        ids = sorted(self._files[key], key=lambda i: (lines(i)[0], -lines(i)[1], i))
+        self._files[key] = ids
+
+        # Chunks sorted by start line (widest first) nest like brackets: the
+        # innermost open chunk still covering the current one is its parent.
+        children: Dict[Optional[int], List[int]] = {}
+        stack: List[int] = []
+        for chunk_id in ids:
+            start, end = lines(chunk_id)
+            while stack and (lines(stack[-1])[1] < end or lines(stack[-1]) == (start, end)):
+                stack.pop()
+
+            parent = stack[-1] if stack and end > 0 else None
+            if parent is None:
+                self._parent.pop(chunk_id, None)
+            else:
+                self._parent[chunk_id] = parent
+            children.setdefault(parent, []).append(chunk_id)
+            stack.append(chunk_id)
+
+        for siblings in children.values():
+            for position, chunk_id in enumerate(siblings):
+                if position > 0:
+                    self._prev[chunk_id] = siblings[position - 1]
+                else:
+                    self._prev.pop(chunk_id, None)
+                if position + 1 < len(siblings):
+                    self._next[chunk_id] = siblings[position + 1]
+                else:
+                    self._next.pop(chunk_id, None)
+
+    def _owns(self, meta: Dict[str, Any]) -> bool:
+        """Check that a search hit comes from the backend these groups index."""
+        chunk_id = meta.get("id")
+        return (chunk_id in self._file_of and chunk_id < len(self.metadata)
+                and self.metadata[chunk_id] is meta)
+
+    def neighbors(self, meta: Dict[str, Any], count: int) -> Dict[str, List[Dict[str, Any]]]:
+        """Get up to ``count`` sibling chunks before and after a chunk, in line order."""
+        before, after = [], []
+        if count > 0 and self._owns(meta):
+            chunk_id = meta["id"]
+            while len(before) < count and chunk_id in self._prev:
+                chunk_id = self._prev[chunk_id]
+                before.append(self.metadata[chunk_id])
+            chunk_id = meta["id"]
+            while len(after) < count and chunk_id in self._next:
+                chunk_id = self._next[chunk_id]
+                after.append(self.metadata[chunk_id])
+        return {"before": before[::-1], "after": after}
+
+    def parent(self, meta: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Get the chunk enclosing a chunk (e.g. the class of a method), if any."""
+        if not self._owns(meta) or meta["id"] not in self._parent:
+            return None
+        return self.metadata[self._parent[meta["id"]]]
+
+    def _keys(self, file_path: str, repository: Optional[str]) -> List[Tuple[Optional[str], str]]:
+        """Group keys of a file, in every repository unless one is given."""
+        if repository is not None:
+            return [(repository, file_path)] if (repository, file_path) in self._files else []
+        return [(indexed, file_path) for indexed in self._repositories.get(file_path, [])]
+
+    def file_ids(self, file_path: str, repository: Optional[str] = None) -> List[int]:
+        """Get the ids of a file's chunks in line order, of every repository holding the path by default."""
+        return [chunk_id for key in self._keys(file_path, repository) for chunk_id in self._files[key]]
+
+    def file_chunks(self, file_path: str, repository: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get all chunks of a file in line order."""
+        return [self.metadata[chunk_id] for chunk_id in self.file_ids(file_path, repository)]
+
+    @property
+    def file_count(self) -> int:
+        return len(self._files)
+
+
+def _sha256_file(path: str) -> str:
+    """Compute the SHA-256 checksum of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fsync_path(path: str):
+    """Flush a file or directory to stable storage."""
+    flags = os.O_RDONLY
+    if os.path.isdir(path):
+        flags |= getattr(os, "O_DIRECTORY", 0)
+    try:
+        fd = os.open(path, flags)
+    except OSError:
+        return  # Directories cannot be opened on some platforms
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class SnapshotStore:
+    """
+    Versioned, immutable on-disk snapshots of the vector index.
+
+    Each snapshot lives in its own ``v<version>`` directory and is written to a
+    temporary directory first, then atomically renamed into place together with
+    a manifest holding checksums of every file. A ``CURRENT`` pointer file,
+    itself replaced atomically, names the active version.
+    """
+
+    def __init__(self, root: str, retention: int = SNAPSHOT_RETENTION):
+        self.root = root
+        self.retention = max(1, retention)
+        self.current_file = os.path.join(root, "CURRENT")
+        os.makedirs(root, exist_ok=True)
+
+    def _version_dir(self, version: int) -> str:
+        return os.path.join(self.root, f"v{version:06d}")
+
+    def index_path(self, version: int) -> str:
+        return os.path.join(self._version_dir(version), INDEX_FILE_NAME)
+
+    def metadata_path(self, version: int) -> str:
+        return os.path.join(self._version_dir(version), METADATA_FILE_NAME)
+
+    def versions(self) -> List[int]:
+        """List the available snapshot versions in ascending order."""
+        versions = []
+        for name in os.listdir(self.root):
+            if name.startswith("v") and name[1:].isdigit():
+                if os.path.exists(os.path.join(self.root, name, MANIFEST_FILE_NAME)):
+                    versions.append(int(name[1:]))
+        return sorted(versions)
+
+    def current_version(self) -> Optional[int]:
+        """Get the version the CURRENT pointer refers to."""
+        try:
+            with open(self.current_file, 'r') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            versions = self.versions()
+            return versions[-1] if versions else None
+
+    def set_current(self, version: int):
+        """Atomically point CURRENT at an existing snapshot version."""
+        if version not in self.versions():
+            raise ValueError(f"Snapshot version {version} does not exist")
+
+        tmp_path = f"{self.current_file}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            f.write(str(version))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.current_file)
+        _fsync_path(self.root)
+
+    def manifest(self, version: int) -> Dict[str, Any]:
+        """Read the manifest of a snapshot version."""
+        with open(os.path.join(self._version_dir(version), MANIFEST_FILE_NAME), 'r') as f:
+            return json.load(f)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Get the manifests of all snapshots, newest first."""
+        return [self.manifest(version) for version in reversed(self.versions())]
+
+    def write(self, backend, info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Write the backend to a new snapshot and make it current."""
+        versions = self.versions()
+        version = (versions[-1] + 1) if versions else 1
+        tmp_dir = os.path.join(self.root, f".tmp-v{version:06d}-{os.getpid()}-{threading.get_ident()}")
+        os.makedirs(tmp_dir)
+
+        try:
+            backend.save(
+                os.path.join(tmp_dir, INDEX_FILE_NAME),
+                os.path.join(tmp_dir, METADATA_FILE_NAME)
+            )
+
+            files = {}
+            for name in sorted(os.listdir(tmp_dir)):
+                path = os.path.join(tmp_dir, name)
+                _fsync_path(path)
+                files[name] = {
+                    "sha256": _sha256_file(path),
+                    "size": os.path.getsize(path)
+                }
+
+            manifest = {
+                "version": version,
+                "created_at": datetime.now().isoformat(),
+                "files": files,
+                **(info or {})
+            }
+            with open(os.path.join(tmp_dir, MANIFEST_FILE_NAME), 'w') as f:
+                json.dump(manifest, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            _fsync_path(tmp_dir)
+
+            os.rename(tmp_dir, self._version_dir(version))
+            _fsync_path(self.root)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self.set_current(version)
+        self._prune()
+        logger.info(f"Snapshot v{version} written to {self.root}")
+        return manifest
+
+    def verify(self, version: int) -> bool:
+        """Check every file of a snapshot against its manifest checksum."""
+        manifest = self.manifest(version)
+        for name, info in manifest["files"].items():
+            path = os.path.join(self._version_dir(version), name)
+            if not os.path.exists(path) or _sha256_file(path) != info["sha256"]:
+                logger.error(f"Snapshot v{version} checksum mismatch for {name}")
+                return False
+        return True
+
+    def read(self, version: int, backend) -> Dict[str, Any]:
+        """Verify a snapshot and load it into the given (fresh) backend."""
+        if version not in self.versions():
+            raise ValueError(f"Snapshot version {version} does not exist")
+        if not self.verify(version):
+            raise ValueError(f"Snapshot version {version} failed checksum verification")
+        if not backend.load(self.index_path(version), self.metadata_path(version)):
+            raise ValueError(f"Snapshot version {version} could not be loaded")
+        return self.manifest(version)
+
+    def _prune(self):
+        """Drop the oldest snapshots beyond the retention limit."""
+        current = self.current_version()
+        versions = self.versions()
+        for version in versions[:-self.retention]:
+            if version != current:
+                shutil.rmtree(self._version_dir(version), ignore_errors=True)
+
+        # Remove temporary directories left behind by interrupted writes
+        for name in os.listdir(self.root):
+            if name.startswith(".tmp-") and os.path.isdir(os.path.join(self.root, name)):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+
+class ReembedJob:
+    """
+    Background job that re-embeds every stored chunk with a new model.
+
+    The chunk text kept in the index metadata is encoded in large batches
+    (on a multi-process pool when more than one worker is configured) into a
+    new backend built alongside the live one. Chunks inserted while the job
+    runs are caught up at the end, then the new backend and model are swapped
+    in and persisted as a new snapshot.
+    """
+
+    def __init__(self, vector_index: "VectorIndex", model_name: str,
+                 batch_size: int = REEMBED_BATCH_SIZE, workers: int = REEMBED_WORKERS):
+        self.job_id = str(uuid.uuid4())
+        self.vector_index = vector_index
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.status = "pending"
+        self.total = 0
+        self.processed = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.version: Optional[int] = None
+
+    def run(self):
+        """Run the job to completion, recording failures in the job status."""
+        self.status = "running"
+        self.started_at = time.time()
+        pool = None
+        try:
+            generator = EmbeddingGenerator(self.model_name)
+            source_backend = self.vector_index.index
+            source = list(source_backend.metadata)
+            self.total = len(source)
+
+            backend = self.vector_index._create_backend(generator.dimension)
+            if self.workers > 1 and self.total > self.batch_size:
+                pool = generator.start_pool(self.workers)
+
+            for offset in range(0, len(source), self.batch_size):
+                self._embed_into(backend, generator, source[offset:offset + self.batch_size], pool)
+
+            with self.vector_index._lock:
+                if self.vector_index.index is not source_backend:
+                    raise RuntimeError("Index was replaced while re-embedding; aborting")
+
+                # Catch up on chunks inserted while the job was running
+                tail = self.vector_index.index.metadata[len(source):]
+                self.total += len(tail)
+                if tail:
+                    self._embed_into(backend, generator, tail, pool)
+
+                self.vector_index._swap(backend, generator)
+                self.version = self.vector_index.save()["version"]
+
+            self.status = "completed"
+            logger.info(f"Re-embedding with {self.model_name} completed: {self.processed} chunks")
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            logger.error(f"Re-embedding with {self.model_name} failed: {e}")
+        finally:
+            if pool is not None:
+                EmbeddingGenerator.stop_pool(pool)
+            self.finished_at = time.time()
+
+    def _embed_into(self, backend, generator: EmbeddingGenerator,
+                    metadata: List[Dict[str, Any]], pool=None):
+        """Embed one batch of stored chunks and add it to the new backend."""
+        texts = [meta.get("text", "") for meta in metadata]
+        if pool is not None:
+            embeddings = generator.encode_with_pool(texts, pool, batch_size=min(self.batch_size, 256))
+        else:
+            embeddings = generator.encode(texts)
+
+        copies = [dict(meta) for meta in metadata]
+        backend.add(np.asarray(embeddings, dtype=np.float32), copies)
+        for copy, meta in zip(copies, metadata):
+            copy["added_at"] = meta.get("added_at", copy["added_at"])
+        self.processed += len(metadata)
+
+    def progress(self) -> Dict[str, Any]:
+        """Get job progress and throughput."""
+        elapsed = 0.0
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "model_name": self.model_name,
+            "processed": self.processed,
+            "total": self.total,
+            "percent": round(100.0 * self.processed / self.total, 1) if self.total else 0.0,
+            "elapsed_seconds": round(elapsed, 2),
+            "chunks_per_second": round(self.processed / elapsed, 1) if elapsed > 0 else 0.0,
+            "batch_size": self.batch_size,
+            "workers": self.workers,
+            "version": self.version,
+            "error": self.error
+        }
+
+
 class VectorIndex:
     """Main vector index class with automatic backend selection."""
-    
-    def __init__(self):
+
+    def __init__(self, data_dir: str = DATA_DIR):
         self.embedding_generator = EmbeddingGenerator()
         self.dimension = self.embedding_generator.dimension
-        
+        self.data_dir = data_dir
+
         # Choose backend
-        if FAISS_AVAILABLE:
-            self.index = FAISSIndex(self.dimension)
-            logger.info("Using FAISS backend")
-        else:
-            self.index = SimpleInMemoryIndex(self.dimension)
-            logger.info("Using in-memory fallback backend")
-        
+        self.index = self._create_backend(self.dimension)
+        self.groups = ChunkGroups(self.index.metadata)
+        logger.info("Using FAISS backend" if FAISS_AVAILABLE else "Using in-memory fallback backend")
+
         # Ensure data directory exists
-        os.makedirs(DATA_DIR, exist_ok=True)
-        
+        os.makedirs(data_dir, exist_ok=True)
+
+        # Writers and backend swaps are serialized; searches read the current
+        # backend reference without locking.
+        self._lock = threading.RLock()
+        # Snapshot loads in progress; writes wait for them (see load)
+        self._loading = 0
+        self._loaded = threading.Condition(self._lock)
+        self.snapshots = SnapshotStore(os.path.join(data_dir, "snapshots"))
+        self.version: Optional[int] = None
+        self.reembed_job: Optional[ReembedJob] = None
+
         # Try to load existing index
-        self.load()
+        try:
+            self.load()
+        except ValueError as e:
+            logger.error(f"Failed to load index snapshot: {e}")
+
+    def _create_backend(self, dimension: int):
+        """Create an empty backend for the given dimension."""
+        if FAISS_AVAILABLE:
+            return FAISSIndex(dimension)
+        return SimpleInMemoryIndex(dimension)
+
+    def _await_loads(self):
+        """Hold a write, with the lock held, until pending snapshot loads have been swapped in."""
+        while self._loading:
+            self._loaded.wait()
+
+    def _swap(self, backend, generator: Optional[EmbeddingGenerator] = None,
+              groups: Optional[ChunkGroups] = None):
+        """Swap in a new backend (and the model its vectors came from)."""
+        groups = groups or ChunkGroups(backend.metadata)
+        with self._lock:
+            self.index = backend
+            self.groups = groups
+            if generator is not None:
+                self.embedding_generator = generator
+                self.dimension = generator.dimension
     
-    def insert(self, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Insert text chunks into the index."""
+    def insert(self, chunks: List[Dict[str, Any]], save: bool = True) -> Dict[str, Any]:
+        """
+        Insert text chunks into the index.
+
+        ``save=False`` skips writing a snapshot, for callers streaming many
+        batches that save once at the end.
+        """
         if not chunks:
             return {"indexed_count": 0, "message": "No chunks to index"}
         
@@ -330,6 +855,7 @@ class VectorIndex:
                     "text": text,
                     "meta": chunk.get("meta", {}),
                     "chunk_id": chunk.get("chunk_id"),
+                    "content_hash": chunk.get("content_hash"),
                     "source": chunk.get("source", "unknown")
                 }
                 metadata.append(meta)
@@ -339,13 +865,19 @@ class VectorIndex:
             
             # Generate embeddings
             logger.info(f"Generating embeddings for {len(texts)} texts")
-            embeddings = self.embedding_generator.encode(texts)
+            generator = self.embedding_generator
+            embeddings = generator.encode(texts)
             
-            # Add to index
-            ids = self.index.add(embeddings, metadata)
-            
-            # Save index
-            self.save()
+            # Add to index and persist a new snapshot
+            with self._lock:
+                self._await_loads()
+                if self.embedding_generator is not generator:
+                    # A re-embedding job swapped the model in the meantime
+                    embeddings = self.embedding_generator.encode(texts)
+                ids = self.index.add(embeddings, metadata)
+                self.groups.add(metadata)
+                if save:
+                    self.save()
             
             logger.info(f"Successfully indexed {len(ids)} chunks")
             return {
@@ -358,17 +890,34 @@ class VectorIndex:
             logger.error(f"Failed to insert chunks: {e}")
             raise
     
-    def search(self, query: str, top_k: int = 10) -> Dict[str, Any]:
-        """Search the index for similar content."""
+    def search(self, query: str, top_k: int = 10,
+               threshold: Optional[float] = None, neighbors: int = 0,
+               include_parent: bool = False) -> Dict[str, Any]:
+        """
+        Search the index for similar content.
+
+        When ``threshold`` is given, returns all chunks scoring at least that
+        similarity, capped at ``top_k``, instead of always ``top_k`` chunks.
+        ``neighbors`` and ``include_parent`` attach the surrounding sibling
+        chunks and the enclosing chunk of each hit from the per-file grouping.
+        A parent is attached once: hits whose parent is another hit or was
+        already attached to a better-ranked hit get ``parent_rank``, the rank
+        of the result carrying it, instead.
+        """
         try:
+            # A concurrent load or re-embedding may swap the backend at any time
+            generator, index, groups = self.embedding_generator, self.index, self.groups
+            
             # Generate query embedding
-            query_embedding = self.embedding_generator.encode_single(query)
+            query_embedding = generator.encode_single(query)
             
             # Search index
-            results = self.index.search(query_embedding, top_k)
+            results = index.search(query_embedding, top_k, threshold=threshold)
             
             # Format results
             formatted_results = []
+            # Chunk id -> rank of the result whose text or parent contains it
+            shown = {result["metadata"].get("id"): result["rank"] for result in results}
             for result in results:
                 formatted_result = {
                     "text": result["metadata"].get("text", ""),
@@ -377,12 +926,28 @@ class VectorIndex:
                     "source": result["metadata"].get("source", "unknown"),
                     "rank": result["rank"]
                 }
+                if neighbors > 0:
+                    expanded = groups.neighbors(result["metadata"], neighbors)
+                    formatted_result["neighbors"] = {
+                        side: [self._format_chunk(meta) for meta in chunks]
+                        for side, chunks in expanded.items()
+                    }
+                if include_parent:
+                    parent = groups.parent(result["metadata"])
+                    if parent is not None and parent["id"] in shown:
+                        formatted_result["parent"] = None
+                        formatted_result["parent_rank"] = shown[parent["id"]]
+                    else:
+                        formatted_result["parent"] = self._format_chunk(parent) if parent else None
+                        if parent is not None:
+                            shown[parent["id"]] = result["rank"]
                 formatted_results.append(formatted_result)
             
             return {
                 "query": query,
                 "results": formatted_results,
                 "total_results": len(formatted_results),
+                "threshold": threshold,
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -390,18 +955,169 @@ class VectorIndex:
             logger.error(f"Search failed: {e}")
             raise
     
-    def save(self):
-        """Save the index to disk."""
-        self.index.save(INDEX_FILE, METADATA_FILE)
-    
-    def load(self):
-        """Load the index from disk."""
-        return self.index.load(INDEX_FILE, METADATA_FILE)
-    
+    @staticmethod
+    def _format_chunk(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Format a stored chunk for a response."""
+        return {
+            "text": metadata.get("text", ""),
+            "meta": metadata.get("meta", {}),
+            "source": metadata.get("source", "unknown")
+        }
+
+    def get_file_chunks(self, file_path: str, repository: Optional[str] = None) -> Dict[str, Any]:
+        """Get all indexed chunks of a file in line order."""
+        chunks = [self._format_chunk(meta) for meta in self.groups.file_chunks(file_path, repository)]
+        return {
+            "file_path": file_path,
+            "repository": repository,
+            "chunks": chunks,
+            "total_chunks": len(chunks)
+        }
+
+    def save(self) -> Dict[str, Any]:
+        """Save the index to disk as a new immutable snapshot."""
+        with self._lock:
+            manifest = self.snapshots.write(self.index, {
+                "backend": "FAISS" if FAISS_AVAILABLE else "In-Memory",
+                "embedding_model": self.embedding_generator.model_name,
+                "dimension": self.index.dimension,
+                "total_vectors": len(self.index.metadata)
+            })
+            self.version = manifest["version"]
+            return manifest
+
+    def load(self, version: Optional[int] = None) -> bool:
+        """
+        Load a snapshot from disk and atomically swap it in.
+
+        The snapshot is read into a fresh backend without holding the lock, so
+        searches keep being served from the current backend until the swap.
+        Inserts, deletes and clears arriving meanwhile wait for the swap and
+        then apply to the loaded snapshot, instead of being applied to the
+        outgoing backend and lost. Defaults to the CURRENT snapshot, falling
+        back to the legacy single-file layout when no snapshots exist yet.
+        """
+        with self._lock:
+            self._loading += 1
+        try:
+            if version is None:
+                version = self.snapshots.current_version()
+
+            backend = self._create_backend(self.dimension)
+            generator = None
+            if version is not None:
+                manifest = self.snapshots.read(version, backend)
+                generator = self._generator_for(manifest.get("embedding_model"))
+            else:
+                legacy_index = os.path.join(self.data_dir, INDEX_FILE_NAME)
+                legacy_metadata = os.path.join(self.data_dir, METADATA_FILE_NAME)
+                if not backend.load(legacy_index, legacy_metadata):
+                    return False
+
+            groups = ChunkGroups(backend.metadata)
+            with self._lock:
+                self._swap(backend, generator, groups)
+                self.version = version
+        finally:
+            with self._lock:
+                self._loading -= 1
+                self._loaded.notify_all()
+        logger.info(f"Index snapshot v{version} swapped in" if version else "Legacy index loaded")
+        return True
+
+    def _generator_for(self, model_name: Optional[str]) -> Optional[EmbeddingGenerator]:
+        """
+        Get a generator for the model a snapshot was built with.
+
+        Queries must be embedded with the same model as the stored vectors, so
+        a snapshot built with another model keeps being served with that model
+        until a re-embedding job migrates it to EMBEDDING_MODEL.
+        """
+        if not model_name or model_name == self.embedding_generator.model_name:
+            return None
+
+        logger.warning(f"Index snapshot was built with {model_name}, not "
+                       f"{self.embedding_generator.model_name}; re-embedding required")
+        try:
+            return EmbeddingGenerator(model_name)
+        except Exception as e:
+            raise ValueError(f"Embedding model {model_name} of the snapshot could not be loaded: {e}")
+
+    def start_reembed(self, model_name: Optional[str] = None, batch_size: Optional[int] = None,
+                      workers: Optional[int] = None) -> Dict[str, Any]:
+        """Start re-embedding the index with a new model in a background thread."""
+        with self._lock:
+            if self.reembed_job and self.reembed_job.status in ("pending", "running"):
+                raise ValueError("A re-embedding job is already running")
+
+            self.reembed_job = ReembedJob(
+                self,
+                model_name or EMBEDDING_MODEL,
+                batch_size=batch_size or REEMBED_BATCH_SIZE,
+                workers=workers or REEMBED_WORKERS
+            )
+
+        thread = threading.Thread(target=self.reembed_job.run, name="reembed", daemon=True)
+        thread.start()
+        return self.reembed_job.progress()
+
+    def reembed_status(self) -> Optional[Dict[str, Any]]:
+        """Get the progress of the most recent re-embedding job."""
+        return self.reembed_job.progress() if self.reembed_job else None
+
+    def rollback(self, version: Optional[int] = None) -> Dict[str, Any]:
+        """Swap back to a previous snapshot (the one before the current by default)."""
+        versions = self.snapshots.versions()
+        if version is None:
+            older = [v for v in versions if self.version is None or v < self.version]
+            if not older:
+                raise ValueError("No previous snapshot to roll back to")
+            version = older[-1]
+
+        self.load(version)
+        self.snapshots.set_current(version)
+        return self.snapshots.manifest(version)
+
+    def list_snapshots(self) -> Dict[str, Any]:
+        """List available snapshots and the active version."""
+        return {
+            "current_version": self.version,
+            "snapshots": self.snapshots.list()
+        }
+
+    def delete_files(self, file_paths: List[str], save: bool = True,
+                     repository: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Remove all chunks of the given files, e.g. before re-inserting
+        modified files or after files were deleted. With ``repository``,
+        only chunks tagged with that repository (``meta["repository"]``)
+        go; otherwise the paths are matched in every repository.
+
+        A copy of the backend without those chunks is swapped in, so
+        searches keep being served meanwhile. ``save=False`` skips writing
+        a snapshot, as for insert.
+        """
+        with self._lock:
+            self._await_loads()
+            ids = set()
+            files = 0
+            for file_path in set(file_paths):
+                file_ids = self.groups.file_ids(file_path, repository)
+                files += bool(file_ids)
+                ids.update(file_ids)
+            if ids:
+                self._swap(self.index.without(ids))
+                if save:
+                    self.save()
+        logger.info(f"Deleted {len(ids)} chunks of {files} files")
+        return {"deleted_count": len(ids), "files_deleted": files, "message": "Chunks deleted successfully"}
+
     def clear(self):
         """Clear the entire index."""
-        self.index.clear()
-        self.save()
+        with self._lock:
+            self._await_loads()
+            self._swap(self._create_backend(self.dimension))
+            self.save()
         return {"message": "Index cleared successfully"}
     
     def stats(self) -> Dict[str, Any]:
@@ -410,6 +1126,10 @@ class VectorIndex:
         base_stats.update({
             "embedding_model": self.embedding_generator.model_name,
             "backend": "FAISS" if FAISS_AVAILABLE else "In-Memory",
-            "data_directory": DATA_DIR
+            "data_directory": self.data_dir,
+            "file_count": self.groups.file_count,
+            "snapshot_version": self.version,
+            "target_embedding_model": EMBEDDING_MODEL,
+            "reembed_required": self.embedding_generator.model_name != EMBEDDING_MODEL
         })
         return base_stats
@@ -0,0 +1,45 @@
+"""
+Shared test fixtures.
+
+The services keep their state under /app/data by default and open it when
+imported or first used, so tests point every state path at temporary
+directories instead of writing to the host.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+# Read when the services are imported, so set before any test module imports them
+_STATE_DIR = tempfile.mkdtemp(prefix="contextforge-tests-")
+os.environ["DATA_DIR"] = os.path.join(_STATE_DIR, "index")
+os.environ["MANIFEST_DIR"] = os.path.join(_STATE_DIR, "manifests")
+os.environ["CHUNK_CACHE_PATH"] = os.path.join(_STATE_DIR, "chunk_cache.sqlite3")
+os.environ["IMPORT_GRAPH_PATH"] = os.path.join(_STATE_DIR, "import_graph.sqlite3")
+os.environ["CACHE_DIR"] = os.path.join(_STATE_DIR, "web_cache")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_STATE_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def preprocessor_state(tmp_path, monkeypatch):
+    """Give each test an empty chunk cache and import graph under ``tmp_path``."""
+    preprocessor_app = sys.modules.get("services.preprocessor.app")
+    if preprocessor_app is None:
+        yield
+        return
+    from services.preprocessor.chunk_cache import ChunkCache
+    from services.preprocessor.import_graph import ImportGraph
+
+    cache = ChunkCache(str(tmp_path / "chunk_cache.sqlite3"))
+    graph = ImportGraph(str(tmp_path / "import_graph.sqlite3"))
+    monkeypatch.setattr(preprocessor_app.engine, "cache", cache)
+    monkeypatch.setattr(preprocessor_app, "import_graph", graph)
+    yield
+    cache.close()
+    graph.close()
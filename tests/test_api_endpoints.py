@@ -4,6 +4,7 @@ Tests for API Gateway endpoints.
 
 import pytest
 import json
+import requests
 from unittest.mock import Mock, patch, MagicMock
 from fastapi.testclient import TestClient
 
@@ -15,6 +16,26 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services', 'api_g
 from app import app
 
 
+def _connector_stream(files, changes=None, head_commit=None, manifest_token=None):
+    """A connector response streaming files as NDJSON, then its summary."""
+    response = Mock()
+    response.status_code = 200
+    response.iter_lines.return_value = [
+        json.dumps({"type": "repository", "repository_path": "/test/repo"}).encode()
+    ] + [
+        json.dumps({"type": "file", "file": file, "change": change}).encode()
+        for file, change in files
+    ] + [json.dumps({
+        "type": "summary",
+        "repository_path": "/test/repo",
+        "changes": changes or {"added": [], "modified": [], "deleted": [], "unchanged": 0},
+        "head_commit": head_commit,
+        "manifest_token": manifest_token,
+        "stats": {}
+    }).encode()]
+    return response
+
+
 class TestAPIGatewayEndpoints:
     """Test the API Gateway endpoints."""
     
@@ -114,23 +135,19 @@ class TestAPIGatewayEndpoints:
     def test_ingest_endpoint_success(self, mock_post):
         """Test successful ingestion endpoint."""
         # Mock service responses - must match what the code expects
-        mock_connector_response = Mock()
-        mock_connector_response.status_code = 200
-        mock_connector_response.json.return_value = {
-            "files": [
-                {"path": "file1.py", "content": "print('hello')"},
-                {"path": "file2.js", "content": "console.log('hello')"}
-            ]
-        }
+        mock_connector_response = _connector_stream([
+            ({"path": "file1.py", "content": "print('hello')"}, "added"),
+            ({"path": "file2.js", "content": "console.log('hello')"}, "added")
+        ])
 
+        # The preprocessor streams chunks as NDJSON
         mock_preprocessor_response = Mock()
         mock_preprocessor_response.status_code = 200
-        mock_preprocessor_response.json.return_value = {
-            "chunks": [
-                {"text": "chunk1", "meta": {}},
-                {"text": "chunk2", "meta": {}}
-            ]
-        }
+        mock_preprocessor_response.iter_lines.return_value = [
+            json.dumps({"type": "chunk", "chunk": {"text": "chunk1", "meta": {}}}).encode(),
+            json.dumps({"type": "chunk", "chunk": {"text": "chunk2", "meta": {}}}).encode(),
+            json.dumps({"type": "summary", "stats": {"processing_errors": []}}).encode()
+        ]
 
         mock_vector_response = Mock()
         mock_vector_response.status_code = 200
@@ -138,10 +155,14 @@ class TestAPIGatewayEndpoints:
             "indexed_count": 2
         }
 
+        mock_save_response = Mock()
+        mock_save_response.status_code = 200
+
         mock_post.side_effect = [
             mock_connector_response,
             mock_preprocessor_response,
-            mock_vector_response
+            mock_vector_response,
+            mock_save_response
         ]
 
         # Test ingestion
@@ -161,6 +182,184 @@ class TestAPIGatewayEndpoints:
         assert data["stats"]["files_processed"] == 2
         assert data["stats"]["chunks_indexed"] == 2
     
+    @patch('app.INGEST_BATCH_SIZE', 2)
+    @patch('requests.post')
+    def test_ingest_endpoint_pipelines_batches(self, mock_post):
+        """Test that streamed chunks are indexed in batches and saved once."""
+        mock_connector_response = _connector_stream([
+            ({"path": "file1.py", "content": "print('hello')"}, "added")
+        ])
+
+        mock_preprocessor_response = Mock()
+        mock_preprocessor_response.iter_lines.return_value = [
+            json.dumps({"type": "chunk", "chunk": {"text": f"chunk{i}", "meta": {}}}).encode()
+            for i in range(5)
+        ] + [
+            json.dumps({"type": "error", "file_path": "bad.py", "error": "boom"}).encode(),
+            b""
+        ]
+
+        def post(url, **kwargs):
+            if url.endswith("/connect"):
+                return mock_connector_response
+            if url.endswith("/process"):
+                assert kwargs["json"]["stream"] is True
+                return mock_preprocessor_response
+            response = Mock()
+            if url.endswith("/index/insert"):
+                assert kwargs["json"]["save"] is False
+                response.json.return_value = {"indexed_count": len(kwargs["json"]["chunks"])}
+            return response
+
+        mock_post.side_effect = post
+
+        response = self.client.post("/ingest", json={"path": "/test/repo"})
+
+        assert response.status_code == 200
+        stats = response.json()["stats"]
+        assert stats["chunks_created"] == 5
+        assert stats["chunks_indexed"] == 5
+        assert stats["processing_errors"] == ["Error processing bad.py: boom"]
+
+        urls = [call.args[0] for call in mock_post.call_args_list]
+        assert sum(url.endswith("/index/insert") for url in urls) == 3
+        assert sum(url.endswith("/index/save") for url in urls) == 1
+        assert urls[-1].endswith("/index/save")
+
+    @patch('requests.post')
+    def test_ingest_endpoint_incremental(self, mock_post):
+        """Test that incremental ingestion drops stale chunks and only processes changed files."""
+        mock_connector_response = _connector_stream(
+            [({"path": "changed.py", "content": "x = 2"}, "modified")],
+            changes={"added": [], "modified": ["changed.py"], "deleted": ["old.py"], "unchanged": 4},
+            head_commit="abc123"
+        )
+        mock_preprocessor_response = Mock()
+        mock_preprocessor_response.iter_lines.return_value = [
+            json.dumps({"type": "chunk", "chunk": {"text": "x = 2", "meta": {}}}).encode()
+        ]
+
+        def post(url, **kwargs):
+            if url.endswith("/connect"):
+                assert kwargs["json"]["delta"] is True
+                assert kwargs["json"]["stream"] is True
+                return mock_connector_response
+            if url.endswith("/process"):
+                return mock_preprocessor_response
+            response = Mock()
+            if url.endswith("/index/delete"):
+                response.json.return_value = {"deleted_count": len(kwargs["json"]["file_paths"]) * 2}
+            elif url.endswith("/index/insert"):
+                response.json.return_value = {"indexed_count": len(kwargs["json"]["chunks"])}
+            return response
+
+        mock_post.side_effect = post
+
+        response = self.client.post("/ingest", json={"path": "/test/repo", "incremental": True})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["stats"]["chunks_deleted"] == 4
+        assert data["stats"]["chunks_indexed"] == 1
+        assert data["stats"]["files_modified"] == 1
+        assert data["stats"]["files_deleted"] == 1
+        assert data["stats"]["files_unchanged"] == 4
+        assert data["head_commit"] == "abc123"
+
+        # Stale chunks of the modified file go before its new ones are inserted
+        calls = [(call.args[0].rsplit("/", 1)[-1], call.kwargs.get("json")) for call in mock_post.call_args_list]
+        assert [name for name, _ in calls] == ["connect", "delete", "process", "insert", "delete", "remove", "save"]
+        assert calls[1][1]["file_paths"] == ["changed.py"]
+        assert calls[4][1]["file_paths"] == ["old.py"]
+        # Only this repository's chunks are deleted, and new ones are tagged with it
+        assert calls[1][1]["repository"] == calls[4][1]["repository"] == "/test/repo"
+        assert calls[3][1]["chunks"][0]["meta"]["repository"] == "/test/repo"
+        # Deleted files also leave the import graph
+        assert calls[5][1] == {"file_paths": ["old.py"], "repository": "/test/repo"}
+        assert calls[2][1]["repository"] == "/test/repo"
+
+    @patch('requests.post')
+    def test_ingest_endpoint_commits_manifest_after_indexing(self, mock_post):
+        """Test that the connector's snapshot is committed after the index is saved, without failed files."""
+        mock_connector_response = _connector_stream(
+            [({"path": "good.py", "content": "x = 1"}, "added"),
+             ({"path": "bad.py", "content": "x ="}, "added")],
+            changes={"added": ["good.py", "bad.py"], "modified": [], "deleted": [], "unchanged": 0},
+            manifest_token="token1"
+        )
+        mock_preprocessor_response = Mock()
+        mock_preprocessor_response.iter_lines.return_value = [
+            json.dumps({"type": "chunk", "chunk": {"text": "x = 1", "meta": {}}}).encode(),
+            json.dumps({"type": "error", "file_path": "bad.py", "error": "boom"}).encode(),
+            json.dumps({"type": "summary", "stats": {"processing_errors": ["Error processing bad.py: boom"]}}).encode()
+        ]
+
+        def post(url, **kwargs):
+            if url.endswith("/connect"):
+                assert kwargs["json"]["defer_manifest"] is True
+                return mock_connector_response
+            if url.endswith("/process"):
+                return mock_preprocessor_response
+            response = Mock()
+            if url.endswith("/index/delete"):
+                response.json.return_value = {"deleted_count": 0}
+            elif url.endswith("/index/insert"):
+                response.json.return_value = {"indexed_count": len(kwargs["json"]["chunks"])}
+            return response
+
+        mock_post.side_effect = post
+
+        response = self.client.post("/ingest", json={"path": "/test/repo", "incremental": True})
+
+        assert response.status_code == 200
+        calls = [(call.args[0].rsplit("/", 1)[-1], call.kwargs.get("json")) for call in mock_post.call_args_list]
+        assert [name for name, _ in calls] == ["connect", "delete", "process", "insert", "save", "commit"]
+        # Added files are cleared first, in case a failed ingestion left them in the index
+        assert calls[1][1]["file_paths"] == ["good.py", "bad.py"]
+        assert calls[5][1] == {"path": "/test/repo", "token": "token1", "exclude": ["bad.py"]}
+
+    @patch('requests.post')
+    def test_ingest_endpoint_keeps_manifest_when_indexing_fails(self, mock_post):
+        """Test that the connector's snapshot is not committed when indexing fails."""
+        mock_connector_response = _connector_stream(
+            [({"path": "good.py", "content": "x = 1"}, "added")], manifest_token="token1"
+        )
+        mock_preprocessor_response = Mock()
+        mock_preprocessor_response.iter_lines.return_value = [
+            json.dumps({"type": "chunk", "chunk": {"text": "x = 1", "meta": {}}}).encode()
+        ]
+
+        def post(url, **kwargs):
+            if url.endswith("/connect"):
+                return mock_connector_response
+            if url.endswith("/process"):
+                return mock_preprocessor_response
+            response = Mock()
+            if url.endswith("/index/insert"):
+                response.raise_for_status.side_effect = requests.HTTPError("index down")
+            return response
+
+        mock_post.side_effect = post
+
+        response = self.client.post("/ingest", json={"path": "/test/repo"})
+
+        assert response.status_code == 503
+        assert not any(call.args[0].endswith("/manifest/commit") for call in mock_post.call_args_list)
+
+    @patch('requests.post')
+    def test_ingest_endpoint_connector_stream_failure(self, mock_post):
+        """Test that a connector stream cut short fails the ingestion."""
+        mock_connector_response = Mock()
+        mock_connector_response.iter_lines.return_value = [
+            json.dumps({"type": "error", "file_path": None, "error": "Connection failed: disk"}).encode()
+        ]
+        mock_post.return_value = mock_connector_response
+
+        response = self.client.post("/ingest", json={"path": "/test/repo"})
+
+        assert response.status_code == 500
+        assert "Connection failed: disk" in response.json()["detail"]
+
     def test_ingest_endpoint_missing_path(self):
         """Test ingestion endpoint with missing path."""
         response = self.client.post("/ingest", json={})
@@ -16,10 +16,52 @@ from lang_chunkers import (
     PythonChunker,
     JavaScriptChunker,
     MarkdownChunker,
-    ChunkerFactory
+    ChunkerFactory,
+    LineIndex,
+    TypeScriptChunker,
+    GoChunker,
+    RustChunker,
+    JavaChunker,
+    JSONChunker,
+    YAMLChunker,
+    TOMLChunker,
+    ChunkSizer,
+    TokenSizer,
+    get_chunk_sizer,
+    FixedWindowChunker,
+    detect_generated,
+    compact_metadata,
+    derive_metadata,
+    _load_tree_sitter_language,
+    _scan_js_code
 )
 
 
+def word_tokenizer(model_max_length=512):
+    """A local BERT-style fast tokenizer: one token per word or punctuation mark, plus [CLS]/[SEP]."""
+    pytest.importorskip("tokenizers")
+    transformers = pytest.importorskip("transformers")
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    
+    tokenizer = Tokenizer(models.WordPiece({"[UNK]": 0, "[CLS]": 1, "[SEP]": 2}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 1), ("[SEP]", 2)]
+    )
+    return transformers.PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, unk_token="[UNK]", cls_token="[CLS]", sep_token="[SEP]",
+        model_max_length=model_max_length
+    )
+
+
+def requires_grammar(grammar):
+    """Skip a test when the tree-sitter grammar is not installed."""
+    return pytest.mark.skipif(
+        _load_tree_sitter_language(grammar) is None,
+        reason=f"tree-sitter {grammar} grammar not installed"
+    )
+
+
 class TestPythonChunker:
     """Test the PythonChunker functionality."""
     
@@ -169,6 +211,112 @@ def broken_function(
         assert "broken_function" in text_content
 
 
+class TestPythonChunkerHierarchy:
+    """Test single-pass hierarchical Python chunking."""
+    
+    CODE = '''import os
+import sys
+
+VERSION = "1.0"
+
+
+class Repository(Base):
+    """Stores items."""
+    
+    table = "items"
+    
+    def __init__(self, db):
+        self.db = db
+    
+    def find(self, item_id):
+        """Find an item."""
+        return self.db.get(self.table, item_id)
+
+
+def helper():
+    return 1
+'''
+    
+    def test_method_granularity_has_no_duplicate_text(self):
+        """Test that methods are not repeated inside the class chunk."""
+        chunks = PythonChunker(granularity="method").chunk(self.CODE, "repo.py")
+        by_type = {}
+        for chunk in chunks:
+            by_type.setdefault(chunk["meta"]["chunk_type"], []).append(chunk)
+        
+        class_chunk = by_type["class"][0]
+        assert "table = \"items\"" in class_chunk["text"]
+        assert "def find" not in class_chunk["text"]
+        # The header spans the whole class so methods nest under it
+        assert (class_chunk["meta"]["start_line"], class_chunk["meta"]["end_line"]) == (7, 17)
+        methods = {c["meta"]["function_name"]: c for c in by_type["function"]}
+        assert methods["find"]["meta"]["qualified_name"] == "Repository.find"
+        assert "parent" not in methods["helper"]["meta"]
+        assert len(by_type["import"]) == 1
+        assert by_type["import"][0]["meta"]["modules"] == ["os", "sys"]
+        
+        lines = [line.strip() for c in chunks for line in c["text"].split("\n") if line.strip()]
+        assert len(lines) == len(set(lines))
+    
+    def test_class_granularity_keeps_classes_whole(self):
+        """Test that classes that fit are emitted as one chunk."""
+        chunks = PythonChunker(granularity="class").chunk(self.CODE, "repo.py")
+        
+        class_chunk = next(c for c in chunks if c["meta"]["chunk_type"] == "class")
+        assert "def find" in class_chunk["text"]
+        assert [c["meta"]["function_name"] for c in chunks
+                if c["meta"]["chunk_type"] == "function"] == ["helper"]
+    
+    def test_module_granularity(self):
+        """Test that a small module is one chunk and a large one is split."""
+        chunks = PythonChunker(granularity="module").chunk(self.CODE, "repo.py")
+        assert len(chunks) == 1
+        assert chunks[0]["meta"]["chunk_type"] == "module"
+        assert chunks[0]["meta"]["names"] == ["Repository", "helper"]
+        
+        chunks = PythonChunker(max_chunk_size=200, granularity="module").chunk(self.CODE, "repo.py")
+        assert len(chunks) > 1
+        assert all(len(c["text"]) <= 200 for c in chunks)
+    
+    def test_oversized_function_is_split_at_statements(self):
+        """Test that a function larger than max_chunk_size is split into parts."""
+        body = "".join(f"    value_{i} = compute({i})\n" for i in range(40))
+        code = f"def build():\n    \"\"\"Build values.\"\"\"\n{body}"
+        
+        chunks = PythonChunker(max_chunk_size=300).chunk(code, "build.py")
+        
+        assert len(chunks) > 1
+        assert [c["meta"]["part"] for c in chunks] == list(range(1, len(chunks) + 1))
+        assert all(c["meta"]["function_name"] == "build" for c in chunks)
+        assert all(len(c["text"]) <= 300 for c in chunks)
+        assert chunks[0]["text"].startswith("def build():")
+        assert chunks[-1]["meta"]["end_line"] == 42
+    
+    def test_tiny_functions_are_merged(self):
+        """Test that runs of functions below min_chunk_size share a chunk."""
+        code = "def a(): pass\ndef b(): pass\ndef c(): pass\n\n\ndef large():\n    return 1\n"
+        
+        chunks = PythonChunker(min_chunk_size=20).chunk(code, "small.py")
+        
+        assert chunks[0]["meta"]["chunk_type"] == "functions"
+        assert chunks[0]["meta"]["function_names"] == ["a", "b", "c"]
+        assert chunks[1]["meta"]["function_name"] == "large"
+    
+    def test_decorators_and_comments_stay_with_definition(self):
+        """Test that leading comments and decorators are part of the chunk."""
+        code = "# Cached lookup\n@lru_cache()\ndef lookup(key):\n    return key\n"
+        
+        chunk = PythonChunker().chunk(code, "cache.py")[0]
+        
+        assert chunk["meta"]["start_line"] == 1
+        assert chunk["text"].startswith("# Cached lookup\n@lru_cache()")
+    
+    def test_unknown_granularity(self):
+        """Test that an unknown granularity is rejected."""
+        with pytest.raises(ValueError):
+            PythonChunker(granularity="statement")
+
+
 class TestJavaScriptChunker:
     """Test the JavaScriptChunker functionality."""
     
@@ -310,6 +458,356 @@ function outerFunction() {
         assert "innerFunction" in outer_chunk["text"]
         assert "arrowInner" in outer_chunk["text"]
 
+    def test_braces_in_strings_comments_and_templates(self):
+        """Test that braces inside literals and comments do not end a block."""
+        code = """function render(user) {
+    const open = "{";
+    const close = '}'; // a } in a comment
+    /* and { in a block comment */
+    const html = `<div>${ {name: user.name}.name }}</div>`;
+    return html;
+}
+
+function next() {
+    return 1;
+}
+"""
+        
+        chunks = self.chunker.chunk(code, "render.js")
+        
+        render = next(c for c in chunks if c["meta"].get("name") == "render")
+        assert render["meta"]["start_line"] == 1
+        assert render["meta"]["end_line"] == 7
+        assert render["text"].endswith("return html;\n}")
+        
+        following = next(c for c in chunks if c["meta"].get("name") == "next")
+        assert following["meta"]["start_line"] == 9
+        assert following["meta"]["end_line"] == 11
+    
+    def test_unclosed_block_is_skipped(self):
+        """Test that the brace scanner reports blocks that never close."""
+        code = "function broken() {\n    const s = `${ {a: 1} `;\n"
+        
+        assert _scan_js_code(code, code.index("{")) == -1
+    
+    def test_regex_fallback_without_tree_sitter(self):
+        """Test that the regex chunker is used when the grammar is unavailable."""
+        code = """import a from 'a';
+function render() {
+    return "}";
+}
+const helper = () => {
+    return 1;
+};
+"""
+        
+        with patch("lang_chunkers._get_tree_sitter_parser", return_value=None):
+            chunks = self.chunker.chunk(code, "fallback.js")
+        
+        by_name = {c["meta"].get("name"): c for c in chunks}
+        assert by_name["render"]["meta"]["end_line"] == 4
+        assert by_name["helper"]["meta"]["chunk_type"] == "arrow_function"
+        assert any(c["meta"]["chunk_type"] == "import" for c in chunks)
+    
+    def test_line_numbers_match_newline_counting(self):
+        """Test that the line index agrees with counting newlines before each offset."""
+        content = "a\n\nbc\nd\n"
+        line_index = LineIndex(content)
+        
+        for pos in range(len(content) + 1):
+            assert line_index.line_of(pos) == content[:pos].count("\n") + 1
+    
+    @pytest.mark.slow
+    def test_large_file_chunking_is_linear(self):
+        """Test that multi-MB files chunk in roughly linear time."""
+        import time
+        
+        unit = "".join(
+            f"function f{i}() {{\n  return `${{ {{v: {i}}}.v }}`;\n}}\n" for i in range(200)
+        )
+        small = unit * 50
+        large = small * 8
+        
+        timings = []
+        for content in (small, large):
+            start = time.perf_counter()
+            chunks = self.chunker.chunk(content, "bundle.js")
+            timings.append(time.perf_counter() - start)
+        
+        assert len(chunks) == 200 * 50 * 8
+        assert chunks[-1]["meta"]["end_line"] == large.count("\n")
+        # Linear scaling gives ~8x; the old per-match newline counting was ~64x
+        assert timings[1] < timings[0] * 24
+
+
+class TestTreeSitterChunkers:
+    """Test the tree-sitter chunkers for TypeScript, Go, Rust and Java."""
+    
+    def _by_type(self, chunks):
+        by_type = {}
+        for chunk in chunks:
+            by_type.setdefault(chunk["meta"]["chunk_type"], []).append(chunk["meta"].get("name"))
+        return by_type
+    
+    @requires_grammar("typescript")
+    def test_typescript_declarations(self):
+        """Test TypeScript interfaces, types, enums and exported classes."""
+        code = """import { Injectable } from '@angular/core';
+import type { User } from './user';
+
+export interface Repository<T> {
+    find(id: string): Promise<T>;
+}
+
+type Id = string | number;
+
+enum Color { Red, Green }
+
+export class UserService implements Repository<User> {
+    async find(id: string): Promise<User> {
+        return { id } as User;
+    }
+}
+"""
+        
+        chunks = TypeScriptChunker().chunk(code, "service.ts")
+        by_type = self._by_type(chunks)
+        
+        assert by_type["interface"] == ["Repository"]
+        assert by_type["type"] == ["Id"]
+        assert by_type["enum"] == ["Color"]
+        assert by_type["class"] == ["UserService"]
+        # Adjacent imports are merged into one chunk
+        assert len(by_type["import"]) == 1
+        service = next(c for c in chunks if c["meta"].get("name") == "UserService")
+        assert service["text"].startswith("export class UserService")
+        assert service["meta"]["start_line"] == 12
+        assert service["meta"]["language"] == "typescript"
+    
+    @requires_grammar("tsx")
+    def test_tsx_component(self):
+        """Test that TSX files are parsed with the TSX grammar."""
+        code = """const Button = ({ label }: Props) => {
+    return <button className="primary">{label}</button>;
+};
+"""
+        
+        chunks = TypeScriptChunker().chunk(code, "Button.tsx")
+        
+        assert self._by_type(chunks)["arrow_function"] == ["Button"]
+    
+    @requires_grammar("go")
+    def test_go_declarations(self):
+        """Test Go functions, methods and types."""
+        code = """package main
+
+import (
+    "fmt"
+)
+
+type Server struct {
+    addr string
+}
+
+func (s *Server) Start() error {
+    fmt.Println(s.addr)
+    return nil
+}
+
+func main() {
+    s := &Server{addr: ":8080"}
+    s.Start()
+}
+"""
+        
+        by_type = self._by_type(GoChunker().chunk(code, "main.go"))
+        
+        assert by_type["type"] == ["Server"]
+        assert by_type["method"] == ["Start"]
+        assert by_type["function"] == ["main"]
+        assert len(by_type["import"]) == 1
+    
+    @requires_grammar("rust")
+    def test_rust_declarations(self):
+        """Test Rust structs, traits, impls and functions."""
+        code = """use std::fmt;
+
+pub struct Point { x: i32, y: i32 }
+
+pub trait Shape {
+    fn area(&self) -> f64;
+}
+
+impl fmt::Display for Point {
+    fn fmt(&self, f: &mut fmt::Formatter) -> fmt::Result {
+        write!(f, "({}, {})", self.x, self.y)
+    }
+}
+
+fn main() {}
+"""
+        
+        chunks = RustChunker().chunk(code, "lib.rs")
+        by_type = self._by_type(chunks)
+        
+        assert by_type["struct"] == ["Point"]
+        assert by_type["trait"] == ["Shape"]
+        assert by_type["impl"] == ["Point"]
+        assert set(by_type["function"]) == {"fmt", "main"}
+        # The impl is a header spanning its methods, which are not repeated in it
+        impl = next(c for c in chunks if c["meta"]["chunk_type"] == "impl")
+        assert impl["text"] == "impl fmt::Display for Point {\n}"
+        assert (impl["meta"]["start_line"], impl["meta"]["end_line"]) == (9, 13)
+        assert impl["meta"]["members"] == ["fmt"]
+        fmt = next(c for c in chunks if c["meta"].get("name") == "fmt")
+        assert fmt["meta"]["qualified_name"] == "Point.fmt"
+        assert sum("write!" in c["text"] for c in chunks) == 1
+    
+    @requires_grammar("java")
+    def test_java_declarations(self):
+        """Test Java classes, constructors and methods."""
+        code = """import java.util.List;
+import java.util.ArrayList;
+
+public class Inventory {
+    private final List<String> items = new ArrayList<>();
+
+    public Inventory() {}
+
+    public void add(String item) {
+        items.add(item);
+    }
+}
+"""
+        
+        chunks = JavaChunker().chunk(code, "Inventory.java")
+        by_type = self._by_type(chunks)
+        
+        assert by_type["class"] == ["Inventory"]
+        assert by_type["constructor"] == ["Inventory"]
+        assert by_type["method"] == ["add"]
+        inventory = next(c for c in chunks if c["meta"]["chunk_type"] == "class")
+        assert (inventory["meta"]["start_line"], inventory["meta"]["end_line"]) == (4, 12)
+        # The class keeps its fields; its members are chunks of their own
+        assert inventory["text"] == ("public class Inventory {\n"
+                                     "    private final List<String> items = new ArrayList<>();\n}")
+        assert inventory["meta"]["members"] == ["Inventory", "add"]
+        assert sum("items.add(item)" in c["text"] for c in chunks) == 1
+    
+    @requires_grammar("java")
+    def test_java_doc_comments_stay_with_members(self):
+        """Test that a method's Javadoc goes with the method rather than the class header."""
+        code = """/** Stores items. */
+public class Inventory {
+    /**
+     * Adds an item.
+     */
+    public void add(String item) {}
+
+    class Entry {
+        int count() { return 0; }
+    }
+}
+"""
+        
+        chunks = JavaChunker().chunk(code, "Inventory.java")
+        by_name = {c["meta"]["name"]: c for c in chunks}
+        
+        assert by_name["Inventory"]["text"] == "/** Stores items. */\npublic class Inventory {\n}"
+        assert by_name["add"]["text"].startswith("/**\n     * Adds an item.")
+        assert by_name["add"]["meta"]["start_line"] == 3
+        assert by_name["Entry"]["text"] == "class Entry {\n    }"
+        assert by_name["count"]["meta"]["qualified_name"] == "Inventory.Entry.count"
+    
+    @requires_grammar("javascript")
+    def test_javascript_nested_functions_stay_in_their_function(self):
+        """Test that functions nested in a function are not chunked again."""
+        code = """function outer() {
+  function inner() {}
+  return inner;
+}
+"""
+        
+        chunks = JavaScriptChunker().chunk(code, "outer.js")
+        
+        assert [c["meta"]["name"] for c in chunks] == ["outer"]
+    
+    def test_missing_grammar_falls_back_to_lines(self):
+        """Test that code is still chunked when the grammar is not installed."""
+        with patch("lang_chunkers._get_tree_sitter_parser", return_value=None):
+            chunks = GoChunker().chunk("package main\n\nfunc main() {}\n", "main.go")
+        
+        assert chunks
+        assert all(c["meta"]["chunk_type"] == "text_block" for c in chunks)
+
+
+class TestDataFileChunkers:
+    """Test the JSON, YAML and TOML chunkers."""
+    
+    def test_json_splits_members_and_nested_objects(self):
+        """Test that JSON is split at keys, expanding oversized objects."""
+        import json
+        content = json.dumps({
+            "name": "app",
+            "scripts": {f"script{i}": "x" * 40 for i in range(20)},
+            "private": True
+        }, indent=2)
+        
+        chunks = JSONChunker(max_chunk_size=200).chunk(content, "package.json")
+        keys = [key for c in chunks for key in c["meta"]["keys"]]
+        
+        assert keys[0] == "name"
+        assert "scripts.script0" in keys and "scripts.script19" in keys
+        assert keys[-1] == "private"
+        assert all(c["meta"]["chunk_type"] == "data_section" for c in chunks)
+        assert all(len(c["text"]) <= 200 for c in chunks)
+        assert chunks[0]["meta"]["start_line"] == 2
+        assert chunks[0]["meta"]["language"] == "json"
+    
+    def test_json_invalid_falls_back(self):
+        """Test that malformed JSON is still chunked as text."""
+        chunks = JSONChunker().chunk('{"key": "unterminated', "broken.json")
+        
+        assert chunks[0]["meta"]["chunk_type"] == "text_block"
+    
+    def test_yaml_splits_top_level_keys(self):
+        """Test that YAML is split at top-level keys and documents."""
+        content = """# Compose file
+version: "3"
+services:
+  web:
+    image: nginx
+  db:
+    image: postgres
+---
+kind: ConfigMap
+"""
+        
+        chunks = YAMLChunker(max_chunk_size=40).chunk(content, "compose.yml")
+        keys = [key for c in chunks for key in c["meta"]["keys"]]
+        
+        assert keys[:2] == ["version", "services"] or keys[:3] == ["version", "services", "services.web"]
+        assert "services.db" in keys
+        assert "kind" in keys
+        assert chunks[0]["text"].startswith("# Compose file")
+    
+    def test_toml_splits_tables(self):
+        """Test that TOML is split at table headers with root keys first."""
+        content = """name = "demo"
+
+[tool.black]
+line-length = 100
+
+[[tool.mypy.overrides]]
+module = "tests.*"
+"""
+        
+        chunks = TOMLChunker(max_chunk_size=10).chunk(content, "pyproject.toml")
+        
+        assert [c["meta"]["name"] for c in chunks] == ["(root)", "tool.black", "tool.mypy.overrides"]
+        assert chunks[1]["meta"]["start_line"] == 3
+        assert chunks[1]["meta"]["end_line"] == 5
+
 
 class TestMarkdownChunker:
     """Test the MarkdownChunker functionality."""
@@ -454,6 +952,146 @@ This section has content.
         assert len(content_chunks) > 0
 
 
+class TestMarkdownScanner:
+    """Test fenced code tracking and oversized section splitting in MarkdownChunker."""
+    
+    def test_hash_lines_in_code_blocks_are_not_headings(self):
+        """Test that # comments inside fenced code stay in their section."""
+        markdown = """# Setup
+
+```bash
+# install dependencies
+pip install -r requirements.txt
+```
+
+~~~~python
+# Example
+run()
+```
+still code
+~~~~
+
+## Usage ##
+"""
+        
+        chunks = MarkdownChunker().chunk(markdown, "setup.md")
+        
+        assert [c["meta"]["heading"] for c in chunks] == ["Setup", "Usage"]
+        assert chunks[0]["meta"]["code_languages"] == ["bash", "python"]
+        assert "# install dependencies" in chunks[0]["text"]
+        assert chunks[1]["meta"]["start_line"] == 15
+    
+    def test_unclosed_fence_runs_to_end(self):
+        """Test that an unclosed fence swallows the rest of the file."""
+        markdown = "# Intro\n\n```\n# not a heading\n"
+        
+        chunks = MarkdownChunker().chunk(markdown, "intro.md")
+        
+        assert len(chunks) == 1
+        assert chunks[0]["meta"]["has_code"] is True
+    
+    def test_oversized_section_split_at_paragraphs(self):
+        """Test that large sections are split at blank lines, not inside code."""
+        paragraphs = "\n\n".join(f"Paragraph {i} " + "word " * 20 for i in range(8))
+        code = "```python\n" + "\n\n".join(f"x_{i} = {i}" for i in range(5)) + "\n```"
+        markdown = f"# Guide\n\n{paragraphs}\n\n{code}\n"
+        
+        chunks = MarkdownChunker(max_chunk_size=300).chunk(markdown, "guide.md")
+        
+        assert len(chunks) > 1
+        assert all(len(c["text"]) <= 300 for c in chunks)
+        assert all(c["meta"]["heading"] == "Guide" for c in chunks)
+        assert [c["meta"]["part"] for c in chunks] == list(range(1, len(chunks) + 1))
+        code_chunk = next(c for c in chunks if c["meta"]["has_code"])
+        # The code block is kept whole despite the blank lines inside it
+        assert code_chunk["text"].count("```") == 2
+        assert "x_0 = 0" in code_chunk["text"] and "x_4 = 4" in code_chunk["text"]
+        assert chunks[-1]["meta"]["end_line"] == markdown.count("\n")
+    
+    def test_blank_preamble_is_skipped(self):
+        """Test that whitespace before the first heading does not make a chunk."""
+        chunks = MarkdownChunker().chunk("\n\n# Title\n\nText\n", "title.md")
+        
+        assert len(chunks) == 1
+        assert chunks[0]["meta"]["start_line"] == 3
+
+
+class TestChunkSizing:
+    """Test size budgets in characters and in tokens."""
+    
+    def test_fallback_windows_overlap_within_budget(self):
+        """Test that fallback windows respect the size and overlap them by whole lines."""
+        content = "\n".join(f"line number {i:03d}" for i in range(60))
+        chunker = PythonChunker(max_chunk_size=200, overlap=40)
+        
+        chunks = chunker._fallback_chunk(content, "notes.txt")
+        
+        assert all(len(c["text"]) <= 200 for c in chunks)
+        for previous, current in zip(chunks, chunks[1:]):
+            assert current["meta"]["start_line"] <= previous["meta"]["end_line"]
+            assert current["meta"]["start_line"] > previous["meta"]["start_line"]
+        assert chunks[-1]["meta"]["end_line"] == 60
+    
+    def test_fallback_splits_long_lines(self):
+        """Test that a line longer than the budget is split instead of emitted whole."""
+        chunks = JavaScriptChunker(max_chunk_size=100)._fallback_chunk("x" * 350, "min.js")
+        
+        assert [len(c["text"]) for c in chunks] == [100, 100, 100, 50]
+    
+    def test_fit_to_budget_splits_oversized_chunks(self):
+        """Test that chunks over the budget are split into parts with their metadata."""
+        chunker = JavaScriptChunker(max_chunk_size=120)
+        chunk = chunker.create_chunk("\n".join(f"  total += {i};" for i in range(30)),
+                                     "sum.js", 10, 39, "function", {"name": "sum"})
+        
+        parts = chunker.fit_to_budget([chunk])
+        
+        assert len(parts) > 1
+        assert all(len(p["text"]) <= 120 for p in parts)
+        assert all(p["meta"]["name"] == "sum" for p in parts)
+        assert [p["meta"]["part"] for p in parts] == list(range(1, len(parts) + 1))
+        assert parts[0]["meta"]["start_line"] == 10
+        assert parts[-1]["meta"]["end_line"] == 39
+    
+    def test_token_sizer_counts_tokens(self):
+        """Test token counts, line sizes and splitting with a fast tokenizer."""
+        sizer = TokenSizer(word_tokenizer())
+        
+        assert sizer.size("def add(a, b):") == 8
+        assert sizer.line_sizes(["x = 1", "return x"]) == [3, 2]
+        assert sizer.reserved == 2
+        assert sizer.split("a b c d e", 2) == ["a b ", "c d ", "e"]
+    
+    def test_python_chunks_fit_token_budget(self):
+        """Test that Python chunks fit the model window including special tokens."""
+        sizer = TokenSizer(word_tokenizer())
+        body = "".join(f"    value_{i} = compute({i}, {i + 1})\n" for i in range(40))
+        code = f"import os\n\n\ndef build():\n{body}"
+        chunker = PythonChunker(max_chunk_size=64, sizer=sizer)
+        
+        chunks = chunker.fit_to_budget(chunker.chunk(code, "build.py"))
+        
+        assert len(chunks) > 2
+        assert all(sizer.size(c["text"]) + sizer.reserved <= 64 for c in chunks)
+    
+    def test_max_chunk_size_clamped_to_model_length(self):
+        """Test that chunks are never larger than the tokenizer's maximum length."""
+        chunker = MarkdownChunker(max_chunk_size=1000, sizer=TokenSizer(word_tokenizer(128)))
+        
+        assert chunker.max_chunk_size == 128
+        assert chunker.budget == 126
+    
+    def test_unavailable_tokenizer_falls_back_to_characters(self):
+        """Test that sizing falls back to characters when the tokenizer cannot load."""
+        get_chunk_sizer.cache_clear()
+        try:
+            with patch.dict("sys.modules", {"transformers": None}):
+                assert type(get_chunk_sizer("some/model")) is ChunkSizer
+            assert type(get_chunk_sizer("")) is ChunkSizer
+        finally:
+            get_chunk_sizer.cache_clear()
+
+
 class TestChunkerFactory:
     """Test the ChunkerFactory functionality."""
 
@@ -480,6 +1118,22 @@ class TestChunkerFactory:
             chunker = ChunkerFactory.get_chunker(filename)
             assert isinstance(chunker, MarkdownChunker)
 
+    def test_get_chunker_other_languages(self):
+        """Test getting tree-sitter and data-file chunkers."""
+        expected = {
+            "main.go": GoChunker,
+            "lib.rs": RustChunker,
+            "App.java": JavaChunker,
+            "module.ts": TypeScriptChunker,
+            "package.json": JSONChunker,
+            "config.yaml": YAMLChunker,
+            "compose.yml": YAMLChunker,
+            "pyproject.toml": TOMLChunker,
+        }
+        
+        for filename, chunker_class in expected.items():
+            assert type(ChunkerFactory.get_chunker(filename)) is chunker_class
+
     def test_get_chunker_unsupported(self):
         """Test getting chunker for unsupported file type."""
         # ChunkerFactory returns JavaScriptChunker as default for unsupported types
@@ -489,6 +1143,60 @@ class TestChunkerFactory:
         chunker = ChunkerFactory.get_chunker("image.png")
         assert isinstance(chunker, JavaScriptChunker)
 
+    def test_get_chunker_reuses_instances(self):
+        """Test that chunkers are cached per class and size settings."""
+        first = ChunkerFactory.get_chunker("a.py", max_chunk_size=500, overlap=50)
+        
+        assert ChunkerFactory.get_chunker("b.py", max_chunk_size=500, overlap=50) is first
+        assert ChunkerFactory.get_chunker("c.py", max_chunk_size=800, overlap=50) is not first
+        assert ChunkerFactory.get_chunker("d.js", max_chunk_size=500, overlap=50) is not first
+    
+    def test_get_chunker_by_final_extension(self):
+        """Test that dispatch uses the final, case-insensitive extension."""
+        assert type(ChunkerFactory.get_chunker("src/App.TSX")) is TypeScriptChunker
+        assert type(ChunkerFactory.get_chunker("types/index.d.ts")) is TypeScriptChunker
+        assert type(ChunkerFactory.get_chunker("docs.v2/Makefile")) is JavaScriptChunker
+    
+    def test_register_chunker(self):
+        """Test registering chunkers by call, decorator and class attribute."""
+        class IniChunker(JSONChunker):
+            extensions = (".ini", ".cfg")
+        
+        saved = dict(ChunkerFactory._chunkers)
+        try:
+            @ChunkerFactory.register(".kt", "kts")
+            class KotlinChunker(JavaChunker):
+                pass
+            ChunkerFactory.register(IniChunker)
+            
+            assert type(ChunkerFactory.get_chunker("Main.kt")) is KotlinChunker
+            assert type(ChunkerFactory.get_chunker("build.gradle.kts")) is KotlinChunker
+            assert type(ChunkerFactory.get_chunker("setup.cfg")) is IniChunker
+            assert ".ini" in ChunkerFactory.supported_extensions()
+            with pytest.raises(TypeError):
+                ChunkerFactory.register(dict, ".dict")
+        finally:
+            ChunkerFactory._chunkers.clear()
+            ChunkerFactory._chunkers.update(saved)
+            ChunkerFactory._instances.clear()
+    
+    def test_plugins_loaded_from_env(self, tmp_path, monkeypatch):
+        """Test that CHUNKER_PLUGINS modules are imported to register chunkers."""
+        (tmp_path / "sql_chunker_plugin.py").write_text(
+            "from lang_chunkers import ChunkerFactory, PythonChunker\n"
+            "ChunkerFactory.register(PythonChunker, '.sqlpy')\n"
+        )
+        monkeypatch.syspath_prepend(str(tmp_path))
+        monkeypatch.setenv("CHUNKER_PLUGINS", "sql_chunker_plugin, missing_plugin_module")
+        monkeypatch.setattr(ChunkerFactory, "_plugins_loaded", False)
+        saved = dict(ChunkerFactory._chunkers)
+        try:
+            assert type(ChunkerFactory.get_chunker("query.sqlpy")) is PythonChunker
+        finally:
+            ChunkerFactory._chunkers.clear()
+            ChunkerFactory._chunkers.update(saved)
+            ChunkerFactory._instances.clear()
+
     def test_get_supported_extensions(self):
         """Test getting list of supported extensions."""
         # Method is 'supported_extensions' not 'get_supported_extensions'
@@ -501,6 +1209,177 @@ class TestChunkerFactory:
         assert len(extensions) > 0
 
 
+class TestGeneratedFileDetection:
+    """Test the minified/generated file pre-scan and the fixed-window chunker."""
+    
+    def minified_js(self, functions=400):
+        return "".join(f"function f{i}(a,b){{return a+b*{i}}}var v{i}=f{i}(1,2);" for i in range(functions))
+    
+    def test_ordinary_files_pass(self):
+        """Test that hand-written code, prose and small files are not flagged."""
+        code = "".join(f"def function_{i}(value):\n    return value * {i}\n\n" for i in range(200))
+        prose = "# Guide\n\n" + "This paragraph explains how the service is configured.\n" * 100
+        
+        assert detect_generated(code, "module.py") is None
+        assert detect_generated(prose, "README.md") is None
+        assert detect_generated("x" * 1000, "short.js") is None
+    
+    def test_minified_content_without_suffix(self):
+        """Test that a bundle is caught by its line lengths, not its name."""
+        assert detect_generated(self.minified_js(), "static/app.js") == "minified"
+        assert detect_generated(self.minified_js(), "vendor.min.js") == "minified_name"
+    
+    def test_names_and_markers(self):
+        """Test lockfiles, generated-code headers and source map comments."""
+        body = "const value = 1;\n" * 200
+        
+        assert detect_generated("{}", "web/package-lock.json") == "lockfile"
+        assert detect_generated("// Code generated by protoc-gen-go. DO NOT EDIT.\npackage api\n", "api.go") \
+            == "generated_marker"
+        assert detect_generated("# @generated by tool\n" + body, "schema.py") == "generated_marker"
+        assert detect_generated(body + "//# sourceMappingURL=app.js.map\n", "dist/app.js") == "source_map"
+    
+    def test_encoded_blobs(self):
+        """Test that base64 wrapped at normal line lengths is caught by its entropy."""
+        import base64
+        blob = base64.encodebytes(os.urandom(6000)).decode()
+        
+        assert detect_generated(blob, "fixtures/image.txt") == "encoded"
+    
+    def test_fixed_windows_cover_content(self):
+        """Test that windows are within the budget, cover the content and keep line numbers."""
+        content = "header\n" + self.minified_js(50) + "\nfooter\n"
+        chunker = FixedWindowChunker(max_chunk_size=500, overlap=50, language="javascript", reason="minified")
+        chunks = chunker.chunk(content, "app.js")
+        
+        assert all(len(chunk["text"]) <= 500 for chunk in chunks)
+        assert "".join("".join(chunk["text"].split()) for chunk in chunks) == "".join(content.split())
+        assert chunks[0]["meta"]["start_line"] == 1
+        assert chunks[-1]["meta"]["end_line"] == 3
+        assert {chunk["meta"]["chunk_type"] for chunk in chunks} == {"text_window"}
+        assert chunks[0]["meta"]["generated"] == "minified"
+        assert chunks[0]["meta"]["language"] == "javascript"
+
+
+class TestChunkMetadata:
+    """Test the compact chunk metadata schema and on-demand derivation."""
+    
+    SOURCE = '''import os
+from typing import List
+
+
+class Store(Base, Mixin):
+    """Keeps records."""
+
+    limit = 10
+
+    @property
+    def size(self):
+        """Number of records."""
+        return len(self.records)
+
+    async def save(self, record, *, flush=True):
+        self.records.append(record)
+'''
+    
+    def test_compact_metadata_round_trips(self):
+        """Test that derived fields are dropped and recomputed identically."""
+        chunks = PythonChunker(max_chunk_size=2000).chunk(self.SOURCE, "store.py")
+        
+        for chunk in chunks:
+            compact = compact_metadata(chunk["meta"])
+            assert "docstring" not in compact and "args" not in compact
+            assert derive_metadata(chunk["text"], compact) == chunk["meta"]
+        
+        by_name = {c["meta"].get("qualified_name") or c["meta"]["chunk_type"]: c for c in chunks}
+        assert by_name["Store.size"]["meta"]["docstring"] == "Number of records."
+        assert derive_metadata(by_name["Store.save"]["text"],
+                               compact_metadata(by_name["Store.save"]["meta"]))["is_async"] is True
+    
+    def test_split_parts_keep_metadata(self):
+        """Test that parts keep what their text may not show, except repeated docstrings."""
+        meta = {"chunk_type": "function", "language": "python", "function_name": "f",
+                "args": ["a"], "docstring": "Doc.", "part": 2, "parts": 2}
+        
+        assert compact_metadata(meta) == {k: v for k, v in meta.items() if k != "docstring"}
+        assert compact_metadata({**meta, "part": 1}) == {**meta, "part": 1}
+        assert derive_metadata("return a", compact_metadata(meta))["args"] == ["a"]
+    
+    def test_markdown_metadata_is_derived(self):
+        """Test that word counts and code languages are recomputed from Markdown text."""
+        text = "## Install\n\nRun this:\n\n```bash\npip install x\n```\n\n~~~\nplain\n~~~"
+        meta = MarkdownChunker().chunk(text, "README.md")[0]["meta"]
+        compact = compact_metadata(meta)
+        
+        assert "word_count" not in compact
+        assert derive_metadata(text, compact) == meta
+
+
+class TestImportExtraction:
+    """Test the imports chunkers report for the import graph."""
+    
+    def test_python_imports(self):
+        """Test absolute, relative and from-imports in Python import chunks."""
+        source = "import os, sys\nfrom .models import User, Role\nfrom ..core import *\n\n\ndef run():\n    return User()\n"
+        chunker = PythonChunker()
+        
+        assert chunker.dependencies(chunker.chunk(source, "pkg/app.py")) == [
+            {"module": "os", "names": []},
+            {"module": "sys", "names": []},
+            {"module": ".models", "names": ["User", "Role"]},
+            {"module": "..core", "names": []}
+        ]
+    
+    def test_javascript_imports(self):
+        """Test default, named, side-effect and namespace imports."""
+        source = ("import React, { useState, useEffect as effect } from 'react';\n"
+                  "import './styles.css';\nimport * as utils from './utils';\n\n"
+                  "export function App() {\n  return useState(utils.start);\n}\n")
+        chunker = JavaScriptChunker()
+        imports = chunker.dependencies(chunker.chunk(source, "src/App.js"))
+        
+        assert imports[0]["module"] == "react"
+        assert set(imports[0]["names"]) == {"React", "useState", "useEffect"}
+        assert {"module": "./styles.css", "names": []} in imports
+        assert {"module": "./utils", "names": []} in imports
+    
+    def test_javascript_require_imports(self):
+        """Test CommonJS require() calls, destructured or not."""
+        source = ("const fs = require('fs');\nconst { join, resolve: r } = require(\"path\");\n"
+                  "var config = require('./config').default;\n\nfunction load() {\n  return fs;\n}\n")
+        chunker = JavaScriptChunker()
+        
+        chunks = chunker.chunk(source, "src/load.js")
+        assert any(c["meta"]["chunk_type"] == "import" for c in chunks)
+        assert chunker.dependencies(chunks) == [
+            {"module": "fs", "names": []},
+            {"module": "path", "names": ["join", "resolve"]},
+            {"module": "./config", "names": []}
+        ]
+    
+    @requires_grammar("rust")
+    def test_rust_imports(self):
+        """Test use declarations with groups and aliases."""
+        source = ("use std::collections::HashMap;\nuse crate::models::{User, Role as R};\n\n"
+                  "fn main() {\n    let users: HashMap<u32, User> = HashMap::new();\n}\n")
+        chunker = RustChunker()
+        
+        imports = chunker.dependencies(chunker.chunk(source, "src/main.rs"))
+        assert {"module": "crate::models", "names": ["User", "Role"]} in imports
+        assert {"module": "std::collections", "names": ["HashMap"]} in imports
+    
+    @requires_grammar("java")
+    def test_java_imports(self):
+        """Test class, static and wildcard imports."""
+        source = ("package com.x;\n\nimport com.x.models.User;\nimport java.util.*;\n\n"
+                  "public class App {\n    public User get() { return new User(); }\n}\n")
+        chunker = JavaChunker()
+        
+        imports = chunker.dependencies(chunker.chunk(source, "src/com/x/App.java"))
+        assert {"module": "com.x.models", "names": ["User"]} in imports
+        assert {"module": "java.util", "names": []} in imports
+
+
 class TestChunkerIntegration:
     """Integration tests for chunkers."""
     
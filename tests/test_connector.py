@@ -0,0 +1,456 @@
+"""
+Tests for the connector service.
+"""
+
+import os
+import json
+import shutil
+import fnmatch
+import subprocess
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.connector import app as connector_app
+from services.connector.walker import RepositoryWalker, GitIndexWalker, git_ls_files
+from services.connector.patterns import GlobPatterns, GitignorePatterns
+from services.connector.manifest import ManifestStore
+from services.connector.reader import decode_content, read_ahead, read_file
+
+
+@pytest.fixture(autouse=True)
+def manifests(tmp_path_factory, monkeypatch):
+    """Keep repository manifests in a temporary directory outside the repositories."""
+    store = ManifestStore(str(tmp_path_factory.mktemp("manifests")))
+    monkeypatch.setattr(connector_app, "manifests", store)
+    return store
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A small repository with source files, docs and excluded directories."""
+    files = {
+        "main.py": "print('hello')\n",
+        "README.md": "# Repo\n",
+        "image.png": "not really a png",
+        "src/app.js": "export const app = 1;\n",
+        "src/lib/util.py": "def util():\n    return 1\n",
+        "src/lib/util.pyc": "compiled",
+        "node_modules/pkg/index.js": "module.exports = 1;\n",
+        ".git/config": "[core]\n",
+        "docs/guide.md": "# Guide\n",
+    }
+    for relative_path, content in files.items():
+        path = tmp_path / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return tmp_path
+
+
+@pytest.fixture
+def ignoring_repo(repo):
+    """The small repository with .gitignore files at the root and in a subdirectory."""
+    (repo / ".gitignore").write_text("node_modules/\n*.pyc\ndocs/\n")
+    (repo / "src" / ".gitignore").write_text("lib/\n!important.js\n*.js\n")
+    (repo / "src" / "important.js").write_text("export const x = 1;\n")
+    (repo / ".git" / "info").mkdir()
+    (repo / ".git" / "info" / "exclude").write_text("image.png\n")
+    return repo
+
+
+requires_git = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+class TestRepositoryWalker:
+    """Test the scandir-based walker."""
+
+    def test_walks_depth_first_in_name_order(self, repo):
+        """Test that all files are listed with their size and relative path."""
+        walker = RepositoryWalker(str(repo))
+        entries = list(walker)
+
+        assert [entry.relative_path for entry in entries] == [
+            "README.md", "image.png", "main.py",
+            os.path.join(".git", "config"),
+            os.path.join("docs", "guide.md"),
+            os.path.join("node_modules", "pkg", "index.js"),
+            os.path.join("src", "app.js"),
+            os.path.join("src", "lib", "util.py"),
+            os.path.join("src", "lib", "util.pyc"),
+        ]
+        assert entries[0].size == len("# Repo\n")
+        assert walker.files_found == 9
+
+    def test_prunes_directories_and_filters_files(self, repo):
+        """Test that excluded directories are not entered and filtered files are counted."""
+        listed = []
+        walker = RepositoryWalker(
+            str(repo),
+            exclude_dir=lambda path: (listed.append(path), path in ("node_modules", ".git"))[1],
+            include_file=lambda path: path.endswith(".py")
+        )
+        paths = [entry.relative_path for entry in walker]
+
+        assert paths == ["main.py", os.path.join("src", "lib", "util.py")]
+        assert not any(path.startswith("node_modules" + os.sep) for path in listed)
+        assert walker.directories_pruned == 2
+        assert walker.files_filtered == 5
+
+    def test_parallel_walk_keeps_order(self, repo):
+        """Test that prefetching listings on threads yields the same files in the same order."""
+        sequential = list(RepositoryWalker(str(repo), workers=1))
+        parallel = list(RepositoryWalker(str(repo), workers=4))
+
+        assert parallel == sequential
+
+    def test_non_recursive(self, repo):
+        """Test that only top-level files are listed without recursion."""
+        paths = [entry.relative_path for entry in RepositoryWalker(str(repo), recursive=False)]
+
+        assert paths == ["README.md", "image.png", "main.py"]
+
+
+class TestIgnoredFiles:
+    """Test enumeration honouring the repository's ignore files."""
+
+    def test_walk_honours_gitignore_files(self, ignoring_repo):
+        """Test that nested .gitignore files and info/exclude prune directories and filter files."""
+        walker = RepositoryWalker(str(ignoring_repo), gitignore=True)
+        paths = [entry.relative_path for entry in walker]
+
+        assert paths == [".gitignore", "README.md", "main.py", os.path.join("src", ".gitignore")]
+        # .git, docs, node_modules and src/lib
+        assert walker.directories_pruned == 4
+
+    @requires_git
+    def test_git_index(self, ignoring_repo):
+        """Test listing tracked and untracked-but-not-ignored files from git."""
+        subprocess.run(["git", "init", "-q"], cwd=ignoring_repo, check=True)
+        (ignoring_repo / ".git" / "info" / "exclude").write_text("image.png\n")
+        subprocess.run(["git", "add", "-f", "src/lib/util.py"], cwd=ignoring_repo, check=True)
+
+        paths = git_ls_files(str(ignoring_repo))
+        walker = GitIndexWalker(str(ignoring_repo), paths, include_file=lambda path: not path.endswith(".gitignore"))
+        listed = [entry.relative_path for entry in walker]
+
+        # Tracked files are listed even where ignored
+        assert listed == ["README.md", "main.py", os.path.join("src", "lib", "util.py")]
+        assert walker.files_filtered == 2
+
+    def test_git_ls_files_outside_work_tree(self, tmp_path):
+        """Test that a directory outside any git work tree gives None."""
+        assert git_ls_files(str(tmp_path)) is None
+
+
+class TestReader:
+    """Test single-read encoding detection and read-ahead."""
+
+    @pytest.mark.parametrize("data, text, encoding", [
+        ("def f():\n    return 'é'\n".encode("utf-8"), "def f():\n    return 'é'\n", "utf-8"),
+        (b"\xef\xbb\xbfx = 1\n", "x = 1\n", "utf-8-sig"),
+        ("x = 'ü'\n".encode("utf-16"), "x = 'ü'\n", "utf-16"),
+        ("x = 'ü'\n".encode("utf-32"), "x = 'ü'\n", "utf-32"),
+        ("x = 1\n".encode("utf-16-le"), "x = 1\n", "utf-16-le"),
+        ("x = 1\n".encode("utf-16-be"), "x = 1\n", "utf-16-be"),
+        (b"say \x93hi\x94 for \x805\n", "say \u201chi\u201d for \u20ac5\n", "cp1252"),
+        (b"caf\xe9 \x81", "caf\xe9 \x81", "latin-1"),
+    ])
+    def test_decode_content(self, data, text, encoding):
+        """Test BOM sniffing, the UTF-8 fast path and the fallbacks."""
+        assert decode_content(data) == (text, encoding)
+
+    def test_read_file(self, tmp_path):
+        """Test reading a file and a missing one."""
+        path = tmp_path / "a.py"
+        path.write_bytes("x = 'é'\n".encode("cp1252"))
+
+        assert read_file(str(path)) == ("x = 'é'\n", "cp1252")
+        assert read_file(str(tmp_path / "missing.py")) == (None, "failed")
+
+    def test_read_ahead_keeps_order_and_bounds_reads(self):
+        """Test that results come in order with at most ``workers`` items read ahead."""
+        consumed = []
+        started = []
+
+        def items():
+            for i in range(20):
+                # Reads never get further ahead than the pool size
+                assert i - len(consumed) <= 3
+                yield i
+
+        def read(i):
+            started.append(i)
+            return i * i
+
+        for item, result in read_ahead(items(), read, workers=3):
+            assert result == item * item
+            consumed.append(item)
+
+        assert consumed == list(range(20))
+        assert sorted(started) == list(range(20))
+
+
+class TestGlobPatterns:
+    """Test compiled fnmatch-style patterns."""
+
+    PATHS = [
+        "main.py", "src/app.JS", "node_modules/a/b.js", "pkg/node_modules/c.js", "dist/x.js",
+        "a/.env.local", "config/secrets.yaml", "Thumbs.db", "docs/Thumbs.db", "lib/x.min.js",
+        "[weird].md", "src/sub/main.py", "README"
+    ]
+
+    def test_matches_like_fnmatch(self):
+        """Test that compiled patterns select exactly what per-pattern fnmatch did."""
+        for patterns in (connector_app.DEFAULT_INCLUDE_PATTERNS, connector_app.DEFAULT_EXCLUDE_PATTERNS,
+                         ["src/*.py", "[a-c]*", "?hum*", "README"]):
+            compiled = GlobPatterns(patterns)
+            for path in self.PATHS:
+                expected = any(fnmatch.fnmatch(path, p) or fnmatch.fnmatch(path.lower(), p.lower())
+                               for p in patterns)
+                assert compiled.matches(path) == expected, (patterns, path)
+
+    def test_matches_directory(self):
+        """Test that only directories whose every path matches are reported."""
+        compiled = GlobPatterns(connector_app.DEFAULT_EXCLUDE_PATTERNS)
+
+        assert compiled.matches_directory("node_modules")
+        assert compiled.matches_directory("my_secrets")
+        assert not compiled.matches_directory("pkg/node_modules")
+        assert not compiled.matches_directory("src")
+
+
+class TestGitignorePatterns:
+    """Test gitignore pattern semantics."""
+
+    def test_anchoring_and_directories(self):
+        """Test unanchored names, anchored paths, directory-only patterns and **."""
+        patterns = GitignorePatterns(["*.log", "/build", "out/", "docs/**/*.tmp", "# comment", ""])
+
+        assert patterns.matches("a/b/debug.log")
+        assert patterns.matches("build/x.py") and not patterns.matches("src/build/x.py")
+        assert patterns.matches("src/out/x.py") and not patterns.matches("src/out")
+        assert patterns.matches("out", is_dir=True)
+        assert patterns.matches("docs/a/b/c.tmp") and patterns.matches("docs/c.tmp")
+        assert not patterns.matches("src/main.py")
+
+    def test_negation(self):
+        """Test that the last matching pattern wins, except below an excluded directory."""
+        patterns = GitignorePatterns(["*.log", "!keep.log", "logs/", "!logs/important.txt"])
+
+        assert patterns.matches("a.log")
+        assert not patterns.matches("dir/keep.log")
+        assert patterns.match("dir/keep.log") is False
+        assert patterns.matches("logs/important.txt")
+        assert patterns.match("src/main.py") is None
+
+    def test_base_directory(self):
+        """Test that patterns of a nested .gitignore apply below its directory only."""
+        patterns = GitignorePatterns(["/generated", "*.bak"], base="web")
+
+        assert patterns.matches("web/generated/a.js")
+        assert patterns.matches("web/src/old.bak")
+        assert not patterns.matches("generated/a.js")
+        assert not patterns.matches("src/old.bak")
+
+
+class TestConnectEndpoints:
+    """Test the /connect and /list-files endpoints."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.client = TestClient(connector_app.app)
+
+    def test_connect_reads_matching_files(self, repo):
+        """Test that default patterns keep source files and prune excluded directories."""
+        response = self.client.post("/connect", json={"path": str(repo)})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert sorted(f["path"] for f in data["files"]) == sorted([
+            "README.md", "main.py", os.path.join("docs", "guide.md"),
+            os.path.join("src", "app.js"), os.path.join("src", "lib", "util.py")
+        ])
+        assert data["files"][0]["content"] == "# Repo\n"
+        assert data["stats"]["directories_pruned"] == 2
+        assert data["stats"]["files_processed"] == 5
+        assert data["stats"]["files_skipped"] == 2
+
+    def test_default_patterns_include_every_chunker_language(self):
+        """Test that files of every language the preprocessor chunks are ingested by default."""
+        from services.preprocessor.lang_chunkers import ChunkerFactory
+
+        missed = [extension for extension in ChunkerFactory.supported_extensions()
+                  if not any(fnmatch.fnmatch(f"file{extension}", pattern)
+                             for pattern in connector_app.DEFAULT_INCLUDE_PATTERNS)]
+        assert missed == []
+
+    def test_connect_respects_limits(self, repo):
+        """Test the file count and file size limits."""
+        limited = self.client.post("/connect", json={"path": str(repo), "max_files": 2}).json()
+        small = self.client.post("/connect", json={"path": str(repo), "max_file_size": 7}).json()
+
+        assert len(limited["files"]) == 2
+        assert [f["path"] for f in small["files"]] == ["README.md"]
+
+    def test_list_files(self, repo):
+        """Test that listing returns file info without content."""
+        data = self.client.post("/list-files", json={"path": str(repo)}).json()
+
+        assert data["stats"]["files_matched"] == 5
+        entry = next(f for f in data["files"] if f["path"] == "main.py")
+        assert entry["extension"] == ".py"
+        assert entry["size"] == len("print('hello')\n")
+        assert "content" not in entry
+
+    def test_missing_path(self, tmp_path):
+        """Test that a missing repository path is a 404."""
+        response = self.client.post("/connect", json={"path": str(tmp_path / "missing")})
+
+        assert response.status_code == 404
+
+    def test_connect_stream(self, repo):
+        """Test that files stream as NDJSON lines followed by a summary."""
+        full = self.client.post("/connect", json={"path": str(repo), "update_manifest": False}).json()
+        response = self.client.post("/connect", json={"path": str(repo), "stream": True})
+        records = [json.loads(line) for line in response.text.splitlines()]
+
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert records[0] == {"type": "repository", "repository_path": full["repository_path"]}
+        assert [r["file"] for r in records[1:-1]] == full["files"]
+        assert {r["change"] for r in records[1:-1]} == {"added"}
+        assert records[-1]["type"] == "summary"
+        assert records[-1]["stats"]["files_processed"] == 5
+        assert records[-1]["changes"]["added"] == full["changes"]["added"]
+
+    def test_gitignore_pattern_syntax(self, repo):
+        """Test that patterns can be given in gitignore syntax."""
+        response = self.client.post("/connect", json={
+            "path": str(repo),
+            "pattern_syntax": "gitignore",
+            "file_patterns": ["*.py", "*.md"],
+            "exclude_patterns": ["docs/", "node_modules/"]
+        })
+        bad = self.client.post("/connect", json={"path": str(repo), "pattern_syntax": "regex"})
+
+        data = response.json()
+        assert sorted(f["path"] for f in data["files"]) == sorted([
+            "README.md", "main.py", os.path.join("src", "lib", "util.py")
+        ])
+        assert data["stats"]["directories_pruned"] == 2
+        assert bad.status_code == 400
+
+    @pytest.mark.parametrize("enumeration", ["gitignore", "git"])
+    def test_enumeration_modes(self, ignoring_repo, enumeration):
+        """Test the ignore-aware modes; outside a git work tree git mode walks with .gitignore rules."""
+        response = self.client.post("/list-files", json={"path": str(ignoring_repo), "enumeration": enumeration})
+
+        data = response.json()
+        assert sorted(f["path"] for f in data["files"]) == ["README.md", "main.py"]
+        assert data["stats"]["enumeration"] == "gitignore"
+
+    def test_unknown_enumeration(self, repo):
+        """Test that an unknown enumeration mode is a 400."""
+        response = self.client.post("/connect", json={"path": str(repo), "enumeration": "svn"})
+
+        assert response.status_code == 400
+
+
+class TestDeltaScans:
+    """Test change detection against the last snapshot or a git commit."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.client = TestClient(connector_app.app)
+
+    @staticmethod
+    def _change(repo):
+        """Modify, add, delete and only touch files."""
+        (repo / "main.py").write_text("print('changed')\n")
+        os.utime(repo / "main.py", (1, 1))
+        (repo / "new.py").write_text("x = 1\n")
+        (repo / "src" / "app.js").unlink()
+        os.utime(repo / "README.md", (2, 2))
+
+    def test_delta_since_last_snapshot(self, repo):
+        """Test that a delta scan returns only added and modified files and lists deleted ones."""
+        first = self.client.post("/connect", json={"path": str(repo), "delta": True}).json()
+        self._change(repo)
+        data = self.client.post("/connect", json={"path": str(repo), "delta": True}).json()
+        again = self.client.post("/connect", json={"path": str(repo), "delta": True}).json()
+
+        assert len(first["changes"]["added"]) == 5
+        assert sorted(f["path"] for f in data["files"]) == ["main.py", "new.py"]
+        assert data["changes"]["added"] == ["new.py"]
+        assert data["changes"]["modified"] == ["main.py"]
+        assert data["changes"]["deleted"] == [os.path.join("src", "app.js")]
+        assert data["changes"]["unchanged"] == 3
+        assert again["files"] == [] and again["changes"]["unchanged"] == 5
+
+    def test_full_scan_reports_changes(self, repo, manifests):
+        """Test that a full scan returns every file, and that a deleted manifest resets the snapshot."""
+        self.client.post("/connect", json={"path": str(repo)})
+        self._change(repo)
+        data = self.client.post("/connect", json={"path": str(repo), "update_manifest": False}).json()
+        deleted = self.client.delete("/manifest", params={"path": str(repo)}).json()
+
+        assert len(data["files"]) == 5
+        assert data["changes"]["modified"] == ["main.py"]
+        assert data["changes"]["unchanged"] == 3
+        assert deleted["deleted"] is True
+        assert manifests.load(str(repo)) == {}
+
+    def test_deferred_manifest_is_saved_on_commit(self, repo, manifests):
+        """Test that a staged snapshot is only saved on commit, without the files that were not indexed."""
+        self.client.post("/connect", json={"path": str(repo), "delta": True})
+        before = manifests.load(str(repo))
+        self._change(repo)
+        data = self.client.post("/connect", json={"path": str(repo), "delta": True, "defer_manifest": True}).json()
+
+        assert data["manifest_token"]
+        assert manifests.load(str(repo)) == before
+        # An uncommitted scan delivers the same files again
+        again = self.client.post("/connect", json={"path": str(repo), "delta": True, "defer_manifest": True}).json()
+        assert sorted(f["path"] for f in again["files"]) == ["main.py", "new.py"]
+
+        stale = self.client.post("/manifest/commit", json={"path": str(repo), "token": data["manifest_token"]})
+        committed = self.client.post("/manifest/commit", json={
+            "path": str(repo), "token": again["manifest_token"], "exclude": ["main.py", "new.py"]
+        })
+        after = manifests.load(str(repo))
+
+        assert stale.status_code == 409
+        assert committed.status_code == 200
+        assert os.path.join("src", "app.js") not in after
+        # Files that were not indexed keep their previous entry, or none
+        assert after["main.py"] == before["main.py"]
+        assert "new.py" not in after
+        retried = self.client.post("/connect", json={"path": str(repo), "delta": True}).json()
+        assert sorted(f["path"] for f in retried["files"]) == ["main.py", "new.py"]
+
+    @requires_git
+    def test_delta_since_commit(self, repo):
+        """Test listing the files changed since a git commit, untracked files included."""
+        git = ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com"]
+        subprocess.run(git + ["init", "-q"], cwd=repo, check=True)
+        subprocess.run(git + ["add", "main.py", "README.md", "src/app.js"], cwd=repo, check=True)
+        subprocess.run(git + ["commit", "-q", "-m", "Initial"], cwd=repo, check=True)
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        self._change(repo)
+
+        data = self.client.post("/connect", json={"path": str(repo), "since_commit": commit}).json()
+        bad = self.client.post("/connect", json={"path": str(repo), "since_commit": "no-such-commit"})
+
+        assert data["delta"] is True
+        assert data["head_commit"] == commit
+        # Untracked files that are not ignored count as added
+        assert sorted(f["path"] for f in data["files"]) == sorted([
+            "main.py", "new.py", os.path.join("docs", "guide.md"), os.path.join("src", "lib", "util.py")
+        ])
+        # Changes are classified by git, without a snapshot to compare with
+        assert data["changes"]["modified"] == ["main.py"]
+        assert sorted(data["changes"]["added"]) == sorted([
+            "new.py", os.path.join("docs", "guide.md"), os.path.join("src", "lib", "util.py")
+        ])
+        assert data["changes"]["deleted"] == [os.path.join("src", "app.js")]
+        assert bad.status_code == 400
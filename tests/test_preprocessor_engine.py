@@ -0,0 +1,715 @@
+"""
+Tests for the parallel chunking engine and the preprocessor /process endpoint.
+"""
+
+import ast
+import time
+import asyncio
+import threading
+import json
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.preprocessor.engine import (
+    ChunkingEngine, chunk_file, generate_chunk_id, chunk_anchor, chunk_content_hash, PROCESSING_STAGES
+)
+from services.preprocessor.lang_chunkers import ChunkerFactory
+from services.preprocessor.chunk_cache import ChunkCache, content_hash
+from services.preprocessor.import_graph import ImportGraph
+from services.preprocessor.metrics import ProcessingMetrics
+from services.preprocessor import app as preprocessor_app
+
+
+def _file(path, content):
+    return SimpleNamespace(path=path, content=content, size=len(content),
+                           modified_time="2024-01-01T00:00:00")
+
+
+def _files(count):
+    files = []
+    for i in range(count):
+        if i % 3 == 0:
+            files.append(_file(f"pkg/module_{i}.py", f"def function_{i}():\n    return {i}\n"))
+        elif i % 3 == 1:
+            files.append(_file(f"web/script_{i}.js", f"function handler{i}() {{\n  return {i};\n}}\n"))
+        else:
+            files.append(_file(f"docs/page_{i}.md", f"# Page {i}\n\nSome text about page {i}.\n"))
+    return files
+
+
+def _collect(engine, files, max_chunk_size=1000, overlap=100):
+    async def run():
+        return [result async for result in engine.process(files, max_chunk_size, overlap)]
+    return asyncio.run(run())
+
+
+class TestChunkFile:
+    """Test the per-file worker function."""
+
+    def test_chunk_file_adds_ids_and_source(self):
+        """Test that chunks get IDs and file info."""
+        result = chunk_file("a.py", "def f():\n    return 1\n", 22, "2024-01-01", 1000, 100)
+
+        assert result["error"] is None
+        assert result["language"] == "python"
+        chunk = result["chunks"][0]
+        assert chunk["content_hash"] == chunk_content_hash(chunk["text"])
+        assert chunk["chunk_id"] == generate_chunk_id("a.py", "function:f", chunk["content_hash"])
+        assert chunk["source"] == "file"
+        assert chunk["file_size"] == 22
+
+    def test_chunk_file_times_stages(self):
+        """Test that the file time is broken down into parse, chunk and the other stages."""
+        result = chunk_file("a.py", "def f():\n    return 1\n", 22, "2024-01-01", 1000, 100)
+
+        assert set(result["stages"]) == {"detect", "parse", "chunk", "imports", "ids"}
+        assert result["stages"]["parse"] > 0
+        assert sum(result["stages"].values()) <= result["seconds"]
+
+    def test_chunk_file_times_parse_per_call(self):
+        """Test that concurrent calls sharing a chunker each time only their own parse."""
+        parse = ast.parse
+        barrier = threading.Barrier(4)
+
+        def slow_parse(source, *args, **kwargs):
+            time.sleep(0.05)
+            return parse(source, *args, **kwargs)
+
+        def run(index):
+            barrier.wait()
+            content = f"def f{index}():\n    return {index}\n"
+            return chunk_file(f"{index}.py", content, len(content), "2024-01-01", 1000, 100)["stages"]
+
+        with patch("services.preprocessor.lang_chunkers.ast.parse", side_effect=slow_parse), \
+                ThreadPoolExecutor(max_workers=4) as pool:
+            stages = list(pool.map(run, range(4)))
+
+        for file_stages in stages:
+            # The other three parses would add 0.15 s
+            assert 0.05 <= file_stages["parse"] < 0.15
+            assert file_stages["chunk"] >= 0
+
+    def test_chunk_ids_survive_edits_elsewhere(self):
+        """Test that inserting a function above others keeps their IDs."""
+        methods = "".join(f"    def method_{i}(self):\n        return {i}\n\n" for i in range(3))
+        before = f"class Store:\n{methods}\ndef helper():\n    return 0\n"
+        after = "def inserted():\n    return -1\n\n\n" + before
+        old = chunk_file("a.py", before, len(before), "2024-01-01", 1000, 100)["chunks"]
+        new = chunk_file("a.py", after, len(after), "2024-01-01", 1000, 100)["chunks"]
+
+        old_ids = {c["chunk_id"] for c in old}
+        assert old_ids < {c["chunk_id"] for c in new}
+        assert "a.py#function:helper#" + chunk_content_hash("def helper():\n    return 0") in old_ids
+
+    def test_chunk_ids_are_unique_and_hashes_ignore_whitespace(self):
+        """Test that identical chunks get distinct IDs and re-indenting keeps the hash."""
+        content = "\n\n".join(["# Same\n\nRepeated paragraph."] * 2)
+        chunks = chunk_file("a.md", content, len(content), "2024-01-01", 1000, 100)["chunks"]
+
+        assert len({c["chunk_id"] for c in chunks}) == len(chunks) == 2
+        assert chunks[0]["content_hash"] == chunks[1]["content_hash"]
+        assert chunks[1]["chunk_id"].endswith("~2")
+        assert chunk_content_hash("if x:\n    y()") == chunk_content_hash("if x:\n\ty()  ")
+        assert chunk_anchor({"chunk_type": "function", "function_name": "run", "part": 2}) == "function:run/2"
+
+    def test_compact_metadata_schema(self):
+        """Test that CHUNK_METADATA=compact leaves out derivable fields and shrinks metadata."""
+        content = 'def f(a, b):\n    """Add."""\n    return a + b\n'
+        full = chunk_file("a.py", content, len(content), "2024-01-01", 1000, 100)
+        with patch("services.preprocessor.engine.CHUNK_METADATA", "compact"):
+            compact = chunk_file("a.py", content, len(content), "2024-01-01", 1000, 100)
+
+        assert full["chunks"][0]["meta"]["docstring"] == "Add."
+        assert "docstring" not in compact["chunks"][0]["meta"]
+        assert compact["chunks"][0]["chunk_id"] == full["chunks"][0]["chunk_id"]
+        assert 0 < compact["metadata_bytes"] < full["metadata_bytes"]
+
+    def test_chunk_file_reports_errors(self):
+        """Test that chunker failures are returned instead of raised."""
+        with patch("services.preprocessor.engine.ChunkerFactory.get_chunker",
+                   side_effect=RuntimeError("boom")):
+            result = chunk_file("a.py", "x = 1", 5, "2024-01-01", 1000, 100)
+
+        assert result["chunks"] == []
+        assert "boom" in result["error"]
+
+    def test_generated_files_are_windowed(self):
+        """Test that a bundle without a .min suffix gets fixed windows instead of parsing."""
+        bundle = "".join(f"function f{i}(a){{return a*{i}}}" for i in range(300))
+        with patch("services.preprocessor.engine.ChunkerFactory.get_chunker",
+                   wraps=ChunkerFactory.get_chunker) as get_chunker:
+            result = chunk_file("static/app.js", bundle, len(bundle), "2024-01-01", 1000, 100)
+
+        assert result["generated"] == "minified"
+        assert result["skipped"] is False
+        assert result["language"] == "javascript"
+        assert {c["meta"]["chunk_type"] for c in result["chunks"]} == {"text_window"}
+        assert all(c["chunk_id"] for c in result["chunks"])
+        assert result["seconds"] >= 0
+        assert get_chunker.call_count == 1
+
+    def test_generated_files_can_be_skipped(self):
+        """Test that GENERATED_FILE_ACTION=skip drops generated files and keeps others."""
+        with patch("services.preprocessor.engine.GENERATED_FILE_ACTION", "skip"):
+            skipped = chunk_file("package-lock.json", '{"lockfileVersion": 3}', 22, "2024-01-01", 1000, 100)
+            kept = chunk_file("a.py", "def f():\n    return 1\n", 22, "2024-01-01", 1000, 100)
+
+        assert skipped["chunks"] == [] and skipped["skipped"] is True
+        assert skipped["generated"] == "lockfile"
+        assert kept["generated"] is None and kept["chunks"]
+
+
+class TestChunkingEngine:
+    """Test ordering and bounded parallelism of the chunking engine."""
+
+    def test_results_in_input_order_with_pool(self):
+        """Test that pooled results match serial chunking in the same order."""
+        files = _files(30)
+        engine = ChunkingEngine(workers=2, max_in_flight=4)
+        try:
+            results = _collect(engine, files)
+        finally:
+            engine.shutdown()
+
+        assert [r["path"] for r in results] == [f.path for f in files]
+        for result, file_data in zip(results, files):
+            expected = chunk_file(file_data.path, file_data.content, file_data.size,
+                                  file_data.modified_time, 1000, 100)
+            # Timings differ between runs
+            assert result.pop("seconds") >= 0
+            assert result.pop("stages").keys() == expected.pop("stages").keys()
+            expected.pop("seconds")
+            assert result == expected
+
+    def test_single_worker_runs_without_pool(self):
+        """Test that one worker chunks on a thread without starting processes."""
+        engine = ChunkingEngine(workers=1)
+        results = _collect(engine, _files(5))
+
+        assert len(results) == 5
+        assert engine.stats()["pool_started"] is False
+
+    def test_pool_is_replaced_after_worker_crash(self):
+        """Test that files submitted after a worker dies are chunked on a fresh pool."""
+        files = _files(12)
+        engine = ChunkingEngine(workers=2, max_in_flight=2)
+
+        class KillingFiles:
+            def __iter__(self):
+                for i, file_data in enumerate(files):
+                    if i == 4:
+                        executor = engine._executor
+                        for process in list(executor._processes.values()):
+                            process.kill()
+                            process.join()
+                        deadline = time.monotonic() + 10
+                        while not executor._broken and time.monotonic() < deadline:
+                            time.sleep(0.01)
+                        assert executor._broken
+                    yield file_data
+
+        try:
+            results = _collect(engine, KillingFiles())
+            assert [r["path"] for r in results] == [f.path for f in files]
+            for result in results[:4]:
+                assert result["error"] is None or result["error"].startswith("Worker process failed")
+            assert all(r["error"] is None and r["chunks"] for r in results[4:])
+
+            # Later requests keep using the replacement pool
+            assert all(r["error"] is None for r in _collect(engine, _files(4)))
+        finally:
+            engine.shutdown()
+
+    def test_in_flight_work_is_bounded(self):
+        """Test that no more than max_in_flight files are submitted at once."""
+        submitted = []
+
+        class CountingFiles:
+            def __iter__(self):
+                for file_data in _files(12):
+                    submitted.append(file_data.path)
+                    yield file_data
+
+        engine = ChunkingEngine(workers=1, max_in_flight=3)
+
+        async def run():
+            max_ahead = 0
+            consumed = 0
+            async for _ in engine.process(CountingFiles(), 1000, 100):
+                consumed += 1
+                max_ahead = max(max_ahead, len(submitted) - consumed)
+            return max_ahead
+
+        assert asyncio.run(run()) <= 3
+
+
+class TestChunkCache:
+    """Test the persistent chunk cache and its use by the engine."""
+
+    def test_put_flush_get_across_instances(self, tmp_path):
+        """Test that flushed entries survive reopening and need a matching hash."""
+        path = str(tmp_path / "cache.sqlite3")
+        cache = ChunkCache(path)
+        cache.put("k", "hash1", "python", [{"text": "x"}])
+        assert cache.get("k", "hash1") == ("python", [{"text": "x"}])
+        cache.close()
+
+        reopened = ChunkCache(path)
+        assert reopened.get("k", "hash1") == ("python", [{"text": "x"}])
+        assert reopened.get("k", "hash2") is None
+        assert reopened.stats()["entries"] == 1
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Test that the cache stays under its size limit, keeping recent entries."""
+        cache = ChunkCache(str(tmp_path / "cache.sqlite3"), max_bytes=250)
+        for i in range(3):
+            cache.put(f"k{i}", "h", "python", [{"text": "x" * 50}])
+            cache.flush()
+        cache.get("k0", "h")
+        cache.flush()
+        cache.put("k3", "h", "python", [{"text": "x" * 50}])
+        cache.flush()
+
+        assert cache.stats()["size_bytes"] <= 250
+        assert cache.get("k0", "h") is not None
+        assert cache.get("k1", "h") is None
+        assert cache.get("k3", "h") is not None
+
+    def test_unwritable_path_disables_cache(self, tmp_path):
+        """Test that a cache that cannot be opened is skipped instead of failing."""
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        cache = ChunkCache(str(blocker / "cache.sqlite3"))
+
+        assert cache.get("k", "h") is None
+        cache.put("k", "h", "python", [])
+        cache.flush()
+        assert cache.stats()["enabled"] is False
+
+    def test_engine_reuses_unchanged_files(self, tmp_path):
+        """Test that re-processing skips chunking for unchanged files only."""
+        files = _files(6)
+        engine = ChunkingEngine(workers=1, cache=ChunkCache(str(tmp_path / "cache.sqlite3")))
+        first = _collect(engine, files)
+
+        changed = _file(files[0].path, files[0].content + "\ndef extra():\n    pass\n")
+        updated = [changed] + files[1:]
+        with patch("services.preprocessor.engine.chunk_file", wraps=chunk_file) as chunked:
+            second = _collect(engine, updated)
+
+        assert [call.args[0] for call in chunked.call_args_list] == [changed.path]
+        assert not second[0].get("cached")
+        assert all(result["cached"] for result in second[1:])
+        assert [r["chunks"] for r in second[1:]] == [r["chunks"] for r in first[1:]]
+        assert engine.stats()["cache"]["hits"] == 5
+
+    def test_engine_flushes_once_and_keeps_cache_work_off_the_loop(self, tmp_path):
+        """Test that a request flushes the cache once and hashes and looks up files on threads."""
+        cache = ChunkCache(str(tmp_path / "cache.sqlite3"))
+        engine = ChunkingEngine(workers=1, cache=cache)
+        loop_threads = set()
+        lookup_threads = []
+
+        def get(*args):
+            lookup_threads.append(threading.get_ident())
+            return ChunkCache.get(cache, *args)
+
+        async def run():
+            loop_threads.add(threading.get_ident())
+            return [result async for result in engine.process(_files(4), 1000, 100)]
+
+        with patch.object(cache, "get", side_effect=get), \
+                patch.object(cache, "flush", wraps=cache.flush) as flush:
+            asyncio.run(run())
+
+        assert flush.call_count == 1
+        assert len(lookup_threads) == 4
+        assert not loop_threads & set(lookup_threads)
+
+    def test_engine_cache_key_includes_settings(self, tmp_path):
+        """Test that different chunk sizes do not share cached chunks."""
+        files = _files(2)
+        engine = ChunkingEngine(workers=1, cache=ChunkCache(str(tmp_path / "cache.sqlite3")))
+        _collect(engine, files, max_chunk_size=1000)
+        results = _collect(engine, files, max_chunk_size=500)
+        bypassed = asyncio.run(self._collect_without_cache(engine, files))
+
+        assert not any(r.get("cached") for r in results)
+        assert not any(r.get("cached") for r in bypassed)
+        assert content_hash("a") != content_hash("b")
+
+    @staticmethod
+    async def _collect_without_cache(engine, files):
+        return [r async for r in engine.process(files, 1000, 100, use_cache=False)]
+
+
+class TestImportGraph:
+    """Test the persistent import graph and its module resolution."""
+
+    def test_resolves_imports_per_language(self, tmp_path):
+        """Test relative, absolute and package imports across languages."""
+        graph = ImportGraph(str(tmp_path / "graph.sqlite3"))
+        for path in ["app/models/__init__.py", "app/models/user.py", "app/core.py",
+                     "web/src/utils/index.js", "go/pkg/store/db.go", "java/src/com/x/models/User.java"]:
+            graph.update(path, None, [])
+        graph.update("app/api/views.py", "python", [
+            {"module": "..models", "names": ["user"]},
+            {"module": "app.core", "names": ["run"]},
+            {"module": "os", "names": []}
+        ])
+        graph.update("web/src/main.js", "javascript", [{"module": "./utils", "names": []},
+                                                       {"module": "react", "names": []}])
+        graph.update("go/cmd/main.go", "go", [{"module": "example.com/x/pkg/store", "names": []}])
+        graph.update("java/src/com/x/App.java", "java", [{"module": "com.x.models", "names": ["User"]}])
+
+        views = graph.dependencies("app/api/views.py")
+        assert [record["files"] for record in views] == [
+            ["app/models/user.py", "app/models/__init__.py"], ["app/core.py"], []
+        ]
+        assert [r["files"] for r in graph.dependencies("web/src/main.js")] == [["web/src/utils/index.js"], []]
+        assert graph.dependencies("go/cmd/main.go")[0]["files"] == ["go/pkg/store/db.go"]
+        assert graph.dependencies("java/src/com/x/App.java")[0]["files"] == ["java/src/com/x/models/User.java"]
+        assert graph.dependencies("unknown.py") is None
+        assert graph.dependents("app/core.py") == ["app/api/views.py"]
+
+    def test_resolves_javascript_imports_with_extensions(self, tmp_path):
+        """Test that relative imports spelling out a source extension resolve to the file."""
+        graph = ImportGraph(str(tmp_path / "graph.sqlite3"))
+        for path in ["src/b.js", "src/lib/c.ts", "src/styles.css"]:
+            graph.update(path, None, [])
+        graph.update("src/a.js", "javascript", [{"module": "./b.js", "names": []},
+                                                {"module": "./styles.css", "names": []}])
+        graph.update("src/a.ts", "typescript", [{"module": "./lib/c.js", "names": []}])
+
+        assert [r["files"] for r in graph.dependencies("src/a.js")] == [["src/b.js"], []]
+        assert graph.dependencies("src/a.ts")[0]["files"] == ["src/lib/c.ts"]
+
+    def test_persists_across_instances(self, tmp_path):
+        """Test that flushed files are reloaded and clear empties the graph."""
+        path = str(tmp_path / "graph.sqlite3")
+        graph = ImportGraph(path)
+        graph.update("pkg/a.py", "python", [{"module": "pkg.b", "names": []}])
+        graph.update("pkg/b.py", "python", [])
+        graph.close()
+
+        reopened = ImportGraph(path)
+        assert reopened.dependencies("pkg/a.py")[0]["files"] == ["pkg/b.py"]
+        assert reopened.stats()["files"] == 2
+        reopened.clear()
+        assert ImportGraph(path).stats()["files"] == 0
+
+    def test_remove_forgets_deleted_files(self, tmp_path):
+        """Test that removed files stop resolving and stay removed after reopening."""
+        path = str(tmp_path / "graph.sqlite3")
+        graph = ImportGraph(path)
+        graph.update("pkg/a.py", "python", [{"module": "pkg.b", "names": []}])
+        graph.update("pkg/b.py", "python", [])
+        graph.flush()
+        assert graph.dependents("pkg/b.py") == ["pkg/a.py"]
+        graph.update("pkg/c.py", "python", [{"module": "pkg.b", "names": []}])
+
+        assert graph.remove(["pkg/b.py", "pkg/c.py", "missing.py"]) == 2
+        assert graph.dependencies("pkg/a.py")[0]["files"] == []
+        assert graph.dependents("pkg/b.py") == []
+        graph.close()
+
+        reopened = ImportGraph(path)
+        assert reopened.stats()["files"] == 1
+        assert reopened.dependencies("pkg/b.py") is None
+
+    def test_repositories_are_kept_apart(self, tmp_path):
+        """Test that repositories sharing relative paths neither overwrite nor resolve into each other."""
+        path = str(tmp_path / "graph.sqlite3")
+        graph = ImportGraph(path)
+        graph.update("pkg/a.py", "python", [{"module": "pkg.b", "names": []}], "/repos/a")
+        graph.update("pkg/b.py", "python", [], "/repos/a")
+        graph.update("pkg/a.py", "python", [{"module": "pkg.c", "names": []}], "/repos/b")
+        graph.update("pkg/c.py", "python", [], "/repos/b")
+        graph.close()
+
+        reopened = ImportGraph(path)
+        assert reopened.dependencies("pkg/a.py", "/repos/a")[0]["files"] == ["pkg/b.py"]
+        assert reopened.dependencies("pkg/a.py", "/repos/b")[0]["files"] == ["pkg/c.py"]
+        assert reopened.dependencies("pkg/a.py") is None
+        assert reopened.dependents("pkg/b.py", "/repos/a") == ["pkg/a.py"]
+        assert reopened.dependents("pkg/b.py", "/repos/b") == []
+        assert reopened.stats()["repositories"] == 2
+
+        assert reopened.remove(["pkg/a.py"], "/repos/b") == 1
+        assert reopened.dependencies("pkg/a.py", "/repos/a") is not None
+
+    def test_engine_reports_imports(self, tmp_path):
+        """Test that chunked and cached results list the file's imports."""
+        source = "import os\nfrom .models import User\n\n\ndef run():\n    return User(os.getcwd())\n"
+        engine = ChunkingEngine(workers=1, cache=ChunkCache(str(tmp_path / "cache.sqlite3")))
+        fresh, = _collect(engine, [_file("pkg/app.py", source)])
+        cached, = _collect(engine, [_file("pkg/app.py", source)])
+
+        expected = [{"module": "os", "names": []}, {"module": ".models", "names": ["User"]}]
+        assert fresh["imports"] == expected
+        assert cached["cached"] and cached["imports"] == expected
+
+
+class TestProcessingMetrics:
+    """Test the aggregation of per-file timings."""
+
+    @staticmethod
+    def _result(path, language, seconds, cached=False):
+        return {"path": path, "language": language, "chunks": [{}], "error": None, "cached": cached,
+                "seconds": 0.0 if cached else seconds,
+                "stages": {"cache": seconds} if cached else {"parse": seconds / 2, "chunk": seconds / 2}}
+
+    def test_aggregates_by_language_and_stage(self):
+        """Test per-language totals, stage totals, histograms and the slowest files."""
+        metrics = ProcessingMetrics(slowest_files=2)
+        metrics.record(self._result("a.py", "python", 0.2))
+        metrics.record(self._result("b.py", "python", 0.0005, cached=True))
+        metrics.record(self._result("c.js", "javascript", 0.03))
+        metrics.record(self._result("d.js", "javascript", 0.002))
+        metrics.record({"path": "e.py", "language": None, "chunks": [], "error": "boom"})
+        snapshot = metrics.snapshot()
+
+        assert (snapshot["files"], snapshot["errors"], snapshot["cache_hits"], snapshot["chunks"]) == (4, 1, 1, 4)
+        assert snapshot["stages"]["parse"] == pytest.approx(0.116)
+        assert list(snapshot["languages"]) == ["python", "javascript"]
+        assert snapshot["languages"]["python"]["stages"]["cache"] == pytest.approx(0.0005)
+        assert [bucket["files"] for bucket in snapshot["histogram"]] == [1, 1, 0, 1, 0, 1, 0, 0, 0]
+        assert snapshot["histogram"][-1]["le"] == "+Inf"
+        assert [entry["path"] for entry in snapshot["slowest_files"]] == ["a.py", "c.js"]
+
+        metrics.reset()
+        assert metrics.snapshot()["files"] == 0
+
+
+class TestProcessEndpoint:
+    """Test the /process endpoint on top of the engine."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.client = TestClient(preprocessor_app.app)
+
+    def test_process_keeps_file_order_and_stats(self):
+        """Test that /process returns chunks in request order with stats."""
+        files = [
+            {"path": f.path, "content": f.content, "size": f.size, "modified_time": f.modified_time}
+            for f in _files(6)
+        ]
+        with patch.object(preprocessor_app, "engine", ChunkingEngine(workers=1)):
+            response = self.client.post("/process", json={"files": files})
+
+        assert response.status_code == 200
+        data = response.json()
+        paths = []
+        for chunk in data["chunks"]:
+            if chunk["meta"]["file_path"] not in paths:
+                paths.append(chunk["meta"]["file_path"])
+        assert paths == [f["path"] for f in files]
+        assert data["stats"]["files_processed"] == 6
+        assert data["stats"]["files_by_language"] == {"python": 2, "javascript": 2, "markdown": 2}
+
+    def test_process_reports_slowest_and_generated_files(self):
+        """Test that per-file timings and generated files are listed in the stats."""
+        bundle = "".join(f"function f{i}(a){{return a*{i}}}" for i in range(300))
+        files = [
+            {"path": f.path, "content": f.content, "size": f.size, "modified_time": f.modified_time}
+            for f in _files(3) + [_file("static/app.js", bundle)]
+        ]
+        with patch.object(preprocessor_app, "engine", ChunkingEngine(workers=1)), \
+                patch.object(preprocessor_app, "PROCESS_SLOWEST_FILES", 2):
+            stats = self.client.post("/process", json={"files": files}).json()["stats"]
+
+        assert len(stats["slowest_files"]) == 2
+        assert stats["slowest_files"][0]["seconds"] >= stats["slowest_files"][1]["seconds"]
+        assert stats["chunking_seconds"] >= stats["slowest_files"][0]["seconds"]
+        assert stats["generated_files"] == [{"path": "static/app.js", "reason": "minified", "skipped": False}]
+
+    def test_process_reports_metadata_size(self):
+        """Test that /process reports the serialized metadata size per chunk."""
+        files = [
+            {"path": f.path, "content": f.content, "size": f.size, "modified_time": f.modified_time}
+            for f in _files(3)
+        ]
+        with patch.object(preprocessor_app, "engine", ChunkingEngine(workers=1)):
+            data = self.client.post("/process", json={"files": files}).json()
+
+        expected = sum(len(json.dumps(chunk["meta"])) for chunk in data["chunks"])
+        assert data["stats"]["metadata_bytes"] == expected
+        assert data["stats"]["metadata_bytes_per_chunk"] == round(expected / len(data["chunks"]), 1)
+
+    def test_derive_metadata_endpoint(self):
+        """Test that compact chunks get their derivable metadata back on demand."""
+        text = 'def f(a, b):\n    """Add."""\n    return a + b'
+        meta = {"file_path": "a.py", "start_line": 1, "end_line": 3, "chunk_type": "function",
+                "language": "python", "function_name": "f"}
+        response = self.client.post("/derive-metadata", json={"chunks": [{"text": text, "meta": meta}]})
+
+        assert response.status_code == 200
+        derived = response.json()["chunks"][0]["meta"]
+        assert derived == {**meta, "is_async": False, "args": ["a", "b"], "docstring": "Add."}
+
+    def test_process_reports_cache_hits(self, tmp_path):
+        """Test that repeated requests are served from the chunk cache."""
+        files = [
+            {"path": f.path, "content": f.content, "size": f.size, "modified_time": f.modified_time}
+            for f in _files(3)
+        ]
+        engine = ChunkingEngine(workers=1, cache=ChunkCache(str(tmp_path / "cache.sqlite3")))
+        with patch.object(preprocessor_app, "engine", engine):
+            first = self.client.post("/process", json={"files": files}).json()
+            second = self.client.post("/process", json={"files": files}).json()
+            cache_stats = self.client.get("/cache/stats").json()
+
+        assert first["stats"]["cache_hits"] == 0
+        assert second["stats"]["cache_hits"] == 3
+        assert second["chunks"] == first["chunks"]
+        assert cache_stats["entries"] == 3
+
+    def test_process_streams_ndjson(self):
+        """Test that stream mode emits chunk lines per file and a final summary."""
+        files = [
+            {"path": f.path, "content": f.content, "size": f.size, "modified_time": f.modified_time}
+            for f in _files(3)
+        ]
+        with patch.object(preprocessor_app, "engine", ChunkingEngine(workers=1)):
+            response = self.client.post("/process", json={"files": files, "stream": True})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert {r["type"] for r in records[:-1]} == {"chunk"}
+        assert [r["chunk"]["meta"]["file_path"] for r in records[:-1]] == [f["path"] for f in files]
+        assert records[-1]["type"] == "summary"
+        assert records[-1]["stats"]["total_chunks"] == len(records) - 1
+
+    def test_process_stream_reports_file_errors(self):
+        """Test that a failed file is reported in-band without stopping the stream."""
+        files = [
+            {"path": f.path, "content": f.content, "size": f.size, "modified_time": f.modified_time}
+            for f in _files(2)
+        ]
+        failing = {"path": files[0]["path"], "language": None, "chunks": [], "error": "boom"}
+        ok = chunk_file(files[1]["path"], files[1]["content"], files[1]["size"],
+                        files[1]["modified_time"], 1000, 100)
+
+        class FakeEngine:
+            async def process(self, *args, **kwargs):
+                yield failing
+                yield ok
+
+        with patch.object(preprocessor_app, "engine", FakeEngine()):
+            response = self.client.post("/process", json={"files": files, "stream": True})
+
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert records[0] == {"type": "error", "file_path": files[0]["path"], "error": "boom"}
+        assert records[1]["type"] == "chunk"
+        assert records[-1]["stats"]["files_processed"] == 1
+        assert len(records[-1]["stats"]["processing_errors"]) == 1
+
+    def test_graph_endpoints_follow_processed_files(self, tmp_path):
+        """Test that /process fills the import graph queried by /graph endpoints."""
+        files = [
+            {"path": "pkg/models.py", "content": "class User:\n    pass\n", "size": 22,
+             "modified_time": "2024-01-01T00:00:00"},
+            {"path": "pkg/views.py", "content": "from .models import User\n\n\ndef show():\n    return User()\n",
+             "size": 52, "modified_time": "2024-01-01T00:00:00"}
+        ]
+        graph = ImportGraph(str(tmp_path / "graph.sqlite3"))
+        on_loop = []
+
+        def off_loop(method):
+            def call(*args):
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(method.__name__)
+                except RuntimeError:
+                    pass
+                return method(*args)
+            return call
+
+        repository = {"repository": "/repos/app"}
+        with patch.object(preprocessor_app, "engine", ChunkingEngine(workers=1)), \
+                patch.object(preprocessor_app, "import_graph", graph), \
+                patch.object(graph, "update", off_loop(graph.update)), \
+                patch.object(graph, "flush", off_loop(graph.flush)), \
+                patch.object(graph, "dependencies", off_loop(graph.dependencies)):
+            self.client.post("/process", json={"files": files, **repository})
+            self.client.post("/process", json={"files": files[:1], "stream": True, "repository": "/repos/other"})
+            dependencies = self.client.post("/graph/dependencies",
+                                            json={"file_paths": ["pkg/views.py", "missing.py"], **repository}).json()
+            dependents = self.client.get("/graph/dependents",
+                                         params={"file_path": "pkg/models.py", **repository}).json()
+            stats = self.client.get("/graph/stats").json()
+            removed = self.client.post("/graph/remove", json={"file_paths": ["pkg/views.py"], **repository}).json()
+            after = self.client.get("/graph/dependents", params={"file_path": "pkg/models.py", **repository}).json()
+
+        assert dependencies == {"dependencies": {"pkg/views.py": [
+            {"module": ".models", "names": ["User"], "files": ["pkg/models.py"]}
+        ]}}
+        assert dependents["dependents"] == ["pkg/views.py"]
+        assert stats["files"] == 3 and stats["repositories"] == 2 and stats["pending"] == 0
+        assert removed == {"removed_count": 1}
+        assert after["dependents"] == []
+        # SQLite I/O stays off the event loop
+        assert on_loop == []
+
+    def test_process_profile_and_metrics(self):
+        """Test that /process adds a per-request profile and /metrics accumulates across requests."""
+        files = [
+            {"path": f.path, "content": f.content, "size": f.size, "modified_time": f.modified_time}
+            for f in _files(3)
+        ]
+        recorded = []
+
+        class RecordingMetrics(ProcessingMetrics):
+            def record_stage(self, stage, seconds):
+                recorded.append((self, stage, seconds))
+                super().record_stage(stage, seconds)
+
+        service_metrics = RecordingMetrics()
+        with patch.object(preprocessor_app, "engine", ChunkingEngine(workers=1)), \
+                patch.object(preprocessor_app, "metrics", service_metrics), \
+                patch.object(preprocessor_app, "ProcessingMetrics", RecordingMetrics):
+            plain = self.client.post("/process", json={"files": files}).json()
+            profiled = self.client.post("/process", json={"files": files, "profile": True}).json()
+            streamed = self.client.post("/process", json={"files": files, "stream": True, "profile": True})
+            # Snapshots round to 0.1 ms, so fast stages are checked unrounded
+            stages = dict(service_metrics._stages)
+            metrics = self.client.get("/metrics").json()
+            self.client.delete("/metrics")
+            reset = self.client.get("/metrics").json()
+
+        assert "profile" not in plain["stats"]
+        profile = profiled["stats"]["profile"]
+        assert profile["files"] == 3
+        assert set(profile["languages"]) == {"python", "javascript", "markdown"}
+        assert set(profile["stages"]) == set(PROCESSING_STAGES)
+        summary = json.loads(streamed.text.splitlines()[-1])
+        assert summary["stats"]["profile"]["files"] == 3
+        assert metrics["files"] == 9
+        assert len(metrics["slowest_files"]) == 9
+        assert all(stages[stage] > 0 for stage in ("decode", "parse", "chunk", "serialize"))
+        assert reset["files"] == 0
+
+        # Every request decodes its body; non-streamed ones serialize the chunks
+        # once, and the profiles see the same times
+        service_stages = [stage for owner, stage, _ in recorded if owner is service_metrics]
+        assert service_stages.count("decode") == 3
+        assert service_stages.count("serialize") == 2
+        profile_times = [(stage, seconds) for owner, stage, seconds in recorded if owner is not service_metrics]
+        assert [stage for stage, _ in profile_times] == ["decode", "serialize", "decode"]
+        assert all(seconds > 0 for _, seconds in profile_times)
+
+    def test_process_rejects_invalid_body(self):
+        """Test that a body that does not match ProcessRequest is a 422, as with FastAPI parsing."""
+        response = self.client.post("/process", json={"files": [{"path": "a.py"}]})
+
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "files", 0, "content"]
+        assert self.client.post("/process", content=b"{").status_code == 422
+        # The body stays documented in the OpenAPI schema
+        body = self.client.get("/openapi.json").json()["paths"]["/process"]["post"]["requestBody"]
+        assert body["content"]["application/json"]["schema"] == {"$ref": "#/components/schemas/ProcessRequest"}
@@ -77,6 +77,34 @@ class TestRAGPipeline:
         assert contexts[0]["score"] == 0.95
         assert contexts[1]["meta"]["source"] == "models.py"
 
+    @patch('requests.post')
+    def test_retrieve_contexts_with_threshold(self, mock_post):
+        """Test that a similarity threshold is forwarded to the vector index."""
+        mock_response = Mock()
+        mock_response.json.return_value = {"results": []}
+        mock_post.return_value = mock_response
+
+        pipeline = RAGPipeline()
+        pipeline.retrieve_contexts("authentication", top_k=8, threshold=0.35)
+
+        payload = mock_post.call_args.kwargs["json"]
+        assert payload == {"query": "authentication", "top_k": 8, "threshold": 0.35}
+
+    @patch('requests.post')
+    def test_retrieve_contexts_with_context_expansion(self, mock_post):
+        """Test that neighbour/parent expansion options are forwarded to the vector index."""
+        mock_response = Mock()
+        mock_response.json.return_value = {"results": []}
+        mock_post.return_value = mock_response
+
+        pipeline = RAGPipeline()
+        pipeline.retrieve_contexts("authentication", top_k=5, threshold=None,
+                                   neighbors=2, include_parent=True)
+
+        payload = mock_post.call_args.kwargs["json"]
+        assert payload == {"query": "authentication", "top_k": 5,
+                           "neighbors": 2, "include_parent": True}
+
     @patch('requests.post')
     def test_retrieve_contexts_empty_results(self, mock_post):
         """Test context retrieval with empty results."""
@@ -99,6 +127,55 @@ class TestRAGPipeline:
         contexts = pipeline.retrieve_contexts("test query")
 
         assert len(contexts) == 0
+
+    @patch('requests.get')
+    @patch('requests.post')
+    def test_retrieve_contexts_attaches_dependencies(self, mock_post, mock_get):
+        """Test that definitions of imported names are attached through the import graph."""
+        search = Mock()
+        search.json.return_value = {"results": [{
+            "text": "def login(name):\n    return User(name)",
+            "score": 0.9,
+            "meta": {"file_path": "app/views.py", "chunk_id": "app/views.py#function:login#1",
+                     "repository": "/repos/app"}
+        }]}
+        graph = Mock()
+        graph.json.return_value = {"dependencies": {"app/views.py": [
+            {"module": ".models", "names": ["User"], "files": ["app/models.py"]},
+            {"module": "os", "names": [], "files": []}
+        ]}}
+        mock_post.side_effect = [search, graph]
+        file_chunks = Mock()
+        file_chunks.json.return_value = {"chunks": [
+            {"text": "class User: ...", "meta": {"file_path": "app/models.py", "class_name": "User",
+                                                 "chunk_id": "a"}},
+            {"text": "def save(self): ...", "meta": {"file_path": "app/models.py", "function_name": "save",
+                                                     "parent": "User", "chunk_id": "b"}},
+            {"text": "class Role: ...", "meta": {"file_path": "app/models.py", "class_name": "Role",
+                                                 "chunk_id": "c"}}
+        ]}
+        mock_get.return_value = file_chunks
+
+        pipeline = RAGPipeline()
+        contexts = pipeline.retrieve_contexts("login", top_k=5, threshold=None, dependencies=3)
+
+        # The graph and the chunks are looked up in the hit's repository
+        assert mock_post.call_args.kwargs["json"] == {"file_paths": ["app/views.py"], "repository": "/repos/app"}
+        assert mock_get.call_args.kwargs["params"] == {"file_path": "app/models.py", "repository": "/repos/app"}
+        assert [d["meta"]["chunk_id"] for d in contexts[0]["dependencies"]] == ["a"]
+        assert "[DEPENDENCY | app/models.py]\nclass User" in pipeline.format_contexts(contexts)
+
+    @patch('requests.post')
+    def test_retrieve_contexts_without_import_graph(self, mock_post):
+        """Test that a failing import graph lookup keeps the search results."""
+        search = Mock()
+        search.json.return_value = {"results": [{"text": "x", "score": 0.5, "meta": {"file_path": "a.py"}}]}
+        mock_post.side_effect = [search, Exception("preprocessor down")]
+
+        pipeline = RAGPipeline()
+        contexts = pipeline.retrieve_contexts("x", threshold=None, dependencies=2)
+
+        assert len(contexts) == 1 and "dependencies" not in contexts[0]
     
     @patch('rag.SearchAdapter')
     @patch('rag.LLMClient')
@@ -198,6 +275,25 @@ class TestRAGPipeline:
         assert "def hello()" in formatted
         assert "score:" in formatted.lower()
 
+    def test_format_contexts_with_neighbors(self):
+        """Test that retrieved neighbour chunks are formatted around the hit in order."""
+        contexts = [
+            {
+                "text": "def middle(): pass",
+                "score": 0.9,
+                "meta": {"file_path": "utils.py"},
+                "neighbors": {
+                    "before": [{"text": "def first(): pass"}],
+                    "after": [{"text": "def last(): pass"}]
+                }
+            }
+        ]
+
+        pipeline = RAGPipeline()
+        formatted = pipeline.format_contexts(contexts)
+
+        assert formatted.index("def first()") < formatted.index("def middle()") < formatted.index("def last()")
+
     def test_format_contexts_empty(self):
         """Test formatting empty contexts."""
         pipeline = RAGPipeline()
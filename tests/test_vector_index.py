@@ -5,6 +5,7 @@ Tests for Vector Index functionality.
 import pytest
 import numpy as np
 import tempfile
+import threading
 import os
 from unittest.mock import Mock, patch
 
@@ -12,7 +13,10 @@ from unittest.mock import Mock, patch
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services', 'vector_index'))
 
-from index import VectorIndex, EmbeddingGenerator, FAISSIndex, SimpleInMemoryIndex
+from index import (
+    VectorIndex, EmbeddingGenerator, FAISSIndex, SimpleInMemoryIndex, SnapshotStore, ReembedJob,
+    ChunkGroups
+)
 
 
 class TestEmbeddingGenerator:
@@ -402,6 +406,481 @@ class TestVectorIndex:
         assert result["chunks_indexed"] >= 1
 
 
+class TestSearchThreshold:
+    """Test similarity cutoff (range search) semantics of the backends."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        # Unit vectors at decreasing similarity to the query e0
+        self.embeddings = np.array([
+            [1.0, 0.0, 0.0, 0.0],
+            [0.9, np.sqrt(1 - 0.81), 0.0, 0.0],
+            [0.5, 0.0, np.sqrt(0.75), 0.0],
+            [0.0, 0.0, 0.0, 1.0],
+        ], dtype=np.float32)
+        self.metadata = [{"text": f"Document {i}"} for i in range(4)]
+        self.query = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+
+    def _backends(self):
+        backends = [SimpleInMemoryIndex(dimension=4)]
+        try:
+            backends.append(FAISSIndex(dimension=4))
+        except NameError:
+            pass  # FAISS not installed
+        for backend in backends:
+            backend.add(self.embeddings.copy(), [dict(m) for m in self.metadata])
+        return backends
+
+    def test_threshold_returns_only_chunks_above_cutoff(self):
+        """Test that only results at or above the threshold are returned."""
+        for backend in self._backends():
+            results = backend.search(self.query.copy(), top_k=10, threshold=0.8)
+
+            assert [r["id"] for r in results] == [0, 1]
+            assert all(r["score"] >= 0.8 for r in results)
+            assert [r["rank"] for r in results] == [1, 2]
+
+    def test_threshold_is_capped_at_top_k(self):
+        """Test that top_k caps the range search results."""
+        for backend in self._backends():
+            results = backend.search(self.query.copy(), top_k=2, threshold=0.1)
+
+            assert [r["id"] for r in results] == [0, 1]
+
+    def test_threshold_above_all_scores(self):
+        """Test that a threshold above every score returns no results."""
+        for backend in self._backends():
+            assert backend.search(self.query.copy(), top_k=5, threshold=1.5) == []
+
+    def test_without_threshold_returns_top_k(self):
+        """Test that omitting the threshold keeps fixed top_k behaviour."""
+        for backend in self._backends():
+            results = backend.search(self.query.copy(), top_k=3)
+
+            assert [r["id"] for r in results] == [0, 1, 2]
+
+
+class TestChunkGroups:
+    """Test per-file chunk grouping used for neighbour and parent retrieval."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        # A class with three methods, an import and a function in another file
+        chunks = [
+            ("service.py", 10, 14, "method"),
+            ("service.py", 1, 2, "import"),
+            ("service.py", 4, 30, "class"),
+            ("service.py", 5, 8, "method"),
+            ("util.py", 1, 5, "function"),
+            ("service.py", 16, 30, "method"),
+        ]
+        self.metadata = [
+            {
+                "id": i,
+                "text": f"{chunk_type} {i}",
+                "meta": {"file_path": path, "start_line": start, "end_line": end}
+            }
+            for i, (path, start, end, chunk_type) in enumerate(chunks)
+        ]
+        self.groups = ChunkGroups(self.metadata)
+
+    def _ids(self, chunks):
+        return [chunk["id"] for chunk in chunks]
+
+    def test_file_chunks_in_line_order(self):
+        """Test that chunks of a file are ordered by line, enclosing chunks first."""
+        assert self._ids(self.groups.file_chunks("service.py")) == [1, 2, 3, 0, 5]
+        assert self._ids(self.groups.file_chunks("util.py")) == [4]
+        assert self.groups.file_chunks("missing.py") == []
+        assert self.groups.file_count == 2
+
+    def test_parent_is_enclosing_chunk(self):
+        """Test that methods resolve to their class and top-level chunks have no parent."""
+        assert self.groups.parent(self.metadata[0])["id"] == 2
+        assert self.groups.parent(self.metadata[5])["id"] == 2
+        assert self.groups.parent(self.metadata[2]) is None
+        assert self.groups.parent(self.metadata[4]) is None
+
+    def test_neighbors_are_siblings(self):
+        """Test that neighbours stay within the same parent and file."""
+        neighbors = self.groups.neighbors(self.metadata[0], 1)
+        assert self._ids(neighbors["before"]) == [3]
+        assert self._ids(neighbors["after"]) == [5]
+
+        neighbors = self.groups.neighbors(self.metadata[5], 5)
+        assert self._ids(neighbors["before"]) == [3, 0]
+        assert neighbors["after"] == []
+
+        neighbors = self.groups.neighbors(self.metadata[2], 1)
+        assert self._ids(neighbors["before"]) == [1]
+        assert neighbors["after"] == []
+
+    def test_add_regroups_touched_files(self):
+        """Test that chunks added later are merged into the file order."""
+        new_chunk = {"id": 6, "text": "method 6",
+                     "meta": {"file_path": "service.py", "start_line": 9, "end_line": 9}}
+        self.metadata.append(new_chunk)
+        self.groups.add([new_chunk])
+
+        assert self._ids(self.groups.file_chunks("service.py")) == [1, 2, 3, 6, 0, 5]
+        assert self.groups.parent(new_chunk)["id"] == 2
+        assert self._ids(self.groups.neighbors(self.metadata[0], 1)["before"]) == [6]
+
+    def test_foreign_chunk_is_not_expanded(self):
+        """Test that hits from another backend are not expanded with these groups."""
+        foreign = dict(self.metadata[0])
+        assert self.groups.parent(foreign) is None
+        assert self.groups.neighbors(foreign, 2) == {"before": [], "after": []}
+
+    @patch("index.EmbeddingGenerator")
+    def test_vector_index_search_expands_hits(self, mock_generator):
+        """Test that search attaches neighbours and parent without extra encoding."""
+        mock_generator.return_value.dimension = 8
+        mock_generator.return_value.model_name = "test-model"
+        mock_generator.return_value.encode.side_effect = (
+            lambda texts: np.random.rand(len(texts), 8).astype(np.float32)
+        )
+        mock_generator.return_value.encode_single.side_effect = (
+            lambda text: np.random.rand(8).astype(np.float32)
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index = VectorIndex(data_dir=tmp_dir)
+            index.insert([
+                {"text": meta["text"], "meta": meta["meta"]} for meta in self.metadata
+            ])
+            result = index.search("method", top_k=6, neighbors=1, include_parent=True)
+
+            assert mock_generator.return_value.encode_single.call_count == 1
+            by_text = {r["text"]: r for r in result["results"]}
+            # The class is a hit itself, so its methods refer to it instead of repeating it
+            assert by_text["method 0"]["parent"] is None
+            assert by_text["method 0"]["parent_rank"] == by_text["class 2"]["rank"]
+            assert [c["text"] for c in by_text["method 0"]["neighbors"]["before"]] == ["method 3"]
+            assert [c["text"] for c in by_text["method 0"]["neighbors"]["after"]] == ["method 5"]
+            assert by_text["class 2"]["parent"] is None
+
+            assert [c["text"] for c in index.get_file_chunks("service.py")["chunks"]] == [
+                "import 1", "class 2", "method 3", "method 0", "method 5"
+            ]
+            assert index.stats()["file_count"] == 2
+
+            reopened = VectorIndex(data_dir=tmp_dir)
+            assert reopened.get_file_chunks("service.py")["total_chunks"] == 5
+
+    @patch("index.EmbeddingGenerator")
+    def test_search_attaches_shared_parent_once(self, mock_generator):
+        """Test that sibling hits carry their shared parent only on the best-ranked one."""
+        # One axis per chunk; the query prefers method 3, then method 0, then method 5
+        weights = {"method 3": 4.0, "method 0": 3.0, "method 5": 2.0}
+        texts = [meta["text"] for meta in self.metadata]
+
+        def encode(batch):
+            vectors = np.zeros((len(batch), 8), dtype=np.float32)
+            for row, text in enumerate(batch):
+                vectors[row, texts.index(text)] = 1.0
+            return vectors
+
+        query = np.zeros(8, dtype=np.float32)
+        for text, weight in weights.items():
+            query[texts.index(text)] = weight
+        mock_generator.return_value.dimension = 8
+        mock_generator.return_value.model_name = "test-model"
+        mock_generator.return_value.encode.side_effect = encode
+        mock_generator.return_value.encode_single.return_value = query / np.linalg.norm(query)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index = VectorIndex(data_dir=tmp_dir)
+            index.insert([
+                {"text": meta["text"], "meta": meta["meta"]} for meta in self.metadata
+            ])
+            results = index.search("method", top_k=3, include_parent=True)["results"]
+
+            assert [r["text"] for r in results] == ["method 3", "method 0", "method 5"]
+            assert results[0]["parent"]["text"] == "class 2"
+            for result in results[1:]:
+                assert result["parent"] is None
+                assert result["parent_rank"] == 1
+
+    @patch("index.EmbeddingGenerator")
+    def test_delete_files_renumbers_and_regroups(self, mock_generator):
+        """Test that deleting a file's chunks keeps the other files searchable and grouped."""
+        mock_generator.return_value.dimension = 8
+        mock_generator.return_value.model_name = "test-model"
+        mock_generator.return_value.encode.side_effect = (
+            lambda texts: np.random.rand(len(texts), 8).astype(np.float32)
+        )
+        mock_generator.return_value.encode_single.side_effect = (
+            lambda text: np.random.rand(8).astype(np.float32)
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index = VectorIndex(data_dir=tmp_dir)
+            index.insert([
+                {"text": meta["text"], "meta": meta["meta"]} for meta in self.metadata
+            ])
+            old_backend = index.index
+            result = index.delete_files(["util.py", "missing.py"])
+
+            assert result["deleted_count"] == 1
+            assert result["files_deleted"] == 1
+            assert index.index is not old_backend
+            assert len(old_backend.metadata) == 6
+            assert [meta["id"] for meta in index.index.metadata] == list(range(5))
+            assert index.get_file_chunks("util.py")["total_chunks"] == 0
+            assert [c["text"] for c in index.get_file_chunks("service.py")["chunks"]] == [
+                "import 1", "class 2", "method 3", "method 0", "method 5"
+            ]
+            by_text = {r["text"]: r for r in index.search("method", top_k=10, include_parent=True)["results"]}
+            assert len(by_text) == 5
+            assert by_text["method 5"]["parent_rank"] == by_text["class 2"]["rank"]
+
+            reopened = VectorIndex(data_dir=tmp_dir)
+            assert reopened.stats()["file_count"] == 1
+
+    @patch("index.EmbeddingGenerator")
+    def test_delete_files_of_one_repository(self, mock_generator):
+        """Test that a repository's delete keeps another repository's files at the same paths."""
+        mock_generator.return_value.dimension = 8
+        mock_generator.return_value.model_name = "test-model"
+        mock_generator.return_value.encode.side_effect = (
+            lambda texts: np.random.rand(len(texts), 8).astype(np.float32)
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index = VectorIndex(data_dir=tmp_dir)
+            index.insert([
+                {"text": f"{repository} {meta['text']}", "meta": {**meta["meta"], "repository": repository}}
+                for repository in ("/repos/a", "/repos/b") for meta in self.metadata
+            ])
+
+            assert index.stats()["file_count"] == 4
+            assert index.get_file_chunks("util.py", "/repos/a")["total_chunks"] == 1
+            assert index.get_file_chunks("util.py")["total_chunks"] == 2
+            # Siblings and parents stay within one repository's file
+            method = next(meta for meta in index.index.metadata if meta["text"] == "/repos/b method 0")
+            assert index.groups.parent(method)["text"] == "/repos/b class 2"
+
+            result = index.delete_files(["util.py", "service.py"], repository="/repos/a")
+
+            assert result["deleted_count"] == 6
+            assert index.get_file_chunks("service.py", "/repos/a")["total_chunks"] == 0
+            assert [c["text"] for c in index.get_file_chunks("service.py", "/repos/b")["chunks"]] == [
+                "/repos/b import 1", "/repos/b class 2", "/repos/b method 3", "/repos/b method 0", "/repos/b method 5"
+            ]
+            assert index.delete_files(["util.py"])["deleted_count"] == 1
+
+
+class TestIndexSnapshots:
+    """Test versioned snapshots, checksums and rollback."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = SnapshotStore(os.path.join(self.tmp_dir.name, "snapshots"), retention=3)
+        self.embeddings = np.random.rand(4, 8).astype(np.float32)
+        self.metadata = [{"text": f"Document {i}", "source": f"doc{i}.txt"} for i in range(4)]
+
+    def teardown_method(self):
+        """Clean up temporary files."""
+        self.tmp_dir.cleanup()
+
+    def _backend(self, count: int) -> SimpleInMemoryIndex:
+        backend = SimpleInMemoryIndex(dimension=8)
+        backend.add(self.embeddings[:count], [dict(m) for m in self.metadata[:count]])
+        return backend
+
+    def test_write_creates_versioned_snapshot_with_manifest(self):
+        """Test that writing a snapshot records checksums and moves CURRENT."""
+        manifest = self.store.write(self._backend(2), {"total_vectors": 2})
+
+        assert manifest["version"] == 1
+        assert manifest["total_vectors"] == 2
+        assert "metadata.json" in manifest["files"]
+        assert all(len(info["sha256"]) == 64 for info in manifest["files"].values())
+        assert self.store.current_version() == 1
+        assert self.store.verify(1)
+
+        self.store.write(self._backend(3))
+        assert self.store.versions() == [1, 2]
+        assert self.store.current_version() == 2
+
+    def test_read_loads_snapshot_into_fresh_backend(self):
+        """Test loading a snapshot into a new backend."""
+        self.store.write(self._backend(3))
+
+        backend = SimpleInMemoryIndex(dimension=8)
+        self.store.read(1, backend)
+
+        assert len(backend.embeddings) == 3
+        assert backend.metadata[2]["text"] == "Document 2"
+
+    def test_corrupted_snapshot_is_rejected(self):
+        """Test that a checksum mismatch prevents loading."""
+        self.store.write(self._backend(2))
+        with open(self.store.metadata_path(1), "a") as f:
+            f.write(" ")
+
+        assert not self.store.verify(1)
+        with pytest.raises(ValueError):
+            self.store.read(1, SimpleInMemoryIndex(dimension=8))
+
+    def test_retention_prunes_old_snapshots(self):
+        """Test that only the newest snapshots are kept."""
+        for count in range(1, 5):
+            self.store.write(self._backend(count))
+
+        assert self.store.versions() == [2, 3, 4]
+
+    def test_set_current_for_rollback(self):
+        """Test pointing CURRENT at an older snapshot."""
+        self.store.write(self._backend(1))
+        self.store.write(self._backend(2))
+
+        self.store.set_current(1)
+        assert self.store.current_version() == 1
+
+        with pytest.raises(ValueError):
+            self.store.set_current(42)
+
+    @patch("index.EmbeddingGenerator")
+    def test_vector_index_save_load_and_rollback(self, mock_generator):
+        """Test that VectorIndex swaps backends between snapshot versions."""
+        mock_generator.return_value.dimension = 8
+        mock_generator.return_value.model_name = "test-model"
+        mock_generator.return_value.encode.side_effect = (
+            lambda texts: np.random.rand(len(texts), 8).astype(np.float32)
+        )
+
+        index = VectorIndex(data_dir=self.tmp_dir.name)
+        index.insert([{"text": "first chunk"}])
+        index.insert([{"text": "second chunk"}])
+        assert index.version == 2
+        assert index.stats()["metadata_count"] == 2
+
+        index.rollback()
+        assert index.version == 1
+        assert index.stats()["metadata_count"] == 1
+        assert index.snapshots.current_version() == 1
+
+        reopened = VectorIndex(data_dir=self.tmp_dir.name)
+        assert reopened.version == 1
+        assert reopened.stats()["metadata_count"] == 1
+
+    @patch("index.EmbeddingGenerator")
+    def test_writes_during_load_apply_to_loaded_snapshot(self, mock_generator):
+        """Test that an insert arriving while a snapshot loads waits for it instead of being lost."""
+        mock_generator.return_value.dimension = 8
+        mock_generator.return_value.model_name = "test-model"
+        mock_generator.return_value.encode.side_effect = (
+            lambda texts: np.random.rand(len(texts), 8).astype(np.float32)
+        )
+
+        index = VectorIndex(data_dir=self.tmp_dir.name)
+        index.insert([{"text": "first chunk"}])
+        reading, release = threading.Event(), threading.Event()
+        read = index.snapshots.read
+
+        def slow_read(*args):
+            reading.set()
+            release.wait(5)
+            return read(*args)
+
+        with patch.object(index.snapshots, "read", side_effect=slow_read):
+            loader = threading.Thread(target=index.load)
+            loader.start()
+            assert reading.wait(5)
+            writer = threading.Thread(target=index.insert, args=([{"text": "second chunk"}],))
+            writer.start()
+            writer.join(0.2)
+            # Held until the loaded snapshot is swapped in
+            assert writer.is_alive()
+            release.set()
+            loader.join(5)
+            writer.join(5)
+
+        assert [meta["text"] for meta in index.index.metadata] == ["first chunk", "second chunk"]
+        assert index.version == 2
+
+
+class TestReembedJob:
+    """Test re-embedding the index with a new embedding model."""
+
+    def setup_method(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def teardown_method(self):
+        """Clean up temporary files."""
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def _fake_generator(model_name="all-MiniLM-L6-v2"):
+        dimension = 16 if model_name == "new-model" else 8
+        generator = Mock()
+        generator.model_name = model_name
+        generator.dimension = dimension
+        generator.encode.side_effect = (
+            lambda texts: np.random.rand(len(texts), dimension).astype(np.float32)
+        )
+        generator.encode_single.side_effect = (
+            lambda text: np.random.rand(dimension).astype(np.float32)
+        )
+        return generator
+
+    @patch("index.EmbeddingGenerator")
+    def test_reembed_builds_new_index_and_swaps(self, mock_generator):
+        """Test that the job re-embeds stored text and swaps model and backend."""
+        mock_generator.side_effect = self._fake_generator
+        index = VectorIndex(data_dir=self.tmp_dir.name)
+        index.insert([{"text": f"chunk {i}", "meta": {"file_path": "a.py"}} for i in range(5)])
+
+        job = ReembedJob(index, "new-model", batch_size=2, workers=1)
+        job.run()
+
+        progress = job.progress()
+        assert progress["status"] == "completed"
+        assert progress["processed"] == 5
+        assert progress["percent"] == 100.0
+        assert index.embedding_generator.model_name == "new-model"
+        assert index.dimension == 16
+        assert index.stats()["metadata_count"] == 5
+        assert index.index.metadata[3]["text"] == "chunk 3"
+        assert index.snapshots.manifest(index.version)["embedding_model"] == "new-model"
+
+    @patch("index.EmbeddingGenerator")
+    def test_snapshot_keeps_serving_with_its_model(self, mock_generator):
+        """Test that a snapshot built with another model is not silently mixed."""
+        mock_generator.side_effect = self._fake_generator
+        index = VectorIndex(data_dir=self.tmp_dir.name)
+        index.insert([{"text": "chunk"}])
+        ReembedJob(index, "new-model", workers=1).run()
+
+        reopened = VectorIndex(data_dir=self.tmp_dir.name)
+        assert reopened.embedding_generator.model_name == "new-model"
+        assert reopened.stats()["reembed_required"] is True
+
+    @patch("index.EmbeddingGenerator")
+    def test_failed_job_leaves_live_index_untouched(self, mock_generator):
+        """Test that a failing model load reports an error and keeps the old index."""
+        def generator_factory(model_name="all-MiniLM-L6-v2"):
+            if model_name == "missing-model":
+                raise OSError("model not found")
+            return self._fake_generator(model_name)
+
+        mock_generator.side_effect = generator_factory
+        index = VectorIndex(data_dir=self.tmp_dir.name)
+        index.insert([{"text": "chunk"}])
+        live_backend = index.index
+
+        job = ReembedJob(index, "missing-model", workers=1)
+        job.run()
+
+        assert job.progress()["status"] == "failed"
+        assert "model not found" in job.progress()["error"]
+        assert index.index is live_backend
+
+
 class TestVectorIndexIntegration:
     """Integration tests for the vector index system."""
     